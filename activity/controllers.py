@@ -1638,7 +1638,7 @@ def schedule_activity_notices_from_seed(activity_notice_seed):
     #  NOTICE_FRIEND_ENDORSEMENTS_SEED
     #  NOTICE_VOTER_DAILY_SUMMARY_SEED
     if activity_notice_seed.kind_of_seed == NOTICE_CAMPAIGNX_NEWS_ITEM_SEED:
-        from campaign.controllers_email_outbound import campaignx_news_item_send
+        from campaign.controllers_email_outbound import campaignx_news_item_send_to_recipient_list
         from campaign.controllers import fetch_sentence_string_from_politician_list
         from campaign.models import CampaignXManager
         from organization.controllers import transform_campaigns_url
@@ -1693,8 +1693,11 @@ def schedule_activity_notices_from_seed(activity_notice_seed):
                 success = False
             elif results['activity_notice_list_found']:
                 activity_notice_list = results['activity_notice_list']
-                for activity_notice in activity_notice_list:
-                    send_results = campaignx_news_item_send(
+                # Render this batch's emails together
+                send_results_dict = {}
+                for speaker_voter_we_vote_id in set(activity_notice.speaker_voter_we_vote_id
+                                                    for activity_notice in activity_notice_list):
+                    send_list_results = campaignx_news_item_send_to_recipient_list(
                         campaignx_news_item_we_vote_id=activity_notice_seed.campaignx_news_item_we_vote_id,
                         campaigns_root_url_verified=campaigns_root_url_verified,
                         campaignx_title=campaignx_title,
@@ -1702,13 +1705,18 @@ def schedule_activity_notices_from_seed(activity_notice_seed):
                         campaignx_we_vote_id=activity_notice_seed.campaignx_we_vote_id,
                         politician_count=politician_count,
                         politician_full_sentence_string=politician_full_sentence_string,
-                        recipient_voter_we_vote_id=activity_notice.recipient_voter_we_vote_id,
+                        recipient_voter_we_vote_id_list=[
+                            activity_notice.recipient_voter_we_vote_id for activity_notice in activity_notice_list
+                            if activity_notice.speaker_voter_we_vote_id == speaker_voter_we_vote_id],
                         speaker_voter_name=speaker_voter_name,
-                        speaker_voter_we_vote_id=activity_notice.speaker_voter_we_vote_id,
+                        speaker_voter_we_vote_id=speaker_voter_we_vote_id,
                         statement_subject=activity_notice_seed.statement_subject,
                         statement_text_preview=activity_notice_seed.statement_text_preview,
                         we_vote_hosted_campaign_photo_large_url=we_vote_hosted_campaign_photo_large_url,
                     )
+                    send_results_dict.update(send_list_results['send_results_dict'])
+                for activity_notice in activity_notice_list:
+                    send_results = send_results_dict[activity_notice.recipient_voter_we_vote_id]
                     activity_notice_id_already_reviewed_list.append(activity_notice.id)
                     try:
                         activity_notice.scheduled_to_email = True
@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from activity.push_notifications import PushNotificationDispatcher, PUSH_NOTIFICATION_WORKER_COUNT
+
+
+class Command(BaseCommand):
+    help = 'Sends the push notifications that are due, including retries. With --loop, keeps checking for more.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=PUSH_NOTIFICATION_WORKER_COUNT)
+        parser.add_argument('--loop', action='store_true')
+        parser.add_argument('--sleep_seconds', type=int, default=5)
+
+    def handle(self, *args, **options):
+        push_notification_dispatcher = PushNotificationDispatcher(worker_count=options['workers'])
+        while True:
+            results = push_notification_dispatcher.dispatch()
+            if results['status']:
+                self.stdout.write(results['status'])
+            if not options['loop']:
+                break
+            time.sleep(options['sleep_seconds'])
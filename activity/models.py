@@ -1764,6 +1764,26 @@ class ActivityPost(models.Model):
         super(ActivityPost, self).save(*args, **kwargs)
 
 
+class ActivityPushNotification(models.Model):
+    """
+    A push notification waiting to be sent to one voter's phones. Posts made before it is sent are added to it,
+    so a voter gets one notification for a burst of posts. Sent by activity/push_notifications.py
+    """
+    recipient_voter_we_vote_id = models.CharField(max_length=255, db_index=True)
+    speaker_name = models.CharField(max_length=255, default=None, null=True)
+    statement_text = models.TextField(default=None, null=True)
+    coalesced_count = models.PositiveIntegerField(default=1)
+    date_created = models.DateTimeField(null=True, auto_now_add=True)
+    date_to_send = models.DateTimeField(default=now, db_index=True)
+    date_checked_out = models.DateTimeField(default=None, null=True)
+    date_sent = models.DateTimeField(default=None, null=True, db_index=True)
+    send_failed = models.BooleanField(default=False)
+    attempt_count = models.PositiveIntegerField(default=0)
+    # The [platform_type, firebase_fcm_token] pairs still to be sent to, when retrying
+    fcm_token_list_serialized = models.TextField(default=None, null=True)
+    status = models.TextField(default=None, null=True)
+
+
 def get_lifespan_of_seed(kind_of_seed):
     if kind_of_seed == NOTICE_ACTIVITY_POST_SEED:
         return 14400  # 4 hours * 60 minutes * 60 seconds/minute
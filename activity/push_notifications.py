@@ -0,0 +1,391 @@
+# activity/push_notifications.py
+# Brought to you by We Vote. Be good.
+# -*- coding: UTF-8 -*-
+
+"""
+Push notifications to the Cordova apps, sent from the ActivityPushNotification table so they survive a restart.
+A web server sends them soon after they are queued, on one background thread per process. Whatever it misses,
+and the retries, are sent by process_next_activity_notices, or by "python manage.py send_push_notifications".
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+import json
+import random
+import threading
+
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils.timezone import now
+
+from activity.models import ActivityNotice, ActivityPushNotification
+from config.base import get_environment_variable_default
+from friend.models import FriendManager
+from voter.models import Voter, VoterDeviceLink
+import wevote_functions.admin
+from wevote_functions.background_task import BackgroundTask
+from wevote_functions.functions import convert_to_int, positive_value_exists
+
+logger = wevote_functions.admin.get_logger(__name__)
+
+PUSH_NOTIFICATION_TITLE = "We Vote"
+PUSH_NOTIFICATION_DEVICE_ACTIVE_DAYS = 15
+PUSH_NOTIFICATION_BADGE_NOTICES_COUNTED = 30  # As many as the notification drop-down menu shows
+PUSH_NOTIFICATION_CLAIM_BATCH_SIZE = 200
+PUSH_NOTIFICATION_CHECKED_OUT_EXPIRATION_SECONDS = 300
+PUSH_NOTIFICATION_MAX_ATTEMPTS = 6
+PUSH_NOTIFICATION_RETRY_BASE_SECONDS = 30
+PUSH_NOTIFICATION_RETRY_MAX_SECONDS = 3600
+PUSH_NOTIFICATION_WORKER_COUNT = \
+    convert_to_int(get_environment_variable_default("PUSH_NOTIFICATION_WORKER_COUNT", 4)) or 4
+
+
+def push_notification_body(push_notification):
+    body = push_notification.speaker_name + " posted \"" + push_notification.statement_text + "\""
+    if push_notification.coalesced_count > 1:
+        body += " and " + str(push_notification.coalesced_count - 1) + " more"
+    return body
+
+
+def push_notification_retry_delay_seconds(attempt_count):
+    # Exponential backoff, with jitter so the retries from one outage don't all arrive together
+    delay_seconds = min(PUSH_NOTIFICATION_RETRY_BASE_SECONDS * (2 ** max(attempt_count - 1, 0)),
+                        PUSH_NOTIFICATION_RETRY_MAX_SECONDS)
+    return delay_seconds / 2 + random.uniform(0, delay_seconds / 2)
+
+
+def queue_activity_post_push_notifications(recipient_voter_we_vote_id_list, speaker_name, statement_text):
+    """
+    Queue a notification about a new post for each recipient. A recipient with a notification that hasn't been
+    tried yet gets that one updated instead of a second one.
+    :param recipient_voter_we_vote_id_list:
+    :param speaker_name:
+    :param statement_text:
+    :return:
+    """
+    status = ""
+    success = True
+    queued_count = 0
+    coalesced_count = 0
+    recipient_voter_we_vote_id_list = list(set(recipient_voter_we_vote_id_list))
+    if not len(recipient_voter_we_vote_id_list):
+        return {
+            'success':          success,
+            'status':           "NO_PUSH_NOTIFICATION_RECIPIENTS ",
+            'queued_count':     queued_count,
+            'coalesced_count':  coalesced_count,
+        }
+    speaker_name = speaker_name if positive_value_exists(speaker_name) else ''
+    statement_text = statement_text if positive_value_exists(statement_text) else ''
+    try:
+        with transaction.atomic():
+            # Once a notification is checked out to be sent, we leave it alone and queue a new one. So we do for a
+            #  retry, which only goes to the devices the earlier attempt didn't reach.
+            push_notification_list = list(ActivityPushNotification.objects.select_for_update().filter(
+                Q(fcm_token_list_serialized__isnull=True) | Q(fcm_token_list_serialized=''),
+                recipient_voter_we_vote_id__in=recipient_voter_we_vote_id_list,
+                date_sent__isnull=True,
+                date_checked_out__isnull=True,
+                send_failed=False,
+                attempt_count=0))
+            recipients_with_pending_notification = set()
+            for push_notification in push_notification_list:
+                if push_notification.recipient_voter_we_vote_id in recipients_with_pending_notification:
+                    continue
+                recipients_with_pending_notification.add(push_notification.recipient_voter_we_vote_id)
+                push_notification.speaker_name = speaker_name
+                push_notification.statement_text = statement_text
+                push_notification.coalesced_count += 1
+                coalesced_count += 1
+            ActivityPushNotification.objects.bulk_update(
+                [push_notification for push_notification in push_notification_list
+                 if push_notification.recipient_voter_we_vote_id in recipients_with_pending_notification],
+                ['speaker_name', 'statement_text', 'coalesced_count'])
+            new_push_notification_list = [
+                ActivityPushNotification(
+                    recipient_voter_we_vote_id=recipient_voter_we_vote_id,
+                    speaker_name=speaker_name,
+                    statement_text=statement_text)
+                for recipient_voter_we_vote_id in recipient_voter_we_vote_id_list
+                if recipient_voter_we_vote_id not in recipients_with_pending_notification]
+            ActivityPushNotification.objects.bulk_create(new_push_notification_list)
+            queued_count = len(new_push_notification_list)
+        status += "PUSH_NOTIFICATIONS_QUEUED "
+    except Exception as e:
+        status += "PUSH_NOTIFICATIONS_NOT_QUEUED: " + str(e) + " "
+        logger.error(status)
+        success = False
+    return {
+        'success':          success,
+        'status':           status,
+        'queued_count':     queued_count,
+        'coalesced_count':  coalesced_count,
+    }
+
+
+def queue_friend_post_push_notifications(speaker_voter_we_vote_id, speaker_name, statement_text):
+    """
+    Notify all the speaker's friends, on all of the devices they have used in the last 15 days, soon
+    :param speaker_voter_we_vote_id:
+    :param speaker_name:
+    :param statement_text:
+    :return:
+    """
+    friend_results = FriendManager().retrieve_friends_we_vote_id_list(speaker_voter_we_vote_id)
+    if not friend_results['friends_we_vote_id_list_found']:
+        return {
+            'success':  friend_results['success'],
+            'status':   friend_results['status'],
+        }
+    results = queue_activity_post_push_notifications(
+        friend_results['friends_we_vote_id_list'], speaker_name, statement_text)
+    if results['success']:
+        dispatch_push_notifications_soon()
+    return results
+
+
+class PushNotificationDispatcher(object):
+    """
+    Claims notifications that are due, looks up their devices, and sends each message to as many devices as it can
+    at once, on worker_count threads. The database work stays on the calling thread.
+    :param transport: has send_multicast(type, token_list, title, body, badge_number), like
+      google_firebase_api.cloud_messaging.FirebaseCloudMessagingTransport
+    """
+
+    def __init__(self, transport=None, worker_count=PUSH_NOTIFICATION_WORKER_COUNT,
+                 claim_batch_size=PUSH_NOTIFICATION_CLAIM_BATCH_SIZE):
+        if transport is None:
+            from google_firebase_api.cloud_messaging import FirebaseCloudMessagingTransport
+            transport = FirebaseCloudMessagingTransport()
+        self.transport = transport
+        self.worker_count = worker_count
+        self.claim_batch_size = claim_batch_size
+        self.executor = ThreadPoolExecutor(max_workers=worker_count, thread_name_prefix='push_notification')
+
+    def claim_push_notifications(self):
+        checked_out_expired_time = now() - timedelta(seconds=PUSH_NOTIFICATION_CHECKED_OUT_EXPIRATION_SECONDS)
+        with transaction.atomic():
+            # skip_locked lets other processes claim the next notifications instead of waiting for these
+            push_notification_list = list(
+                ActivityPushNotification.objects.select_for_update(skip_locked=True)
+                .filter(date_sent__isnull=True, send_failed=False, date_to_send__lte=now())
+                .exclude(date_checked_out__gt=checked_out_expired_time)
+                .order_by('date_to_send')[:self.claim_batch_size])
+            for push_notification in push_notification_list:
+                push_notification.date_checked_out = now()
+                push_notification.attempt_count += 1
+            ActivityPushNotification.objects.bulk_update(
+                push_notification_list, ['date_checked_out', 'attempt_count'])
+        return push_notification_list
+
+    def fetch_fcm_token_list_dict(self, push_notification_list):
+        """
+        :return: dict of push_notification.id -> list of (platform_type, firebase_fcm_token)
+        """
+        fcm_token_list_dict = {}
+        recipient_voter_we_vote_id_list = []
+        for push_notification in push_notification_list:
+            if positive_value_exists(push_notification.fcm_token_list_serialized):
+                # A retry goes to the devices that weren't reached
+                fcm_token_list_dict[push_notification.id] = \
+                    [tuple(pair) for pair in json.loads(push_notification.fcm_token_list_serialized)]
+            else:
+                recipient_voter_we_vote_id_list.append(push_notification.recipient_voter_we_vote_id)
+        if not len(recipient_voter_we_vote_id_list):
+            return fcm_token_list_dict
+
+        voter_we_vote_id_by_voter_id = {
+            voter_id: voter_we_vote_id for voter_we_vote_id, voter_id in Voter.objects.using('readonly')
+            .filter(we_vote_id__in=recipient_voter_we_vote_id_list).values_list('we_vote_id', 'id')}
+        fcm_token_list_by_voter_we_vote_id = {}
+        device_query = VoterDeviceLink.objects.using('readonly') \
+            .filter(voter_id__in=list(voter_we_vote_id_by_voter_id.keys()),
+                    date_last_changed__gt=now() - timedelta(days=PUSH_NOTIFICATION_DEVICE_ACTIVE_DAYS)) \
+            .exclude(firebase_fcm_token__isnull=True) \
+            .exclude(firebase_fcm_token='') \
+            .values_list('voter_id', 'platform_type', 'firebase_fcm_token')
+        for voter_id, platform_type, firebase_fcm_token in device_query:
+            fcm_token_list = fcm_token_list_by_voter_we_vote_id.setdefault(voter_we_vote_id_by_voter_id[voter_id], [])
+            if (platform_type, firebase_fcm_token) not in fcm_token_list:
+                fcm_token_list.append((platform_type, firebase_fcm_token))
+        for push_notification in push_notification_list:
+            if push_notification.id not in fcm_token_list_dict:
+                fcm_token_list_dict[push_notification.id] = \
+                    fcm_token_list_by_voter_we_vote_id.get(push_notification.recipient_voter_we_vote_id, [])
+        return fcm_token_list_dict
+
+    def fetch_badge_number_dict(self, push_notification_list):
+        recipient_voter_we_vote_id_list = \
+            list(set(push_notification.recipient_voter_we_vote_id for push_notification in push_notification_list))
+        notice_count_dict = dict(
+            ActivityNotice.objects.using('readonly')
+            .filter(recipient_voter_we_vote_id__in=recipient_voter_we_vote_id_list, deleted=False)
+            .values('recipient_voter_we_vote_id')
+            .annotate(notice_count=Count('id'))
+            .values_list('recipient_voter_we_vote_id', 'notice_count'))
+        return {
+            push_notification.id:
+                min(notice_count_dict.get(push_notification.recipient_voter_we_vote_id, 0),
+                    PUSH_NOTIFICATION_BADGE_NOTICES_COUNTED) + 1
+            for push_notification in push_notification_list}
+
+    def send_multicast_chunk(self, chunk):
+        """
+        Runs on a worker thread
+        :param chunk: (message_type, title, body, badge_number, list of (push_notification.id, platform_type, token))
+        :return: list of (push_notification.id, platform_type, token, result)
+        """
+        from google_firebase_api.cloud_messaging import FCM_SEND_RETRY
+        message_type, title, body, badge_number, device_list = chunk
+        try:
+            token_list = [token for push_notification_id, platform_type, token in device_list]
+            result_list = self.transport.send_multicast(message_type, token_list, title, body, badge_number)
+        except Exception as e:
+            logger.error('send_multicast_chunk threw: ' + str(e))
+            result_list = [FCM_SEND_RETRY] * len(device_list)
+        return [device + (result,) for device, result in zip(device_list, result_list)]
+
+    def dispatch_once(self):
+        """
+        Send one claimed batch
+        :return:
+        """
+        from google_firebase_api.cloud_messaging import FCM_MESSAGE_NOT_VALID, FCM_MULTICAST_TOKEN_LIMIT, FCM_SEND_OK, \
+            FCM_SEND_RETRY, FCM_TOKEN_NOT_VALID
+        status = ""
+        push_notification_list = self.claim_push_notifications()
+        if not len(push_notification_list):
+            return {
+                'success':                  True,
+                'status':                   status,
+                'push_notification_count':  0,
+                'sent_count':               0,
+                'retry_count':              0,
+            }
+        fcm_token_list_dict = self.fetch_fcm_token_list_dict(push_notification_list)
+        badge_number_dict = self.fetch_badge_number_dict(push_notification_list)
+
+        # The same message to devices of the same type goes out in one request
+        device_list_by_message = {}
+        for push_notification in push_notification_list:
+            body = push_notification_body(push_notification)
+            for platform_type, token in fcm_token_list_dict[push_notification.id]:
+                message_type = 'IOS' if platform_type == 'IOS' else 'ANDROID'
+                message_key = (message_type, PUSH_NOTIFICATION_TITLE, body, badge_number_dict[push_notification.id])
+                device_list_by_message.setdefault(message_key, []).append(
+                    (push_notification.id, platform_type, token))
+        chunk_list = []
+        for message_key, device_list in device_list_by_message.items():
+            for index in range(0, len(device_list), FCM_MULTICAST_TOKEN_LIMIT):
+                chunk_list.append(message_key + (device_list[index:index + FCM_MULTICAST_TOKEN_LIMIT],))
+
+        retry_token_list_dict = {}
+        not_valid_token_list = []
+        message_not_valid_count = 0
+        for chunk_result_list in self.executor.map(self.send_multicast_chunk, chunk_list):
+            for push_notification_id, platform_type, token, result in chunk_result_list:
+                if result == FCM_SEND_RETRY:
+                    retry_token_list_dict.setdefault(push_notification_id, []).append([platform_type, token])
+                elif result == FCM_TOKEN_NOT_VALID:
+                    not_valid_token_list.append(token)
+                elif result == FCM_MESSAGE_NOT_VALID:
+                    message_not_valid_count += 1
+                elif result != FCM_SEND_OK:
+                    logger.error('dispatch_once unexpected send result: ' + str(result))
+
+        sent_count = 0
+        retry_count = 0
+        for push_notification in push_notification_list:
+            push_notification.date_checked_out = None
+            retry_token_list = retry_token_list_dict.get(push_notification.id)
+            if not retry_token_list:
+                push_notification.date_sent = now()
+                push_notification.fcm_token_list_serialized = None
+                push_notification.status = "SENT_TO_DEVICES: " + str(len(fcm_token_list_dict[push_notification.id]))
+                sent_count += 1
+            elif push_notification.attempt_count >= PUSH_NOTIFICATION_MAX_ATTEMPTS:
+                push_notification.send_failed = True
+                push_notification.status = "GAVE_UP_AFTER_ATTEMPTS: " + str(push_notification.attempt_count)
+            else:
+                push_notification.fcm_token_list_serialized = json.dumps(retry_token_list)
+                push_notification.date_to_send = now() + timedelta(
+                    seconds=push_notification_retry_delay_seconds(push_notification.attempt_count))
+                push_notification.status = "RETRYING_DEVICES: " + str(len(retry_token_list))
+                retry_count += 1
+        ActivityPushNotification.objects.bulk_update(
+            push_notification_list,
+            ['date_checked_out', 'date_sent', 'date_to_send', 'send_failed', 'fcm_token_list_serialized', 'status'])
+        if message_not_valid_count:
+            status += "FCM_MESSAGES_NOT_VALID: " + str(message_not_valid_count) + " "
+            logger.error('dispatch_once FCM refused messages: ' + str(message_not_valid_count))
+        if len(not_valid_token_list):
+            # Don't send to uninstalled apps again
+            VoterDeviceLink.objects.filter(firebase_fcm_token__in=not_valid_token_list).update(firebase_fcm_token=None)
+            status += "FCM_TOKENS_CLEARED: " + str(len(not_valid_token_list)) + " "
+        return {
+            'success':                  True,
+            'status':                   status,
+            'push_notification_count':  len(push_notification_list),
+            'sent_count':               sent_count,
+            'retry_count':              retry_count,
+        }
+
+    def dispatch(self, max_batches=None):
+        """
+        Send batches until nothing is due
+        :param max_batches:
+        :return:
+        """
+        status = ""
+        success = True
+        sent_count = 0
+        retry_count = 0
+        batch_count = 0
+        try:
+            while max_batches is None or batch_count < max_batches:
+                results = self.dispatch_once()
+                if not results['push_notification_count']:
+                    break
+                batch_count += 1
+                status += results['status']
+                sent_count += results['sent_count']
+                retry_count += results['retry_count']
+        except Exception as e:
+            status += "PUSH_NOTIFICATION_DISPATCH_FAILED: " + str(e) + " "
+            logger.error(status)
+            success = False
+        if sent_count or retry_count:
+            status += "PUSH_NOTIFICATIONS_SENT: " + str(sent_count) + ", RETRYING: " + str(retry_count) + " "
+        return {
+            'success':      success,
+            'status':       status,
+            'sent_count':   sent_count,
+            'retry_count':  retry_count,
+        }
+
+
+push_notification_dispatcher = None
+push_notification_dispatcher_lock = threading.Lock()
+
+
+def fetch_push_notification_dispatcher():
+    global push_notification_dispatcher
+    with push_notification_dispatcher_lock:
+        if push_notification_dispatcher is None:
+            push_notification_dispatcher = PushNotificationDispatcher()
+        return push_notification_dispatcher
+
+
+def dispatch_push_notifications(max_batches=None):
+    return fetch_push_notification_dispatcher().dispatch(max_batches=max_batches)
+
+
+push_notification_dispatch_task = BackgroundTask('push_notification_dispatch', dispatch_push_notifications)
+
+
+def dispatch_push_notifications_soon():
+    """
+    Send the queued notifications on this process's background thread, so the request doesn't wait
+    :return:
+    """
+    push_notification_dispatch_task.run_soon()
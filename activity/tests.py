@@ -0,0 +1,99 @@
+# activity/tests.py
+# Brought to you by We Vote. Be good.
+# -*- coding: UTF-8 -*-
+
+from django.test import SimpleTestCase, TestCase
+
+from activity.models import ActivityPushNotification
+from activity.push_notifications import PushNotificationDispatcher, queue_activity_post_push_notifications
+from firebase_admin import exceptions as firebase_exceptions
+from firebase_admin import messaging
+from google_firebase_api.cloud_messaging import fcm_send_result, FCM_MESSAGE_NOT_VALID, FCM_SEND_OK, FCM_SEND_RETRY, \
+    FCM_TOKEN_NOT_VALID
+from voter.models import Voter, VoterDeviceLink
+
+
+class FakeCloudMessagingTransport(object):
+
+    def __init__(self, result_by_token=None, raise_exception=False):
+        self.result_by_token = result_by_token or {}
+        self.raise_exception = raise_exception
+        self.sent_list = []
+
+    def send_multicast(self, type, token_list, title, body, badge_number):
+        if self.raise_exception:
+            raise Exception('FCM unavailable')
+        self.sent_list.append((type, sorted(token_list), body, badge_number))
+        return [self.result_by_token.get(token, FCM_SEND_OK) for token in token_list]
+
+
+class FakeSendResponse(object):
+
+    def __init__(self, exception=None):
+        self.success = exception is None
+        self.exception = exception
+
+
+class PushNotificationDispatcherTestCase(SimpleTestCase):
+
+    def test_only_unregistered_tokens_are_not_valid(self):
+        self.assertEqual(fcm_send_result(FakeSendResponse()), FCM_SEND_OK)
+        self.assertEqual(fcm_send_result(FakeSendResponse(messaging.UnregisteredError('Unregistered'))),
+                         FCM_TOKEN_NOT_VALID)
+        self.assertEqual(fcm_send_result(FakeSendResponse(messaging.SenderIdMismatchError('Mismatch'))),
+                         FCM_TOKEN_NOT_VALID)
+        # Ex/ the message is too large, which isn't the device's fault
+        self.assertEqual(fcm_send_result(FakeSendResponse(firebase_exceptions.InvalidArgumentError('Too large'))),
+                         FCM_MESSAGE_NOT_VALID)
+        self.assertEqual(fcm_send_result(FakeSendResponse(messaging.QuotaExceededError('Quota'))), FCM_SEND_RETRY)
+
+    def test_failed_request_is_retried(self):
+        push_notification_dispatcher = PushNotificationDispatcher(
+            transport=FakeCloudMessagingTransport(raise_exception=True), worker_count=1)
+        result_list = push_notification_dispatcher.send_multicast_chunk(
+            ('IOS', 'We Vote', 'body', 1, [(1, 'IOS', 'token1'), (2, 'IOS', 'token2')]))
+        self.assertEqual(result_list, [(1, 'IOS', 'token1', FCM_SEND_RETRY), (2, 'IOS', 'token2', FCM_SEND_RETRY)])
+
+
+class PushNotificationSendTestCase(TestCase):
+    databases = '__all__'
+
+    def test_posts_are_coalesced_and_sent_to_each_device_type_at_once(self):
+        voter = Voter.objects.create(we_vote_id='wv01voter1')
+        for voter_device_id, platform_type, firebase_fcm_token in [
+                ('device1', 'IOS', 'iphone'), ('device2', 'IOS', 'ipad'), ('device3', 'ANDROID', 'android'),
+                ('device4', 'ANDROID', 'uninstalled'), ('device5', 'ANDROID', 'unavailable')]:
+            VoterDeviceLink.objects.create(voter_device_id=voter_device_id, voter_id=voter.id,
+                                           platform_type=platform_type, firebase_fcm_token=firebase_fcm_token)
+        queue_activity_post_push_notifications(['wv01voter1'], 'Pat', 'First')
+        results = queue_activity_post_push_notifications(['wv01voter1'], 'Pat', 'Second')
+        self.assertEqual(results['coalesced_count'], 1)
+        self.assertEqual(ActivityPushNotification.objects.count(), 1)
+
+        transport = FakeCloudMessagingTransport(
+            result_by_token={'uninstalled': FCM_TOKEN_NOT_VALID, 'unavailable': FCM_SEND_RETRY})
+        results = PushNotificationDispatcher(transport=transport, worker_count=2).dispatch()
+
+        self.assertEqual(results['retry_count'], 1)
+        self.assertEqual(sorted(transport.sent_list), [
+            ('ANDROID', ['android', 'unavailable', 'uninstalled'], 'Pat posted "Second" and 1 more', 1),
+            ('IOS', ['ipad', 'iphone'], 'Pat posted "Second" and 1 more', 1),
+        ])
+        self.assertIsNone(VoterDeviceLink.objects.get(voter_device_id='device4').firebase_fcm_token)
+        push_notification = ActivityPushNotification.objects.get()
+        self.assertIsNone(push_notification.date_sent)
+        self.assertIsNone(push_notification.date_checked_out)
+        # Only the device we didn't reach gets the retry, and not before its backoff
+        self.assertEqual(push_notification.fcm_token_list_serialized, '[["ANDROID", "unavailable"]]')
+        self.assertEqual(PushNotificationDispatcher(transport=transport, worker_count=1).dispatch()['sent_count'], 0)
+
+    def test_post_is_not_added_to_a_retry(self):
+        ActivityPushNotification.objects.create(
+            recipient_voter_we_vote_id='wv01voter1', speaker_name='Pat', statement_text='First', attempt_count=1,
+            fcm_token_list_serialized='[["ANDROID", "unavailable"]]')
+
+        results = queue_activity_post_push_notifications(['wv01voter1'], 'Pat', 'Second')
+
+        self.assertEqual((results['queued_count'], results['coalesced_count']), (1, 0))
+        self.assertEqual(sorted(ActivityPushNotification.objects.values_list('statement_text', flat=True)),
+                         ['First', 'Second'])
@@ -8,6 +8,7 @@ from . import views
 
 urlpatterns = [
     re_path(r'^$', views.admin_home_view, name='admin_home',),
+    re_path(r'^api_profiling/$', views.api_profiling_view, name='api_profiling'),
     re_path(r'^data_cleanup/$', views.data_cleanup_view, name='data_cleanup'),
     re_path(r'^data_cleanup_organization_analysis/$',
         views.data_cleanup_organization_analysis_view, name='data_cleanup_organization_analysis'),
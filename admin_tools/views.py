@@ -2,6 +2,9 @@
 # Brought to you by We Vote. Be good.
 # -*- coding: UTF-8 -*-
 
+from apis_v1.middleware import API_PROFILING_CPROFILE_SAMPLE_RATE, API_PROFILING_ENABLED, \
+    API_PROFILING_SERVER_TIMING, API_PROFILING_SLOW_REQUEST_MS, api_profile_statistics
+from datetime import datetime
 from config.base import get_environment_variable, get_git_merge_date, get_node_version, get_postgres_version, \
     get_python_version, LOGIN_URL
 from ballot.models import BallotReturned, VoterBallotSaved
@@ -154,6 +157,33 @@ def admin_home_view(request):
     return response
 
 
+@login_required
+def api_profiling_view(request):
+    # admin, analytics_admin, partner_organization, political_data_manager, political_data_viewer, verified_volunteer
+    authority_required = {'admin'}
+    if not voter_has_authority(request, authority_required):
+        return redirect_to_sign_in_page(request, authority_required)
+
+    sort_by = request.GET.get('sort_by', 'total_ms_p95')
+    if positive_value_exists(request.GET.get('reset', False)):
+        api_profile_statistics.reset()
+        messages.add_message(request, messages.INFO, 'API profiling numbers reset for this server process.')
+        return HttpResponseRedirect(reverse('admin_tools:api_profiling', args=()) + "?sort_by=" + sort_by)
+
+    template_values = {
+        'api_profiling_enabled':        API_PROFILING_ENABLED,
+        'cprofile_sample_rate':         API_PROFILING_CPROFILE_SAMPLE_RATE,
+        'endpoint_summary_list':        api_profile_statistics.summary_list(sort_by=sort_by),
+        'messages_on_stage':            get_messages(request),
+        'server_timing':                API_PROFILING_SERVER_TIMING,
+        'slow_request_ms':              API_PROFILING_SLOW_REQUEST_MS,
+        'slow_request_profile_list':    api_profile_statistics.slow_request_profiles(),
+        'sort_by':                      sort_by,
+        'started_time':                 datetime.fromtimestamp(api_profile_statistics.started_time),
+    }
+    return render(request, 'admin_tools/api_profiling.html', template_values)
+
+
 @login_required
 def data_cleanup_view(request):
     # admin, analytics_admin, partner_organization, political_data_manager, political_data_viewer, verified_volunteer
@@ -1331,67 +1331,6 @@ def delete_analytics_info_for_voter(voter_to_delete_we_vote_id):
     return results
 
 
-def move_analytics_info_to_another_voter(from_voter_we_vote_id, to_voter_we_vote_id):
-    status = " MOVE_ANALYTICS_ACTION_DATA"
-    success = False
-    analytics_action_moved = 0
-    analytics_action_not_moved = 0
-
-    if not positive_value_exists(from_voter_we_vote_id) or not positive_value_exists(to_voter_we_vote_id):
-        status += "MOVE_ANALYTICS_ACTION-MISSING_FROM_OR_TO_VOTER_ID"
-        results = {
-            'status':                       status,
-            'success':                      success,
-            'from_voter_we_vote_id':        from_voter_we_vote_id,
-            'to_voter_we_vote_id':          to_voter_we_vote_id,
-            'analytics_action_moved':       analytics_action_moved,
-            'analytics_action_not_moved':   analytics_action_not_moved,
-        }
-        return results
-
-    if from_voter_we_vote_id == to_voter_we_vote_id:
-        status += "MOVE_ANALYTICS_ACTION-FROM_AND_TO_VOTER_WE_VOTE_ID_IDENTICAL "
-        results = {
-            'status':                       status,
-            'success':                      success,
-            'from_voter_we_vote_id':        from_voter_we_vote_id,
-            'to_voter_we_vote_id':          to_voter_we_vote_id,
-            'analytics_action_moved':       analytics_action_moved,
-            'analytics_action_not_moved':   analytics_action_not_moved,
-        }
-        return results
-
-    analytics_manager = AnalyticsManager()
-    analytics_action_list_results = analytics_manager.retrieve_analytics_action_list(from_voter_we_vote_id)
-    if analytics_action_list_results['analytics_action_list_found']:
-        analytics_action_list = analytics_action_list_results['analytics_action_list']
-
-        for analytics_action_object in analytics_action_list:
-            # Change the voter_we_vote_id
-            try:
-                analytics_action_object.voter_we_vote_id = to_voter_we_vote_id
-                analytics_action_object.save()
-                analytics_action_moved += 1
-            except Exception as e:
-                analytics_action_not_moved += 1
-                status += "UNABLE_TO_SAVE_ANALYTICS_ACTION "
-
-        status += " MOVE_ANALYTICS_ACTION, moved: " + str(analytics_action_moved) + \
-                  ", not moved: " + str(analytics_action_not_moved)
-    else:
-        status += " " + analytics_action_list_results['status']
-
-    results = {
-        'status':                       status,
-        'success':                      success,
-        'from_voter_we_vote_id':        from_voter_we_vote_id,
-        'to_voter_we_vote_id':          to_voter_we_vote_id,
-        'analytics_action_moved':       analytics_action_moved,
-        'analytics_action_not_moved':   analytics_action_not_moved,
-    }
-    return results
-
-
 def retrieve_analytics_processing_next_step():
     """
     What is the next processing required to bring our analytics data up-to-date?
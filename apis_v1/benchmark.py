@@ -0,0 +1,376 @@
+# apis_v1/benchmark.py
+# Brought to you by We Vote. Be good.
+# -*- coding: UTF-8 -*-
+
+"""
+Seeds a synthetic election and times our busiest API endpoints against it with the Django test client.
+Run with: python manage.py benchmark_api (see apis_v1/management/commands/benchmark_api.py)
+"""
+
+from contextlib import ExitStack
+from datetime import date, timedelta
+import json
+import random
+import time
+
+from django.conf import settings
+from django.db import connections
+from django.urls import reverse
+
+from apis_v1.middleware import percentile, QueryCounter
+from ballot.models import BallotItem, BallotReturned, CANDIDATE
+from candidate.models import CandidateCampaign, CandidateToOfficeLink
+from election.models import Election
+from follow.models import FollowOrganization, FOLLOWING
+from friend.models import CurrentFriend, CURRENT_FRIENDS
+from measure.models import ContestMeasure
+from office.models import ContestOffice
+from organization.models import NONPROFIT, Organization
+from position.models import OPPOSE, PositionEntered, SUPPORT
+from voter.models import Voter, VoterDeviceLinkManager
+from voter_guide.models import VoterGuide
+from wevote_functions.functions import generate_voter_device_id
+
+BENCHMARK_GOOGLE_CIVIC_ELECTION_ID = 9900001
+BENCHMARK_STATE_CODE = 'CA'
+BENCHMARK_WE_VOTE_ID_PREFIX = 'wv99'
+# A request's query count is exact, so any increase fails. Latency is noisy, so only a large slowdown fails.
+DEFAULT_LATENCY_TOLERANCE = 0.5
+LATENCY_FLOOR_MS = 5.0
+
+DEFAULT_SCALE_DICT = {
+    'offices':                      200,
+    'candidates_per_office':        5,
+    'measures':                     50,
+    'organizations':                500,
+    'positions_per_organization':   10,
+    'voters':                       2000,
+    'friends':                      200,
+    'organizations_followed':       50,
+}
+
+
+def benchmark_we_vote_id(kind, number):
+    return BENCHMARK_WE_VOTE_ID_PREFIX + kind + str(number)
+
+
+def seed_benchmark_election(scale_dict=None, random_seed=2022, batch_size=1000):
+    """
+    Creates one upcoming election with offices, candidates, measures, organizations with voter guides and positions,
+    voters and friendships. The same scale and seed always produce the same data.
+    :param scale_dict: See DEFAULT_SCALE_DICT
+    :param random_seed:
+    :param batch_size:
+    :return: Everything run_api_benchmark needs to build its requests
+    """
+    scale = dict(DEFAULT_SCALE_DICT)
+    scale.update(scale_dict or {})
+    randomizer = random.Random(random_seed)
+    google_civic_election_id = BENCHMARK_GOOGLE_CIVIC_ELECTION_ID
+    election_day_text = (date.today() + timedelta(days=30)).strftime('%Y-%m-%d')
+
+    Election.objects.create(
+        google_civic_election_id=str(google_civic_election_id),
+        google_civic_election_id_new=google_civic_election_id,
+        election_name='Benchmark General Election',
+        election_day_text=election_day_text,
+        state_code=BENCHMARK_STATE_CODE,
+        include_in_list_for_voters=True)
+
+    contest_office_list = [ContestOffice(
+        we_vote_id=benchmark_we_vote_id('off', number),
+        office_name='Benchmark Office ' + str(number),
+        google_civic_election_id=str(google_civic_election_id),
+        google_civic_election_id_new=google_civic_election_id,
+        ballotpedia_race_office_level='Local' if number % 3 else 'State',
+        state_code=BENCHMARK_STATE_CODE,
+    ) for number in range(1, scale['offices'] + 1)]
+    contest_office_list = ContestOffice.objects.bulk_create(contest_office_list, batch_size=batch_size)
+
+    candidate_list = []
+    candidate_to_office_link_list = []
+    candidate_number = 0
+    for contest_office in contest_office_list:
+        for candidate_on_ballot in range(scale['candidates_per_office']):
+            candidate_number += 1
+            candidate_we_vote_id = benchmark_we_vote_id('cand', candidate_number)
+            candidate_list.append(CandidateCampaign(
+                we_vote_id=candidate_we_vote_id,
+                candidate_name='Benchmark Candidate ' + str(candidate_number),
+                contest_office_id=contest_office.id,
+                contest_office_we_vote_id=contest_office.we_vote_id,
+                contest_office_name=contest_office.office_name,
+                google_civic_election_id=str(google_civic_election_id),
+                party=randomizer.choice(['Democratic', 'Republican', 'Green', 'Libertarian', 'Nonpartisan']),
+                state_code=BENCHMARK_STATE_CODE,
+                twitter_followers_count=randomizer.randint(0, 100000),
+            ))
+            candidate_to_office_link_list.append(CandidateToOfficeLink(
+                candidate_we_vote_id=candidate_we_vote_id,
+                contest_office_we_vote_id=contest_office.we_vote_id,
+                google_civic_election_id=google_civic_election_id,
+                state_code=BENCHMARK_STATE_CODE,
+            ))
+    candidate_list = CandidateCampaign.objects.bulk_create(candidate_list, batch_size=batch_size)
+    CandidateToOfficeLink.objects.bulk_create(candidate_to_office_link_list, batch_size=batch_size)
+
+    contest_measure_list = [ContestMeasure(
+        we_vote_id=benchmark_we_vote_id('meas', number),
+        measure_title='Benchmark Measure ' + str(number),
+        measure_text='Shall the benchmark measure ' + str(number) + ' pass?',
+        google_civic_election_id=str(google_civic_election_id),
+        google_civic_election_id_new=google_civic_election_id,
+        district_name='Benchmark County',
+        district_scope='county',
+        state_code=BENCHMARK_STATE_CODE,
+    ) for number in range(1, scale['measures'] + 1)]
+    contest_measure_list = ContestMeasure.objects.bulk_create(contest_measure_list, batch_size=batch_size)
+
+    # One polling location's ballot has every office and measure
+    polling_location_we_vote_id = benchmark_we_vote_id('ploc', 1)
+    ballot_returned = BallotReturned.objects.create(
+        google_civic_election_id=google_civic_election_id,
+        polling_location_we_vote_id=polling_location_we_vote_id,
+        election_description_text='Benchmark General Election',
+        text_for_map_search='1 Benchmark Way, Oakland, CA 94612',
+        normalized_state=BENCHMARK_STATE_CODE,
+        state_code=BENCHMARK_STATE_CODE)
+    ballot_item_list = []
+    for local_ballot_order, contest_office in enumerate(contest_office_list, start=1):
+        ballot_item_list.append(BallotItem(
+            polling_location_we_vote_id=polling_location_we_vote_id,
+            google_civic_election_id=str(google_civic_election_id),
+            google_civic_election_id_new=google_civic_election_id,
+            state_code=BENCHMARK_STATE_CODE,
+            local_ballot_order=local_ballot_order,
+            contest_office_id=contest_office.id,
+            contest_office_we_vote_id=contest_office.we_vote_id,
+            ballot_item_display_name=contest_office.office_name))
+    for local_ballot_order, contest_measure in enumerate(contest_measure_list, start=len(ballot_item_list) + 1):
+        ballot_item_list.append(BallotItem(
+            polling_location_we_vote_id=polling_location_we_vote_id,
+            google_civic_election_id=str(google_civic_election_id),
+            google_civic_election_id_new=google_civic_election_id,
+            state_code=BENCHMARK_STATE_CODE,
+            local_ballot_order=local_ballot_order,
+            contest_measure_id=contest_measure.id,
+            contest_measure_we_vote_id=contest_measure.we_vote_id,
+            ballot_item_display_name=contest_measure.measure_title))
+    BallotItem.objects.bulk_create(ballot_item_list, batch_size=batch_size)
+
+    organization_list = [Organization(
+        we_vote_id=benchmark_we_vote_id('org', number),
+        organization_name='Benchmark Organization ' + str(number),
+        organization_type=NONPROFIT,
+        state_served_code=BENCHMARK_STATE_CODE,
+        twitter_followers_count=randomizer.randint(0, 50000),
+    ) for number in range(1, scale['organizations'] + 1)]
+    organization_list = Organization.objects.bulk_create(organization_list, batch_size=batch_size)
+
+    voter_guide_list = [VoterGuide(
+        we_vote_id=benchmark_we_vote_id('vg', number),
+        organization_we_vote_id=organization.we_vote_id,
+        google_civic_election_id=google_civic_election_id,
+        election_day_text=election_day_text,
+        state_code=BENCHMARK_STATE_CODE,
+        display_name=organization.organization_name,
+        voter_guide_owner_type=NONPROFIT,
+        twitter_followers_count=organization.twitter_followers_count,
+    ) for number, organization in enumerate(organization_list, start=1)]
+    VoterGuide.objects.bulk_create(voter_guide_list, batch_size=batch_size)
+
+    position_list = []
+    position_number = 0
+    for organization in organization_list:
+        for candidate in randomizer.sample(candidate_list, min(scale['positions_per_organization'],
+                                                               len(candidate_list))):
+            position_number += 1
+            position_list.append(PositionEntered(
+                we_vote_id=benchmark_we_vote_id('pos', position_number),
+                organization_id=organization.id,
+                organization_we_vote_id=organization.we_vote_id,
+                speaker_display_name=organization.organization_name,
+                speaker_type=NONPROFIT,
+                ballot_item_display_name=candidate.candidate_name,
+                candidate_campaign_id=candidate.id,
+                candidate_campaign_we_vote_id=candidate.we_vote_id,
+                contest_office_id=candidate.contest_office_id,
+                contest_office_we_vote_id=candidate.contest_office_we_vote_id,
+                contest_office_name=candidate.contest_office_name,
+                google_civic_election_id=str(google_civic_election_id),
+                state_code=BENCHMARK_STATE_CODE,
+                stance=SUPPORT if randomizer.random() < 0.7 else OPPOSE,
+                statement_text='Benchmark endorsement',
+            ))
+    PositionEntered.objects.bulk_create(position_list, batch_size=batch_size)
+
+    voter_list = [Voter(
+        we_vote_id=benchmark_we_vote_id('voter', number),
+        first_name='Benchmark',
+        last_name='Voter ' + str(number),
+        state_code_for_display=BENCHMARK_STATE_CODE,
+    ) for number in range(1, scale['voters'] + 1)]
+    voter_list = Voter.objects.bulk_create(voter_list, batch_size=batch_size)
+
+    # The voter who makes the requests
+    benchmark_voter = voter_list[0]
+    voter_device_id = generate_voter_device_id()
+    voter_device_link_manager = VoterDeviceLinkManager()
+    voter_device_link_manager.save_new_voter_device_link(voter_device_id, benchmark_voter.id)
+
+    current_friend_list = [CurrentFriend(
+        viewer_voter_we_vote_id=benchmark_voter.we_vote_id,
+        viewee_voter_we_vote_id=friend_voter.we_vote_id,
+    ) for friend_voter in voter_list[1:scale['friends'] + 1]]
+    CurrentFriend.objects.bulk_create(current_friend_list, batch_size=batch_size)
+
+    follow_organization_list = [FollowOrganization(
+        voter_id=benchmark_voter.id,
+        organization_id=organization.id,
+        organization_we_vote_id=organization.we_vote_id,
+        following_status=FOLLOWING,
+    ) for organization in organization_list[:scale['organizations_followed']]]
+    FollowOrganization.objects.bulk_create(follow_organization_list, batch_size=batch_size)
+
+    voter_position_list = []
+    for number, candidate in enumerate(candidate_list[:scale['offices']], start=1):
+        voter_position_list.append(PositionEntered(
+            we_vote_id=benchmark_we_vote_id('voterpos', number),
+            voter_id=benchmark_voter.id,
+            voter_we_vote_id=benchmark_voter.we_vote_id,
+            ballot_item_display_name=candidate.candidate_name,
+            candidate_campaign_id=candidate.id,
+            candidate_campaign_we_vote_id=candidate.we_vote_id,
+            contest_office_we_vote_id=candidate.contest_office_we_vote_id,
+            google_civic_election_id=str(google_civic_election_id),
+            state_code=BENCHMARK_STATE_CODE,
+            stance=SUPPORT,
+        ))
+    PositionEntered.objects.bulk_create(voter_position_list, batch_size=batch_size)
+
+    # The most endorsed candidate, so positionListForBallotItem has the most work to do
+    position_count_by_candidate = {}
+    for position in position_list:
+        position_count_by_candidate[position.candidate_campaign_we_vote_id] = \
+            position_count_by_candidate.get(position.candidate_campaign_we_vote_id, 0) + 1
+    most_endorsed_candidate_we_vote_id = \
+        max(position_count_by_candidate, key=lambda we_vote_id: (position_count_by_candidate[we_vote_id], we_vote_id)) \
+        if len(position_count_by_candidate) else ''
+
+    return {
+        'ballot_returned_we_vote_id':           ballot_returned.we_vote_id,
+        'google_civic_election_id':             google_civic_election_id,
+        'most_endorsed_candidate_we_vote_id':   most_endorsed_candidate_we_vote_id,
+        'scale':                                scale,
+        'voter_device_id':                      voter_device_id,
+    }
+
+
+def benchmark_request_list(seed_results):
+    """
+    :param seed_results: From seed_benchmark_election
+    :return: list of (endpoint_name, url, GET parameters)
+    """
+    voter_device_id = seed_results['voter_device_id']
+    google_civic_election_id = seed_results['google_civic_election_id']
+    return [
+        ('voterBallotItemsRetrieve', reverse('apis_v1:voterBallotItemsRetrieveView'), {
+            'voter_device_id': voter_device_id,
+            'google_civic_election_id': google_civic_election_id,
+            'ballot_returned_we_vote_id': seed_results['ballot_returned_we_vote_id']}),
+        ('voterGuidesToFollowRetrieve', reverse('apis_v1:voterGuidesToFollowRetrieveView'), {
+            'voter_device_id': voter_device_id,
+            'google_civic_election_id': google_civic_election_id}),
+        ('positionListForBallotItem', reverse('apis_v1:positionListForBallotItemView'), {
+            'voter_device_id': voter_device_id,
+            'kind_of_ballot_item': CANDIDATE,
+            'ballot_item_we_vote_id': seed_results['most_endorsed_candidate_we_vote_id']}),
+        ('voterAllPositionsRetrieve', reverse('apis_v1:voterAllPositionsRetrieveView'), {
+            'voter_device_id': voter_device_id,
+            'google_civic_election_id': google_civic_election_id}),
+        # Measures the round trip to whichever Elasticsearch ELASTIC_SEARCH_CONNECTION_STRING points to
+        ('searchAll', reverse('apis_v1:searchAllView'), {
+            'voter_device_id': voter_device_id,
+            'text_from_search_field': 'Benchmark Candidate 1'}),
+        ('friendList', reverse('apis_v1:friendListView'), {
+            'voter_device_id': voter_device_id,
+            'kind_of_list': CURRENT_FRIENDS}),
+    ]
+
+
+def time_one_request(client, url, parameters):
+    query_counter_list = [QueryCounter(alias) for alias in settings.DATABASES.keys()]
+    with ExitStack() as exit_stack:
+        for query_counter in query_counter_list:
+            exit_stack.enter_context(connections[query_counter.alias].execute_wrapper(query_counter))
+        start_time = time.perf_counter()
+        response = client.get(url, parameters)
+        elapsed_ms = (time.perf_counter() - start_time) * 1000
+    success = False
+    try:
+        success = json.loads(response.content.decode()).get('success', False)
+    except Exception:
+        pass
+    return {
+        'elapsed_ms':           elapsed_ms,
+        'query_count':          sum(query_counter.query_count for query_counter in query_counter_list),
+        'query_count_by_alias': {query_counter.alias: query_counter.query_count
+                                 for query_counter in query_counter_list if query_counter.query_count},
+        'response_bytes':       len(response.content),
+        'status_code':          response.status_code,
+        'success':              success,
+    }
+
+
+def run_api_benchmark(client, request_list, iterations=20, warmup_iterations=2, endpoint_name_list=None):
+    """
+    :param client: django.test.Client
+    :param request_list: From benchmark_request_list
+    :param iterations: Timed requests per endpoint
+    :param warmup_iterations: Untimed requests first, so per-worker caches are filled the way they are in production
+    :param endpoint_name_list: Only these endpoints, if passed in
+    :return: dict of endpoint_name -> measurements
+    """
+    measurement_dict = {}
+    for endpoint_name, url, parameters in request_list:
+        if endpoint_name_list and endpoint_name not in endpoint_name_list:
+            continue
+        for warmup_number in range(warmup_iterations):
+            time_one_request(client, url, parameters)
+        one_request_list = [time_one_request(client, url, parameters) for number in range(max(iterations, 1))]
+        elapsed_ms_list = sorted(one_request['elapsed_ms'] for one_request in one_request_list)
+        last_request = one_request_list[-1]
+        measurement_dict[endpoint_name] = {
+            'p50_ms':               round(percentile(elapsed_ms_list, 50), 2),
+            'p95_ms':               round(percentile(elapsed_ms_list, 95), 2),
+            'max_ms':               round(elapsed_ms_list[-1], 2),
+            'query_count':          max(one_request['query_count'] for one_request in one_request_list),
+            'query_count_by_alias': last_request['query_count_by_alias'],
+            'response_bytes':       last_request['response_bytes'],
+            'status_code':          last_request['status_code'],
+            'success':              last_request['success'],
+        }
+    return measurement_dict
+
+
+def compare_with_baseline(measurement_dict, baseline_dict, latency_tolerance=DEFAULT_LATENCY_TOLERANCE):
+    """
+    :param measurement_dict: From run_api_benchmark
+    :param baseline_dict: A measurement_dict saved earlier
+    :param latency_tolerance: 0.5 allows the median to be 50% slower than the baseline
+    :return: list of regression descriptions, empty if there are none
+    """
+    regression_list = []
+    for endpoint_name, measurement in measurement_dict.items():
+        baseline = baseline_dict.get(endpoint_name)
+        if not baseline:
+            continue
+        if measurement['query_count'] > baseline.get('query_count', 0):
+            regression_list.append('{endpoint}: {count} queries, baseline {baseline_count}'.format(
+                endpoint=endpoint_name, count=measurement['query_count'], baseline_count=baseline['query_count']))
+        baseline_p50_ms = baseline.get('p50_ms', 0)
+        allowed_p50_ms = max(baseline_p50_ms * (1 + latency_tolerance), baseline_p50_ms + LATENCY_FLOOR_MS)
+        if measurement['p50_ms'] > allowed_p50_ms:
+            regression_list.append('{endpoint}: median {p50:.1f} ms, baseline {baseline_p50:.1f} ms'.format(
+                endpoint=endpoint_name, p50=measurement['p50_ms'], baseline_p50=baseline_p50_ms))
+    return regression_list
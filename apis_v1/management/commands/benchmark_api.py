@@ -0,0 +1,65 @@
+import json
+import os
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.test.utils import setup_databases, setup_test_environment, teardown_databases, \
+    teardown_test_environment
+from apis_v1.benchmark import benchmark_request_list, compare_with_baseline, DEFAULT_LATENCY_TOLERANCE, \
+    DEFAULT_SCALE_DICT, run_api_benchmark, seed_benchmark_election
+
+DEFAULT_BASELINE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                                     'benchmark_baseline.json')
+
+
+class Command(BaseCommand):
+    help = 'Seeds a synthetic election in a throwaway test database, times the busiest API endpoints against it, ' \
+           'and fails if query counts or median latency regress from the saved baseline'
+
+    def add_arguments(self, parser):
+        for scale_name, default_value in DEFAULT_SCALE_DICT.items():
+            parser.add_argument('--' + scale_name, type=int, default=default_value)
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--endpoint', action='append', default=None)
+        parser.add_argument('--baseline', default=DEFAULT_BASELINE_PATH)
+        parser.add_argument('--save_baseline', action='store_true')
+        parser.add_argument('--latency_tolerance', type=float, default=DEFAULT_LATENCY_TOLERANCE)
+        parser.add_argument('--keepdb', action='store_true')
+
+    def handle(self, *args, **options):
+        scale_dict = {scale_name: options[scale_name] for scale_name in DEFAULT_SCALE_DICT.keys()}
+        setup_test_environment()
+        old_database_config = setup_databases(verbosity=options['verbosity'], interactive=False,
+                                              keepdb=options['keepdb'])
+        try:
+            seed_results = seed_benchmark_election(scale_dict=scale_dict)
+            measurement_dict = run_api_benchmark(
+                Client(), benchmark_request_list(seed_results), iterations=options['iterations'],
+                endpoint_name_list=options['endpoint'])
+        finally:
+            teardown_databases(old_database_config, verbosity=options['verbosity'], keepdb=options['keepdb'])
+            teardown_test_environment()
+
+        self.stdout.write('Scale: ' + json.dumps(seed_results['scale'], sort_keys=True))
+        self.stdout.write('{:<30}{:>10}{:>10}{:>10}{:>10}{:>12}  {}'.format(
+            'Endpoint', 'p50 ms', 'p95 ms', 'max ms', 'queries', 'bytes', 'success'))
+        for endpoint_name, measurement in measurement_dict.items():
+            self.stdout.write('{:<30}{:>10.1f}{:>10.1f}{:>10.1f}{:>10}{:>12}  {}'.format(
+                endpoint_name, measurement['p50_ms'], measurement['p95_ms'], measurement['max_ms'],
+                measurement['query_count'], measurement['response_bytes'], measurement['success']))
+
+        if options['save_baseline']:
+            with open(options['baseline'], 'w') as baseline_file:
+                json.dump(measurement_dict, baseline_file, indent=2, sort_keys=True)
+            self.stdout.write('Baseline saved to ' + options['baseline'])
+            return
+
+        if not os.path.exists(options['baseline']):
+            self.stdout.write('No baseline at ' + options['baseline'] + ', run with --save_baseline to create one')
+            return
+        with open(options['baseline']) as baseline_file:
+            baseline_dict = json.load(baseline_file)
+        regression_list = compare_with_baseline(
+            measurement_dict, baseline_dict, latency_tolerance=options['latency_tolerance'])
+        if len(regression_list):
+            raise CommandError('Regressions from baseline:\n' + '\n'.join(regression_list))
+        self.stdout.write('No regressions from baseline')
@@ -0,0 +1,319 @@
+# apis_v1/middleware.py
+# Brought to you by We Vote. Be good.
+# -*- coding: UTF-8 -*-
+
+"""API profiling middleware, and the middleware that sends the reads in read-only API requests to the replica"""
+
+from collections import deque
+from contextlib import ExitStack
+import cProfile
+import io
+import pstats
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from config.base import get_environment_variable_default
+import wevote_functions.admin
+from wevote_functions.database_router import end_read_replica_request, read_replica_routing_enabled, \
+    start_read_replica_request
+from wevote_functions.functions import convert_to_int, positive_value_exists
+
+logger = wevote_functions.admin.get_logger(__name__)
+
+# Turn on with API_PROFILING_ENABLED=true. The rest are optional.
+API_PROFILING_ENABLED = positive_value_exists(get_environment_variable_default("API_PROFILING_ENABLED", False))
+API_PROFILING_PATH_PREFIX = get_environment_variable_default("API_PROFILING_PATH_PREFIX", '/apis/v1/') or '/apis/v1/'
+# Add a Server-Timing header, so the browser's network panel shows where each request spent its time
+API_PROFILING_SERVER_TIMING = \
+    positive_value_exists(get_environment_variable_default("API_PROFILING_SERVER_TIMING", False))
+# Keep a cProfile report for sampled requests that take at least this long
+API_PROFILING_SLOW_REQUEST_MS = \
+    convert_to_int(get_environment_variable_default("API_PROFILING_SLOW_REQUEST_MS", 1000)) or 1000
+# Fraction of requests run under cProfile, ex/ "0.01". cProfile roughly doubles the time of the requests it samples.
+try:
+    API_PROFILING_CPROFILE_SAMPLE_RATE = \
+        float(get_environment_variable_default("API_PROFILING_CPROFILE_SAMPLE_RATE", 0) or 0)
+except ValueError:
+    API_PROFILING_CPROFILE_SAMPLE_RATE = 0.0
+
+SAMPLES_KEPT_PER_ENDPOINT = 1000
+SLOW_REQUEST_PROFILES_KEPT = 20
+SLOW_REQUEST_PROFILE_LINES = 40
+
+
+def percentile(sorted_value_list, percent):
+    """
+    Nearest-rank percentile
+    :param sorted_value_list:
+    :param percent: 0 to 100
+    :return:
+    """
+    if not len(sorted_value_list):
+        return 0
+    rank = int(round(percent / 100.0 * (len(sorted_value_list) - 1)))
+    return sorted_value_list[max(0, min(rank, len(sorted_value_list) - 1))]
+
+
+class QueryCounter(object):
+    """
+    Passed to connection.execute_wrapper for every database alias, so one request's queries and query time are
+    counted per alias (default, readonly, analytics)
+    """
+
+    def __init__(self, alias):
+        self.alias = alias
+        self.query_count = 0
+        self.query_seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start_time = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.query_seconds += time.perf_counter() - start_time
+            self.query_count += 1
+
+
+class EndpointStatistics(object):
+    def __init__(self, endpoint_name):
+        self.endpoint_name = endpoint_name
+        self.request_count = 0
+        # Only the most recent requests are kept for percentiles
+        self.sample_list = deque(maxlen=SAMPLES_KEPT_PER_ENDPOINT)
+
+    def summary(self):
+        total_ms_list = sorted(sample['total_ms'] for sample in self.sample_list)
+        db_ms_list = sorted(sample['db_ms'] for sample in self.sample_list)
+        query_count_list = sorted(sample['query_count'] for sample in self.sample_list)
+        response_bytes_list = sorted(sample['response_bytes'] for sample in self.sample_list)
+        query_count_by_alias = {}
+        db_ms_by_alias = {}
+        for sample in self.sample_list:
+            for alias, query_count in sample['query_count_by_alias'].items():
+                query_count_by_alias[alias] = query_count_by_alias.get(alias, 0) + query_count
+            for alias, db_ms in sample['db_ms_by_alias'].items():
+                db_ms_by_alias[alias] = db_ms_by_alias.get(alias, 0) + db_ms
+        sample_count = len(self.sample_list) or 1
+        return {
+            'endpoint_name':            self.endpoint_name,
+            'request_count':            self.request_count,
+            'sample_count':             len(self.sample_list),
+            'total_ms_p50':             round(percentile(total_ms_list, 50), 1),
+            'total_ms_p95':             round(percentile(total_ms_list, 95), 1),
+            'total_ms_p99':             round(percentile(total_ms_list, 99), 1),
+            'total_ms_max':             round(total_ms_list[-1], 1) if len(total_ms_list) else 0,
+            'db_ms_p50':                round(percentile(db_ms_list, 50), 1),
+            'db_ms_p95':                round(percentile(db_ms_list, 95), 1),
+            'query_count_p50':          percentile(query_count_list, 50),
+            'query_count_p95':          percentile(query_count_list, 95),
+            'query_count_max':          query_count_list[-1] if len(query_count_list) else 0,
+            'response_bytes_p50':       percentile(response_bytes_list, 50),
+            'response_bytes_p95':       percentile(response_bytes_list, 95),
+            'average_query_count_by_alias':
+                {alias: round(float(count) / sample_count, 1) for alias, count in query_count_by_alias.items()},
+            'average_db_ms_by_alias':
+                {alias: round(db_ms / sample_count, 1) for alias, db_ms in db_ms_by_alias.items()},
+        }
+
+
+class ApiProfileStatistics(object):
+    """
+    Everything the middleware has measured in this worker process since it started (or was reset)
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.endpoint_dict = {}
+        self.slow_request_profile_list = deque(maxlen=SLOW_REQUEST_PROFILES_KEPT)
+        self.started_time = time.time()
+
+    def record(self, endpoint_name, sample):
+        with self.lock:
+            endpoint_statistics = self.endpoint_dict.get(endpoint_name)
+            if endpoint_statistics is None:
+                endpoint_statistics = EndpointStatistics(endpoint_name)
+                self.endpoint_dict[endpoint_name] = endpoint_statistics
+            endpoint_statistics.request_count += 1
+            endpoint_statistics.sample_list.append(sample)
+
+    def record_slow_request_profile(self, endpoint_name, total_ms, profile_text):
+        with self.lock:
+            self.slow_request_profile_list.appendleft({
+                'endpoint_name':    endpoint_name,
+                'total_ms':         round(total_ms, 1),
+                'profile_text':     profile_text,
+                'recorded_time':    time.time(),
+            })
+
+    def reset(self):
+        with self.lock:
+            self.endpoint_dict = {}
+            self.slow_request_profile_list.clear()
+            self.started_time = time.time()
+
+    def summary_list(self, sort_by='total_ms_p95'):
+        with self.lock:
+            endpoint_statistics_list = list(self.endpoint_dict.values())
+            summary_list = [endpoint_statistics.summary() for endpoint_statistics in endpoint_statistics_list]
+        summary_list.sort(key=lambda summary: summary.get(sort_by, 0), reverse=True)
+        return summary_list
+
+    def slow_request_profiles(self):
+        with self.lock:
+            return list(self.slow_request_profile_list)
+
+
+api_profile_statistics = ApiProfileStatistics()
+
+
+def format_server_timing(total_ms, app_ms, query_counter_list):
+    server_timing_list = []
+    for query_counter in query_counter_list:
+        if query_counter.query_count:
+            server_timing_list.append('db-{alias};dur={dur:.1f};desc="{count} queries"'.format(
+                alias=query_counter.alias, dur=query_counter.query_seconds * 1000, count=query_counter.query_count))
+    server_timing_list.append('app;dur={dur:.1f}'.format(dur=app_ms))
+    server_timing_list.append('total;dur={dur:.1f}'.format(dur=total_ms))
+    return ', '.join(server_timing_list)
+
+
+class ApiProfilingMiddleware(object):
+    """
+    Measures each API request: wall time, queries and query time for each database alias, the rest of the time
+    (our Python code, including json.dumps, since the views serialize their own responses) and response size.
+    Percentiles are shown at /admin/api_profiling/. This keeps numbers for its own worker process only.
+    """
+
+    def __init__(self, get_response):
+        if not API_PROFILING_ENABLED:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not request.path.startswith(API_PROFILING_PATH_PREFIX):
+            return self.get_response(request)
+
+        query_counter_list = [QueryCounter(alias) for alias in settings.DATABASES.keys()]
+        profiler = None
+        if API_PROFILING_CPROFILE_SAMPLE_RATE > 0 and random.random() < API_PROFILING_CPROFILE_SAMPLE_RATE:
+            profiler = cProfile.Profile()
+        start_time = time.perf_counter()
+        with ExitStack() as exit_stack:
+            for query_counter in query_counter_list:
+                exit_stack.enter_context(connections[query_counter.alias].execute_wrapper(query_counter))
+            if profiler is not None:
+                try:
+                    profiler.enable()
+                except ValueError:
+                    # Another profiler is already running in this thread
+                    profiler = None
+            try:
+                response = self.get_response(request)
+            finally:
+                if profiler is not None:
+                    profiler.disable()
+        total_ms = (time.perf_counter() - start_time) * 1000
+
+        try:
+            self.record_request(request, response, total_ms, query_counter_list, profiler)
+        except Exception as e:
+            logger.error("ApiProfilingMiddleware could not record request: " + str(e))
+        return response
+
+    @staticmethod
+    def record_request(request, response, total_ms, query_counter_list, profiler):
+        resolver_match = getattr(request, 'resolver_match', None)
+        endpoint_name = resolver_match.view_name if resolver_match is not None else request.path
+        db_ms = sum(query_counter.query_seconds for query_counter in query_counter_list) * 1000
+        app_ms = max(total_ms - db_ms, 0)
+        response_bytes = 0 if getattr(response, 'streaming', False) else len(response.content)
+        api_profile_statistics.record(endpoint_name, {
+            'total_ms':             total_ms,
+            'db_ms':                db_ms,
+            'app_ms':               app_ms,
+            'query_count':          sum(query_counter.query_count for query_counter in query_counter_list),
+            'query_count_by_alias': {query_counter.alias: query_counter.query_count
+                                     for query_counter in query_counter_list if query_counter.query_count},
+            'db_ms_by_alias':       {query_counter.alias: query_counter.query_seconds * 1000
+                                     for query_counter in query_counter_list if query_counter.query_count},
+            'response_bytes':       response_bytes,
+        })
+
+        if profiler is not None and total_ms >= API_PROFILING_SLOW_REQUEST_MS:
+            profile_output = io.StringIO()
+            profile_stats = pstats.Stats(profiler, stream=profile_output)
+            profile_stats.sort_stats('cumulative').print_stats(SLOW_REQUEST_PROFILE_LINES)
+            api_profile_statistics.record_slow_request_profile(endpoint_name, total_ms, profile_output.getvalue())
+
+        if API_PROFILING_SERVER_TIMING:
+            response['Server-Timing'] = format_server_timing(total_ms, app_ms, query_counter_list)
+
+
+# API endpoints, by URL name, that only read. Reads in these go to the read replica. Many WeVoteServer endpoints that
+#  change data take GET requests (ex/ organizationFollow), and the rows they read first are saved back, so an
+#  endpoint is only added here once we know it doesn't write. Most of the busy voter endpoints can't be added yet,
+#  because they save rows they have just read: ex/ voterRetrieve and voterBallotItemsRetrieve, candidateRetrieve and
+#  positionListForBallotItem (refresh_cached_..._info), organizationRetrieve (repair_organization) and
+#  voterGuidesUpcomingRetrieve (schedules a refresh of its cache).
+READ_REPLICA_URL_NAME_SET = frozenset([
+    'analyticsActionSyncOutView',
+    'ballotItemHighlightsRetrieveView',
+    'ballotItemOptionsRetrieveView',
+    'ballotItemsSyncOutView',
+    'ballotReturnedSyncOutView',
+    'candidateListForUpcomingElectionsRetrieveView',
+    'candidatesSyncOutView',
+    'candidateToOfficeLinkSyncOutView',
+    'electionsRetrieveView',
+    'electionsSyncOutView',
+    'issueDescriptionsRetrieveView',
+    'issuesSyncOutView',
+    'issuesUnderBallotItemsRetrieveView',
+    'measureListForUpcomingElectionsRetrieveView',
+    'measureRetrieveView',
+    'measuresSyncOutView',
+    'officeRetrieveView',
+    'officesSyncOutView',
+    'organizationDailyMetricsSyncOutView',
+    'organizationElectionMetricsSyncOutView',
+    'organizationLinkToIssueSyncOutView',
+    'organizationsSyncOutView',
+    'politiciansSyncOutView',
+    'pollingLocationsSyncOutView',
+    'positionsSyncOutView',
+    'sitewideDailyMetricsSyncOutView',
+    'sitewideElectionMetricsSyncOutView',
+    'sitewideVoterMetricsSyncOutView',
+    'voterGuidesSyncOutView',
+])
+
+
+class DatabaseRoutingMiddleware(object):
+    """
+    Marks GET (and HEAD) requests to the endpoints in READ_REPLICA_URL_NAME_SET, so ReadReplicaRouter sends their
+    reads to the read replica
+    """
+
+    def __init__(self, get_response):
+        if not read_replica_routing_enabled():
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        try:
+            return self.get_response(request)
+        finally:
+            end_read_replica_request()
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if request.method not in ('GET', 'HEAD') or not request.path.startswith('/apis/v1/'):
+            return None
+        resolver_match = getattr(request, 'resolver_match', None)
+        if resolver_match is not None and resolver_match.url_name in READ_REPLICA_URL_NAME_SET:
+            start_read_replica_request()
+        return None
@@ -0,0 +1,28 @@
+# apis_v1/tests/test_benchmark.py
+# Brought to you by We Vote. Be good.
+# -*- coding: UTF-8 -*-
+
+from django.test import SimpleTestCase
+
+from apis_v1.benchmark import compare_with_baseline
+
+
+class WeVoteAPIsV1TestsBenchmark(SimpleTestCase):
+
+    def test_regressions_against_baseline(self):
+        baseline_dict = {
+            'voterBallotItemsRetrieve': {'p50_ms': 40.0, 'query_count': 12},
+            'friendList':               {'p50_ms': 2.0, 'query_count': 4},
+        }
+        measurement_dict = {
+            'voterBallotItemsRetrieve': {'p50_ms': 55.0, 'query_count': 12},
+            # A few milliseconds of noise on a fast endpoint isn't a regression
+            'friendList':               {'p50_ms': 6.0, 'query_count': 4},
+            'searchAll':                {'p50_ms': 900.0, 'query_count': 90},
+        }
+        self.assertEqual(compare_with_baseline(measurement_dict, baseline_dict), [])
+
+        measurement_dict['voterBallotItemsRetrieve'] = {'p50_ms': 70.0, 'query_count': 212}
+        regression_list = compare_with_baseline(measurement_dict, baseline_dict)
+        self.assertEqual(len(regression_list), 2)
+        self.assertTrue(regression_list[0].startswith('voterBallotItemsRetrieve: 212 queries'))
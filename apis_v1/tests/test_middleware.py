@@ -0,0 +1,71 @@
+# apis_v1/tests/test_middleware.py
+# Brought to you by We Vote. Be good.
+# -*- coding: UTF-8 -*-
+
+from unittest import mock
+
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase
+from django.urls import resolve
+
+from apis_v1 import middleware
+from apis_v1.middleware import ApiProfilingMiddleware, api_profile_statistics, DatabaseRoutingMiddleware, percentile
+from wevote_functions.database_router import request_routing_state
+
+
+class WeVoteAPIsV1TestsApiProfilingMiddleware(SimpleTestCase):
+
+    def setUp(self):
+        api_profile_statistics.reset()
+        self.request_factory = RequestFactory()
+
+    def tearDown(self):
+        api_profile_statistics.reset()
+
+    def test_percentile(self):
+        value_list = list(range(1, 101))
+        self.assertEqual(percentile(value_list, 50), 51)
+        self.assertEqual(percentile(value_list, 99), 99)
+        self.assertEqual(percentile([], 95), 0)
+
+    def test_api_requests_are_measured(self):
+        with mock.patch.object(middleware, 'API_PROFILING_ENABLED', True), \
+                mock.patch.object(middleware, 'API_PROFILING_SERVER_TIMING', True):
+            profiling_middleware = ApiProfilingMiddleware(lambda request: HttpResponse('{"success": true}'))
+            for number in range(3):
+                response = profiling_middleware(self.request_factory.get('/apis/v1/voterCount/'))
+            other_response = profiling_middleware(self.request_factory.get('/admin/'))
+
+        self.assertIn('total;dur=', response['Server-Timing'])
+        self.assertFalse(other_response.has_header('Server-Timing'))
+        summary_list = api_profile_statistics.summary_list()
+        self.assertEqual(len(summary_list), 1)
+        self.assertEqual(summary_list[0]['endpoint_name'], '/apis/v1/voterCount/')
+        self.assertEqual(summary_list[0]['request_count'], 3)
+        self.assertEqual(summary_list[0]['query_count_max'], 0)
+        self.assertEqual(summary_list[0]['response_bytes_p50'], len('{"success": true}'))
+
+
+class WeVoteAPIsV1TestsDatabaseRoutingMiddleware(SimpleTestCase):
+
+    def reads_from_replica(self, path):
+        request = RequestFactory().get(path)
+        request.resolver_match = resolve(path)
+
+        def get_response(one_request):
+            routing_middleware.process_view(one_request, request.resolver_match.func, (), {})
+            return HttpResponse(str(getattr(request_routing_state, 'read_from_replica', False)))
+
+        with mock.patch.object(middleware, 'read_replica_routing_enabled', return_value=True):
+            routing_middleware = DatabaseRoutingMiddleware(get_response)
+        response = routing_middleware(request)
+        self.assertFalse(getattr(request_routing_state, 'read_from_replica', False))
+        return response.content == b'True'
+
+    def test_only_read_only_endpoints_read_from_the_replica(self):
+        self.assertTrue(self.reads_from_replica('/apis/v1/electionsRetrieve/'))
+        self.assertTrue(self.reads_from_replica('/apis/v1/issuesUnderBallotItemsRetrieve/'))
+        # positionListForBallotItem saves the positions whose cached candidate or organization info is out of date
+        self.assertFalse(self.reads_from_replica('/apis/v1/positionListForBallotItem/'))
+        # organizationFollow changes data in a GET request
+        self.assertFalse(self.reads_from_replica('/apis/v1/organizationFollow/'))
@@ -4,17 +4,16 @@
 
 import json
 
-import stripe
 from django.http import HttpResponse
 from django.views.decorators.csrf import csrf_exempt
 
 import wevote_functions.admin
 from config.base import get_environment_variable
 from stripe_donations.controllers import donation_active_paid_plan_retrieve, donation_with_stripe_for_api, \
-    donation_process_stripe_webhook_event, \
     donation_refund_for_api, donation_subscription_cancellation_for_api, donation_journal_history_for_a_voter
 from stripe_donations.controllers import donation_lists_for_a_voter
 from stripe_donations.models import StripeManager
+from stripe_donations.webhook_events import process_stripe_webhook_events_soon, save_stripe_webhook_event
 from voter.models import fetch_voter_we_vote_id_from_voter_device_link, VoterManager
 from wevote_functions.functions import get_voter_device_id, positive_value_exists
 
@@ -186,22 +185,19 @@ def donation_stripe_webhook_view(request):    # donationStripeWebhook
     payload = request.body.decode('utf-8')
 
     try:
-        stripe.api_key = get_environment_variable("STRIPE_SECRET_KEY")
-        event = stripe.Event.construct_from(json.loads(payload), stripe.api_key)
-
+        event_dict = json.loads(payload)
     except ValueError as e:
         logger.error("donation_stripe_webhook_view, Stripe returned ValueError: " + str(e))
         return HttpResponse(status=400)
 
-    except stripe.error.SignatureVerificationError as err:
-        logger.error("donation_stripe_webhook_view, Stripe returned SignatureVerificationError: " + str(err))
-        return HttpResponse(status=400)
-
-    except Exception as err:
-        logger.error("donation_stripe_webhook_view: " + str(err))
-        return HttpResponse(status=400)
-
-    donation_process_stripe_webhook_event(event)
+    # We save the event and acknowledge it now, and process it in the background. Stripe sends an event again
+    # until it is acknowledged, so it is only acknowledged once it is saved.
+    results = save_stripe_webhook_event(event_dict)
+    if not results['success']:
+        logger.error("donation_stripe_webhook_view: " + results['status'])
+        return HttpResponse(status=400 if 'id' not in event_dict else 500)
+    if results['event_is_new']:
+        process_stripe_webhook_events_soon()
 
     return HttpResponse(status=200)
 
@@ -2,9 +2,11 @@
 # Brought to you by We Vote. Be good.
 # -*- coding: UTF-8 -*-
 
+from .election_snapshot import fetch_election_snapshot, generate_candidate_dict_for_ballot
 from .models import BallotItemListManager, BallotItemManager, BallotReturnedListManager, BallotReturnedManager, \
-    CANDIDATE, find_best_previously_stored_ballot_returned, OFFICE, MEASURE, \
+    CANDIDATE, fetch_ballot_item_cache_version, find_best_previously_stored_ballot_returned, OFFICE, MEASURE, \
     VoterBallotSaved, VoterBallotSavedManager
+from collections import OrderedDict
 from candidate.models import CandidateListManager
 from config.base import get_environment_variable
 from datetime import datetime, timedelta
@@ -19,10 +21,13 @@ from measure.models import ContestMeasureListManager, ContestMeasureManager
 from office.models import ContestOfficeManager, ContestOfficeListManager
 from polling_location.models import PollingLocationManager
 import pytz
+import threading
+import time
 from voter.models import BALLOT_ADDRESS, VoterAddress, VoterAddressManager, VoterDeviceLinkManager, VoterManager
 import wevote_functions.admin
 from wevote_functions.functions import convert_to_int, extract_state_code_from_address_string, positive_value_exists, \
     process_request_from_master, strip_html_tags
+from wevote_settings.models import cache_version_increments_deferred
 from geopy.geocoders import get_geocoder_for_service
 
 logger = wevote_functions.admin.get_logger(__name__)
@@ -34,6 +39,21 @@ WE_VOTE_API_KEY = get_environment_variable("WE_VOTE_API_KEY")
 BALLOT_ITEMS_SYNC_URL = get_environment_variable("BALLOT_ITEMS_SYNC_URL")  # ballotItemsSyncOut
 BALLOT_RETURNED_SYNC_URL = get_environment_variable("BALLOT_RETURNED_SYNC_URL")  # ballotReturnedSyncOut
 
+# Every voter whose address maps to the same ballot_returned gets the same ballot, so each worker keeps the assembled
+#  ballot_item_list for a (ballot_returned_we_vote_id, google_civic_election_id) pair. Entries are dropped when the
+#  election's ballot item cache version (bumped by the signals at the bottom of ballot/models.py) changes, and after
+#  BALLOT_ITEM_CACHE_MAX_AGE_SECONDS in case an edit was made with a queryset update that doesn't send signals.
+BALLOT_ITEM_CACHE_MAX_AGE_SECONDS = 900
+BALLOT_ITEM_CACHE_MAX_ENTRIES = 5000
+BALLOT_ITEM_CACHE_VERSION_CHECK_SECONDS = 10
+ballot_item_cache = OrderedDict()
+ballot_item_cache_version_dict = {}
+ballot_item_cache_lock = threading.Lock()
+# The politician_we_vote_ids on the upcoming ballots of a map point, kept and invalidated the same way
+POLITICIAN_WE_VOTE_IDS_CACHE_MAX_ENTRIES = 50000
+politician_we_vote_ids_for_polling_location_cache = OrderedDict()
+politician_we_vote_id_set_interned = {}
+
 
 def ballot_items_import_from_master_server(request, google_civic_election_id, state_code):
     """
@@ -232,6 +252,7 @@ def filter_ballot_returned_structured_json_for_local_duplicates(structured_json)
     return ballot_returned_results
 
 
+@cache_version_increments_deferred()
 def ballot_items_import_from_structured_json(structured_json):
     """
     This pathway in requires a we_vote_id, and is not used when we import from Google Civic
@@ -2534,12 +2555,14 @@ def ballot_items_search_retrieve_for_api(search_string):  # ballotItemsSearchRet
 def retrieve_politician_we_vote_ids_voter_can_vote_for(
         voter_device_id,
         voter_id=0,
-        polling_location_we_vote_id=''):
+        polling_location_we_vote_id='',
+        upcoming_google_civic_election_id_list=None):
     """
 
     :param voter_device_id:
     :param voter_id:
     :param polling_location_we_vote_id:
+    :param upcoming_google_civic_election_id_list: Pass in if the caller has already looked it up
     :return:
     """
 
@@ -2554,12 +2577,13 @@ def retrieve_politician_we_vote_ids_voter_can_vote_for(
     politician_we_vote_id_list = []
     results = {}
 
-    upcoming_google_civic_election_id_list = []
-    upcoming_results = election_manager.retrieve_upcoming_google_civic_election_id_list(
-        require_include_in_list_for_voters=True
-    )
-    if upcoming_results['upcoming_google_civic_election_id_list_found']:
-        upcoming_google_civic_election_id_list = upcoming_results['upcoming_google_civic_election_id_list']
+    if upcoming_google_civic_election_id_list is None:
+        upcoming_google_civic_election_id_list = []
+        upcoming_results = election_manager.retrieve_upcoming_google_civic_election_id_list(
+            require_include_in_list_for_voters=True
+        )
+        if upcoming_results['upcoming_google_civic_election_id_list_found']:
+            upcoming_google_civic_election_id_list = upcoming_results['upcoming_google_civic_election_id_list']
     try:
         if positive_value_exists(polling_location_we_vote_id):
             results = ballot_item_list_manager.retrieve_all_ballot_items_for_polling_location(
@@ -2622,6 +2646,173 @@ def retrieve_politician_we_vote_ids_voter_can_vote_for(
     return results
 
 
+def retrieve_politician_we_vote_ids_for_polling_location(
+        polling_location_we_vote_id, upcoming_google_civic_election_id_list):
+    """
+    The politicians on the upcoming ballots for one map point. Every voter whose ballot came from this map point
+    gets the same answer, so it is kept in each worker until one of the elections' ballot item cache versions
+    changes (see invalidate_ballot_item_cache_for_election).
+    :param polling_location_we_vote_id:
+    :param upcoming_google_civic_election_id_list:
+    :return: frozenset of politician_we_vote_ids
+    """
+    election_id_tuple = tuple(sorted(convert_to_int(one_id) for one_id in upcoming_google_civic_election_id_list))
+    cache_key = (polling_location_we_vote_id, election_id_tuple)
+    version_tuple = tuple(current_ballot_item_cache_version(one_id) for one_id in election_id_tuple)
+    now = time.monotonic()
+    with ballot_item_cache_lock:
+        cache_entry = politician_we_vote_ids_for_polling_location_cache.get(cache_key)
+        if cache_entry is not None and cache_entry['version_tuple'] == version_tuple \
+                and now - cache_entry['date_cached'] < BALLOT_ITEM_CACHE_MAX_AGE_SECONDS:
+            politician_we_vote_ids_for_polling_location_cache.move_to_end(cache_key)
+            return cache_entry['politician_we_vote_id_set']
+
+    results = retrieve_politician_we_vote_ids_voter_can_vote_for(
+        '',
+        polling_location_we_vote_id=polling_location_we_vote_id,
+        upcoming_google_civic_election_id_list=list(election_id_tuple))
+    politician_we_vote_id_set = frozenset(results['politician_we_vote_id_list'])
+    if not results['success']:
+        return politician_we_vote_id_set
+    with ballot_item_cache_lock:
+        # Neighboring map points usually share a ballot, so store one copy of each distinct set
+        politician_we_vote_id_set = \
+            politician_we_vote_id_set_interned.setdefault(politician_we_vote_id_set, politician_we_vote_id_set)
+        politician_we_vote_ids_for_polling_location_cache[cache_key] = {
+            'date_cached':                  now,
+            'politician_we_vote_id_set':    politician_we_vote_id_set,
+            'version_tuple':                version_tuple,
+        }
+        politician_we_vote_ids_for_polling_location_cache.move_to_end(cache_key)
+        if len(politician_we_vote_ids_for_polling_location_cache) > POLITICIAN_WE_VOTE_IDS_CACHE_MAX_ENTRIES:
+            politician_we_vote_ids_for_polling_location_cache.popitem(last=False)
+            if len(politician_we_vote_id_set_interned) > POLITICIAN_WE_VOTE_IDS_CACHE_MAX_ENTRIES:
+                politician_we_vote_id_set_interned.clear()
+    return politician_we_vote_id_set
+
+
+def retrieve_upcoming_politician_we_vote_ids_for_voter(voter_id):
+    """
+    A cheap version of what_voter_can_vote_for for pages that only want to personalize: it uses the ballot the voter
+    already has (VoterBallotSaved) and never looks up or creates an address or a ballot.
+    :param voter_id:
+    :return:
+    """
+    status = ""
+    politician_we_vote_id_list = []
+    if not positive_value_exists(voter_id):
+        status += "VALID_VOTER_ID_MISSING "
+        results = {
+            'status':                                       status,
+            'success':                                      False,
+            'voter_can_vote_for_politician_we_vote_ids':    politician_we_vote_id_list,
+        }
+        return results
+
+    election_manager = ElectionManager()
+    upcoming_results = election_manager.retrieve_upcoming_google_civic_election_id_list(
+        require_include_in_list_for_voters=True)
+    upcoming_google_civic_election_id_list = upcoming_results['upcoming_google_civic_election_id_list']
+
+    polling_location_we_vote_id_source = ''
+    if len(upcoming_google_civic_election_id_list):
+        try:
+            polling_location_we_vote_id_source = VoterBallotSaved.objects.using('readonly') \
+                .filter(voter_id=voter_id,
+                        google_civic_election_id__in=upcoming_google_civic_election_id_list) \
+                .exclude(polling_location_we_vote_id_source__isnull=True) \
+                .exclude(polling_location_we_vote_id_source='') \
+                .order_by('-id') \
+                .values_list('polling_location_we_vote_id_source', flat=True) \
+                .first()
+        except Exception as e:
+            status += "VOTER_BALLOT_SAVED_LOOKUP_FAILED: " + str(e) + " "
+
+    if positive_value_exists(polling_location_we_vote_id_source):
+        politician_we_vote_id_list = sorted(retrieve_politician_we_vote_ids_for_polling_location(
+            polling_location_we_vote_id_source, upcoming_google_civic_election_id_list))
+    else:
+        status += "NO_UPCOMING_BALLOT_FROM_MAP_POINT "
+
+    results = {
+        'status':                                       status,
+        'success':                                      True,
+        'voter_can_vote_for_politician_we_vote_ids':    politician_we_vote_id_list,
+    }
+    return results
+
+
+def current_ballot_item_cache_version(google_civic_election_id):
+    """
+    Look up the election's ballot item cache version, asking the database at most once every
+    BALLOT_ITEM_CACHE_VERSION_CHECK_SECONDS per worker.
+    :param google_civic_election_id:
+    :return:
+    """
+    google_civic_election_id = convert_to_int(google_civic_election_id)
+    now = time.monotonic()
+    with ballot_item_cache_lock:
+        version_entry = ballot_item_cache_version_dict.get(google_civic_election_id)
+    if version_entry is not None and now - version_entry[1] < BALLOT_ITEM_CACHE_VERSION_CHECK_SECONDS:
+        return version_entry[0]
+    cache_version = fetch_ballot_item_cache_version(google_civic_election_id)
+    with ballot_item_cache_lock:
+        ballot_item_cache_version_dict[google_civic_election_id] = (cache_version, now)
+    return cache_version
+
+
+def retrieve_cached_ballot_item_list(ballot_returned_we_vote_id, google_civic_election_id):
+    """
+    Return the shared ballot_item_list assembled for this ballot_returned, or None if we don't have a current one.
+    :param ballot_returned_we_vote_id:
+    :param google_civic_election_id:
+    :return:
+    """
+    if not positive_value_exists(ballot_returned_we_vote_id) or not positive_value_exists(google_civic_election_id):
+        return None
+    cache_key = (ballot_returned_we_vote_id, convert_to_int(google_civic_election_id))
+    with ballot_item_cache_lock:
+        cache_entry = ballot_item_cache.get(cache_key)
+    if cache_entry is None:
+        return None
+    if time.monotonic() - cache_entry['date_cached'] > BALLOT_ITEM_CACHE_MAX_AGE_SECONDS or \
+            cache_entry['cache_version'] != current_ballot_item_cache_version(google_civic_election_id):
+        with ballot_item_cache_lock:
+            ballot_item_cache.pop(cache_key, None)
+        return None
+    with ballot_item_cache_lock:
+        if cache_key in ballot_item_cache:
+            ballot_item_cache.move_to_end(cache_key)
+    return cache_entry['ballot_item_list']
+
+
+def store_cached_ballot_item_list(ballot_returned_we_vote_id, google_civic_election_id, ballot_item_list,
+                                  cache_version):
+    if not positive_value_exists(ballot_returned_we_vote_id) or not positive_value_exists(google_civic_election_id):
+        return
+    cache_key = (ballot_returned_we_vote_id, convert_to_int(google_civic_election_id))
+    with ballot_item_cache_lock:
+        ballot_item_cache[cache_key] = {
+            'ballot_item_list': ballot_item_list,
+            'cache_version':    cache_version,
+            'date_cached':      time.monotonic(),
+        }
+        ballot_item_cache.move_to_end(cache_key)
+        version_entry = ballot_item_cache_version_dict.get(cache_key[1])
+        if version_entry is None or version_entry[0] < cache_version:
+            ballot_item_cache_version_dict[cache_key[1]] = (cache_version, time.monotonic())
+        while len(ballot_item_cache) > BALLOT_ITEM_CACHE_MAX_ENTRIES:
+            ballot_item_cache.popitem(last=False)
+
+
+def clear_ballot_item_cache():
+    with ballot_item_cache_lock:
+        ballot_item_cache.clear()
+        ballot_item_cache_version_dict.clear()
+        politician_we_vote_ids_for_polling_location_cache.clear()
+        politician_we_vote_id_set_interned.clear()
+
+
 def voter_ballot_items_retrieve_for_one_election_for_api(
         voter_device_id, voter_id=0, google_civic_election_id='', ballot_returned_we_vote_id=''):
     """
@@ -2640,6 +2831,18 @@ def voter_ballot_items_retrieve_for_one_election_for_api(
     ballot_returned_manager = BallotReturnedManager()
     polling_location_we_vote_id = ''
 
+    cached_ballot_item_list = retrieve_cached_ballot_item_list(ballot_returned_we_vote_id, google_civic_election_id)
+    if cached_ballot_item_list is not None:
+        status += "BALLOT_ITEM_LIST_FOUND_IN_CACHE "
+        results = {
+            'status': status,
+            'success': True,
+            'voter_device_id': voter_device_id,
+            'ballot_item_list': list(cached_ballot_item_list),
+            'google_civic_election_id': google_civic_election_id,
+        }
+        return results
+
     if positive_value_exists(ballot_returned_we_vote_id):
         ballot_returned_results = \
             ballot_returned_manager.retrieve_ballot_returned_from_ballot_returned_we_vote_id(ballot_returned_we_vote_id)
@@ -2651,6 +2854,9 @@ def voter_ballot_items_retrieve_for_one_election_for_api(
     ballot_items_to_display = []
     results = {}
     google_civic_election_id_list = [google_civic_election_id]
+    # Read the version before the ballot items, so an edit made while we build the list leaves the entry stale
+    cache_version = fetch_ballot_item_cache_version(google_civic_election_id) \
+        if positive_value_exists(polling_location_we_vote_id) else 0
     try:
         if positive_value_exists(polling_location_we_vote_id):
             results = ballot_item_list_manager.retrieve_all_ballot_items_for_polling_location(
@@ -2674,6 +2880,8 @@ def voter_ballot_items_retrieve_for_one_election_for_api(
         handle_exception(e, logger=logger, exception_message=status)
         success = False
 
+    election_snapshot = fetch_election_snapshot()
+    use_election_snapshot = election_snapshot.includes_election(google_civic_election_id)
     if success:
         status += "BALLOT_ITEM_LIST_FOUND "
         for ballot_item in ballot_item_list:
@@ -2683,77 +2891,50 @@ def voter_ballot_items_retrieve_for_one_election_for_api(
                 office_id = ballot_item.contest_office_id
                 office_we_vote_id = ballot_item.contest_office_we_vote_id
                 race_office_level = ""
-                if positive_value_exists(office_we_vote_id):
-                    office_results = contest_office_manager.retrieve_contest_office_from_we_vote_id(
-                        office_we_vote_id, read_only=True)
-                    if office_results['contest_office_found']:
-                        contest_office = office_results['contest_office']
-                        office_id = contest_office.id
-                        office_name = contest_office.office_name
-                        race_office_level = contest_office.ballotpedia_race_office_level
-                try:
-                    results = candidate_list_object.retrieve_all_candidates_for_office(
-                        office_we_vote_id=office_we_vote_id, read_only=True)
-
-                    candidates_to_display = []
-                    if results['candidate_list_found']:
-                        candidate_list = results['candidate_list']
-                        for candidate in candidate_list:
-                            withdrawal_date = ''
-                            if isinstance(candidate.withdrawal_date, the_other_datetime.date):
-                                withdrawal_date = candidate.withdrawal_date.strftime("%Y-%m-%d")
-
-                            # This should match values returned in candidates_retrieve_for_api (candidatesRetrieve)
-                            one_candidate = {
-                                'id':                           candidate.id,
-                                'we_vote_id':                   candidate.we_vote_id,
-                                'ballot_item_display_name':     candidate.display_candidate_name(),
-                                'ballotpedia_candidate_id':     candidate.ballotpedia_candidate_id,
-                                'ballotpedia_candidate_summary': candidate.ballotpedia_candidate_summary,
-                                'ballotpedia_candidate_url':    candidate.ballotpedia_candidate_url,
-                                'ballotpedia_person_id':        candidate.ballotpedia_person_id,
-                                'candidate_email':              candidate.candidate_email,
-                                'candidate_phone':              candidate.candidate_phone,
-                                'candidate_photo_url_large':
-                                    candidate.we_vote_hosted_profile_image_url_large
-                                    if positive_value_exists(candidate.we_vote_hosted_profile_image_url_large)
-                                    else candidate.candidate_photo_url(),
-                                'candidate_photo_url_medium':
-                                    candidate.we_vote_hosted_profile_image_url_medium,
-                                'candidate_photo_url_tiny': candidate.we_vote_hosted_profile_image_url_tiny,
-                                'candidate_url':                candidate.candidate_url,
-                                'candidate_contact_form_url':   candidate.candidate_contact_form_url,
-                                'contest_office_id':            office_id,
-                                'contest_office_name':          office_name,
-                                'contest_office_we_vote_id':    office_we_vote_id,
-                                'facebook_url':                 candidate.facebook_url,
-                                'google_civic_election_id':     google_civic_election_id,
-                                'instagram_handle':             candidate.instagram_handle,
-                                'instagram_followers_count':    candidate.instagram_followers_count,
-                                'kind_of_ballot_item':          CANDIDATE,
-                                'maplight_id':                  candidate.maplight_id,
-                                'ocd_division_id':              candidate.ocd_division_id,
-                                'order_on_ballot':              candidate.order_on_ballot,
-                                'party':                        candidate.political_party_display(),
-                                'politician_id':                candidate.politician_id,
-                                'politician_we_vote_id':        candidate.politician_we_vote_id,
-                                'state_code':                   candidate.state_code,
-                                'twitter_url':                  candidate.twitter_url,
-                                'twitter_handle':               candidate.fetch_twitter_handle(),
-                                'twitter_description':          candidate.twitter_description
-                                if positive_value_exists(candidate.twitter_description) and
-                                len(candidate.twitter_description) > 1 else '',
-                                'twitter_followers_count':      candidate.twitter_followers_count,
-                                'youtube_url':                  candidate.youtube_url,
-                                'withdrawn_from_election':      candidate.withdrawn_from_election,
-                                'withdrawal_date':              withdrawal_date,
-                            }
-                            candidates_to_display.append(one_candidate.copy())
-                except Exception as e:
-                    status = 'FAILED retrieve_all_candidates_for_office. ' + str(e) + " "
+                snapshot_contest_office = None
+                if use_election_snapshot:
+                    snapshot_contest_office = election_snapshot.contest_office(
+                        contest_office_we_vote_id=office_we_vote_id)
+                if snapshot_contest_office is not None:
+                    office_id = snapshot_contest_office.id
+                    office_name = snapshot_contest_office.office_name
+                    race_office_level = snapshot_contest_office.ballotpedia_race_office_level
                     candidates_to_display = []
-                    if hasattr(results, 'status'):
-                        status += results['status'] + " "
+                    for snapshot_candidate in election_snapshot.candidate_list_for_office(office_we_vote_id):
+                        one_candidate = dict(snapshot_candidate.ballot_item_dict)
+                        one_candidate['contest_office_id'] = office_id
+                        one_candidate['contest_office_name'] = office_name
+                        one_candidate['contest_office_we_vote_id'] = office_we_vote_id
+                        one_candidate['google_civic_election_id'] = google_civic_election_id
+                        candidates_to_display.append(one_candidate)
+                else:
+                    if positive_value_exists(office_we_vote_id):
+                        office_results = contest_office_manager.retrieve_contest_office_from_we_vote_id(
+                            office_we_vote_id, read_only=True)
+                        if office_results['contest_office_found']:
+                            contest_office = office_results['contest_office']
+                            office_id = contest_office.id
+                            office_name = contest_office.office_name
+                            race_office_level = contest_office.ballotpedia_race_office_level
+                    try:
+                        results = candidate_list_object.retrieve_all_candidates_for_office(
+                            office_we_vote_id=office_we_vote_id, read_only=True)
+
+                        candidates_to_display = []
+                        if results['candidate_list_found']:
+                            candidate_list = results['candidate_list']
+                            for candidate in candidate_list:
+                                one_candidate = generate_candidate_dict_for_ballot(candidate)
+                                one_candidate['contest_office_id'] = office_id
+                                one_candidate['contest_office_name'] = office_name
+                                one_candidate['contest_office_we_vote_id'] = office_we_vote_id
+                                one_candidate['google_civic_election_id'] = google_civic_election_id
+                                candidates_to_display.append(one_candidate)
+                    except Exception as e:
+                        status = 'FAILED retrieve_all_candidates_for_office. ' + str(e) + " "
+                        candidates_to_display = []
+                        if hasattr(results, 'status'):
+                            status += results['status'] + " "
 
                 if len(candidates_to_display):
                     one_ballot_item = {
@@ -2797,6 +2978,10 @@ def voter_ballot_items_retrieve_for_one_election_for_api(
 
         from operator import itemgetter
         ballot_item_list_ordered = sorted(ballot_items_to_display, key=itemgetter('local_ballot_order'), reverse=False)
+        if positive_value_exists(polling_location_we_vote_id):
+            # Only ballots built from a map point are shared between voters
+            store_cached_ballot_item_list(
+                ballot_returned_we_vote_id, google_civic_election_id, ballot_item_list_ordered, cache_version)
 
         results = {
             'status': status,
@@ -0,0 +1,387 @@
+# ballot/election_snapshot.py
+# Brought to you by We Vote. Be good.
+# -*- coding: UTF-8 -*-
+
+import copy
+import datetime
+import threading
+import time
+
+from ballot.models import CANDIDATE, fetch_election_snapshot_version_dict
+from candidate.models import CandidateCampaign, CandidateToOfficeLink
+from election.models import ElectionManager
+from measure.models import ContestMeasure
+from office.models import ContestOffice
+import wevote_functions.admin
+from wevote_functions.background_task import BackgroundTask
+from wevote_functions.functions import convert_to_int, positive_value_exists
+
+logger = wevote_functions.admin.get_logger(__name__)
+
+# Offices, candidates and measures in upcoming elections only change during imports and admin edits, so each worker
+#  keeps one read-only copy in memory. Every save bumps a version stamp per election (see ballot/models.py), which
+#  we check at most every ELECTION_SNAPSHOT_VERSION_CHECK_SECONDS. Queryset .update() calls don't send signals, so
+#  the snapshot is also rebuilt after ELECTION_SNAPSHOT_MAX_AGE_SECONDS. Rebuilding reads every office, candidate and
+#  measure in the upcoming elections, so it happens on a background thread; until the new snapshot is ready, the
+#  elections that changed are left out of the old one, and requests read them from the database.
+ELECTION_SNAPSHOT_MAX_AGE_SECONDS = 900
+ELECTION_SNAPSHOT_VERSION_CHECK_SECONDS = 10
+
+
+def generate_candidate_dict_for_ballot(candidate):
+    """
+    The candidate fields returned with each office in voterBallotItemsRetrieve. The caller adds contest_office_id,
+    contest_office_name, contest_office_we_vote_id and google_civic_election_id.
+    This should match values returned in candidates_retrieve_for_api (candidatesRetrieve)
+    :param candidate:
+    :return:
+    """
+    withdrawal_date = ''
+    if isinstance(candidate.withdrawal_date, datetime.date):
+        withdrawal_date = candidate.withdrawal_date.strftime("%Y-%m-%d")
+    return {
+        'id':                           candidate.id,
+        'we_vote_id':                   candidate.we_vote_id,
+        'ballot_item_display_name':     candidate.display_candidate_name(),
+        'ballotpedia_candidate_id':     candidate.ballotpedia_candidate_id,
+        'ballotpedia_candidate_summary': candidate.ballotpedia_candidate_summary,
+        'ballotpedia_candidate_url':    candidate.ballotpedia_candidate_url,
+        'ballotpedia_person_id':        candidate.ballotpedia_person_id,
+        'candidate_email':              candidate.candidate_email,
+        'candidate_phone':              candidate.candidate_phone,
+        'candidate_photo_url_large':
+            candidate.we_vote_hosted_profile_image_url_large
+            if positive_value_exists(candidate.we_vote_hosted_profile_image_url_large)
+            else candidate.candidate_photo_url(),
+        'candidate_photo_url_medium':   candidate.we_vote_hosted_profile_image_url_medium,
+        'candidate_photo_url_tiny':     candidate.we_vote_hosted_profile_image_url_tiny,
+        'candidate_url':                candidate.candidate_url,
+        'candidate_contact_form_url':   candidate.candidate_contact_form_url,
+        'facebook_url':                 candidate.facebook_url,
+        'instagram_handle':             candidate.instagram_handle,
+        'instagram_followers_count':    candidate.instagram_followers_count,
+        'kind_of_ballot_item':          CANDIDATE,
+        'maplight_id':                  candidate.maplight_id,
+        'ocd_division_id':              candidate.ocd_division_id,
+        'order_on_ballot':              candidate.order_on_ballot,
+        'party':                        candidate.political_party_display(),
+        'politician_id':                candidate.politician_id,
+        'politician_we_vote_id':        candidate.politician_we_vote_id,
+        'state_code':                   candidate.state_code,
+        'twitter_url':                  candidate.twitter_url,
+        'twitter_handle':               candidate.fetch_twitter_handle(),
+        'twitter_description':          candidate.twitter_description
+        if positive_value_exists(candidate.twitter_description) and
+        len(candidate.twitter_description) > 1 else '',
+        'twitter_followers_count':      candidate.twitter_followers_count,
+        'youtube_url':                  candidate.youtube_url,
+        'withdrawn_from_election':      candidate.withdrawn_from_election,
+        'withdrawal_date':              withdrawal_date,
+    }
+
+
+class ContestOfficeSnapshot(object):
+    __slots__ = ('id', 'we_vote_id', 'ballotpedia_race_office_level', 'candidate_we_vote_id_list',
+                 'google_civic_election_id', 'office_name', 'state_code')
+
+    def __init__(self, contest_office_id, we_vote_id, ballotpedia_race_office_level, google_civic_election_id,
+                 office_name, state_code):
+        self.id = contest_office_id
+        self.we_vote_id = we_vote_id
+        self.ballotpedia_race_office_level = ballotpedia_race_office_level
+        self.candidate_we_vote_id_list = ()
+        self.google_civic_election_id = google_civic_election_id
+        self.office_name = office_name
+        self.state_code = state_code
+
+
+class CandidateSnapshot(object):
+    """
+    The CandidateCampaign fields our controllers read most, with the same names, so code that only reads a
+    candidate can be handed one of these instead
+    """
+    __slots__ = ('id', 'we_vote_id', 'alternate_names_list', 'ballot_item_dict', 'ballot_item_display_name',
+                 'candidate_name', 'contest_office_name', 'contest_office_we_vote_id', 'do_not_display_on_ballot',
+                 'google_civic_election_id', 'google_civic_election_id_set', 'party', 'twitter_followers_count',
+                 'we_vote_hosted_profile_image_url_large', 'we_vote_hosted_profile_image_url_medium',
+                 'we_vote_hosted_profile_image_url_tiny', 'withdrawal_date', 'withdrawn_from_election')
+
+    def __init__(self, candidate):
+        self.id = candidate.id
+        self.we_vote_id = candidate.we_vote_id
+        self.alternate_names_list = tuple(candidate.display_alternate_names_list())
+        self.ballot_item_dict = generate_candidate_dict_for_ballot(candidate)
+        self.ballot_item_display_name = candidate.display_candidate_name()
+        self.candidate_name = candidate.candidate_name
+        self.contest_office_name = candidate.contest_office_name
+        self.contest_office_we_vote_id = candidate.contest_office_we_vote_id
+        self.do_not_display_on_ballot = positive_value_exists(candidate.do_not_display_on_ballot)
+        self.google_civic_election_id = candidate.google_civic_election_id
+        # Every election this candidate is on the ballot in, through CandidateToOfficeLink
+        self.google_civic_election_id_set = frozenset([convert_to_int(candidate.google_civic_election_id)])
+        self.party = candidate.party
+        self.twitter_followers_count = candidate.twitter_followers_count
+        self.we_vote_hosted_profile_image_url_large = candidate.we_vote_hosted_profile_image_url_large
+        self.we_vote_hosted_profile_image_url_medium = candidate.we_vote_hosted_profile_image_url_medium
+        self.we_vote_hosted_profile_image_url_tiny = candidate.we_vote_hosted_profile_image_url_tiny
+        self.withdrawal_date = candidate.withdrawal_date
+        self.withdrawn_from_election = candidate.withdrawn_from_election
+
+    def display_candidate_name(self):
+        return self.ballot_item_display_name
+
+    def display_alternate_names_list(self):
+        return list(self.alternate_names_list)
+
+
+class ContestMeasureSnapshot(object):
+    __slots__ = ('id', 'we_vote_id', 'google_civic_election_id', 'measure_title', 'state_code')
+
+    def __init__(self, contest_measure_id, we_vote_id, google_civic_election_id, measure_title, state_code):
+        self.id = contest_measure_id
+        self.we_vote_id = we_vote_id
+        self.google_civic_election_id = google_civic_election_id
+        self.measure_title = measure_title
+        self.state_code = state_code
+
+
+class ElectionSnapshot(object):
+    """
+    Read-only offices, candidates and measures for a set of elections, indexed by id and we_vote_id
+    """
+
+    def __init__(self, google_civic_election_id_list=None, version_dict=None, checked=True):
+        self.google_civic_election_id_set = frozenset(
+            convert_to_int(google_civic_election_id)
+            for google_civic_election_id in google_civic_election_id_list or [])
+        self.version_dict = version_dict or {}
+        # Elections that changed since this snapshot was loaded, which we leave to the database
+        self.stale_google_civic_election_id_set = frozenset()
+        self.loaded_time = time.monotonic()
+        # An unchecked snapshot is replaced the first time it is used
+        self.version_checked_time = self.loaded_time if checked else None
+        self.candidate_by_id = {}
+        self.candidate_by_we_vote_id = {}
+        self.contest_measure_by_id = {}
+        self.contest_measure_by_we_vote_id = {}
+        self.contest_office_by_id = {}
+        self.contest_office_by_we_vote_id = {}
+
+    def includes_election(self, google_civic_election_id):
+        google_civic_election_id = convert_to_int(google_civic_election_id)
+        return google_civic_election_id in self.google_civic_election_id_set \
+            and google_civic_election_id not in self.stale_google_civic_election_id_set
+
+    def with_stale_elections(self, stale_google_civic_election_id_list):
+        """
+        :param stale_google_civic_election_id_list:
+        :return: this snapshot, sharing its indexes, with these elections left out
+        """
+        election_snapshot = copy.copy(self)
+        election_snapshot.stale_google_civic_election_id_set = self.stale_google_civic_election_id_set | frozenset(
+            convert_to_int(google_civic_election_id)
+            for google_civic_election_id in stale_google_civic_election_id_list)
+        return election_snapshot
+
+    def current_or_none(self, snapshot_object):
+        if snapshot_object is None or not self.stale_google_civic_election_id_set:
+            return snapshot_object
+        if isinstance(snapshot_object, CandidateSnapshot):
+            if snapshot_object.google_civic_election_id_set & self.stale_google_civic_election_id_set:
+                return None
+            return snapshot_object
+        return snapshot_object if self.includes_election(snapshot_object.google_civic_election_id) else None
+
+    def candidate(self, candidate_id=0, candidate_we_vote_id=''):
+        if positive_value_exists(candidate_id):
+            return self.current_or_none(self.candidate_by_id.get(convert_to_int(candidate_id)))
+        if positive_value_exists(candidate_we_vote_id):
+            return self.current_or_none(self.candidate_by_we_vote_id.get(candidate_we_vote_id.lower()))
+        return None
+
+    def candidate_list_for_office(self, contest_office_we_vote_id):
+        """
+        :param contest_office_we_vote_id:
+        :return: Candidates to show on the ballot for this office, most Twitter followers first, or None if we
+         don't have this office
+        """
+        contest_office = self.contest_office(contest_office_we_vote_id=contest_office_we_vote_id)
+        if contest_office is None:
+            return None
+        # A candidate can also be on the ballot in an election that changed
+        if self.stale_google_civic_election_id_set and any(
+                self.current_or_none(self.candidate_by_we_vote_id[candidate_we_vote_id]) is None
+                for candidate_we_vote_id in contest_office.candidate_we_vote_id_list):
+            return None
+        return [self.candidate_by_we_vote_id[candidate_we_vote_id]
+                for candidate_we_vote_id in contest_office.candidate_we_vote_id_list]
+
+    def contest_measure(self, contest_measure_id=0, contest_measure_we_vote_id=''):
+        if positive_value_exists(contest_measure_id):
+            return self.current_or_none(self.contest_measure_by_id.get(convert_to_int(contest_measure_id)))
+        if positive_value_exists(contest_measure_we_vote_id):
+            return self.current_or_none(self.contest_measure_by_we_vote_id.get(contest_measure_we_vote_id.lower()))
+        return None
+
+    def contest_office(self, contest_office_id=0, contest_office_we_vote_id=''):
+        if positive_value_exists(contest_office_id):
+            return self.current_or_none(self.contest_office_by_id.get(convert_to_int(contest_office_id)))
+        if positive_value_exists(contest_office_we_vote_id):
+            return self.current_or_none(self.contest_office_by_we_vote_id.get(contest_office_we_vote_id.lower()))
+        return None
+
+    def load(self):
+        google_civic_election_id_list = list(self.google_civic_election_id_set)
+        if not len(google_civic_election_id_list):
+            return
+        google_civic_election_id_string_list = [str(google_civic_election_id)
+                                                for google_civic_election_id in google_civic_election_id_list]
+
+        office_query = ContestOffice.objects.using('readonly') \
+            .filter(google_civic_election_id__in=google_civic_election_id_string_list) \
+            .values_list('id', 'we_vote_id', 'ballotpedia_race_office_level', 'google_civic_election_id',
+                         'office_name', 'state_code')
+        for contest_office_id, we_vote_id, ballotpedia_race_office_level, google_civic_election_id, office_name, \
+                state_code in office_query.iterator():
+            if not positive_value_exists(we_vote_id):
+                continue
+            contest_office = ContestOfficeSnapshot(
+                contest_office_id, we_vote_id.lower(), ballotpedia_race_office_level, google_civic_election_id,
+                office_name, state_code)
+            self.contest_office_by_id[contest_office_id] = contest_office
+            self.contest_office_by_we_vote_id[contest_office.we_vote_id] = contest_office
+
+        candidate_we_vote_id_list_by_office = {}
+        google_civic_election_id_set_by_candidate = {}
+        link_query = CandidateToOfficeLink.objects.using('readonly') \
+            .filter(google_civic_election_id__in=google_civic_election_id_list) \
+            .values_list('candidate_we_vote_id', 'contest_office_we_vote_id', 'google_civic_election_id')
+        for candidate_we_vote_id, contest_office_we_vote_id, google_civic_election_id in link_query.iterator():
+            if positive_value_exists(candidate_we_vote_id) and positive_value_exists(contest_office_we_vote_id):
+                candidate_we_vote_id_list_by_office.setdefault(contest_office_we_vote_id.lower(), set()) \
+                    .add(candidate_we_vote_id.lower())
+                google_civic_election_id_set_by_candidate.setdefault(candidate_we_vote_id.lower(), set()) \
+                    .add(convert_to_int(google_civic_election_id))
+
+        all_candidate_we_vote_id_set = set()
+        for candidate_we_vote_id_set in candidate_we_vote_id_list_by_office.values():
+            all_candidate_we_vote_id_set.update(candidate_we_vote_id_set)
+        all_candidate_we_vote_id_list = list(all_candidate_we_vote_id_set)
+        chunk_size = 2000
+        for start_index in range(0, len(all_candidate_we_vote_id_list), chunk_size):
+            candidate_query = CandidateCampaign.objects.using('readonly') \
+                .filter(we_vote_id__in=all_candidate_we_vote_id_list[start_index:start_index + chunk_size])
+            for candidate_object in candidate_query.iterator():
+                candidate = CandidateSnapshot(candidate_object)
+                candidate.google_civic_election_id_set = candidate.google_civic_election_id_set | frozenset(
+                    google_civic_election_id_set_by_candidate.get(candidate.we_vote_id.lower(), ()))
+                self.candidate_by_id[candidate.id] = candidate
+                self.candidate_by_we_vote_id[candidate.we_vote_id.lower()] = candidate
+
+        for contest_office_we_vote_id, candidate_we_vote_id_set in candidate_we_vote_id_list_by_office.items():
+            contest_office = self.contest_office_by_we_vote_id.get(contest_office_we_vote_id)
+            if contest_office is None:
+                continue
+            # Same filter and order as CandidateListManager.retrieve_all_candidates_for_office
+            candidate_list = [self.candidate_by_we_vote_id[candidate_we_vote_id]
+                              for candidate_we_vote_id in candidate_we_vote_id_set
+                              if candidate_we_vote_id in self.candidate_by_we_vote_id and
+                              not self.candidate_by_we_vote_id[candidate_we_vote_id].do_not_display_on_ballot]
+            candidate_list.sort(key=lambda candidate: -convert_to_int(candidate.twitter_followers_count))
+            contest_office.candidate_we_vote_id_list = tuple(candidate.we_vote_id.lower()
+                                                             for candidate in candidate_list)
+
+        measure_query = ContestMeasure.objects.using('readonly') \
+            .filter(google_civic_election_id__in=google_civic_election_id_string_list) \
+            .values_list('id', 'we_vote_id', 'google_civic_election_id', 'measure_title', 'state_code')
+        for contest_measure_id, we_vote_id, google_civic_election_id, measure_title, state_code \
+                in measure_query.iterator():
+            if not positive_value_exists(we_vote_id):
+                continue
+            contest_measure = ContestMeasureSnapshot(
+                contest_measure_id, we_vote_id.lower(), google_civic_election_id, measure_title, state_code)
+            self.contest_measure_by_id[contest_measure_id] = contest_measure
+            self.contest_measure_by_we_vote_id[contest_measure.we_vote_id] = contest_measure
+
+
+election_snapshot = ElectionSnapshot(checked=False)
+election_snapshot_lock = threading.Lock()
+
+
+def fetch_upcoming_election_version_dict():
+    """
+    :return: the upcoming google_civic_election_id_list, and the version stamp of each of those elections
+    """
+    election_manager = ElectionManager()
+    results = election_manager.retrieve_upcoming_google_civic_election_id_list()
+    google_civic_election_id_list = results['upcoming_google_civic_election_id_list']
+    return google_civic_election_id_list, fetch_election_snapshot_version_dict(google_civic_election_id_list)
+
+
+def rebuild_election_snapshot():
+    """
+    Load a new snapshot of the upcoming elections and swap it in. Runs on election_snapshot_rebuild_task's thread.
+    :return:
+    """
+    global election_snapshot
+    google_civic_election_id_list, version_dict = fetch_upcoming_election_version_dict()
+    new_snapshot = ElectionSnapshot(
+        google_civic_election_id_list=google_civic_election_id_list, version_dict=version_dict)
+    new_snapshot.load()
+    with election_snapshot_lock:
+        # Readers holding the old snapshot keep using it, so we swap in a complete new one
+        election_snapshot = new_snapshot
+
+
+election_snapshot_rebuild_task = BackgroundTask('election_snapshot_rebuild', rebuild_election_snapshot)
+
+
+def fetch_election_snapshot():
+    """
+    This worker's snapshot of the upcoming elections, loaded the first time it is needed and rebuilt when the
+    upcoming elections, or anything in them, change. The rebuild runs in the background, so the snapshot returned
+    can leave out elections that changed (see ElectionSnapshot.includes_election).
+    :return: ElectionSnapshot
+    """
+    global election_snapshot
+    now = time.monotonic()
+    current_snapshot = election_snapshot
+    if current_snapshot.version_checked_time is not None \
+            and now - current_snapshot.version_checked_time < ELECTION_SNAPSHOT_VERSION_CHECK_SECONDS:
+        return current_snapshot
+
+    with election_snapshot_lock:
+        current_snapshot = election_snapshot
+        if current_snapshot.version_checked_time is not None \
+                and now - current_snapshot.version_checked_time < ELECTION_SNAPSHOT_VERSION_CHECK_SECONDS:
+            # Another thread checked while we were waiting
+            return current_snapshot
+        try:
+            google_civic_election_id_list, version_dict = fetch_upcoming_election_version_dict()
+            if version_dict == current_snapshot.version_dict:
+                if now - current_snapshot.loaded_time >= ELECTION_SNAPSHOT_MAX_AGE_SECONDS:
+                    election_snapshot_rebuild_task.run_soon()
+            else:
+                stale_google_civic_election_id_list = [
+                    google_civic_election_id
+                    for google_civic_election_id in current_snapshot.google_civic_election_id_set
+                    if version_dict.get(google_civic_election_id) !=
+                    current_snapshot.version_dict.get(google_civic_election_id)]
+                current_snapshot = current_snapshot.with_stale_elections(stale_google_civic_election_id_list)
+                # So we don't ask for another rebuild while this one is running
+                current_snapshot.version_dict = version_dict
+                election_snapshot_rebuild_task.run_soon()
+            current_snapshot.version_checked_time = now
+            election_snapshot = current_snapshot
+            return current_snapshot
+        except Exception as e:
+            logger.error("fetch_election_snapshot failed: " + str(e))
+            # An empty snapshot sends every lookup back to the database until the next check
+            election_snapshot = ElectionSnapshot()
+            return election_snapshot
+
+
+def clear_election_snapshot():
+    global election_snapshot
+    with election_snapshot_lock:
+        election_snapshot = ElectionSnapshot(checked=False)
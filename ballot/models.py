@@ -7,20 +7,23 @@ from datetime import date, datetime
 
 from django.db import models
 from django.db.models import F, Q, Count, FloatField, ExpressionWrapper, Func
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from geopy.exc import GeocoderQuotaExceeded
 from geopy.geocoders import get_geocoder_for_service
 
 import wevote_functions.admin
-from candidate.models import CandidateCampaign
+from candidate.models import CandidateCampaign, CandidateToOfficeLink
 from config.base import get_environment_variable
 from election.models import ElectionManager
 from exception.models import handle_exception, handle_record_found_more_than_one_exception
-from measure.models import ContestMeasureManager
-from office.models import ContestOfficeManager
+from measure.models import ContestMeasure, ContestMeasureManager
+from office.models import ContestOffice, ContestOfficeManager
 from polling_location.models import PollingLocationManager
 from wevote_functions.functions import convert_date_to_date_as_integer, convert_to_int, \
     extract_state_code_from_address_string, positive_value_exists, STATE_CODE_MAP
-from wevote_settings.models import fetch_next_we_vote_id_ballot_returned_integer, fetch_site_unique_id_prefix
+from wevote_settings.models import fetch_next_we_vote_id_ballot_returned_integer, \
+    fetch_site_unique_id_prefix, increment_cache_version, WeVoteSetting
 
 OFFICE = 'OFFICE'
 CANDIDATE = 'CANDIDATE'
@@ -1789,6 +1792,16 @@ class BallotReturned(models.Model):
         # TODO we need to deal with the situation where we_vote_id is NOT unique on save
         return
 
+    def get_text_for_geocoder(self):
+        """
+        :return: the address to look up, or None when the entry doesn't have enough of one
+        """
+        address_list = [self.normalized_line1, self.normalized_city, self.normalized_state, self.normalized_zip]
+        # We require all four values
+        if not all(positive_value_exists(value) for value in address_list):
+            return None
+        return '{}, {}, {} {}'.format(*address_list)
+
     def election_day_text(self):
         if isinstance(self.election_date, date):
             # Consider using:  and isinstance(self.election_date, str)
@@ -2988,11 +3001,8 @@ class BallotReturnedManager(models.Manager):
             }
             return results
 
-        if not positive_value_exists(ballot_returned_object.normalized_line1) or not \
-                positive_value_exists(ballot_returned_object.normalized_city) or not \
-                positive_value_exists(ballot_returned_object.normalized_state) or not \
-                positive_value_exists(ballot_returned_object.normalized_zip):
-            # We require all four values
+        full_ballot_address = ballot_returned_object.get_text_for_geocoder()
+        if full_ballot_address is None:
             results = {
                 'status':                   "POPULATE_LATITUDE_AND_LONGITUDE-MISSING_REQUIRED_ADDRESS_INFO ",
                 'geocoder_quota_exceeded':  False,
@@ -3000,11 +3010,6 @@ class BallotReturnedManager(models.Manager):
             }
             return results
 
-        full_ballot_address = '{}, {}, {} {}'.format(
-            ballot_returned_object.normalized_line1,
-            ballot_returned_object.normalized_city,
-            ballot_returned_object.normalized_state,
-            ballot_returned_object.normalized_zip)
         try:
             location = self.google_client.geocode(full_ballot_address, sensor=False, timeout=GEOCODE_TIMEOUT)
         except GeocoderQuotaExceeded:
@@ -4481,3 +4486,103 @@ def retrieve_address_fields_from_geocoder(text_for_map_search):
         'zip_long':     zip_long,
     }
     return results
+
+
+def ballot_item_cache_version_name(google_civic_election_id):
+    return 'ballot_item_cache_version_' + str(convert_to_int(google_civic_election_id))
+
+
+def fetch_ballot_item_cache_version(google_civic_election_id):
+    """
+    The shared ballots are built from the map point ballot items and from the election's offices, candidates and
+    measures, so their version changes when either the ballot item version or the election snapshot version does.
+    Both are read with one query.
+    :param google_civic_election_id:
+    :return:
+    """
+    setting_name_list = [ballot_item_cache_version_name(google_civic_election_id),
+                         election_snapshot_version_name(google_civic_election_id)]
+    try:
+        return sum(convert_to_int(integer_value) for integer_value in WeVoteSetting.objects
+                   .filter(name__in=setting_name_list).values_list('integer_value', flat=True)
+                   if integer_value)
+    except Exception as e:
+        logger.error("fetch_ballot_item_cache_version failed: " + str(e))
+        return 0
+
+
+def invalidate_ballot_item_cache_for_election(google_civic_election_id):
+    """
+    Tell every worker that the shared ballots it cached for this election are out of date
+    (see voter_ballot_items_retrieve_for_one_election_for_api)
+    :param google_civic_election_id:
+    :return:
+    """
+    if positive_value_exists(google_civic_election_id):
+        increment_cache_version(ballot_item_cache_version_name(google_civic_election_id))
+
+
+def election_snapshot_version_name(google_civic_election_id):
+    return 'election_snapshot_version_' + str(convert_to_int(google_civic_election_id))
+
+
+def fetch_election_snapshot_version_dict(google_civic_election_id_list):
+    """
+    The version stamps of many elections with one query (see ballot/election_snapshot.py)
+    :param google_civic_election_id_list:
+    :return: dict of google_civic_election_id -> version
+    """
+    version_dict = {convert_to_int(google_civic_election_id): 0
+                    for google_civic_election_id in google_civic_election_id_list}
+    setting_name_dict = {election_snapshot_version_name(google_civic_election_id): google_civic_election_id
+                         for google_civic_election_id in version_dict.keys()}
+    try:
+        for setting_name, integer_value in WeVoteSetting.objects.filter(name__in=list(setting_name_dict.keys())) \
+                .values_list('name', 'integer_value'):
+            version_dict[setting_name_dict[setting_name]] = convert_to_int(integer_value)
+    except Exception as e:
+        logger.error("fetch_election_snapshot_version_dict failed: " + str(e))
+    return version_dict
+
+
+def invalidate_election_snapshot_for_election(google_civic_election_id):
+    """
+    Tell every worker that its snapshot of this election's offices, candidates and measures, and the shared ballots
+    built from them (see fetch_ballot_item_cache_version), are out of date
+    :param google_civic_election_id:
+    :return:
+    """
+    if positive_value_exists(google_civic_election_id):
+        increment_cache_version(election_snapshot_version_name(google_civic_election_id))
+
+
+@receiver(post_save, sender=BallotItem)
+@receiver(post_delete, sender=BallotItem)
+def ballot_item_changed_signal(sender, instance, **kwargs):
+    # Ballot items stored for one voter are never part of a shared map point ballot
+    if positive_value_exists(instance.polling_location_we_vote_id):
+        invalidate_ballot_item_cache_for_election(instance.google_civic_election_id)
+
+
+@receiver(post_save, sender=ContestOffice)
+@receiver(post_delete, sender=ContestOffice)
+@receiver(post_save, sender=ContestMeasure)
+@receiver(post_delete, sender=ContestMeasure)
+@receiver(post_save, sender=CandidateToOfficeLink)
+@receiver(post_delete, sender=CandidateToOfficeLink)
+def ballot_item_source_changed_signal(sender, instance, **kwargs):
+    invalidate_election_snapshot_for_election(instance.google_civic_election_id)
+
+
+@receiver(post_save, sender=CandidateCampaign)
+@receiver(post_delete, sender=CandidateCampaign)
+def candidate_changed_signal(sender, instance, **kwargs):
+    # A candidate can be on the ballot in more than one election
+    try:
+        google_civic_election_id_list = CandidateToOfficeLink.objects \
+            .filter(candidate_we_vote_id=instance.we_vote_id) \
+            .values_list('google_civic_election_id', flat=True).distinct()
+        for google_civic_election_id in google_civic_election_id_list:
+            invalidate_election_snapshot_for_election(google_civic_election_id)
+    except Exception as e:
+        logger.error("candidate_changed_signal failed: " + str(e))
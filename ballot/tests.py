@@ -1,9 +1,14 @@
 from unittest import mock
 from collections import namedtuple
 
-from django.test import TestCase
+from django.test import SimpleTestCase, TestCase
 
+from ballot.controllers import clear_ballot_item_cache, retrieve_cached_ballot_item_list, \
+    retrieve_politician_we_vote_ids_for_polling_location, store_cached_ballot_item_list
+from ballot.election_snapshot import CandidateSnapshot, clear_election_snapshot, ContestOfficeSnapshot, \
+    ElectionSnapshot, fetch_election_snapshot, rebuild_election_snapshot
 from ballot.models import BallotReturned, BallotReturnedManager
+from candidate.models import CandidateCampaign
 
 
 Location = namedtuple('Location', ['address', 'latitude', 'longitude'])
@@ -100,3 +105,110 @@ class BallotTestCase(TestCase):
             self.assertFalse(result['geocoder_quota_exceeded'])
             self.assertTrue(result['ballot_returned_found'])
             self.assertEqual(result['ballot_returned'], ballot_in_jackson)
+
+
+class BallotItemCacheTestCase(SimpleTestCase):
+    def setUp(self):
+        clear_ballot_item_cache()
+        self.ballot_item_list = [{'we_vote_id': 'wv01off1', 'local_ballot_order': 1}]
+
+    def tearDown(self):
+        clear_ballot_item_cache()
+
+    def test_shared_ballot_reused_until_version_changes(self):
+        with mock.patch('ballot.controllers.fetch_ballot_item_cache_version') as mock_version:
+            mock_version.return_value = 3
+            store_cached_ballot_item_list('wv01ballot1', 4184, self.ballot_item_list, 3)
+            self.assertEqual(retrieve_cached_ballot_item_list('wv01ballot1', '4184'), self.ballot_item_list)
+            self.assertIsNone(retrieve_cached_ballot_item_list('wv01ballot2', 4184))
+
+            with mock.patch('ballot.controllers.BALLOT_ITEM_CACHE_VERSION_CHECK_SECONDS', 0):
+                mock_version.return_value = 4
+                self.assertIsNone(retrieve_cached_ballot_item_list('wv01ballot1', 4184))
+
+    def test_no_cache_without_ballot_returned(self):
+        store_cached_ballot_item_list('', 4184, self.ballot_item_list, 1)
+        self.assertIsNone(retrieve_cached_ballot_item_list('', 4184))
+
+    def test_politicians_for_map_point_cached_until_version_changes(self):
+        with mock.patch('ballot.controllers.fetch_ballot_item_cache_version') as mock_version, \
+                mock.patch('ballot.controllers.retrieve_politician_we_vote_ids_voter_can_vote_for') as mock_retrieve, \
+                mock.patch('ballot.controllers.BALLOT_ITEM_CACHE_VERSION_CHECK_SECONDS', 0):
+            mock_version.return_value = 1
+            mock_retrieve.return_value = {'success': True, 'politician_we_vote_id_list': ['wv01pol1', 'wv01pol2']}
+            first_set = retrieve_politician_we_vote_ids_for_polling_location('wv01ploc1', [4184])
+            second_set = retrieve_politician_we_vote_ids_for_polling_location('wv01ploc2', [4184])
+            self.assertEqual(first_set, frozenset(['wv01pol1', 'wv01pol2']))
+            # Map points with the same ballot share one set
+            self.assertIs(first_set, second_set)
+            retrieve_politician_we_vote_ids_for_polling_location('wv01ploc1', [4184])
+            self.assertEqual(mock_retrieve.call_count, 2)
+
+            mock_version.return_value = 2
+            retrieve_politician_we_vote_ids_for_polling_location('wv01ploc1', [4184])
+            self.assertEqual(mock_retrieve.call_count, 3)
+
+
+class ElectionSnapshotTestCase(SimpleTestCase):
+    def setUp(self):
+        clear_election_snapshot()
+
+    def tearDown(self):
+        clear_election_snapshot()
+
+    def test_candidates_for_office_are_indexed(self):
+        election_snapshot = ElectionSnapshot(google_civic_election_id_list=['4184'])
+        contest_office = ContestOfficeSnapshot(1, 'wv01off1', 'Federal', '4184', 'U.S. Senate', 'CA')
+        contest_office.candidate_we_vote_id_list = ('wv01cand2', 'wv01cand1')
+        election_snapshot.contest_office_by_id[1] = contest_office
+        election_snapshot.contest_office_by_we_vote_id['wv01off1'] = contest_office
+        for candidate_id in (1, 2):
+            candidate = CandidateSnapshot(CandidateCampaign(
+                id=candidate_id, we_vote_id='wv01cand' + str(candidate_id), candidate_name='Candidate ' +
+                str(candidate_id), google_civic_election_id='4184', twitter_followers_count=candidate_id))
+            election_snapshot.candidate_by_id[candidate.id] = candidate
+            election_snapshot.candidate_by_we_vote_id[candidate.we_vote_id] = candidate
+
+        self.assertTrue(election_snapshot.includes_election(4184))
+        self.assertFalse(election_snapshot.includes_election(4185))
+        self.assertEqual(election_snapshot.contest_office(contest_office_id='1').office_name, 'U.S. Senate')
+        self.assertEqual(election_snapshot.candidate(candidate_we_vote_id='WV01CAND1').display_candidate_name(),
+                         'Candidate 1')
+        candidate_list = election_snapshot.candidate_list_for_office('wv01off1')
+        self.assertEqual([candidate.we_vote_id for candidate in candidate_list], ['wv01cand2', 'wv01cand1'])
+        self.assertEqual(election_snapshot.candidate_list_for_office('wv01off1')[0].ballot_item_dict['id'], 2)
+        self.assertIsNone(election_snapshot.candidate_list_for_office('wv01off2'))
+
+    def test_snapshot_rebuilt_in_the_background_when_version_changes(self):
+        with mock.patch('ballot.election_snapshot.ElectionManager') as mock_election_manager, \
+                mock.patch('ballot.election_snapshot.fetch_election_snapshot_version_dict') as mock_version_dict, \
+                mock.patch('ballot.election_snapshot.ElectionSnapshot.load') as mock_load, \
+                mock.patch('ballot.election_snapshot.election_snapshot_rebuild_task') as mock_rebuild_task, \
+                mock.patch('ballot.election_snapshot.ELECTION_SNAPSHOT_VERSION_CHECK_SECONDS', 0):
+            mock_election_manager().retrieve_upcoming_google_civic_election_id_list.return_value = {
+                'upcoming_google_civic_election_id_list': [4184, 4185]}
+            mock_version_dict.return_value = {4184: 1, 4185: 1}
+            # Nothing is loaded on the request path
+            self.assertFalse(fetch_election_snapshot().includes_election(4184))
+            self.assertEqual(mock_rebuild_task.run_soon.call_count, 1)
+            self.assertEqual(mock_load.call_count, 0)
+
+            rebuild_election_snapshot()
+            first_snapshot = fetch_election_snapshot()
+            self.assertTrue(first_snapshot.includes_election(4184))
+            self.assertIs(fetch_election_snapshot(), first_snapshot)
+            self.assertEqual(mock_load.call_count, 1)
+            self.assertEqual(mock_rebuild_task.run_soon.call_count, 1)
+
+            # Until the rebuild is done, only the election that changed is left to the database
+            mock_version_dict.return_value = {4184: 2, 4185: 1}
+            stale_snapshot = fetch_election_snapshot()
+            self.assertFalse(stale_snapshot.includes_election(4184))
+            self.assertTrue(stale_snapshot.includes_election(4185))
+            self.assertEqual(mock_rebuild_task.run_soon.call_count, 2)
+            self.assertIs(fetch_election_snapshot(), stale_snapshot)
+            self.assertEqual(mock_rebuild_task.run_soon.call_count, 2)
+
+            rebuild_election_snapshot()
+            self.assertTrue(fetch_election_snapshot().includes_election(4184))
+            self.assertEqual(mock_load.call_count, 2)
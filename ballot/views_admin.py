@@ -21,8 +21,9 @@ from geopy.geocoders import get_geocoder_for_service
 import json
 from measure.models import ContestMeasure, ContestMeasureManager
 from office.models import ContestOffice, ContestOfficeManager
+from polling_location.geocoding import GEOCODING_JOB_KIND_BALLOT_RETURNED, geocoding_job_progress_text, \
+    run_geocoding_jobs_soon, start_geocoding_job
 from polling_location.models import PollingLocation, PollingLocationManager
-import time
 from voter.models import voter_has_authority
 import wevote_functions.admin
 from wevote_functions.functions import convert_to_int, positive_value_exists
@@ -890,106 +891,43 @@ def update_ballot_returned_with_latitude_and_longitude_view(request):
     google_civic_election_id = request.GET.get('google_civic_election_id', 0)
     state_code = request.GET.get('state_code', "")
 
-    latitude_and_longitude_updated_count = 0
-    latitude_and_longitude_not_updated_count = 0
-    errors_status = ""
-    polling_location_updated_count = 0
-    polling_location_not_updated_count = 0
-
-    ballot_returned_manager = BallotReturnedManager()
-    polling_location_manager = PollingLocationManager()
     if positive_value_exists(ballot_returned_id):
         # Find existing ballot_returned
-        if positive_value_exists(ballot_returned_id):
-            try:
-                ballot_returned_query = BallotReturned.objects.filter(id=ballot_returned_id)
-                if len(ballot_returned_query):
-                    ballot_returned = ballot_returned_query[0]
-                    ballot_returned_results = \
-                        ballot_returned_manager.populate_latitude_and_longitude_for_ballot_returned(ballot_returned)
-                    if ballot_returned_results['success']:
-                        latitude_and_longitude_updated_count += 1
-                    else:
-                        latitude_and_longitude_not_updated_count += 1
-                        errors_status += ballot_returned_results['status']
-
-            except Exception as e:
-                pass
+        latitude_and_longitude_updated_count = 0
+        latitude_and_longitude_not_updated_count = 0
+        errors_status = ""
+        ballot_returned_manager = BallotReturnedManager()
+        try:
+            ballot_returned_query = BallotReturned.objects.filter(id=ballot_returned_id)
+            if len(ballot_returned_query):
+                ballot_returned = ballot_returned_query[0]
+                ballot_returned_results = \
+                    ballot_returned_manager.populate_latitude_and_longitude_for_ballot_returned(ballot_returned)
+                if ballot_returned_results['success']:
+                    latitude_and_longitude_updated_count += 1
+                else:
+                    latitude_and_longitude_not_updated_count += 1
+                    errors_status += ballot_returned_results['status']
+
+        except Exception as e:
+            pass
+
+        errors_status = errors_status[:155]  # We cut off the string so we don't overwhelm the message system
+        status_print_list = "BallotReturned entries updated with lat/long info: " + \
+                            str(latitude_and_longitude_updated_count) + "<br />" + \
+                            "not updated: " + str(latitude_and_longitude_not_updated_count) + \
+                            ", errors: " + errors_status + "<br />"
+        messages.add_message(request, messages.INFO, status_print_list)
     else:
-        # Gather the list of ballot_returned entries that need to be updated
-        ballot_returned_query = BallotReturned.objects.order_by('id')
-        ballot_returned_query = ballot_returned_query.filter(Q(latitude=None) | Q(latitude=0))
-        # Don't retrieve entries for voters
-        ballot_returned_query = ballot_returned_query.exclude(Q(polling_location_we_vote_id=None) |
-                                                              Q(polling_location_we_vote_id=""))
-        if positive_value_exists(google_civic_election_id):
-            ballot_returned_query = ballot_returned_query.filter(google_civic_election_id=google_civic_election_id)
-        if positive_value_exists(state_code):
-            ballot_returned_query = ballot_returned_query.filter(normalized_state__iexact=state_code)
-        # Limit to 200 because that is all that seems to store anyways with each call
-        ballot_returned_query = ballot_returned_query[:100]
-
-        rate_limit_count = 0
-        for ballot_returned in ballot_returned_query:
-            rate_limit_count += 1
-            ballot_returned_results = ballot_returned_manager.populate_latitude_and_longitude_for_ballot_returned(
-                 ballot_returned)
-            if ballot_returned_results['success']:
-                # Keep track of the number we have processed since last break, since we can only request 10 per second
-                latitude_and_longitude_updated_count += 1
-            else:
-                latitude_and_longitude_not_updated_count += 1
-                errors_status += ballot_returned_results['status']
-
-            if rate_limit_count >= 10:
-                time.sleep(1)
-                # After pause, reset the limit count
-                rate_limit_count = 0
-
-            if ballot_returned_results['geocoder_quota_exceeded']:
-                break
-
-        # Write the lat/long data that we have back to the map point table
-        ballot_returned_query = BallotReturned.objects.order_by('id')
-        ballot_returned_query = ballot_returned_query.exclude(Q(latitude=None) | Q(latitude=0))  # Exclude empty entries
-        ballot_returned_query = ballot_returned_query.exclude(Q(polling_location_we_vote_id=None) |
-                                                              Q(polling_location_we_vote_id=""))
-        if positive_value_exists(google_civic_election_id):
-            ballot_returned_query = ballot_returned_query.filter(google_civic_election_id=google_civic_election_id)
-        if positive_value_exists(state_code):
-            ballot_returned_query = ballot_returned_query.filter(normalized_state__iexact=state_code)
-        for ballot_returned in ballot_returned_query:
-            if positive_value_exists(ballot_returned.polling_location_we_vote_id) \
-                    and ballot_returned.latitude \
-                    and ballot_returned.longitude:
-                results = polling_location_manager.retrieve_polling_location_by_id(
-                    0, ballot_returned.polling_location_we_vote_id)
-                if results['polling_location_found']:
-                    polling_location = results['polling_location']
-                    if not polling_location.latitude or \
-                            not polling_location.longitude:
-                        try:
-                            polling_location.latitude = ballot_returned.latitude
-                            polling_location.longitude = ballot_returned.longitude
-                            polling_location.save()
-                            polling_location_updated_count += 1
-                        except Exception as e:
-                            polling_location_not_updated_count += 1
-
-    status_print_list = ""
-    errors_status = errors_status[:155]  # We cut off the string so we don't overwhelm the message system
-
-    status_print_list += "BallotReturned entries updated with lat/long info: " + \
-                         str(latitude_and_longitude_updated_count) + "<br />" + \
-                         "not updated: " + str(latitude_and_longitude_not_updated_count) + \
-                         ", errors: " + errors_status + "<br />"
-    if positive_value_exists(polling_location_updated_count) \
-            or positive_value_exists(polling_location_not_updated_count):
-        status_print_list += "polling_location_updated_count: " + str(polling_location_updated_count) + ", "
-        status_print_list += "polling_location_not_updated_count: " + str(polling_location_not_updated_count) + " "
-        status_print_list += "<br />"
-
-    messages.add_message(request, messages.INFO, status_print_list)
+        # Geocode the entries missing lat/long in the background (and copy it to their map points), picking up
+        # where the last run for this election and state stopped
+        job_results = start_geocoding_job(GEOCODING_JOB_KIND_BALLOT_RETURNED, state_code=state_code,
+                                          google_civic_election_id=google_civic_election_id)
+        if job_results['success']:
+            run_geocoding_jobs_soon()
+            messages.add_message(request, messages.INFO, geocoding_job_progress_text(job_results['geocoding_job']))
+        else:
+            messages.add_message(request, messages.ERROR, job_results['status'])
 
     if positive_value_exists(google_civic_election_id):
         election_manager = ElectionManager()
@@ -82,13 +82,14 @@ def campaignx_list_retrieve_for_api(  # campaignListRetrieve
     site_owner_organization_we_vote_id = results['organization_we_vote_id']
 
     voter_can_vote_for_politician_we_vote_ids = []
-    # TODO: Creates excessive slow-down. We need a more optimized solution.
-    # if voter_can_vote_for_politicians_list_returned:
-    #     # We need to know all the politicians this voter can vote for so we can figure out
-    #     #  if the voter can vote for any politicians in the election
-    #     from ballot.controllers import what_voter_can_vote_for
-    #     results = what_voter_can_vote_for(request=request, voter_device_id=voter_device_id)
-    #     voter_can_vote_for_politician_we_vote_ids = results['voter_can_vote_for_politician_we_vote_ids']
+    if voter_can_vote_for_politicians_list_returned:
+        # We need to know all the politicians this voter can vote for so we can figure out
+        #  if the voter can vote for any politicians in the election.
+        # what_voter_can_vote_for rebuilt the voter's ballot on every call, which was too slow for this list, so we
+        #  use the ballot already saved for the voter and the per-map-point politician cache.
+        from ballot.controllers import retrieve_upcoming_politician_we_vote_ids_for_voter
+        results = retrieve_upcoming_politician_we_vote_ids_for_voter(voter_id=voter.id)
+        voter_can_vote_for_politician_we_vote_ids = results['voter_can_vote_for_politician_we_vote_ids']
 
     visible_on_this_site_campaignx_we_vote_id_list = []
     campaignx_manager = CampaignXManager()
@@ -96,6 +97,7 @@ def campaignx_list_retrieve_for_api(  # campaignListRetrieve
         results = retrieve_recommended_campaignx_list_for_campaignx_we_vote_id(
             request=request,
             voter_device_id=voter_device_id,
+            voter_id=voter.id,
             voter_we_vote_id=voter_we_vote_id,
             campaignx_we_vote_id=recommended_campaigns_for_campaignx_we_vote_id,
             site_owner_organization_we_vote_id=site_owner_organization_we_vote_id)
@@ -1627,10 +1629,7 @@ def campaignx_supporter_save_for_api(  # campaignSupporterSave
 
     status += create_results['status']
     if create_results['campaignx_supporter_found']:
-        count_results = campaignx_manager.update_campaignx_supporters_count(campaignx_we_vote_id)
-        if not count_results['success']:
-            status += count_results['status']
-
+        # supporters_count was already changed by update_or_create_campaignx_supporter
         campaignx_supporter = create_results['campaignx_supporter']
         date_last_changed_string = ''
         date_supported_string = ''
@@ -1982,6 +1981,7 @@ def retrieve_recommended_campaignx_list_for_campaignx_we_vote_id(
         request=None,
         voter_device_id='',
         campaignx_we_vote_id='',
+        voter_id=0,
         voter_we_vote_id='',
         site_owner_organization_we_vote_id='',
         minimum_number_of_campaignx_options=15,
@@ -1995,6 +1995,7 @@ def retrieve_recommended_campaignx_list_for_campaignx_we_vote_id(
     :param request:
     :param voter_device_id:
     :param campaignx_we_vote_id:
+    :param voter_id: If passed in, we use the voter's saved ballot instead of what_voter_can_vote_for
     :param voter_we_vote_id:
     :param site_owner_organization_we_vote_id:
     :param minimum_number_of_campaignx_options:
@@ -2016,15 +2017,19 @@ def retrieve_recommended_campaignx_list_for_campaignx_we_vote_id(
             supported_by_voter_campaignx_we_vote_id_list = results['campaignx_we_vote_id_list']
 
     campaignx_we_vote_id_list_voter_can_vote_for = []
-    if positive_value_exists(voter_device_id):
+    results = {'voter_can_vote_for_politician_we_vote_ids': []}
+    if positive_value_exists(voter_id):
+        from ballot.controllers import retrieve_upcoming_politician_we_vote_ids_for_voter
+        results = retrieve_upcoming_politician_we_vote_ids_for_voter(voter_id=voter_id)
+    elif positive_value_exists(voter_device_id):
         from ballot.controllers import what_voter_can_vote_for
         results = what_voter_can_vote_for(request=request, voter_device_id=voter_device_id)
-        if len(results['voter_can_vote_for_politician_we_vote_ids']) > 0:
-            voter_can_vote_for_politician_we_vote_ids = results['voter_can_vote_for_politician_we_vote_ids']
-            politician_results = campaignx_manager.retrieve_campaignx_we_vote_id_list_by_politician_we_vote_id(
-                politician_we_vote_id_list=voter_can_vote_for_politician_we_vote_ids)
-            if politician_results['campaignx_we_vote_id_list_found']:
-                campaignx_we_vote_id_list_voter_can_vote_for = politician_results['campaignx_we_vote_id_list']
+    if len(results['voter_can_vote_for_politician_we_vote_ids']) > 0:
+        voter_can_vote_for_politician_we_vote_ids = results['voter_can_vote_for_politician_we_vote_ids']
+        politician_results = campaignx_manager.retrieve_campaignx_we_vote_id_list_by_politician_we_vote_id(
+            politician_we_vote_id_list=voter_can_vote_for_politician_we_vote_ids)
+        if politician_results['campaignx_we_vote_id_list_found']:
+            campaignx_we_vote_id_list_voter_can_vote_for = politician_results['campaignx_we_vote_id_list']
 
     # Create pool of options
     # recommended_campaignx_we_vote_id_list = ['wv02camp4']
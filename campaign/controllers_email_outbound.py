@@ -184,9 +184,36 @@ def campaignx_news_item_send(  # CAMPAIGNX_NEWS_ITEM_TEMPLATE
         statement_subject='',
         statement_text_preview='',
         we_vote_hosted_campaign_photo_large_url=''):
+    results = campaignx_news_item_send_to_recipient_list(
+        campaignx_news_item_we_vote_id=campaignx_news_item_we_vote_id,
+        campaigns_root_url_verified=campaigns_root_url_verified,
+        campaignx_title=campaignx_title,
+        campaignx_url=campaignx_url,
+        campaignx_we_vote_id=campaignx_we_vote_id,
+        politician_count=politician_count,
+        politician_full_sentence_string=politician_full_sentence_string,
+        recipient_voter_we_vote_id_list=[recipient_voter_we_vote_id],
+        speaker_voter_name=speaker_voter_name,
+        speaker_voter_we_vote_id=speaker_voter_we_vote_id,
+        statement_subject=statement_subject,
+        statement_text_preview=statement_text_preview,
+        we_vote_hosted_campaign_photo_large_url=we_vote_hosted_campaign_photo_large_url)
+    return results['send_results_dict'][recipient_voter_we_vote_id]
+
+
+def campaignx_news_item_recipient_template_variables(
+        campaigns_root_url_verified='',
+        campaignx_we_vote_id='',
+        recipient_voter_we_vote_id=''):
+    """
+    The template variables that are different for each recipient of a campaign news item
+    :param campaigns_root_url_verified:
+    :param campaignx_we_vote_id:
+    :param recipient_voter_we_vote_id:
+    :return:
+    """
     from campaign.models import CampaignXManager
-    from email_outbound.controllers import schedule_email_with_email_outbound_description
-    from email_outbound.models import EmailManager, CAMPAIGNX_NEWS_ITEM_TEMPLATE, CAMPAIGNX_SUPER_SHARE_ITEM_TEMPLATE
+    from email_outbound.models import EmailManager
     status = ""
 
     campaignx_manager = CampaignXManager()
@@ -198,6 +225,7 @@ def campaignx_news_item_send(  # CAMPAIGNX_NEWS_ITEM_TEMPLATE
         error_results = {
             'status':                               "RECIPIENT_VOTER_NOT_FOUND ",
             'success':                              False,
+            'recipient_found':                      False,
         }
         return error_results
 
@@ -209,7 +237,6 @@ def campaignx_news_item_send(  # CAMPAIGNX_NEWS_ITEM_TEMPLATE
     recipient_email_subscription_secret_key = ""
     if recipient_voter.has_email_with_verified_ownership():
         results = email_manager.retrieve_primary_email_with_ownership_verified(recipient_voter_we_vote_id)
-        success = results['success']
         if results['email_address_object_found']:
             recipient_email_object = results['email_address_object']
             recipient_email_we_vote_id = recipient_email_object.we_vote_id
@@ -223,10 +250,10 @@ def campaignx_news_item_send(  # CAMPAIGNX_NEWS_ITEM_TEMPLATE
     else:
         # The recipient must have a valid email
         status += "RECIPIENT_VOTER_DOES_NOT_HAVE_VALID_EMAIL "
-        success = True
         results = {
-            'success': success,
-            'status': status,
+            'success':          True,
+            'status':           status,
+            'recipient_found':  False,
         }
         return results
 
@@ -236,10 +263,10 @@ def campaignx_news_item_send(  # CAMPAIGNX_NEWS_ITEM_TEMPLATE
     if not positive_value_exists(recipient_voter_we_vote_id):
         # The recipient must have a valid voter_we_vote_id
         status += "RECIPIENT_VOTER_DOES_NOT_HAVE_VOTER_WE_VOTE_ID "
-        success = True
         results = {
-            'success': success,
-            'status': status,
+            'success':          True,
+            'status':           status,
+            'recipient_found':  False,
         }
         return results
 
@@ -260,59 +287,130 @@ def campaignx_news_item_send(  # CAMPAIGNX_NEWS_ITEM_TEMPLATE
             except Exception as e:
                 status += "DATE_CONVERSION_ERROR: " + str(e) + " "
 
-    campaignx_news_item_url = campaignx_url + '/u/' + campaignx_news_item_we_vote_id
+    results = {
+        'success':                      True,
+        'status':                       status,
+        'recipient_found':              True,
+        'recipient_email':              recipient_email,
+        'recipient_email_we_vote_id':   recipient_email_we_vote_id,
+        'recipient_voter_we_vote_id':   recipient_voter_we_vote_id,
+        'recipient_template_variables_dict': {
+            "date_supported":               date_supported,
+            "recipient_name":               recipient_name,
+            "recipient_voter_email":        recipient_email,
+            "recipient_unsubscribe_url":    campaigns_root_url_verified + "/settings/notifications/esk/" +
+            recipient_email_subscription_secret_key,
+        },
+    }
+    return results
 
-    template_variables_for_json = {
+
+def campaignx_news_item_send_to_recipient_list(  # CAMPAIGNX_NEWS_ITEM_TEMPLATE
+        campaignx_news_item_we_vote_id='',
+        campaigns_root_url_verified='',
+        campaignx_title='',
+        campaignx_url='',
+        campaignx_we_vote_id='',
+        politician_count=0,
+        politician_full_sentence_string='',
+        recipient_voter_we_vote_id_list=None,
+        speaker_voter_name='',
+        speaker_voter_we_vote_id='',
+        statement_subject='',
+        statement_text_preview='',
+        we_vote_hosted_campaign_photo_large_url=''):
+    """
+    Send one campaign news item to many supporters. The emails are rendered together with
+    render_email_for_recipient_list, so the campaign's variables are only set up once.
+    :return: send_results_dict has the success and status for each recipient_voter_we_vote_id
+    """
+    from email_outbound.controllers import schedule_email_with_email_outbound_description
+    from email_outbound.functions import render_email_for_recipient_list
+    from email_outbound.models import EmailManager, CAMPAIGNX_NEWS_ITEM_TEMPLATE
+    status = ""
+    email_manager = EmailManager()
+    if recipient_voter_we_vote_id_list is None:
+        recipient_voter_we_vote_id_list = []
+
+    campaignx_news_item_url = campaignx_url + '/u/' + campaignx_news_item_we_vote_id
+    shared_template_variables_dict = {
         "subject":                          statement_subject,
         "campaignx_title":                  campaignx_title,
         "campaignx_news_item_url":          campaignx_news_item_url,
         "campaignx_news_text":              statement_text_preview,
         "campaignx_url":                    campaignx_url,
-        "date_supported":                   date_supported,
         "politician_count":                 politician_count,
         "politician_full_sentence_string":  politician_full_sentence_string,
-        "recipient_name":                   recipient_name,
-        "recipient_voter_email":            recipient_email,
-        "recipient_unsubscribe_url":        campaigns_root_url_verified + "/settings/notifications/esk/" +
-        recipient_email_subscription_secret_key,
         "speaker_voter_name":               speaker_voter_name,
         "email_open_url":                   WE_VOTE_SERVER_ROOT_URL + "/apis/v1/emailOpen?email_key=1234",
         "view_main_discussion_page_url":    campaigns_root_url_verified + "/news",
         "view_your_ballot_url":             campaigns_root_url_verified + "/ballot",
         "we_vote_hosted_campaign_photo_large_url":  we_vote_hosted_campaign_photo_large_url,
     }
-    template_variables_in_json = json.dumps(template_variables_for_json, ensure_ascii=True)
+
+    send_results_dict = {}
+    recipient_results_list = []
+    for recipient_voter_we_vote_id in recipient_voter_we_vote_id_list:
+        recipient_results = campaignx_news_item_recipient_template_variables(
+            campaigns_root_url_verified=campaigns_root_url_verified,
+            campaignx_we_vote_id=campaignx_we_vote_id,
+            recipient_voter_we_vote_id=recipient_voter_we_vote_id)
+        if recipient_results['recipient_found']:
+            recipient_results_list.append((recipient_voter_we_vote_id, recipient_results))
+        else:
+            send_results_dict[recipient_voter_we_vote_id] = {
+                'success':  recipient_results['success'],
+                'status':   recipient_results['status'],
+            }
+
+    render_results = render_email_for_recipient_list(
+        kind_of_email_template=CAMPAIGNX_NEWS_ITEM_TEMPLATE,
+        shared_template_variables_dict=shared_template_variables_dict,
+        recipient_template_variables_list=[recipient_results['recipient_template_variables_dict']
+                                           for recipient_voter_we_vote_id, recipient_results
+                                           in recipient_results_list])
+    status += render_results['status']
     from_email_for_campaignx_news_item = "We Vote <info@WeVote.US>"  # TODO DALE Make system variable
 
-    # Create the outbound email description, then schedule it
-    kind_of_email_template = CAMPAIGNX_NEWS_ITEM_TEMPLATE
-    outbound_results = email_manager.create_email_outbound_description(
-        sender_voter_we_vote_id=speaker_voter_we_vote_id,
-        sender_voter_email=from_email_for_campaignx_news_item,
-        sender_voter_name=speaker_voter_name,
-        recipient_voter_we_vote_id=recipient_voter_we_vote_id,
-        recipient_email_we_vote_id=recipient_email_we_vote_id,
-        recipient_voter_email=recipient_email,
-        template_variables_in_json=template_variables_in_json,
-        kind_of_email_template=kind_of_email_template)
-    status += outbound_results['status'] + " "
-    success = outbound_results['success']
-    if outbound_results['email_outbound_description_saved']:
-        email_outbound_description = outbound_results['email_outbound_description']
-        schedule_results = schedule_email_with_email_outbound_description(email_outbound_description)
-        status += schedule_results['status'] + " "
-        success = schedule_results['success']
-        if schedule_results['email_scheduled_saved']:
-            # messages_to_send.append(schedule_results['email_scheduled_id'])
-            email_scheduled = schedule_results['email_scheduled']
-            send_results = email_manager.send_scheduled_email(email_scheduled)
-            email_scheduled_sent = send_results['email_scheduled_sent']
-            status += send_results['status']
-            success = send_results['success']
+    for (recipient_voter_we_vote_id, recipient_results), email_template_results in \
+            zip(recipient_results_list, render_results['rendered_list']):
+        recipient_status = recipient_results['status']
+        template_variables_for_json = dict(shared_template_variables_dict)
+        template_variables_for_json.update(recipient_results['recipient_template_variables_dict'])
+        template_variables_in_json = json.dumps(template_variables_for_json, ensure_ascii=True)
+
+        # Create the outbound email description, then schedule it
+        outbound_results = email_manager.create_email_outbound_description(
+            sender_voter_we_vote_id=speaker_voter_we_vote_id,
+            sender_voter_email=from_email_for_campaignx_news_item,
+            sender_voter_name=speaker_voter_name,
+            recipient_voter_we_vote_id=recipient_results['recipient_voter_we_vote_id'],
+            recipient_email_we_vote_id=recipient_results['recipient_email_we_vote_id'],
+            recipient_voter_email=recipient_results['recipient_email'],
+            template_variables_in_json=template_variables_in_json,
+            kind_of_email_template=CAMPAIGNX_NEWS_ITEM_TEMPLATE)
+        recipient_status += outbound_results['status'] + " "
+        success = outbound_results['success']
+        if outbound_results['email_outbound_description_saved']:
+            email_outbound_description = outbound_results['email_outbound_description']
+            schedule_results = schedule_email_with_email_outbound_description(
+                email_outbound_description, email_template_results=email_template_results)
+            recipient_status += schedule_results['status'] + " "
+            success = schedule_results['success']
+            if schedule_results['email_scheduled_saved']:
+                email_scheduled = schedule_results['email_scheduled']
+                send_results = email_manager.send_scheduled_email(email_scheduled)
+                recipient_status += send_results['status']
+                success = send_results['success']
+        send_results_dict[recipient_voter_we_vote_id] = {
+            'success':  success,
+            'status':   recipient_status,
+        }
 
     results = {
-        'success':                              success,
-        'status':                               status,
+        'success':              all(send_results['success'] for send_results in send_results_dict.values()),
+        'status':               status,
+        'send_results_dict':    send_results_dict,
     }
     return results
 
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from campaign.models import CampaignXManager
+
+
+class Command(BaseCommand):
+    help = 'Recounts supporters and news items for every CampaignX, and fixes counts that have drifted'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--campaignx_we_vote_id', action='append', default=None)
+        parser.add_argument('--batch_size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        campaignx_manager = CampaignXManager()
+        results = campaignx_manager.reconcile_campaignx_counts(
+            campaignx_we_vote_id_list=options['campaignx_we_vote_id'],
+            batch_size=options['batch_size'])
+        self.stdout.write('Campaigns checked: {}, counts fixed: {}, success: {}'.format(
+            results['campaignx_checked_count'], results['campaignx_updated_count'], results['success']))
+        if not results['success']:
+            self.stderr.write(results['status'])
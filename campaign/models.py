@@ -6,10 +6,12 @@ import json
 import string
 
 from django.db import models
-from django.db.models import Q
+from django.db.models import F, Q
+from django.db.models.functions import Greatest
 from django.utils.text import slugify
 
 import wevote_functions.admin
+from wevote_functions.denormalized_counts import DenormalizedCount, refresh_denormalized_counts
 from exception.models import handle_record_found_more_than_one_exception, \
     handle_record_not_found_exception
 from organization.models import OrganizationManager, OrganizationTeamMember
@@ -57,6 +59,9 @@ class CampaignX(models.Model):
     is_not_promoted_by_we_vote_reason = models.TextField(null=True, blank=True)
     is_still_active = models.BooleanField(default=True, db_index=True)
     is_victorious = models.BooleanField(default=False, db_index=True)
+    # Kept current with CampaignXManager.increment_campaignx_count, and checked by reconcile_campaignx_counts.
+    #  None until reconcile_campaignx_counts has counted this campaign's news items for the first time.
+    news_items_count = models.PositiveIntegerField(default=None, null=True)
     politician_starter_list_serialized = models.TextField(null=True, blank=True)
     seo_friendly_path = models.CharField(max_length=255, null=True, unique=True, db_index=True)
     started_by_voter_we_vote_id = models.CharField(max_length=255, null=True, blank=True, unique=False, db_index=True)
@@ -140,14 +145,90 @@ class CampaignXManager(models.Manager):
         status = ""
 
         try:
-            campaignx_queryset = CampaignXNewsItem.objects.using('readonly').all()
-            campaignx_queryset = campaignx_queryset.filter(campaignx_we_vote_id=campaignx_we_vote_id)
-            return campaignx_queryset.count()
+            campaignx_queryset = CampaignX.objects.using('readonly').filter(we_vote_id=campaignx_we_vote_id)
+            news_items_count = campaignx_queryset.values_list('news_items_count', flat=True).first()
+            if news_items_count is not None:
+                return convert_to_int(news_items_count)
+            # Not counted by reconcile_campaignx_counts yet
+            news_item_queryset = CampaignXNewsItem.objects.using('readonly').all()
+            news_item_queryset = news_item_queryset.filter(campaignx_we_vote_id=campaignx_we_vote_id)
+            return news_item_queryset.count()
         except Exception as e:
             status += "RETRIEVE_CAMPAIGNX_NEWS_UPDATE_COUNT_FAILED: " + str(e) + " "
 
         return 0
 
+    def increment_campaignx_count(self, campaignx_we_vote_id, count_field_name='supporters_count', count_change=1):
+        """
+        Add to (or subtract from) one of the counts we keep on CampaignX, in the database, so two people signing at
+        the same moment both get counted without reading the count first
+        :param campaignx_we_vote_id:
+        :param count_field_name: 'supporters_count' or 'news_items_count'
+        :param count_change: ex/ 1 or -1
+        :return:
+        """
+        # A count that is still None hasn't been counted yet, and is left for reconcile_campaignx_counts
+        status = ""
+        success = True
+        if not positive_value_exists(campaignx_we_vote_id) or not count_change:
+            results = {
+                'success':  success,
+                'status':   status,
+            }
+            return results
+
+        try:
+            CampaignX.objects.filter(we_vote_id=campaignx_we_vote_id, **{count_field_name + '__isnull': False}) \
+                .update(**{count_field_name: Greatest(F(count_field_name) + count_change, 0)})
+        except Exception as e:
+            status += "FAILED_INCREMENTING_CAMPAIGNX_COUNT: " + str(e) + " "
+            success = False
+
+        results = {
+            'success':  success,
+            'status':   status,
+        }
+        return results
+
+    def reconcile_campaignx_counts(self, campaignx_we_vote_id_list=None, batch_size=1000):
+        """
+        Recount supporters and news items, and fix the counts stored on CampaignX that have drifted (ex/ after a
+        merge, or a supporter deleted directly). Runs over all campaigns, batch_size campaigns at a time, with one
+        grouped count query per table per batch.
+        :param campaignx_we_vote_id_list: Only reconcile these campaigns
+        :param batch_size:
+        :return:
+        """
+        campaignx_queryset = CampaignX.objects.all()
+        if campaignx_we_vote_id_list is not None:
+            campaignx_queryset = campaignx_queryset.filter(we_vote_id__in=campaignx_we_vote_id_list)
+        denormalized_count_list = [
+            DenormalizedCount(
+                'supporters_count',
+                CampaignXSupporter.objects.using('readonly').filter(campaign_supported=True),
+                'campaignx_we_vote_id'),
+            DenormalizedCount(
+                'news_items_count',
+                CampaignXNewsItem.objects.using('readonly').all(),
+                'campaignx_we_vote_id'),
+        ]
+        refresh_results = refresh_denormalized_counts(
+            campaignx_queryset, 'we_vote_id', denormalized_count_list, batch_size=batch_size)
+        success = refresh_results['success']
+        campaignx_checked_count = refresh_results['checked_count']
+        campaignx_updated_count = refresh_results['updated_count']
+
+        status = refresh_results['status']
+        status += "CAMPAIGNX_COUNTS_CHECKED: " + str(campaignx_checked_count) + \
+                  " CAMPAIGNX_COUNTS_FIXED: " + str(campaignx_updated_count) + " "
+        results = {
+            'success':                  success,
+            'status':                   status,
+            'campaignx_checked_count':  campaignx_checked_count,
+            'campaignx_updated_count':  campaignx_updated_count,
+        }
+        return results
+
     def fetch_next_goal_level(
             self,
             supporters_count=1,
@@ -1495,11 +1576,20 @@ class CampaignXManager(models.Manager):
                     try:
                         first_campaignx_supporter.save()
                         # Delete all other CampaignXSupporters
+                        supporters_count_change = 0
                         array_index = 1
                         while array_index < number_of_campaignx_supporters_found and array_index < 25:
                             campaignx_supporter_temp = campaignx_supporter_list[array_index]
                             campaignx_supporter_temp.delete()
+                            if positive_value_exists(campaignx_supporter_temp.campaign_supported):
+                                supporters_count_change -= 1
                             array_index += 1
+                        count_results = self.increment_campaignx_count(
+                            campaignx_we_vote_id=campaignx_we_vote_id,
+                            count_field_name='supporters_count',
+                            count_change=supporters_count_change)
+                        status += count_results['status']
+                        campaignx_supporter_repaired = True
                     except Exception as e:
                         status += "CAMPAIGNX_COULD_NOT_SAVE_OR_DELETE: " + str(e) + " "
                 success = True
@@ -1907,36 +1997,18 @@ class CampaignXManager(models.Manager):
         return results
 
     def update_campaignx_supporters_count(self, campaignx_we_vote_id):
-        status = ''
-        supporters_count = 0
-        try:
-            count_query = CampaignXSupporter.objects.using('readonly').all()
-            count_query = count_query.filter(campaignx_we_vote_id__iexact=campaignx_we_vote_id)
-            count_query = count_query.filter(campaign_supported=True)
-            supporters_count = count_query.count()
-        except Exception as e:
-            status += "FAILED_RETRIEVING_SUPPORTER_COUNT: " + str(e) + ' '
-            results = {
-                'success': False,
-                'status': status,
-                'supporters_count': supporters_count,
-            }
-            return results
-
-        update_values = {
-            'supporters_count': supporters_count,
-        }
-        update_results = self.update_or_create_campaignx(
-            campaignx_we_vote_id=campaignx_we_vote_id,
-            update_values=update_values,
-        )
-        status = update_results['status']
-        success = update_results['success']
-
+        """
+        Recount the supporters of one campaign. Supporting and unsupporting change supporters_count directly
+        (see increment_campaignx_count), so this is only needed to repair a count.
+        :param campaignx_we_vote_id:
+        :return:
+        """
+        reconcile_results = self.reconcile_campaignx_counts(campaignx_we_vote_id_list=[campaignx_we_vote_id])
         results = {
-            'success':          success,
-            'status':           status,
-            'supporters_count': supporters_count,
+            'success':          reconcile_results['success'],
+            'status':           reconcile_results['status'],
+            'supporters_count': convert_to_int(CampaignX.objects.filter(we_vote_id=campaignx_we_vote_id)
+                                               .values_list('supporters_count', flat=True).first()),
         }
         return results
 
@@ -2273,6 +2345,11 @@ class CampaignXManager(models.Manager):
                 )
                 campaignx_news_item_found = True
                 status += "CAMPAIGNX_NEWS_ITEM_CREATED "
+                count_results = campaignx_manager.increment_campaignx_count(
+                    campaignx_we_vote_id=campaignx_we_vote_id,
+                    count_field_name='news_items_count',
+                    count_change=1)
+                status += count_results['status']
             except Exception as e:
                 status += "CAMPAIGNX_NEWS_ITEM_NOT_CREATED: " + str(e) + " "
                 success = False
@@ -2734,7 +2811,19 @@ class CampaignXManager(models.Manager):
 
                 if 'campaign_supported_changed' in update_values \
                         and positive_value_exists(update_values['campaign_supported_changed']):
-                    campaignx_supporter.campaign_supported = update_values['campaign_supported']
+                    campaign_supported = positive_value_exists(update_values['campaign_supported'])
+                    # Only the request that actually flips campaign_supported changes the count, even if the
+                    #  same voter clicks twice at once
+                    flipped_count = CampaignXSupporter.objects \
+                        .filter(id=campaignx_supporter.id, campaign_supported=not campaign_supported) \
+                        .update(campaign_supported=campaign_supported)
+                    if flipped_count:
+                        count_results = campaignx_manager.increment_campaignx_count(
+                            campaignx_we_vote_id=campaignx_we_vote_id,
+                            count_field_name='supporters_count',
+                            count_change=1 if campaign_supported else -1)
+                        status += count_results['status']
+                    campaignx_supporter.campaign_supported = campaign_supported
                     campaignx_supporter_changed = True
                 if 'supporter_endorsement_changed' in update_values \
                         and positive_value_exists(update_values['supporter_endorsement_changed']):
@@ -2765,6 +2854,11 @@ class CampaignXManager(models.Manager):
                     voter_we_vote_id=voter_we_vote_id,
                 )
                 status += "CAMPAIGNX_SUPPORTER_CREATED "
+                count_results = campaignx_manager.increment_campaignx_count(
+                    campaignx_we_vote_id=campaignx_we_vote_id,
+                    count_field_name='supporters_count',
+                    count_change=1)
+                status += count_results['status']
                 # Retrieve the supporter_name and we_vote_hosted_profile_image_url_tiny from the organization entry
                 organization_results = \
                     organization_manager.retrieve_organization_from_we_vote_id(organization_we_vote_id)
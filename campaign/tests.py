@@ -0,0 +1,44 @@
+# campaign/tests.py
+# Brought to you by We Vote. Be good.
+# -*- coding: UTF-8 -*-
+
+from django.test import TestCase
+
+from campaign.models import CampaignX, CampaignXManager, CampaignXNewsItem, CampaignXSupporter
+
+
+class CampaignXCountsTestCase(TestCase):
+    databases = ["default", "readonly"]
+
+    def setUp(self):
+        CampaignX.objects.create(we_vote_id='wv01camp1', supporters_count=3)
+        for number in range(2):
+            CampaignXNewsItem.objects.create(we_vote_id='wv01campnews' + str(number), campaignx_we_vote_id='wv01camp1',
+                                             voter_we_vote_id='wv01voter1')
+
+    def test_news_items_are_counted_until_the_campaign_is_reconciled(self):
+        campaignx_manager = CampaignXManager()
+        self.assertIsNone(CampaignX.objects.get().news_items_count)
+        self.assertEqual(campaignx_manager.fetch_campaignx_news_item_count('wv01camp1'), 2)
+
+        # An increment before the first count is left for reconcile_campaignx_counts
+        campaignx_manager.increment_campaignx_count('wv01camp1', count_field_name='news_items_count')
+        self.assertIsNone(CampaignX.objects.get().news_items_count)
+
+        campaignx_manager.reconcile_campaignx_counts()
+        self.assertEqual(CampaignX.objects.get().news_items_count, 2)
+        campaignx_manager.increment_campaignx_count('wv01camp1', count_field_name='news_items_count')
+        self.assertEqual(campaignx_manager.fetch_campaignx_news_item_count('wv01camp1'), 3)
+
+    def test_repair_subtracts_the_duplicate_supporters_it_deletes(self):
+        # A voter merge left the to_voter with three entries for the campaign, two of them supporting it
+        for campaign_supported in [True, True, False]:
+            CampaignXSupporter.objects.create(campaignx_we_vote_id='wv01camp1', voter_we_vote_id='wv01voter2',
+                                              campaign_supported=campaign_supported, supporter_endorsement='')
+
+        results = CampaignXManager().repair_campaignx_supporter(
+            campaignx_we_vote_id='wv01camp1', voter_we_vote_id='wv01voter2')
+
+        self.assertTrue(results['success'])
+        self.assertEqual(CampaignXSupporter.objects.count(), 1)
+        self.assertEqual(CampaignX.objects.get().supporters_count, 2)
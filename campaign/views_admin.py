@@ -1041,6 +1041,7 @@ def campaign_supporters_list_process_view(request):
     sorted_state_list = sorted(state_list.items())
 
     # Create new CampaignXSupporter
+    campaignx_supporters_count_change = 0
     if positive_value_exists(campaignx_supporter_organization_we_vote_id) or \
             positive_value_exists(campaignx_supporter_voter_we_vote_id):
         do_not_create = False
@@ -1090,6 +1091,7 @@ def campaign_supporters_list_process_view(request):
                     we_vote_hosted_profile_image_url_tiny=we_vote_hosted_profile_image_url_tiny,
                     visibility_blocked_by_we_vote=incoming_visibility_blocked_by_we_vote,
                     visible_to_public=incoming_campaignx_supporter_wants_visibility)
+                campaignx_supporters_count_change += 1
 
                 messages.add_message(request, messages.INFO, 'New CampaignXSupporter created.')
             except Exception as e:
@@ -1099,14 +1101,14 @@ def campaign_supporters_list_process_view(request):
 
     # ##################################
     # Deleting or editing a CampaignXSupporter
-    update_campaignx_supporter_count = False
     for campaignx_supporter in supporters_list:
         if positive_value_exists(campaignx_supporter.campaignx_we_vote_id):
             delete_variable_name = "delete_campaignx_supporter_" + str(campaignx_supporter.id)
             delete_campaignx_supporter = positive_value_exists(request.POST.get(delete_variable_name, False))
             if positive_value_exists(delete_campaignx_supporter):
+                if campaignx_supporter.campaign_supported:
+                    campaignx_supporters_count_change -= 1
                 campaignx_supporter.delete()
-                update_campaignx_supporter_count = True
                 messages.add_message(request, messages.INFO, 'Deleted CampaignXSupporter.')
             else:
                 supporter_changed = False
@@ -1163,15 +1165,12 @@ def campaign_supporters_list_process_view(request):
                 if supporter_changed:
                     campaignx_supporter.save()
 
-    if update_campaignx_supporter_count:
+    if campaignx_supporters_count_change:
         campaignx_manager = CampaignXManager()
-        supporter_count = campaignx_manager.fetch_campaignx_supporter_count(campaignx_we_vote_id)
-        if positive_value_exists(supporter_count):
-            results = campaignx_manager.retrieve_campaignx(campaignx_we_vote_id=campaignx_we_vote_id)
-            if results['campaignx_found']:
-                campaignx = results['campaignx']
-                campaignx.supporters_count = supporter_count
-                campaignx.save()
+        campaignx_manager.increment_campaignx_count(
+            campaignx_we_vote_id=campaignx_we_vote_id,
+            count_field_name='supporters_count',
+            count_change=campaignx_supporters_count_change)
 
     return HttpResponseRedirect(reverse('campaign:supporters_list', args=(campaignx_we_vote_id,)) +
                                 "?google_civic_election_id=" + str(google_civic_election_id) +
@@ -5,6 +5,7 @@ import datetime as the_other_datetime
 import json
 import urllib.request
 from socket import timeout
+from django.db.models import Q
 from django.http import HttpResponse
 from django.utils.timezone import now
 import wevote_functions.admin
@@ -28,8 +29,10 @@ from wevote_functions.functions import add_period_to_middle_name_initial, add_pe
     convert_to_political_party_constant, positive_value_exists, process_request_from_master, \
     extract_twitter_handle_from_text_string, extract_website_from_url, \
     remove_period_from_middle_name_initial, remove_period_from_name_prefix_and_suffix
-from .models import CandidateListManager, CandidateCampaign, CandidateManager, \
-    CANDIDATE_UNIQUE_IDENTIFIERS, PROFILE_IMAGE_TYPE_FACEBOOK, PROFILE_IMAGE_TYPE_UNKNOWN
+from wevote_functions.functions_duplicates import DuplicateFinder
+from wevote_settings.models import cache_version_increments_deferred
+from .models import CandidateListManager, CandidateCampaign, CandidateManager, CandidatesAreNotDuplicates, \
+    CandidateToOfficeLink, CANDIDATE_UNIQUE_IDENTIFIERS, PROFILE_IMAGE_TYPE_FACEBOOK, PROFILE_IMAGE_TYPE_UNKNOWN
 
 logger = wevote_functions.admin.get_logger(__name__)
 
@@ -160,13 +163,11 @@ def candidates_import_from_master_server(
     )
 
     if import_results['success']:
-        # results = filter_candidates_structured_json_for_local_duplicates(structured_json)
-        # filtered_structured_json = results['structured_json']
-        # duplicates_removed = results['duplicates_removed']
-        # import_results = candidates_import_from_structured_json(filtered_structured_json)
-        import_results = candidates_import_from_structured_json(structured_json)
-        # import_results['duplicates_removed'] = duplicates_removed
-        import_results['duplicates_removed'] = 0
+        results = filter_candidates_structured_json_for_local_duplicates(structured_json)
+        filtered_structured_json = results['structured_json']
+        duplicates_removed = results['duplicates_removed']
+        import_results = candidates_import_from_structured_json(filtered_structured_json)
+        import_results['duplicates_removed'] = duplicates_removed
 
     import2_results, structured_json = process_request_from_master(
         request, "Loading Candidate to Office Links from We Vote Master servers",
@@ -281,6 +282,90 @@ def find_duplicate_candidate(we_vote_candidate, ignore_candidate_id_list):
     return results
 
 
+def find_duplicate_candidates_in_elections(google_civic_election_id_list, candidate_list=None):
+    """
+    Rank every likely duplicate pair among the candidates in these elections in one pass, instead of searching the
+    database once per candidate like find_duplicate_candidate. Candidates are only compared with others in the same
+    state and election that share a last name, a Twitter handle, a Vote USA id, a Ballotpedia id or a politician.
+    :param google_civic_election_id_list:
+    :param candidate_list: Pass in if the caller already has the candidates
+    :return:
+    """
+    status = ""
+    duplicate_suggestion_list = []
+    google_civic_election_id_list = [convert_to_int(one_id) for one_id in google_civic_election_id_list]
+    if candidate_list is None:
+        candidate_list_manager = CandidateListManager()
+        results = candidate_list_manager.retrieve_candidates_for_specific_elections(
+            google_civic_election_id_list=google_civic_election_id_list,
+            return_list_of_objects=True)
+        candidate_list = results['candidate_list_objects']
+    candidate_dict = {candidate.we_vote_id: candidate for candidate in candidate_list}
+    if len(candidate_dict) < 2:
+        results = {
+            'success':                      True,
+            'status':                       "FIND_DUPLICATE_CANDIDATES_NOT_ENOUGH_CANDIDATES ",
+            'candidate_dict':               candidate_dict,
+            'duplicate_suggestion_list':    duplicate_suggestion_list,
+        }
+        return results
+
+    try:
+        election_id_list_by_candidate = {}
+        link_query = CandidateToOfficeLink.objects.using('readonly') \
+            .filter(candidate_we_vote_id__in=list(candidate_dict.keys()),
+                    google_civic_election_id__in=google_civic_election_id_list) \
+            .values_list('candidate_we_vote_id', 'google_civic_election_id')
+        for candidate_we_vote_id, google_civic_election_id in link_query:
+            election_id_list_by_candidate.setdefault(candidate_we_vote_id, []).append(google_civic_election_id)
+
+        not_duplicate_query = CandidatesAreNotDuplicates.objects.using('readonly') \
+            .filter(Q(candidate1_we_vote_id__in=list(candidate_dict.keys())) |
+                    Q(candidate2_we_vote_id__in=list(candidate_dict.keys()))) \
+            .values_list('candidate1_we_vote_id', 'candidate2_we_vote_id')
+        ignore_pair_set = set(frozenset(pair) for pair in not_duplicate_query)
+    except Exception as e:
+        status += "FIND_DUPLICATE_CANDIDATES_QUERY_FAILED: " + str(e) + " "
+        results = {
+            'success':                      False,
+            'status':                       status,
+            'candidate_dict':               candidate_dict,
+            'duplicate_suggestion_list':    duplicate_suggestion_list,
+        }
+        return results
+
+    duplicate_finder = DuplicateFinder(kind_of_name='person')
+    for candidate_we_vote_id, candidate in candidate_dict.items():
+        state_code = candidate.state_code.lower() if positive_value_exists(candidate.state_code) else ''
+        scope_list = [(state_code, google_civic_election_id)
+                      for google_civic_election_id in election_id_list_by_candidate.get(candidate_we_vote_id, [])]
+        identifier_list = []
+        if positive_value_exists(candidate.candidate_twitter_handle):
+            identifier_list.append('twitter:' + candidate.candidate_twitter_handle)
+        if positive_value_exists(candidate.vote_usa_politician_id):
+            identifier_list.append('vote_usa:' + str(candidate.vote_usa_politician_id))
+        if positive_value_exists(candidate.ballotpedia_candidate_id):
+            identifier_list.append('ballotpedia:' + str(candidate.ballotpedia_candidate_id))
+        if positive_value_exists(candidate.politician_we_vote_id):
+            identifier_list.append('politician:' + candidate.politician_we_vote_id)
+        duplicate_finder.add(
+            candidate_we_vote_id,
+            name_list=[candidate.candidate_name, candidate.google_civic_candidate_name,
+                       candidate.google_civic_candidate_name2, candidate.google_civic_candidate_name3],
+            scope_list=scope_list,
+            identifier_list=identifier_list)
+    duplicate_suggestion_list = duplicate_finder.find_duplicates(ignore_pair_set=ignore_pair_set)
+    status += "FIND_DUPLICATE_CANDIDATES_SUGGESTIONS: " + str(len(duplicate_suggestion_list)) + " "
+
+    results = {
+        'success':                      True,
+        'status':                       status,
+        'candidate_dict':               candidate_dict,
+        'duplicate_suggestion_list':    duplicate_suggestion_list,
+    }
+    return results
+
+
 def figure_out_candidate_conflict_values(candidate1, candidate2):
     candidate_merge_conflict_values = {}
 
@@ -771,68 +856,92 @@ def filter_candidates_structured_json_for_local_duplicates(structured_json):
     """
     With this function, we remove candidates that seem to be duplicates, but have different we_vote_id's.
     We do not check to see if we have a matching office this routine -- that is done elsewhere.
+    The local candidates in the elections being imported are indexed once (see DuplicateFinder), instead of searching
+    the database once per incoming candidate.
     :param structured_json:
     :return:
     """
-    processed = 0
+    status = ""
     duplicates_removed = 0
     filtered_structured_json = []
-    candidate_list_manager = CandidateListManager()
-    for one_candidate in structured_json:
-        candidate_name = one_candidate['candidate_name'] if 'candidate_name' in one_candidate else ''
-        google_civic_candidate_name = one_candidate['google_civic_candidate_name'] \
-            if 'google_civic_candidate_name' in one_candidate else ''
-        google_civic_candidate_name2 = one_candidate['google_civic_candidate_name2'] \
-            if 'google_civic_candidate_name2' in one_candidate else ''
-        google_civic_candidate_name3 = one_candidate['google_civic_candidate_name3'] \
-            if 'google_civic_candidate_name3' in one_candidate else ''
-        we_vote_id = one_candidate['we_vote_id'] if 'we_vote_id' in one_candidate else ''
-        google_civic_election_id = \
-            one_candidate['google_civic_election_id'] if 'google_civic_election_id' in one_candidate else ''
-        contest_office_we_vote_id = \
-            one_candidate['contest_office_we_vote_id'] if 'contest_office_we_vote_id' in one_candidate else ''
-        politician_we_vote_id = one_candidate['politician_we_vote_id'] \
-            if 'politician_we_vote_id' in one_candidate else ''
-        candidate_twitter_handle = one_candidate['candidate_twitter_handle'] \
-            if 'candidate_twitter_handle' in one_candidate else ''
-        ballotpedia_candidate_id = one_candidate['ballotpedia_candidate_id'] \
-            if 'ballotpedia_candidate_id' in one_candidate else ''
-        # Not needed here: ballotpedia_person_id
-        vote_smart_id = one_candidate['vote_smart_id'] if 'vote_smart_id' in one_candidate else ''
-        maplight_id = one_candidate['maplight_id'] if 'maplight_id' in one_candidate else ''
-
+    google_civic_election_id_list = list(set(
+        convert_to_int(one_candidate['google_civic_election_id']) for one_candidate in structured_json
+        if positive_value_exists(one_candidate.get('google_civic_election_id'))))
+    duplicate_finder = DuplicateFinder(kind_of_name='person')
+    try:
+        election_id_list_by_candidate = {}
+        link_query = CandidateToOfficeLink.objects.using('readonly') \
+            .filter(google_civic_election_id__in=google_civic_election_id_list) \
+            .values_list('candidate_we_vote_id', 'google_civic_election_id')
+        for candidate_we_vote_id, google_civic_election_id in link_query:
+            election_id_list_by_candidate.setdefault(candidate_we_vote_id, []).append(
+                convert_to_int(google_civic_election_id))
+        local_candidate_query = CandidateCampaign.objects.using('readonly') \
+            .filter(we_vote_id__in=list(election_id_list_by_candidate.keys())) \
+            .values('we_vote_id', 'candidate_name', 'google_civic_candidate_name', 'google_civic_candidate_name2',
+                    'google_civic_candidate_name3', 'politician_we_vote_id', 'candidate_twitter_handle',
+                    'ballotpedia_candidate_id', 'vote_smart_id', 'maplight_id')
+        for local_candidate in local_candidate_query:
+            add_candidate_to_duplicate_finder(
+                duplicate_finder, local_candidate['we_vote_id'], local_candidate,
+                election_id_list_by_candidate[local_candidate['we_vote_id']])
+    except Exception as e:
+        status += "FILTER_CANDIDATES_LOCAL_CANDIDATE_QUERY_FAILED: " + str(e) + " "
+
+    incoming_key_list = []
+    ignore_pair_set = set()
+    for index, one_candidate in enumerate(structured_json):
+        incoming_key = 'incoming' + str(index)
+        incoming_key_list.append(incoming_key)
+        add_candidate_to_duplicate_finder(
+            duplicate_finder, incoming_key, one_candidate,
+            [convert_to_int(one_candidate.get('google_civic_election_id', 0))])
         # Check to see if there is an entry that matches in all critical ways, minus the we_vote_id
-        we_vote_id_from_master = we_vote_id
-
-        results = candidate_list_manager.retrieve_possible_duplicate_candidates(
-            candidate_name, google_civic_candidate_name, google_civic_candidate_name2, google_civic_candidate_name3,
-            google_civic_election_id, contest_office_we_vote_id,
-            politician_we_vote_id, candidate_twitter_handle, ballotpedia_candidate_id, vote_smart_id, maplight_id,
-            we_vote_id_from_master)
+        if positive_value_exists(one_candidate.get('we_vote_id')):
+            ignore_pair_set.add(frozenset((incoming_key, one_candidate['we_vote_id'])))
+    duplicate_dict = duplicate_finder.find_duplicates_of(incoming_key_list, ignore_pair_set=ignore_pair_set)
 
-        if results['candidate_list_found']:
-            # print("Skipping candidate " + str(candidate_name) + ",  " + str(google_civic_candidate_name) + ",  " +
-            #       str(google_civic_election_id) + ",  " + str(contest_office_we_vote_id) + ",  " +
-            #       str(politician_we_vote_id) + ",  " + str(candidate_twitter_handle) + ",  " +
-            #       str(vote_smart_id) + ",  " + str(maplight_id) + ",  " + str(we_vote_id_from_master))
-            # Obsolete note?: There seems to be a duplicate already in this database using a different we_vote_id
+    for incoming_key, one_candidate in zip(incoming_key_list, structured_json):
+        if incoming_key in duplicate_dict:
+            # There seems to be a duplicate already in this database using a different we_vote_id
             duplicates_removed += 1
         else:
             filtered_structured_json.append(one_candidate)
 
-        processed += 1
-        if not processed % 10000:
-            print("... candidates checked for duplicates: " + str(processed) + " of " + str(len(structured_json)))
-
     candidates_results = {
         'success':              True,
-        'status':               "FILTER_CANDIDATES_FOR_DUPLICATES_PROCESS_COMPLETE",
+        'status':               status + "FILTER_CANDIDATES_FOR_DUPLICATES_PROCESS_COMPLETE",
         'duplicates_removed':   duplicates_removed,
         'structured_json':      filtered_structured_json,
     }
     return candidates_results
 
 
+def add_candidate_to_duplicate_finder(
+        duplicate_finder, we_vote_id, candidate_values_dict, google_civic_election_id_list):
+    """
+    :param duplicate_finder:
+    :param we_vote_id:
+    :param candidate_values_dict: A candidate from the master server, or the values of a local candidate
+    :param google_civic_election_id_list:
+    :return:
+    """
+    identifier_list = []
+    for field_name in ['politician_we_vote_id', 'candidate_twitter_handle', 'ballotpedia_candidate_id',
+                       'vote_smart_id', 'maplight_id']:
+        if positive_value_exists(candidate_values_dict.get(field_name)):
+            identifier_list.append(field_name + ':' + str(candidate_values_dict[field_name]))
+    duplicate_finder.add(
+        we_vote_id,
+        name_list=[candidate_values_dict.get('candidate_name'),
+                   candidate_values_dict.get('google_civic_candidate_name'),
+                   candidate_values_dict.get('google_civic_candidate_name2'),
+                   candidate_values_dict.get('google_civic_candidate_name3')],
+        scope_list=google_civic_election_id_list,
+        identifier_list=identifier_list)
+
+
+@cache_version_increments_deferred()
 def candidates_import_from_structured_json(structured_json):  # Consumes candidatesSyncOut
     candidate_manager = CandidateManager()
     candidates_saved = 0
@@ -1103,6 +1212,7 @@ def candidates_import_from_structured_json(structured_json):  # Consumes candida
     return candidates_results
 
 
+@cache_version_increments_deferred()
 def candidate_to_office_link_import_from_structured_json(structured_json):
     candidate_manager = CandidateManager()
     entries_saved = 0
@@ -42,8 +42,8 @@ from wevote_settings.constants import ELECTION_YEARS_AVAILABLE
 from wevote_settings.models import RemoteRequestHistory, \
     RETRIEVE_POSSIBLE_GOOGLE_LINKS, RETRIEVE_POSSIBLE_TWITTER_HANDLES
 from .controllers import candidates_import_from_master_server, candidates_import_from_sample_file, \
-    candidate_politician_match, fetch_duplicate_candidate_count, figure_out_candidate_conflict_values, \
-    find_duplicate_candidate, \
+    candidate_politician_match, figure_out_candidate_conflict_values, \
+    find_duplicate_candidate, find_duplicate_candidates_in_elections, \
     merge_if_duplicate_candidates, merge_these_two_candidates, \
     retrieve_candidate_photos, \
     retrieve_candidate_politician_match_options, retrieve_next_or_most_recent_office_for_candidate, \
@@ -2256,7 +2256,6 @@ def find_and_merge_duplicate_candidates_view(request):
     if not voter_has_authority(request, authority_required):
         return redirect_to_sign_in_page(request, authority_required)
 
-    ignore_candidate_id_list = []
     find_number_of_duplicates = request.GET.get('find_number_of_duplicates', 0)
     google_civic_election_id = request.GET.get('google_civic_election_id', 0)
     google_civic_election_id = convert_to_int(google_civic_election_id)
@@ -2276,60 +2275,63 @@ def find_and_merge_duplicate_candidates_view(request):
         return_list_of_objects=True)
     candidate_list = results['candidate_list_objects']
 
-    # Loop through all of the candidates in this election to see how many have possible duplicates
-    if positive_value_exists(find_number_of_duplicates):
-        duplicate_candidate_count = 0
-        for we_vote_candidate in candidate_list:
-            # Note that we don't reset the ignore_candidate_list, so we don't search for a duplicate both directions
-            ignore_candidate_id_list.append(we_vote_candidate.we_vote_id)
-            duplicate_candidate_count_temp = fetch_duplicate_candidate_count(we_vote_candidate,
-                                                                             ignore_candidate_id_list)
-            duplicate_candidate_count += duplicate_candidate_count_temp
+    # Find and rank all the possible duplicates in these elections in one pass
+    duplicate_results = find_duplicate_candidates_in_elections(
+        google_civic_election_id_list=google_civic_election_id_list, candidate_list=candidate_list)
+    candidate_dict = duplicate_results['candidate_dict']
+    duplicate_suggestion_list = duplicate_results['duplicate_suggestion_list']
 
+    if positive_value_exists(find_number_of_duplicates):
+        duplicate_candidate_count = len(duplicate_suggestion_list)
         if positive_value_exists(duplicate_candidate_count):
             messages.add_message(request, messages.INFO, "There are approximately {duplicate_candidate_count} "
                                                          "possible duplicates."
                                                          "".format(duplicate_candidate_count=duplicate_candidate_count))
 
-    # Loop through all of the candidates in this election
-    ignore_candidate_id_list = []
-    for we_vote_candidate in candidate_list:
-        # Add current candidate entry to the ignore list
-        ignore_candidate_id_list.append(we_vote_candidate.we_vote_id)
-        # Now check to for other candidates we have labeled as "not a duplicate"
-        not_a_duplicate_list = candidate_manager.fetch_candidates_are_not_duplicates_list_we_vote_ids(
-            we_vote_candidate.we_vote_id)
-
-        ignore_candidate_id_list += not_a_duplicate_list
-
-        results = find_duplicate_candidate(we_vote_candidate, ignore_candidate_id_list)
-        ignore_candidate_id_list = []
+    # Loop through the possible duplicates, most likely first
+    merged_away_we_vote_id_list = []
+    for duplicate_suggestion in duplicate_suggestion_list:
+        if duplicate_suggestion['we_vote_id1'] in merged_away_we_vote_id_list \
+                or duplicate_suggestion['we_vote_id2'] in merged_away_we_vote_id_list:
+            continue
+        # We sort by ID so that the entry which was saved first becomes the "master"
+        we_vote_candidate, other_candidate = sorted(
+            [candidate_dict[duplicate_suggestion['we_vote_id1']], candidate_dict[duplicate_suggestion['we_vote_id2']]],
+            key=lambda one_candidate: one_candidate.id)
 
         # If we find candidates to merge, stop and ask for confirmation (if we need to)
-        if results['candidate_merge_possibility_found']:
-            candidate_option1_for_template = we_vote_candidate
-            candidate_option2_for_template = results['candidate_merge_possibility']
-
-            # Can we automatically merge these candidates?
-            merge_results = merge_if_duplicate_candidates(
-                candidate_option1_for_template,
-                candidate_option2_for_template,
-                results['candidate_merge_conflict_values'])
-
-            if merge_results['candidates_merged']:
-                candidate = merge_results['candidate']
-                messages.add_message(request, messages.INFO, "Candidate {candidate_name} automatically merged."
-                                                             "".format(candidate_name=candidate.candidate_name))
-                # return HttpResponseRedirect(reverse('candidate:find_and_merge_duplicate_candidates', args=()) +
-                #                             "?google_civic_election_id=" + str(google_civic_election_id) +
-                #                             "&state_code=" + str(state_code))
-            else:
-                # This view function takes us to displaying a template
-                messages.add_message(request, messages.INFO, merge_results['status'])
-                remove_duplicate_process = True  # Try to find another candidate to merge after finishing
-                return render_candidate_merge_form(request, candidate_option1_for_template,
-                                                   candidate_option2_for_template,
-                                                   results['candidate_merge_conflict_values'], remove_duplicate_process)
+        candidate_option1_for_template = we_vote_candidate
+        candidate_option2_for_template = other_candidate
+        candidate_merge_conflict_values = \
+            figure_out_candidate_conflict_values(candidate_option1_for_template, candidate_option2_for_template)
+
+        # Can we automatically merge these candidates?
+        merge_results = merge_if_duplicate_candidates(
+            candidate_option1_for_template,
+            candidate_option2_for_template,
+            candidate_merge_conflict_values)
+
+        if merge_results['candidates_merged']:
+            candidate = merge_results['candidate']
+            merged_away_we_vote_id_list += [
+                one_we_vote_id for one_we_vote_id in [we_vote_candidate.we_vote_id, other_candidate.we_vote_id]
+                if one_we_vote_id != candidate.we_vote_id]
+            # Later suggestions that include the merged candidate need its values after the merge
+            candidate_results = candidate_manager.retrieve_candidate_from_we_vote_id(candidate.we_vote_id)
+            if candidate_results['candidate_found']:
+                candidate_dict[candidate.we_vote_id] = candidate_results['candidate']
+            messages.add_message(request, messages.INFO, "Candidate {candidate_name} automatically merged."
+                                                         "".format(candidate_name=candidate.candidate_name))
+            # return HttpResponseRedirect(reverse('candidate:find_and_merge_duplicate_candidates', args=()) +
+            #                             "?google_civic_election_id=" + str(google_civic_election_id) +
+            #                             "&state_code=" + str(state_code))
+        else:
+            # This view function takes us to displaying a template
+            messages.add_message(request, messages.INFO, merge_results['status'])
+            remove_duplicate_process = True  # Try to find another candidate to merge after finishing
+            return render_candidate_merge_form(request, candidate_option1_for_template,
+                                               candidate_option2_for_template,
+                                               candidate_merge_conflict_values, remove_duplicate_process)
 
     message = "Google Civic Election ID: {election_id}, " \
               "No duplicate candidates found for this election." \
@@ -237,6 +237,10 @@ INSTALLED_APPS = (
 )
 
 MIDDLEWARE = [
+    # Does nothing unless API_PROFILING_ENABLED is true. First, so it measures the rest of the middleware too.
+    'apis_v1.middleware.ApiProfilingMiddleware',
+    # Sends reads in the read-only API endpoints to the read replica, when config/local.py sets DATABASE_ROUTERS
+    'apis_v1.middleware.DatabaseRoutingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'corsheaders.middleware.CorsPostCsrfMiddleware',
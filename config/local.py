@@ -16,7 +16,9 @@ DEBUG = get_environment_variable('SERVER_IN_DEBUG_MODE')
 
 # Multiple Databases
 # See https://docs.djangoproject.com/en/1.10/topics/db/multi-db/#defining-your-databases
-# August 2017: Not setting DATABASE_ROUTERS at this time, instead going with ".using('readonly')" on individual queries
+# Queries that name a database with .using() go to that database. Other reads in the read-only API endpoints listed
+#  in apis_v1/middleware.py go to 'readonly' unless the request has written, or the replica is lagging.
+#  See wevote_functions/database_router.py
 
 DATABASES = {
     'default': {
@@ -51,6 +53,8 @@ DATABASES = {
     }
 }
 
+DATABASE_ROUTERS = ['wevote_functions.database_router.ReadReplicaRouter']
+
 ALLOWED_HOSTS = ['*']
 
 # ########## Logging configurations ###########
@@ -1623,15 +1623,13 @@ class DonationManager(models.Manager):
         """
 
         # First find the subscription_id from the cached invoices
-        row_invoice = DonationInvoice.objects.get(invoice_id=invoice_id)
-        try:
-            subscription_id = row_invoice.subscription_id
-        except Exception as e:
-            # Sometimes the payment, comes a second before the invoice (yuck), so try one more time in 10 seconds
-            logger.debug("update_subscription_with_latest_charge_date: trying again after 10 sec for " + invoice_id)
-            time.sleep(10)
-            row_invoice = DonationInvoice.objects.get(invoice_id=invoice_id)
-            subscription_id = row_invoice.subscription_id
+        row_invoice = DonationInvoice.objects.filter(invoice_id=invoice_id).first()
+        if row_invoice is None:
+            # Sometimes the payment comes a second before the invoice. We used to sleep for 10 seconds here, holding
+            # the web server's worker. The webhook in stripe_donations parks such an event until the invoice arrives.
+            logger.debug("update_subscription_with_latest_charge_date: invoice not received yet for " + invoice_id)
+            return
+        subscription_id = row_invoice.subscription_id
 
         try:
             # Then find the subscription in the DonationJournal row that matches the subscription_id
@@ -0,0 +1,210 @@
+# election/election_calendar.py
+# Brought to you by We Vote. Be good.
+# -*- coding: UTF-8 -*-
+
+from bisect import bisect_left
+import copy
+from datetime import datetime
+import threading
+import time
+
+from election.models import Election
+from wevote_functions.functions import convert_date_to_we_vote_date_string, positive_value_exists
+from wevote_settings.models import fetch_cache_version, increment_cache_version
+
+# The election table is small and asked about on every ballot request, so each worker keeps all of it in memory,
+#  sorted by election day. Every Election save bumps ELECTION_CALENDAR_VERSION_NAME (see election/models.py), which
+#  we check at most every ELECTION_CALENDAR_VERSION_CHECK_SECONDS. Queryset .update() calls don't send signals, so
+#  the calendar is also loaded again after ELECTION_CALENDAR_MAX_AGE_SECONDS. Which elections are upcoming changes at
+#  midnight, so the calendar is sorted again for the new day.
+ELECTION_CALENDAR_MAX_AGE_SECONDS = 900
+ELECTION_CALENDAR_VERSION_CHECK_SECONDS = 10
+ELECTION_CALENDAR_VERSION_NAME = 'election_calendar_version'
+TEST_GOOGLE_CIVIC_ELECTION_ID = '2000'
+
+
+def election_calendar_today():
+    return datetime.now().date()
+
+
+def state_code_key(election):
+    """
+    :return: '' for elections without a state code (national elections), otherwise the lower case state code
+    """
+    return election.state_code.lower() if positive_value_exists(election.state_code) else ''
+
+
+class ElectionCalendar(object):
+    """
+    Answers the upcoming and prior election questions ElectionManager used to query for. The Election objects
+    returned are copies, so callers can change them.
+    """
+
+    def __init__(self, election_list=None, today=None, cache_version=0, checked=True):
+        # Elections without an election day never match a date filter
+        self.election_list = sorted(
+            [election for election in (election_list or []) if election.election_day_text is not None],
+            key=lambda election: (election.election_day_text, election.id))
+        self.cache_version = cache_version
+        self.loaded_time = time.monotonic()
+        self.version_checked_time = self.loaded_time if checked else None
+        self.today = today or election_calendar_today()
+
+        election_day_text_list = [election.election_day_text for election in self.election_list]
+        today_index = bisect_left(election_day_text_list, convert_date_to_we_vote_date_string(self.today))
+        first_day_this_year_index = bisect_left(
+            election_day_text_list, "{year}-01-01".format(year=self.today.year), hi=today_index)
+        self.upcoming_election_list = [election for election in self.election_list[today_index:]
+                                       if not election.ignore_this_election]
+        self.prior_election_list_this_year = [
+            election for election in self.election_list[first_day_this_year_index:today_index]
+            if election.google_civic_election_id != TEST_GOOGLE_CIVIC_ELECTION_ID]
+        self.upcoming_election_list_by_state = self.election_list_by_state(self.upcoming_election_list)
+        self.prior_election_list_this_year_by_state = self.election_list_by_state(self.prior_election_list_this_year)
+
+    @staticmethod
+    def election_list_by_state(election_list):
+        election_list_by_state = {}
+        for election in election_list:
+            election_list_by_state.setdefault(state_code_key(election), []).append(election)
+        return election_list_by_state
+
+    def for_today(self, today):
+        """
+        :return: a calendar with the same elections, sorted for another day, without going back to the database
+        """
+        election_calendar = ElectionCalendar(self.election_list, today=today, cache_version=self.cache_version)
+        election_calendar.loaded_time = self.loaded_time
+        return election_calendar
+
+    def upcoming_election_list_for(
+            self, state_code='', without_state_code=False, require_include_in_list_for_voters=False,
+            include_test_election=False):
+        """
+        Same elections, in the same order, as the query retrieve_upcoming_elections used to run
+        :param state_code:
+        :param without_state_code:
+        :param require_include_in_list_for_voters:
+        :param include_test_election:
+        :return:
+        """
+        if positive_value_exists(without_state_code):
+            election_list = self.upcoming_election_list_by_state.get('', [])
+        elif positive_value_exists(state_code):
+            election_list = self.upcoming_election_list_by_state.get(state_code.lower(), [])
+        else:
+            election_list = self.upcoming_election_list
+        if positive_value_exists(require_include_in_list_for_voters):
+            election_list = [election for election in election_list if election.include_in_list_for_voters]
+        if not positive_value_exists(include_test_election):
+            election_list = [election for election in election_list
+                             if election.google_civic_election_id != TEST_GOOGLE_CIVIC_ELECTION_ID]
+        return [copy.copy(election) for election in election_list]
+
+    def prior_election_list_this_year_for(self, state_code='', without_state_code=False):
+        """
+        Same elections, in the same order, as the query retrieve_prior_elections_this_year used to run
+        :param state_code:
+        :param without_state_code:
+        :return:
+        """
+        if positive_value_exists(without_state_code):
+            election_list = self.prior_election_list_this_year_by_state.get('', [])
+        elif positive_value_exists(state_code):
+            election_list = self.prior_election_list_this_year_by_state.get(state_code.lower(), [])
+        else:
+            election_list = self.prior_election_list_this_year
+        return [copy.copy(election) for election in election_list]
+
+    def upcoming_google_civic_election_id_list(self, limit_to_this_state_code='',
+                                               require_include_in_list_for_voters=False):
+        """
+        Same ids, in the same order, as retrieve_upcoming_google_civic_election_id_list used to find
+        :param limit_to_this_state_code:
+        :param require_include_in_list_for_voters:
+        :return:
+        """
+        if positive_value_exists(limit_to_this_state_code):
+            election_list = self.upcoming_election_list_by_state.get(limit_to_this_state_code.lower(), [])
+        else:
+            election_list = self.upcoming_election_list
+        if positive_value_exists(require_include_in_list_for_voters):
+            election_list = [election for election in election_list if election.include_in_list_for_voters]
+        return google_civic_election_id_list_from_election_list(
+            [election for election in election_list
+             if election.google_civic_election_id != TEST_GOOGLE_CIVIC_ELECTION_ID])
+
+    def prior_google_civic_election_id_list_this_year(self, limit_to_this_state_code=''):
+        """
+        Same ids, in the same order, as retrieve_prior_google_civic_election_id_list_this_year used to find
+        :param limit_to_this_state_code:
+        :return:
+        """
+        if positive_value_exists(limit_to_this_state_code):
+            election_list = self.prior_election_list_this_year_by_state.get(limit_to_this_state_code.lower(), [])
+        else:
+            election_list = self.prior_election_list_this_year
+        return google_civic_election_id_list_from_election_list(election_list)
+
+
+def google_civic_election_id_list_from_election_list(election_list):
+    google_civic_election_id_list = []
+    for election in election_list:
+        if positive_value_exists(election.google_civic_election_id) \
+                and election.google_civic_election_id not in google_civic_election_id_list:
+            google_civic_election_id_list.append(election.google_civic_election_id)
+    return google_civic_election_id_list
+
+
+election_calendar = ElectionCalendar(checked=False)
+election_calendar_lock = threading.Lock()
+
+
+def fetch_election_calendar():
+    """
+    This worker's election calendar, loaded the first time it is needed, loaded again when an election changes, and
+    sorted again when the day changes
+    :return: ElectionCalendar
+    """
+    global election_calendar
+    now = time.monotonic()
+    today = election_calendar_today()
+    current_calendar = election_calendar
+    if current_calendar.version_checked_time is not None and current_calendar.today == today \
+            and now - current_calendar.version_checked_time < ELECTION_CALENDAR_VERSION_CHECK_SECONDS:
+        return current_calendar
+
+    with election_calendar_lock:
+        current_calendar = election_calendar
+        if current_calendar.version_checked_time is not None and current_calendar.today == today \
+                and now - current_calendar.version_checked_time < ELECTION_CALENDAR_VERSION_CHECK_SECONDS:
+            # Another thread checked while we were waiting
+            return current_calendar
+        cache_version = fetch_cache_version(ELECTION_CALENDAR_VERSION_NAME)
+        if current_calendar.version_checked_time is not None and cache_version == current_calendar.cache_version \
+                and now - current_calendar.loaded_time < ELECTION_CALENDAR_MAX_AGE_SECONDS:
+            if current_calendar.today != today:
+                current_calendar = current_calendar.for_today(today)
+                election_calendar = current_calendar
+            current_calendar.version_checked_time = now
+            return current_calendar
+        # Read from the primary database, so a worker never loads a calendar older than the version it just read
+        new_calendar = ElectionCalendar(list(Election.objects.all()), today=today, cache_version=cache_version)
+        # Readers holding the old calendar keep using it, so we swap in a complete new one
+        election_calendar = new_calendar
+        return new_calendar
+
+
+def invalidate_election_calendar():
+    """
+    Tell every worker that its election calendar is out of date
+    :return:
+    """
+    increment_cache_version(ELECTION_CALENDAR_VERSION_NAME)
+    clear_election_calendar()
+
+
+def clear_election_calendar():
+    global election_calendar
+    with election_calendar_lock:
+        election_calendar = ElectionCalendar(checked=False)
@@ -5,6 +5,8 @@
 from datetime import date, datetime, time
 from django.db import models
 from django.db.models import Max, Q
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 import wevote_functions.admin
 from wevote_functions.functions import convert_date_as_integer_to_date, convert_date_to_date_as_integer, \
     convert_date_to_we_vote_date_string, \
@@ -552,6 +554,14 @@ class ElectionManager(models.Manager):
         }
         return results
 
+    def fetch_election_calendar(self):
+        """
+        :return: this worker's ElectionCalendar, see election/election_calendar.py
+        """
+        # election_calendar imports Election from this file, so it can't be imported at the top
+        from election.election_calendar import fetch_election_calendar
+        return fetch_election_calendar()
+
     def retrieve_upcoming_elections(
             self,
             state_code="",
@@ -561,23 +571,12 @@ class ElectionManager(models.Manager):
         status = ''
         election_list_found = False
         upcoming_election_list = []
-        today = datetime.now().date()
-        we_vote_date_string = convert_date_to_we_vote_date_string(today)
         try:
-            election_list_query = Election.objects.using('readonly').all()
-            election_list_query = election_list_query.filter(election_day_text__gte=we_vote_date_string)
-            election_list_query = election_list_query.exclude(ignore_this_election=True)
-            if positive_value_exists(require_include_in_list_for_voters):
-                election_list_query = election_list_query.filter(include_in_list_for_voters=True)
-            if positive_value_exists(without_state_code):
-                election_list_query = election_list_query.filter(Q(state_code__isnull=True) | Q(state_code__exact=''))
-            elif positive_value_exists(state_code):
-                election_list_query = election_list_query.filter(state_code__iexact=state_code)
-            if not positive_value_exists(include_test_election):
-                election_list_query = election_list_query.exclude(google_civic_election_id=2000)
-            election_list_query = election_list_query.order_by('election_day_text')
-
-            upcoming_election_list = list(election_list_query)
+            upcoming_election_list = self.fetch_election_calendar().upcoming_election_list_for(
+                state_code=state_code,
+                without_state_code=without_state_code,
+                require_include_in_list_for_voters=require_include_in_list_for_voters,
+                include_test_election=include_test_election)
 
             status += 'ELECTION_QUERY_COMPLETE '
             election_list_found = positive_value_exists(len(upcoming_election_list))
@@ -602,31 +601,14 @@ class ElectionManager(models.Manager):
         status = ""
         success = True
         upcoming_google_civic_election_id_list = []
-        results = self.retrieve_upcoming_elections(
-            state_code=limit_to_this_state_code,
-            require_include_in_list_for_voters=require_include_in_list_for_voters)
-        if results['election_list_found']:
-            election_list = results['election_list']
-            for one_election in election_list:
-                if positive_value_exists(one_election.google_civic_election_id):
-                    upcoming_google_civic_election_id_list.append(one_election.google_civic_election_id)
-        else:
-            status += results['status']
-            success = results['success']
-
-        # If a state code IS included, then the above retrieve_upcoming_elections will have missed the national election
-        if positive_value_exists(limit_to_this_state_code):
-            results = self.retrieve_upcoming_national_elections(
+        try:
+            election_calendar = self.fetch_election_calendar()
+            upcoming_google_civic_election_id_list = election_calendar.upcoming_google_civic_election_id_list(
+                limit_to_this_state_code=limit_to_this_state_code,
                 require_include_in_list_for_voters=require_include_in_list_for_voters)
-            if results['election_list_found']:
-                election_list = results['election_list']
-                for one_election in election_list:
-                    if positive_value_exists(one_election.google_civic_election_id) \
-                            and one_election.google_civic_election_id not in upcoming_google_civic_election_id_list:
-                        upcoming_google_civic_election_id_list.append(one_election.google_civic_election_id)
-            else:
-                status += results['status']
-                success = results['success']
+        except Exception as e:
+            status += "RETRIEVE_UPCOMING_ELECTIONS_QUERY_FAILURE " + str(e) + " "
+            success = False
 
         upcoming_google_civic_election_id_list_found = len(upcoming_google_civic_election_id_list)
 
@@ -643,21 +625,9 @@ class ElectionManager(models.Manager):
         success = True
         election_list_found = False
         prior_election_list = []
-        today = datetime.now().date()
-        we_vote_date_string = convert_date_to_we_vote_date_string(today)
-        first_day_this_year_string = "{year}-01-01".format(year=today.year)
         try:
-            election_list_query = Election.objects.using('readonly').all()
-            election_list_query = election_list_query.filter(
-                Q(election_day_text__lt=we_vote_date_string) & Q(election_day_text__gte=first_day_this_year_string))
-            if positive_value_exists(without_state_code):
-                election_list_query = election_list_query.filter(Q(state_code__isnull=True) | Q(state_code__exact=''))
-            elif positive_value_exists(state_code):
-                election_list_query = election_list_query.filter(state_code__iexact=state_code)
-            election_list_query = election_list_query.exclude(google_civic_election_id=2000)
-            election_list_query = election_list_query.order_by('election_day_text')
-
-            prior_election_list = list(election_list_query)
+            prior_election_list = self.fetch_election_calendar().prior_election_list_this_year_for(
+                state_code=state_code, without_state_code=without_state_code)
 
             status += 'PRIOR_ELECTIONS_FOUND '
             election_list_found = positive_value_exists(len(prior_election_list))
@@ -682,27 +652,12 @@ class ElectionManager(models.Manager):
         status = ""
         success = True
         prior_google_civic_election_id_list = []
-        results = self.retrieve_prior_elections_this_year(state_code=limit_to_this_state_code)
-        if results['election_list_found']:
-            election_list = results['election_list']
-            for one_election in election_list:
-                if positive_value_exists(one_election.google_civic_election_id):
-                    prior_google_civic_election_id_list.append(one_election.google_civic_election_id)
-        else:
-            status += results['status']
-            # success = results['success']
-
-        # If a state code IS included, then the above retrieve_upcoming_elections will have missed the national election
-        if positive_value_exists(limit_to_this_state_code):
-            results = self.retrieve_prior_national_elections_this_year()
-            if results['election_list_found']:
-                election_list = results['election_list_found']
-                for one_election in election_list:
-                    if positive_value_exists(one_election.google_civic_election_id) \
-                            and one_election.google_civic_election_id not in prior_google_civic_election_id_list:
-                        prior_google_civic_election_id_list.append(one_election.google_civic_election_id)
-            else:
-                status += results['status']
+        try:
+            election_calendar = self.fetch_election_calendar()
+            prior_google_civic_election_id_list = election_calendar.prior_google_civic_election_id_list_this_year(
+                limit_to_this_state_code=limit_to_this_state_code)
+        except Exception as e:
+            status += "RETRIEVE_PRIOR_ELECTIONS_QUERY_FAILURE " + str(e) + " "
 
         prior_google_civic_election_id_list_found = len(prior_google_civic_election_id_list)
 
@@ -1245,3 +1200,11 @@ def fetch_next_election_for_state(state_code, require_include_in_list_for_voters
         return election
     else:
         return Election()
+
+
+@receiver(post_save, sender=Election)
+@receiver(post_delete, sender=Election)
+def election_changed_signal(sender, instance, **kwargs):
+    # Includes the saves in ElectionManager.update_or_create_election and the admin election edit
+    from election.election_calendar import invalidate_election_calendar
+    invalidate_election_calendar()
@@ -0,0 +1,124 @@
+# election/tests.py
+# Brought to you by We Vote. Be good.
+# -*- coding: UTF-8 -*-
+
+from datetime import date, datetime, timedelta
+
+from django.db.models import Q
+from django.test import SimpleTestCase, TestCase
+
+from election.election_calendar import clear_election_calendar, ElectionCalendar
+from election.models import Election, ElectionManager
+from wevote_functions.functions import convert_date_to_we_vote_date_string
+
+ELECTION_VALUES_LIST = [
+    # google_civic_election_id, state_code, days from today, include_in_list_for_voters, ignore_this_election
+    ('1001', 'CA', -400, True, False),
+    ('1002', 'CA', -3, True, False),
+    ('1003', '', -2, True, False),
+    ('1004', 'CA', 0, True, False),
+    ('1005', 'ca', 5, False, False),
+    ('1006', None, 10, True, False),
+    ('1007', 'NY', 12, True, False),
+    ('1008', 'CA', 14, True, True),
+    ('2000', '', 20, True, False),
+]
+
+
+def election_list_for_today(today):
+    return [Election(id=index + 1, google_civic_election_id=google_civic_election_id, state_code=state_code,
+                     election_name=google_civic_election_id,
+                     election_day_text=convert_date_to_we_vote_date_string(today + timedelta(days=days)),
+                     include_in_list_for_voters=include_in_list_for_voters, ignore_this_election=ignore_this_election)
+            for index, (google_civic_election_id, state_code, days, include_in_list_for_voters, ignore_this_election)
+            in enumerate(ELECTION_VALUES_LIST)]
+
+
+def google_civic_election_id_list(election_list):
+    return [election.google_civic_election_id for election in election_list]
+
+
+class ElectionCalendarTestCase(SimpleTestCase):
+
+    def test_upcoming_and_prior_elections(self):
+        # Not January, so every election in the last few days is this year
+        today = date(2022, 6, 15)
+        election_calendar = ElectionCalendar(election_list_for_today(today), today=today)
+
+        self.assertEqual(google_civic_election_id_list(election_calendar.upcoming_election_list_for()),
+                         ['1004', '1005', '1006', '1007'])
+        self.assertEqual(google_civic_election_id_list(election_calendar.upcoming_election_list_for(
+            state_code='CA', require_include_in_list_for_voters=True)), ['1004'])
+        self.assertEqual(google_civic_election_id_list(election_calendar.upcoming_election_list_for(
+            without_state_code=True, include_test_election=True)), ['1006', '2000'])
+        self.assertEqual(election_calendar.upcoming_google_civic_election_id_list(limit_to_this_state_code='ca'),
+                         ['1004', '1005'])
+        self.assertEqual(google_civic_election_id_list(election_calendar.prior_election_list_this_year_for()),
+                         ['1002', '1003'])
+        self.assertEqual(election_calendar.prior_google_civic_election_id_list_this_year(
+            limit_to_this_state_code='CA'), ['1002'])
+
+        # At midnight today's election moves to the prior elections
+        election_calendar = election_calendar.for_today(today + timedelta(days=1))
+        self.assertEqual(google_civic_election_id_list(election_calendar.upcoming_election_list_for(state_code='CA')),
+                         ['1005'])
+        self.assertEqual(election_calendar.prior_google_civic_election_id_list_this_year(), ['1002', '1003', '1004'])
+
+
+class ElectionManagerTestCase(TestCase):
+    databases = ["default", "readonly"]
+
+    def setUp(self):
+        clear_election_calendar()
+        for election in election_list_for_today(datetime.now().date()):
+            election.id = None
+            election.save()
+
+    def test_answers_match_the_election_queries(self):
+        election_manager = ElectionManager()
+        today = datetime.now().date()
+        we_vote_date_string = convert_date_to_we_vote_date_string(today)
+        upcoming_query = Election.objects.filter(election_day_text__gte=we_vote_date_string) \
+            .exclude(ignore_this_election=True).order_by('election_day_text')
+        prior_query = Election.objects.filter(
+            Q(election_day_text__lt=we_vote_date_string) &
+            Q(election_day_text__gte="{year}-01-01".format(year=today.year))) \
+            .exclude(google_civic_election_id=2000).order_by('election_day_text')
+        national_filter = Q(state_code__isnull=True) | Q(state_code__exact='')
+
+        for kwargs, queryset in [
+                ({}, upcoming_query.exclude(google_civic_election_id=2000)),
+                ({'include_test_election': True}, upcoming_query),
+                ({'state_code': 'CA'}, upcoming_query.filter(state_code__iexact='CA')
+                    .exclude(google_civic_election_id=2000)),
+                ({'without_state_code': True, 'require_include_in_list_for_voters': True},
+                 upcoming_query.filter(national_filter).filter(include_in_list_for_voters=True)
+                    .exclude(google_civic_election_id=2000))]:
+            self.assertEqual(google_civic_election_id_list(
+                election_manager.retrieve_upcoming_elections(**kwargs)['election_list']),
+                google_civic_election_id_list(queryset), kwargs)
+        for kwargs, queryset in [
+                ({}, prior_query),
+                ({'state_code': 'ca'}, prior_query.filter(state_code__iexact='CA')),
+                ({'without_state_code': True}, prior_query.filter(national_filter))]:
+            self.assertEqual(google_civic_election_id_list(
+                election_manager.retrieve_prior_elections_this_year(**kwargs)['election_list']),
+                google_civic_election_id_list(queryset), kwargs)
+
+        self.assertEqual(election_manager.retrieve_upcoming_google_civic_election_id_list(
+            limit_to_this_state_code='CA')['upcoming_google_civic_election_id_list'],
+            google_civic_election_id_list(upcoming_query.filter(state_code__iexact='CA')
+                                          .exclude(google_civic_election_id=2000)))
+
+    def test_update_or_create_election_changes_the_answers(self):
+        election_manager = ElectionManager()
+        self.assertEqual(election_manager.retrieve_next_national_election()['election'].google_civic_election_id,
+                         '1006')
+        tomorrow = datetime.now().date() + timedelta(days=1)
+        results = election_manager.update_or_create_election(
+            google_civic_election_id='1009', election_name='Special',
+            election_day_text=convert_date_to_we_vote_date_string(tomorrow))
+        self.assertTrue(results['new_election_created'])
+
+        self.assertEqual(election_manager.retrieve_next_national_election()['election'].google_civic_election_id,
+                         '1009')
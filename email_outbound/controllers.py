@@ -668,17 +668,26 @@ def query_sendgrid_api_to_augment_email_list(email_list=None):
     return results
 
 
-def schedule_email_with_email_outbound_description(email_outbound_description, send_status=TO_BE_PROCESSED):
+def schedule_email_with_email_outbound_description(email_outbound_description, send_status=TO_BE_PROCESSED,
+                                                   email_template_results=None):
+    """
+    :param email_outbound_description:
+    :param send_status:
+    :param email_template_results: The subject and messages when they were already rendered, ex/ by
+        render_email_for_recipient_list for many recipients at once
+    :return:
+    """
     email_manager = EmailManager()
     status = ""
 
-    template_variables_in_json = email_outbound_description.template_variables_in_json
-    if positive_value_exists(email_outbound_description.kind_of_email_template):
-        kind_of_email_template = email_outbound_description.kind_of_email_template
-    else:
-        kind_of_email_template = GENERIC_EMAIL_TEMPLATE
-
-    email_template_results = merge_message_content_with_template(kind_of_email_template, template_variables_in_json)
+    if email_template_results is None:
+        template_variables_in_json = email_outbound_description.template_variables_in_json
+        if positive_value_exists(email_outbound_description.kind_of_email_template):
+            kind_of_email_template = email_outbound_description.kind_of_email_template
+        else:
+            kind_of_email_template = GENERIC_EMAIL_TEMPLATE
+        email_template_results = \
+            merge_message_content_with_template(kind_of_email_template, template_variables_in_json)
     if email_template_results['success']:
         subject = email_template_results['subject']
         message_text = email_template_results['message_text']
@@ -7,9 +7,20 @@ from .models import CAMPAIGNX_FRIEND_HAS_SUPPORTED_TEMPLATE, CAMPAIGNX_NEWS_ITEM
     FRIEND_ACCEPTED_INVITATION_TEMPLATE, FRIEND_INVITATION_TEMPLATE, LINK_TO_SIGN_IN_TEMPLATE, \
     MESSAGE_TO_FRIEND_TEMPLATE, NOTICE_FRIEND_ENDORSEMENTS_TEMPLATE, NOTICE_VOTER_DAILY_SUMMARY_TEMPLATE, \
     SEND_BALLOT_TO_SELF, SEND_BALLOT_TO_FRIENDS, SIGN_IN_CODE_EMAIL_TEMPLATE, VERIFY_EMAIL_ADDRESS_TEMPLATE
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
 from django.template.loader import get_template
 from django.template import Context
 import json
+import threading
+from wevote_functions.functions import positive_value_exists
+
+EMAIL_TEMPLATE_FOLDER = "email_outbound/email_templates/"
+BULK_RENDER_BATCH_SIZE = 500
+
+# Compiled templates stay resident for the life of the worker, keyed by template path
+compiled_email_template_cache = {}
+compiled_email_template_cache_lock = threading.Lock()
 
 
 def get_template_filename(kind_of_email_template, text_or_html):
@@ -90,6 +101,30 @@ def get_template_filename(kind_of_email_template, text_or_html):
         return "generic_email.txt"
 
 
+def get_compiled_email_template(kind_of_email_template, text_or_html):
+    """
+    Resolving a template through get_template searches every template directory and re-parses the file, so we
+    only do that the first time a template is needed in this worker.
+    :param kind_of_email_template:
+    :param text_or_html:
+    :return:
+    """
+    template_path = EMAIL_TEMPLATE_FOLDER + get_template_filename(kind_of_email_template, text_or_html)
+    compiled_template = compiled_email_template_cache.get(template_path)
+    if compiled_template is None:
+        with compiled_email_template_cache_lock:
+            compiled_template = compiled_email_template_cache.get(template_path)
+            if compiled_template is None:
+                compiled_template = get_template(template_path)
+                compiled_email_template_cache[template_path] = compiled_template
+    return compiled_template
+
+
+def clear_compiled_email_template_cache():
+    with compiled_email_template_cache_lock:
+        compiled_email_template_cache.clear()
+
+
 def merge_message_content_with_template(kind_of_email_template, template_variables_in_json):
     success = True
     status = "KIND_OF_EMAIL_TEMPLATE: " + str(kind_of_email_template) + " "
@@ -100,13 +135,9 @@ def merge_message_content_with_template(kind_of_email_template, template_variabl
     template_variables_dict = json.loads(template_variables_in_json)
     # template_variables_object = Context(template_variables_dict)  # Used previously with Django 1.8
 
-    # Set up the templates
-    text_template_path = "email_outbound/email_templates/" + get_template_filename(kind_of_email_template, "TEXT")
-    html_template_path = "email_outbound/email_templates/" + get_template_filename(kind_of_email_template, "HTML")
-
     # We need to combine the template_variables_in_json with the kind_of_email_template
-    text_template = get_template(text_template_path)
-    html_template = get_template(html_template_path)
+    text_template = get_compiled_email_template(kind_of_email_template, "TEXT")
+    html_template = get_compiled_email_template(kind_of_email_template, "HTML")
 
     if "subject" in template_variables_dict:
         subject = template_variables_dict['subject']
@@ -130,3 +161,98 @@ def merge_message_content_with_template(kind_of_email_template, template_variabl
         'message_html': message_html,
     }
     return results
+
+
+def render_email_batch(kind_of_email_template, shared_template_variables_dict, recipient_template_variables_list):
+    """
+    Render one batch of recipients against the same compiled templates. The variables that are identical for every
+    recipient (campaign title, urls, news text) are passed once in shared_template_variables_dict, and each entry in
+    recipient_template_variables_list only carries the per-recipient fields, which take precedence.
+    :param kind_of_email_template:
+    :param shared_template_variables_dict:
+    :param recipient_template_variables_list:
+    :return: list of results dicts, in the same order as recipient_template_variables_list
+    """
+    text_template = get_compiled_email_template(kind_of_email_template, "TEXT")
+    html_template = get_compiled_email_template(kind_of_email_template, "HTML")
+    default_subject = shared_template_variables_dict.get('subject', "From We Vote")
+
+    rendered_list = []
+    for recipient_template_variables_dict in recipient_template_variables_list:
+        template_variables_dict = dict(shared_template_variables_dict)
+        template_variables_dict.update(recipient_template_variables_dict)
+        success = True
+        status = ""
+        message_text = ""
+        message_html = ""
+        try:
+            message_text = text_template.render(template_variables_dict)
+            message_html = html_template.render(template_variables_dict)
+        except Exception as e:
+            status += "FAILED_RENDERING_TEMPLATE, error: " + str(e) + " "
+            success = False
+        rendered_list.append({
+            'success':      success,
+            'status':       status,
+            'subject':      template_variables_dict.get('subject', default_subject),
+            'message_text': message_text,
+            'message_html': message_html,
+        })
+    return rendered_list
+
+
+def render_email_for_recipient_list(
+        kind_of_email_template,
+        shared_template_variables_dict=None,
+        recipient_template_variables_list=None,
+        batch_size=BULK_RENDER_BATCH_SIZE,
+        process_count=0):
+    """
+    Render the same kind of email for many recipients. Recipients are split into batches, and when process_count
+    is greater than one the batches are rendered in a pool of forked processes.
+    :param kind_of_email_template:
+    :param shared_template_variables_dict: Variables that are the same for every recipient
+    :param recipient_template_variables_list: One dict of per-recipient variables for each recipient
+    :param batch_size:
+    :param process_count:
+    :return:
+    """
+    status = "KIND_OF_EMAIL_TEMPLATE: " + str(kind_of_email_template) + " "
+    if shared_template_variables_dict is None:
+        shared_template_variables_dict = {}
+    if recipient_template_variables_list is None:
+        recipient_template_variables_list = []
+    batch_size = batch_size if batch_size and batch_size > 0 else BULK_RENDER_BATCH_SIZE
+    batch_list = [recipient_template_variables_list[index:index + batch_size]
+                  for index in range(0, len(recipient_template_variables_list), batch_size)]
+
+    rendered_list = []
+    use_process_pool = process_count and process_count > 1 and len(batch_list) > 1
+    if use_process_pool and 'fork' not in multiprocessing.get_all_start_methods():
+        # A spawned process would start without Django set up, so only forked processes can render
+        status += "PROCESS_POOL_NEEDS_FORK-RENDERING_IN_THIS_PROCESS "
+        use_process_pool = False
+    if use_process_pool:
+        status += "RENDERING_IN_PROCESS_POOL "
+        with ProcessPoolExecutor(max_workers=process_count, mp_context=multiprocessing.get_context('fork')) \
+                as executor:
+            future_list = [executor.submit(render_email_batch, kind_of_email_template,
+                                           shared_template_variables_dict, one_batch)
+                           for one_batch in batch_list]
+            for future in future_list:
+                rendered_list += future.result()
+    else:
+        for one_batch in batch_list:
+            rendered_list += render_email_batch(
+                kind_of_email_template, shared_template_variables_dict, one_batch)
+
+    failed_count = len([one_rendered for one_rendered in rendered_list if not one_rendered['success']])
+    if positive_value_exists(failed_count):
+        status += "FAILED_RENDERING_COUNT: " + str(failed_count) + " "
+
+    results = {
+        'success':          failed_count == 0,
+        'status':           status,
+        'rendered_list':    rendered_list,
+    }
+    return results
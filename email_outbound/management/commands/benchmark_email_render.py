@@ -0,0 +1,68 @@
+import json
+import time
+from django.core.management.base import BaseCommand
+from django.template.loader import get_template
+from email_outbound.functions import EMAIL_TEMPLATE_FOLDER, get_template_filename, render_email_for_recipient_list
+from email_outbound.models import CAMPAIGNX_NEWS_ITEM_TEMPLATE
+
+
+class Command(BaseCommand):
+    help = 'Compares rendering a campaign news item email one recipient at a time with the bulk render path'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipients', type=int, default=10000)
+        parser.add_argument('--batch_size', type=int, default=500)
+        parser.add_argument('--processes', type=int, default=0)
+
+    def handle(self, *args, **options):
+        recipient_count = options['recipients']
+        shared_template_variables_dict = {
+            "subject":                          "Campaign update",
+            "campaignx_title":                  "Save the Oakland Library",
+            "campaignx_news_item_url":          "https://campaigns.wevote.us/c/save-library/u/wv02camp1",
+            "campaignx_news_text":              "We collected 10,000 signatures this week. Thank you! " * 20,
+            "campaignx_url":                    "https://campaigns.wevote.us/c/save-library",
+            "politician_count":                 2,
+            "politician_full_sentence_string":  " Jane Doe and John Roe",
+            "speaker_voter_name":               "Sam Speaker",
+            "email_open_url":                   "https://api.wevoteusa.org/apis/v1/emailOpen?email_key=1234",
+            "view_main_discussion_page_url":    "https://campaigns.wevote.us/news",
+            "view_your_ballot_url":             "https://campaigns.wevote.us/ballot",
+            "we_vote_hosted_campaign_photo_large_url": "https://wevote-images.s3.amazonaws.com/photo.jpg",
+        }
+        recipient_template_variables_list = []
+        for number in range(recipient_count):
+            recipient_template_variables_list.append({
+                "date_supported":               "May 1, 2022 at 10:00",
+                "recipient_name":               "Voter " + str(number),
+                "recipient_voter_email":        "voter" + str(number) + "@example.com",
+                "recipient_unsubscribe_url":    "https://campaigns.wevote.us/settings/notifications/esk/" +
+                                                str(number),
+            })
+
+        # What merge_message_content_with_template did for each recipient before templates were kept compiled
+        text_template_path = EMAIL_TEMPLATE_FOLDER + get_template_filename(CAMPAIGNX_NEWS_ITEM_TEMPLATE, "TEXT")
+        html_template_path = EMAIL_TEMPLATE_FOLDER + get_template_filename(CAMPAIGNX_NEWS_ITEM_TEMPLATE, "HTML")
+        start_time = time.perf_counter()
+        for recipient_template_variables_dict in recipient_template_variables_list:
+            template_variables_dict = dict(shared_template_variables_dict)
+            template_variables_dict.update(recipient_template_variables_dict)
+            template_variables_dict = json.loads(json.dumps(template_variables_dict, ensure_ascii=True))
+            get_template(text_template_path).render(template_variables_dict)
+            get_template(html_template_path).render(template_variables_dict)
+        one_at_a_time_seconds = time.perf_counter() - start_time
+
+        start_time = time.perf_counter()
+        results = render_email_for_recipient_list(
+            kind_of_email_template=CAMPAIGNX_NEWS_ITEM_TEMPLATE,
+            shared_template_variables_dict=shared_template_variables_dict,
+            recipient_template_variables_list=recipient_template_variables_list,
+            batch_size=options['batch_size'],
+            process_count=options['processes'])
+        bulk_seconds = time.perf_counter() - start_time
+
+        self.stdout.write('Recipients: {}'.format(recipient_count))
+        self.stdout.write('One at a time: {:.3f} seconds ({:.1f} per second)'.format(
+            one_at_a_time_seconds, recipient_count / one_at_a_time_seconds if one_at_a_time_seconds else 0))
+        self.stdout.write('Bulk render: {:.3f} seconds ({:.1f} per second), success: {}'.format(
+            bulk_seconds, recipient_count / bulk_seconds if bulk_seconds else 0, results['success']))
@@ -0,0 +1,89 @@
+# email_outbound/tests.py
+# Brought to you by We Vote. Be good.
+# -*- coding: UTF-8 -*-
+
+import json
+from unittest.mock import patch
+
+from django.test import SimpleTestCase, TestCase
+
+from campaign.controllers_email_outbound import campaignx_news_item_send_to_recipient_list
+from email_outbound.functions import merge_message_content_with_template, render_email_batch, \
+    render_email_for_recipient_list
+from email_outbound.models import CAMPAIGNX_NEWS_ITEM_TEMPLATE, EmailScheduled
+
+SHARED_TEMPLATE_VARIABLES_DICT = {
+    "subject":                  "Campaign update",
+    "campaignx_title":          "Save the Oakland Library",
+    "campaignx_news_text":      "We collected 10,000 signatures this week.",
+    "speaker_voter_name":       "Sam Speaker",
+}
+
+
+def recipient_template_variables_dict(number):
+    return {
+        "recipient_name":               "Voter " + str(number),
+        "recipient_voter_email":        "voter" + str(number) + "@example.com",
+        "recipient_unsubscribe_url":    "https://campaigns.wevote.us/settings/notifications/esk/" + str(number),
+    }
+
+
+class RenderEmailForRecipientListTestCase(SimpleTestCase):
+
+    def test_bulk_render_matches_one_at_a_time(self):
+        recipient_template_variables_list = [recipient_template_variables_dict(number) for number in range(5)]
+        for process_count in [0, 2]:
+            results = render_email_for_recipient_list(
+                CAMPAIGNX_NEWS_ITEM_TEMPLATE, shared_template_variables_dict=SHARED_TEMPLATE_VARIABLES_DICT,
+                recipient_template_variables_list=recipient_template_variables_list, batch_size=2,
+                process_count=process_count)
+            self.assertTrue(results['success'])
+            for recipient_variables_dict, rendered in zip(recipient_template_variables_list,
+                                                          results['rendered_list']):
+                template_variables_dict = dict(SHARED_TEMPLATE_VARIABLES_DICT)
+                template_variables_dict.update(recipient_variables_dict)
+                merge_results = merge_message_content_with_template(
+                    CAMPAIGNX_NEWS_ITEM_TEMPLATE, json.dumps(template_variables_dict))
+                self.assertEqual((rendered['subject'], rendered['message_text'], rendered['message_html']),
+                                 (merge_results['subject'], merge_results['message_text'],
+                                  merge_results['message_html']))
+
+
+class CampaignXNewsItemSendTestCase(TestCase):
+    databases = ["default", "readonly"]
+
+    @patch('email_outbound.models.EmailManager.send_scheduled_email')
+    @patch('campaign.controllers_email_outbound.campaignx_news_item_recipient_template_variables')
+    def test_news_item_is_rendered_once_for_the_batch(self, recipient_template_variables, send_scheduled_email):
+        def recipient_results(recipient_voter_we_vote_id='', **kwargs):
+            if recipient_voter_we_vote_id == 'wv01voter3':
+                return {'success': True, 'status': "RECIPIENT_VOTER_DOES_NOT_HAVE_VALID_EMAIL ",
+                        'recipient_found': False}
+            number = recipient_voter_we_vote_id[-1]
+            return {
+                'success':                      True,
+                'status':                       "",
+                'recipient_found':              True,
+                'recipient_email':              "voter" + number + "@example.com",
+                'recipient_email_we_vote_id':   'wv01email' + number,
+                'recipient_voter_we_vote_id':   recipient_voter_we_vote_id,
+                'recipient_template_variables_dict': recipient_template_variables_dict(number),
+            }
+        recipient_template_variables.side_effect = recipient_results
+        send_scheduled_email.return_value = {'success': True, 'status': "", 'email_scheduled_sent': True}
+
+        with patch('email_outbound.functions.render_email_batch', wraps=render_email_batch) as render_email_batch_mock:
+            results = campaignx_news_item_send_to_recipient_list(
+                campaignx_news_item_we_vote_id='wv01cni1', campaignx_title="Save the Oakland Library",
+                campaignx_url='https://campaigns.wevote.us/c/save-library', campaignx_we_vote_id='wv01camp1',
+                recipient_voter_we_vote_id_list=['wv01voter1', 'wv01voter2', 'wv01voter3'],
+                speaker_voter_name="Sam Speaker", speaker_voter_we_vote_id='wv01voter9',
+                statement_subject="Campaign update")
+
+        self.assertEqual(render_email_batch_mock.call_count, 1)
+        self.assertTrue(results['success'])
+        self.assertEqual(sorted(results['send_results_dict'].keys()), ['wv01voter1', 'wv01voter2', 'wv01voter3'])
+        self.assertEqual(send_scheduled_email.call_count, 2)
+        email_scheduled = EmailScheduled.objects.get(recipient_voter_we_vote_id='wv01voter2')
+        self.assertEqual(email_scheduled.subject, "Campaign update")
+        self.assertIn("Hello Voter 2", email_scheduled.message_text)
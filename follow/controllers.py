@@ -2,10 +2,12 @@
 # Brought to you by We Vote. Be good.
 # -*- coding: UTF-8 -*-
 
-from .models import FollowOrganizationList, FollowOrganizationManager, UPDATE_SUGGESTIONS_FROM_TWITTER_IDS_I_FOLLOW, \
-    FOLLOW_SUGGESTIONS_FROM_TWITTER_IDS_I_FOLLOW, FollowIssueList, FollowIssueManager, FOLLOWING, FollowMetricsManager
+from .models import FollowOrganization, FollowOrganizationList, FollowOrganizationManager, \
+    UPDATE_SUGGESTIONS_FROM_TWITTER_IDS_I_FOLLOW, FOLLOW_SUGGESTIONS_FROM_TWITTER_IDS_I_FOLLOW, FollowIssueList, \
+    FollowIssueManager, FollowMetricsManager, invalidate_voter_follow_state
 from analytics.models import ACTION_ISSUE_FOLLOW, ACTION_ISSUE_FOLLOW_IGNORE, \
     ACTION_ISSUE_STOP_FOLLOWING, AnalyticsManager
+from background_task import background
 from django.http import HttpResponse
 from friend.models import FriendManager
 import json
@@ -19,6 +21,23 @@ from wevote_functions.functions import is_voter_device_id_valid, positive_value_
 logger = wevote_functions.admin.get_logger(__name__)
 
 
+@background(schedule=0)
+def heal_follow_organization_voter_linked_organization_we_vote_id(voter_id, voter_linked_organization_we_vote_id):
+    """
+    Scheduled from FollowOrganizationList.retrieve_follow_organization_by_voter_id_simple_id_array when it finds
+    follow entries that don't carry the voter's current linked_organization_we_vote_id. One UPDATE fixes them all.
+    :param voter_id:
+    :param voter_linked_organization_we_vote_id:
+    :return:
+    """
+    try:
+        FollowOrganization.objects.filter(voter_id=voter_id) \
+            .exclude(voter_linked_organization_we_vote_id=voter_linked_organization_we_vote_id) \
+            .update(voter_linked_organization_we_vote_id=voter_linked_organization_we_vote_id)
+    except Exception as e:
+        logger.error('FAILED_TO_HEAL_FOLLOW_ORGANIZATION-voter_id ' + str(voter_id) + ' ' + str(e))
+
+
 def delete_follow_entries_for_voter(voter_to_delete_id):
     status = ''
     success = False
@@ -45,6 +64,8 @@ def delete_follow_entries_for_voter(voter_to_delete_id):
             follow_entries_deleted += 1
         except Exception as e:
             follow_entries_not_deleted += 1
+    if follow_entries_deleted:
+        invalidate_voter_follow_state(voter_to_delete_id)
 
     results = {
         'status':                       status,
@@ -104,11 +125,13 @@ def delete_organization_followers_for_organization(from_organization_id, from_or
 
     # We search on both from_organization_id and from_organization_we_vote_id in case there is some data that needs
     # to be healed
+    follower_voter_id_set = set()
     from_follow_list = follow_organization_list.retrieve_follow_organization_by_organization_id(from_organization_id)
     for from_follow_entry in from_follow_list:
         try:
             from_follow_entry.delete()
             follow_entries_deleted += 1
+            follower_voter_id_set.add(from_follow_entry.voter_id)
         except Exception as e:
             follow_entries_not_deleted += 1
 
@@ -118,8 +141,11 @@ def delete_organization_followers_for_organization(from_organization_id, from_or
         try:
             from_follow_entry.delete()
             follow_entries_deleted += 1
+            follower_voter_id_set.add(from_follow_entry.voter_id)
         except Exception as e:
             follow_entries_not_deleted += 1
+    for follower_voter_id in follower_voter_id_set:
+        invalidate_voter_follow_state(follower_voter_id)
 
     results = {
         'status':                       status,
@@ -277,6 +303,9 @@ def move_follow_entries_to_another_voter(from_voter_id, to_voter_id, to_voter_we
                 follow_entries_moved += 1
             except Exception as e:
                 follow_entries_not_moved += 1
+    if follow_entries_moved:
+        invalidate_voter_follow_state(from_voter_id)
+        invalidate_voter_follow_state(to_voter_id)
 
     results = {
         'status':                   status,
@@ -290,89 +319,6 @@ def move_follow_entries_to_another_voter(from_voter_id, to_voter_id, to_voter_we
     return results
 
 
-def move_follow_issue_entries_to_another_voter(from_voter_we_vote_id, to_voter_we_vote_id):
-    status = ''
-    success = False
-    follow_issue_entries_moved = 0
-    follow_issue_entries_not_moved = 0
-    follow_issue_list = FollowIssueList()
-
-    if not positive_value_exists(from_voter_we_vote_id) or not positive_value_exists(to_voter_we_vote_id):
-        status += "MOVE_FOLLOW_ISSUE_ENTRIES_TO_ANOTHER_VOTER-" \
-                  "Missing either from_voter_we_vote_id or to_voter_we_vote_id "
-        results = {
-            'status': status,
-            'success': success,
-            'from_voter_we_vote_id': from_voter_we_vote_id,
-            'to_voter_we_vote_id': to_voter_we_vote_id,
-            'follow_issue_entries_moved': follow_issue_entries_moved,
-            'follow_issue_entries_not_moved': follow_issue_entries_not_moved,
-        }
-        return results
-
-    if from_voter_we_vote_id == to_voter_we_vote_id:
-        status += "MOVE_FOLLOW_ISSUE_ENTRIES_TO_ANOTHER_VOTER-from_voter_we_vote_id and to_voter_we_vote_id identical "
-        results = {
-            'status': status,
-            'success': success,
-            'from_voter_we_vote_id': from_voter_we_vote_id,
-            'to_voter_we_vote_id': to_voter_we_vote_id,
-            'follow_issue_entries_moved': follow_issue_entries_moved,
-            'follow_issue_entries_not_moved': follow_issue_entries_not_moved,
-        }
-        return results
-
-    from_follow_issue_list = follow_issue_list.retrieve_follow_issue_list_by_voter_we_vote_id(
-        from_voter_we_vote_id, read_only=False)
-    to_follow_issue_list = follow_issue_list.retrieve_follow_issue_list_by_voter_we_vote_id(
-        to_voter_we_vote_id, read_only=False)
-    to_follow_issue_we_vote_id_list = \
-        follow_issue_list.retrieve_follow_issue_we_vote_id_list_by_voter_we_vote_id(to_voter_we_vote_id)
-
-    for from_follow_issue_entry in from_follow_issue_list:
-        # See if the "to_voter" already has an entry for this issue
-        if from_follow_issue_entry.issue_we_vote_id in to_follow_issue_we_vote_id_list:
-            # Find the entry in the to_follow_issue_list
-            for to_follow_issue_entry in to_follow_issue_list:
-                if to_follow_issue_entry.issue_we_vote_id == from_follow_issue_entry.issue_we_vote_id:
-                    # Change the following status if it is not already FOLLOWING
-                    if to_follow_issue_entry.following_status == FOLLOWING:
-                        # If the to_voter entry is already FOLLOWING, leave it
-                        continue
-                    else:
-                        # Update the to_follow_issue_entry with the following_status
-                        try:
-                            to_follow_issue_entry.following_status = from_follow_issue_entry.following_status
-                            to_follow_issue_entry.save()
-                            follow_issue_entries_moved += 1
-                        except Exception as e:
-                            follow_issue_entries_not_moved += 1
-                            status += "FAILED_TO_FOLLOW_ISSUE_SAVE: " + str(e) + " "
-                        continue
-
-        else:
-            # Change the from_voter_we_vote_id to to_voter_we_vote_id
-            try:
-                from_follow_issue_entry.voter_we_vote_id = to_voter_we_vote_id
-                # We don't currently store follow entries by we_vote_id
-                # from_follow_issue_entry.voter_we_vote_id = to_voter_we_vote_id
-                from_follow_issue_entry.save()
-                follow_issue_entries_moved += 1
-            except Exception as e:
-                follow_issue_entries_not_moved += 1
-                status += "FAILED_FROM_FOLLOW_ISSUE_SAVE: " + str(e) + " "
-
-    results = {
-        'status':                           status,
-        'success':                          success,
-        'from_voter_we_vote_id':            from_voter_we_vote_id,
-        'to_voter_we_vote_id':              to_voter_we_vote_id,
-        'follow_issue_entries_moved':       follow_issue_entries_moved,
-        'follow_issue_entries_not_moved':   follow_issue_entries_not_moved,
-    }
-    return results
-
-
 def duplicate_organization_followers_to_another_organization(from_organization_id, from_organization_we_vote_id,
                                                              to_organization_id, to_organization_we_vote_id):
     status = ''
@@ -383,6 +329,7 @@ def duplicate_organization_followers_to_another_organization(from_organization_i
     organization_manager = OrganizationManager()
     follow_organization_list = FollowOrganizationList()
     follow_organization_manager = FollowOrganizationManager()
+    follower_voter_id_set = set()
 
     # We search on both from_organization_id and from_organization_we_vote_id in case there is some data that needs
     # to be healed
@@ -412,6 +359,7 @@ def duplicate_organization_followers_to_another_organization(from_organization_i
                 from_follow_entry.organization_we_vote_id = to_organization_we_vote_id
                 from_follow_entry.save()
                 follow_entries_duplicated += 1
+                follower_voter_id_set.add(from_follow_entry.voter_id)
             except Exception as e:
                 follow_entries_not_duplicated += 1
 
@@ -442,8 +390,11 @@ def duplicate_organization_followers_to_another_organization(from_organization_i
                 from_follow_entry.organization_we_vote_id = to_organization_we_vote_id
                 from_follow_entry.save()
                 follow_entries_duplicated += 1
+                follower_voter_id_set.add(from_follow_entry.voter_id)
             except Exception as e:
                 follow_entries_not_duplicated += 1
+    for follower_voter_id in follower_voter_id_set:
+        invalidate_voter_follow_state(follower_voter_id)
 
     results = {
         'status':                           status,
@@ -2,6 +2,7 @@
 # Brought to you by We Vote. Be good.
 # -*- coding: UTF-8 -*-
 
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from django.db import models
 from election.models import ElectionManager
@@ -10,9 +11,12 @@ from exception.models import handle_exception, handle_record_found_more_than_one
 from issue.models import IssueManager
 from organization.models import OrganizationManager
 import pytz
+import threading
+import time
 import wevote_functions.admin
-from wevote_functions.functions import positive_value_exists
+from wevote_functions.functions import convert_to_int, positive_value_exists
 from voter.models import VoterManager
+from wevote_settings.models import fetch_cache_version, increment_cache_version
 
 
 FOLLOWING = 'FOLLOWING'
@@ -42,6 +46,22 @@ FOLLOW_SUGGESTIONS_FROM_FRIENDS_ON_TWITTER = 'FOLLOW_SUGGESTIONS_FROM_FRIENDS_ON
 
 logger = wevote_functions.admin.get_logger(__name__)
 
+# Which organizations a voter follows or ignores, cached per worker. Voters share
+#  VOTER_FOLLOW_STATE_VERSION_BUCKETS version stamps (voter_id modulo the bucket count), bumped whenever a voter's
+#  follow entries change (see invalidate_voter_follow_state). Each worker checks a bucket's version at most every
+#  VOTER_FOLLOW_STATE_VERSION_CHECK_SECONDS, and loads the state again after VOTER_FOLLOW_STATE_MAX_AGE_SECONDS
+#  because queryset .update() calls elsewhere don't bump the version.
+VOTER_FOLLOW_STATE_MAX_AGE_SECONDS = 900
+VOTER_FOLLOW_STATE_VERSION_BUCKETS = 1024
+VOTER_FOLLOW_STATE_VERSION_CHECK_SECONDS = 10
+VOTER_FOLLOW_STATE_CACHE_MAX_ENTRIES = 50000
+voter_follow_state_cache = OrderedDict()
+voter_follow_state_version_dict = {}
+voter_follow_state_cache_lock = threading.Lock()
+# The voter_ids this worker has already scheduled a heal for, so a read doesn't schedule it again before it has run
+HEAL_FOLLOW_ORGANIZATION_SCHEDULE_SECONDS = 600
+heal_follow_organization_scheduled_dict = {}
+
 
 class FollowCampaignX(models.Model):
     voter_we_vote_id = models.CharField(max_length=255, null=True, blank=True, unique=False, db_index=True)
@@ -957,6 +977,7 @@ class FollowOrganizationManager(models.Manager):
                 follow_organization_on_stage.save()
                 follow_organization_on_stage_id = follow_organization_on_stage.id
                 follow_organization_on_stage_found = True
+                invalidate_voter_follow_state(voter_id)
                 status += 'UPDATE ' + following_status
             except Exception as e:
                 status += 'FAILED_TO_UPDATE ' + following_status + ' '
@@ -987,6 +1008,7 @@ class FollowOrganizationManager(models.Manager):
                     follow_organization_on_stage.save()
                     follow_organization_on_stage_id = follow_organization_on_stage.id
                     follow_organization_on_stage_found = True
+                    invalidate_voter_follow_state(voter_id)
                     status += 'CREATE ' + following_status + ' '
                 else:
                     status += 'ORGANIZATION_NOT_FOUND_ON_CREATE ' + following_status + ' '
@@ -1323,34 +1345,95 @@ class FollowOrganizationList(models.Model):
     def retrieve_follow_organization_by_voter_id_simple_id_array(self, voter_id, return_we_vote_id=False,
                                                                  auto_followed_from_twitter_suggestion=False,
                                                                  read_only=False):
-        follow_organization_list_manager = FollowOrganizationList()
-        follow_organization_list = \
-            follow_organization_list_manager.retrieve_follow_organization_by_voter_id(
-                voter_id, auto_followed_from_twitter_suggestion, read_only=read_only)
-        follow_organization_list_simple_array = []
-        if len(follow_organization_list):
+        try:
+            if read_only:
+                follow_organization_query = FollowOrganization.objects.using('readonly').all()
+            else:
+                follow_organization_query = FollowOrganization.objects.all()
+            follow_organization_query = follow_organization_query.filter(voter_id=voter_id)
+            follow_organization_query = follow_organization_query.filter(following_status=FOLLOWING)
+            if auto_followed_from_twitter_suggestion:
+                follow_organization_query = follow_organization_query.filter(
+                    auto_followed_from_twitter_suggestion=auto_followed_from_twitter_suggestion)
+            follow_organization_values_list = list(follow_organization_query.values_list(
+                'organization_id', 'organization_we_vote_id', 'voter_linked_organization_we_vote_id'))
+        except Exception as e:
+            handle_record_not_found_exception(e, logger=logger)
+            return []
+
+        if not read_only and len(follow_organization_values_list):
+            # Heal the data by making sure the voter's linked_organization_we_vote_id exists and is accurate.
+            #  The write happens in a background task so this read stays a read.
             voter_manager = VoterManager()
             voter_linked_organization_we_vote_id = \
                 voter_manager.fetch_linked_organization_we_vote_id_from_local_id(voter_id)
-            for follow_organization in follow_organization_list:
-                if not read_only:
-                    # Heal the data by making sure the voter's linked_organization_we_vote_id exists and is accurate
-                    if positive_value_exists(voter_linked_organization_we_vote_id) \
-                        and voter_linked_organization_we_vote_id != \
-                            follow_organization.voter_linked_organization_we_vote_id:
-                        try:
-                            follow_organization.voter_linked_organization_we_vote_id = \
-                                voter_linked_organization_we_vote_id
-                            follow_organization.save()
-                        except Exception as e:
-                            status = 'FAILED_TO_UPDATE_FOLLOW_ISSUE-voter_id ' + str(voter_id)
-                            handle_record_not_saved_exception(e, logger=logger, exception_message_optional=status)
+            if positive_value_exists(voter_linked_organization_we_vote_id):
+                for organization_id, organization_we_vote_id, follow_voter_linked_organization_we_vote_id \
+                        in follow_organization_values_list:
+                    if voter_linked_organization_we_vote_id != follow_voter_linked_organization_we_vote_id:
+                        schedule_heal_follow_organization_voter_linked_organization_we_vote_id(
+                            voter_id, voter_linked_organization_we_vote_id)
+                        break
+
+        if return_we_vote_id:
+            return [one_follow[1] for one_follow in follow_organization_values_list]
+        else:
+            return [one_follow[0] for one_follow in follow_organization_values_list]
 
-                if return_we_vote_id:
-                    follow_organization_list_simple_array.append(follow_organization.organization_we_vote_id)
+    def retrieve_voter_follow_state(self, voter_id):
+        """
+        Snapshot of the organizations this voter follows and ignores, loaded with one query and shared by all the
+        voter guide endpoints. The frozensets must not be modified.
+        :param voter_id:
+        :return:
+        """
+        if not positive_value_exists(voter_id):
+            return {
+                'organization_we_vote_ids_followed':    frozenset(),
+                'organization_we_vote_ids_ignored':     frozenset(),
+            }
+
+        voter_id = convert_to_int(voter_id)
+        cache_version = fetch_voter_follow_state_version(voter_id)
+        cached_entry = voter_follow_state_cache.get(voter_id)
+        if cached_entry is not None and cached_entry['cache_version'] == cache_version \
+                and time.monotonic() - cached_entry['loaded_time'] < VOTER_FOLLOW_STATE_MAX_AGE_SECONDS:
+            return cached_entry['voter_follow_state']
+
+        organization_we_vote_ids_followed = set()
+        organization_we_vote_ids_ignored = set()
+        try:
+            # Read from the primary database, so a worker never caches a state older than the version it just read
+            follow_organization_values_list = FollowOrganization.objects \
+                .filter(voter_id=voter_id, following_status__in=[FOLLOWING, FOLLOW_IGNORE]) \
+                .values_list('organization_we_vote_id', 'following_status')
+            for organization_we_vote_id, following_status in follow_organization_values_list:
+                if following_status == FOLLOWING:
+                    organization_we_vote_ids_followed.add(organization_we_vote_id)
                 else:
-                    follow_organization_list_simple_array.append(follow_organization.organization_id)
-        return follow_organization_list_simple_array
+                    organization_we_vote_ids_ignored.add(organization_we_vote_id)
+        except Exception as e:
+            handle_record_not_found_exception(e, logger=logger)
+            # Don't cache a failed read
+            return {
+                'organization_we_vote_ids_followed':    frozenset(organization_we_vote_ids_followed),
+                'organization_we_vote_ids_ignored':     frozenset(organization_we_vote_ids_ignored),
+            }
+
+        voter_follow_state = {
+            'organization_we_vote_ids_followed':    frozenset(organization_we_vote_ids_followed),
+            'organization_we_vote_ids_ignored':     frozenset(organization_we_vote_ids_ignored),
+        }
+        with voter_follow_state_cache_lock:
+            voter_follow_state_cache[voter_id] = {
+                'cache_version':        cache_version,
+                'loaded_time':          time.monotonic(),
+                'voter_follow_state':   voter_follow_state,
+            }
+            voter_follow_state_cache.move_to_end(voter_id)
+            while len(voter_follow_state_cache) > VOTER_FOLLOW_STATE_CACHE_MAX_ENTRIES:
+                voter_follow_state_cache.popitem(last=False)
+        return voter_follow_state
 
     def retrieve_followed_organization_by_organization_we_vote_id_simple_id_array(
             self, organization_we_vote_id, return_we_vote_id=False,
@@ -1513,3 +1596,66 @@ class SuggestedOrganizationToFollow(models.Model):
         else:
             # If the we_vote_id passed in wasn't found, don't return another we_vote_id
             return ""
+
+
+def voter_follow_state_version_name(voter_id):
+    return 'voter_follow_state_version_' + str(convert_to_int(voter_id) % VOTER_FOLLOW_STATE_VERSION_BUCKETS)
+
+
+def fetch_voter_follow_state_version(voter_id):
+    """
+    The version stamp of this voter's bucket, read from the database at most every
+    VOTER_FOLLOW_STATE_VERSION_CHECK_SECONDS
+    :param voter_id:
+    :return:
+    """
+    version_name = voter_follow_state_version_name(voter_id)
+    version_entry = voter_follow_state_version_dict.get(version_name)
+    if version_entry is not None and \
+            time.monotonic() - version_entry['checked_time'] < VOTER_FOLLOW_STATE_VERSION_CHECK_SECONDS:
+        return version_entry['cache_version']
+    cache_version = fetch_cache_version(version_name)
+    voter_follow_state_version_dict[version_name] = {
+        'cache_version':    cache_version,
+        'checked_time':     time.monotonic(),
+    }
+    return cache_version
+
+
+def invalidate_voter_follow_state(voter_id):
+    """
+    Tell every worker that the follow state it cached for this voter is out of date
+    (see FollowOrganizationList.retrieve_voter_follow_state)
+    :param voter_id:
+    :return:
+    """
+    if not positive_value_exists(voter_id):
+        return
+    voter_id = convert_to_int(voter_id)
+    increment_cache_version(voter_follow_state_version_name(voter_id))
+    with voter_follow_state_cache_lock:
+        voter_follow_state_cache.pop(voter_id, None)
+        voter_follow_state_version_dict.pop(voter_follow_state_version_name(voter_id), None)
+
+
+def schedule_heal_follow_organization_voter_linked_organization_we_vote_id(
+        voter_id, voter_linked_organization_we_vote_id):
+    """
+    Schedule heal_follow_organization_voter_linked_organization_we_vote_id, unless this worker already scheduled it
+    for this voter in the last HEAL_FOLLOW_ORGANIZATION_SCHEDULE_SECONDS
+    :param voter_id:
+    :param voter_linked_organization_we_vote_id:
+    :return:
+    """
+    now = time.monotonic()
+    heal_key = (voter_id, voter_linked_organization_we_vote_id)
+    with voter_follow_state_cache_lock:
+        scheduled_time = heal_follow_organization_scheduled_dict.get(heal_key)
+        if scheduled_time is not None and now - scheduled_time < HEAL_FOLLOW_ORGANIZATION_SCHEDULE_SECONDS:
+            return False
+        if len(heal_follow_organization_scheduled_dict) > VOTER_FOLLOW_STATE_CACHE_MAX_ENTRIES:
+            heal_follow_organization_scheduled_dict.clear()
+        heal_follow_organization_scheduled_dict[heal_key] = now
+    from follow.controllers import heal_follow_organization_voter_linked_organization_we_vote_id
+    heal_follow_organization_voter_linked_organization_we_vote_id(voter_id, voter_linked_organization_we_vote_id)
+    return True
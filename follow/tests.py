@@ -0,0 +1,66 @@
+# follow/tests.py
+# Brought to you by We Vote. Be good.
+# -*- coding: UTF-8 -*-
+
+from unittest.mock import patch
+
+from django.test import TestCase
+
+import follow.models
+from follow.controllers import move_follow_entries_to_another_voter
+from follow.models import FollowOrganization, FollowOrganizationList, FOLLOWING, voter_follow_state_version_name
+from wevote_settings.models import increment_cache_version
+
+
+class VoterFollowStateTestCase(TestCase):
+    databases = ["default", "readonly"]
+
+    def setUp(self):
+        follow.models.voter_follow_state_cache.clear()
+        follow.models.voter_follow_state_version_dict.clear()
+        follow.models.heal_follow_organization_scheduled_dict.clear()
+        FollowOrganization.objects.create(voter_id=1, organization_id=10, organization_we_vote_id='wv01org10',
+                                          following_status=FOLLOWING)
+        FollowOrganization.objects.create(voter_id=2, organization_id=11, organization_we_vote_id='wv01org11',
+                                          following_status=FOLLOWING)
+
+    def test_another_worker_sees_the_change_once_the_version_is_bumped(self):
+        follow_organization_list = FollowOrganizationList()
+        self.assertEqual(follow_organization_list.retrieve_voter_follow_state(1)['organization_we_vote_ids_followed'],
+                         frozenset(['wv01org10']))
+
+        # Saved by another worker, which bumps the version in the database
+        FollowOrganization.objects.create(voter_id=1, organization_id=12, organization_we_vote_id='wv01org12',
+                                          following_status=FOLLOWING)
+        increment_cache_version(voter_follow_state_version_name(1))
+        self.assertEqual(follow_organization_list.retrieve_voter_follow_state(1)['organization_we_vote_ids_followed'],
+                         frozenset(['wv01org10']))
+
+        # Until this worker checks the version again
+        follow.models.voter_follow_state_version_dict.clear()
+        self.assertEqual(follow_organization_list.retrieve_voter_follow_state(1)['organization_we_vote_ids_followed'],
+                         frozenset(['wv01org10', 'wv01org12']))
+
+    def test_merge_invalidates_both_voters(self):
+        follow_organization_list = FollowOrganizationList()
+        follow_organization_list.retrieve_voter_follow_state(1)
+        follow_organization_list.retrieve_voter_follow_state(2)
+
+        results = move_follow_entries_to_another_voter(2, 1, 'wv01voter1')
+
+        self.assertEqual(results['follow_entries_moved'], 1)
+        self.assertEqual(follow_organization_list.retrieve_voter_follow_state(1), {
+            'organization_we_vote_ids_followed':    frozenset(['wv01org10', 'wv01org11']),
+            'organization_we_vote_ids_ignored':     frozenset(),
+        })
+        self.assertEqual(follow_organization_list.retrieve_voter_follow_state(2)['organization_we_vote_ids_followed'],
+                         frozenset())
+
+    @patch('follow.controllers.heal_follow_organization_voter_linked_organization_we_vote_id')
+    @patch('follow.models.VoterManager.fetch_linked_organization_we_vote_id_from_local_id', return_value='wv01org1')
+    def test_heal_is_scheduled_once(self, fetch_linked_organization_we_vote_id, heal):
+        follow_organization_list = FollowOrganizationList()
+        for _ in range(3):
+            self.assertEqual(follow_organization_list.retrieve_follow_organization_by_voter_id_simple_id_array(
+                1, return_we_vote_id=True), ['wv01org10'])
+        heal.assert_called_once_with(1, 'wv01org1')
@@ -2,73 +2,94 @@
 # Brought to you by We Vote. Be good.
 # -*- coding: UTF-8 -*-
 
+from collections import OrderedDict
 import sys
+import threading
 import geoip2.database
+import geoip2.errors
 import wevote_functions.admin
 from config.base import get_environment_variable_default
 from wevote_functions.functions import get_ip_from_headers, positive_value_exists
 
 logger = wevote_functions.admin.get_logger(__name__)
 
+GEOIP_LOCATION_CACHE_MAX_SIZE = 100000
+# Successful lookups (including "not found" in the database) by ip address, least recently used first
+geoip_location_cache = OrderedDict()
+geoip_location_cache_lock = threading.Lock()
 
-def voter_location_retrieve_from_ip_for_api(request, ip_address=''):
+# One reader per process. MODE_MMAP maps the database file into memory, so every gunicorn worker on a host shares
+#  the same pages from the OS page cache instead of each one reading and parsing its own copy.
+geoip_reader = None
+geoip_reader_lock = threading.Lock()
+
+
+def get_geoip_reader():
+    global geoip_reader
+    if geoip_reader is None:
+        with geoip_reader_lock:
+            if geoip_reader is None:
+                database_location = get_environment_variable_default('GEOLITE2_DATABASE_LOCATION',
+                                                                     'geoip2/city-db/GeoLite2-City.mmdb')
+                geoip_reader = geoip2.database.Reader(database_location, mode=geoip2.database.MODE_MMAP)
+    return geoip_reader
+
+
+def close_geoip_reader():
     """
-    Used by the api voterLocationRetrieveFromIP
-    https://www.maxmind.com/en/geoip2-databases
-    https://geoip2.readthedocs.io/en/latest/#city-database
-    https://www.maxmind.com/en/geoip-demo
-    :param request:
-    :param ip_address:
+    Close the shared reader (e.g., after the GeoLite2 database file has been replaced). The next lookup reopens it.
     :return:
     """
-    x_forwarded_for = request.META.get('X-Forwarded-For')
-    http_x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
+    global geoip_reader
+    with geoip_reader_lock:
+        if geoip_reader is not None:
+            try:
+                geoip_reader.close()
+            except Exception as e:
+                logger.error("close_geoip_reader error: " + str(e))
+            geoip_reader = None
+    clear_geoip_location_cache()
 
-    if not positive_value_exists(ip_address):
-        ip_address = get_ip_from_headers(request)
-
-    # For testing - NY IP Address
-    # if not positive_value_exists(ip_address):
-    #     ip_address = '108.46.177.24'
-
-    if ip_address == '127.0.0.1' and 'test' not in sys.argv:
-        ip_address = '73.158.32.221'
-        try:
-            if 'only_log_ip_substitution_once' not in sys.argv:
-                sys.argv.append('only_log_ip_substitution_once')
-                print("Running on a local dev server, "
-                      "so we are sending a valid Oakland IP address 73.158.32.221 for use in geolocation")
-        except Exception as e:
-            pass
 
-    if not positive_value_exists(ip_address):
-        # return HttpResponse('missing ip_address request parameter', status=400)
-        response_content = {
-            'success':              False,
-            'status':               'LOCATION_RETRIEVE_IP_ADDRESS_REQUEST_PARAMETER_MISSING',
-            'voter_location_found': False,
-            'voter_location':       '',
-            'city':                 '',
-            'region':               '',
-            'postal_code':          '',
-            'ip_address':           ip_address,
-            'x_forwarded_for':      x_forwarded_for,
-            'http_x_forwarded_for': http_x_forwarded_for,
-        }
+def clear_geoip_location_cache():
+    with geoip_location_cache_lock:
+        geoip_location_cache.clear()
 
-        return response_content
 
+def retrieve_location_from_ip_address(ip_address):
+    """
+    Look up one ip address in the shared reader. Successful results (including "not found") are cached per process,
+    so the returned dict must be treated as read-only. A failed lookup is tried again the next time.
+    :param ip_address:
+    :return:
+    """
+    with geoip_location_cache_lock:
+        location_results = geoip_location_cache.get(ip_address)
+        if location_results is not None:
+            geoip_location_cache.move_to_end(ip_address)
+            return location_results
+    location_results = lookup_location_from_ip_address(ip_address)
+    if location_results['success']:
+        with geoip_location_cache_lock:
+            geoip_location_cache[ip_address] = location_results
+            geoip_location_cache.move_to_end(ip_address)
+            while len(geoip_location_cache) > GEOIP_LOCATION_CACHE_MAX_SIZE:
+                geoip_location_cache.popitem(last=False)
+    return location_results
+
+
+def lookup_location_from_ip_address(ip_address):
+    """
+    Look up one ip address in the shared reader, without the cache
+    :param ip_address:
+    :return:
+    """
     try:
-        database_location = get_environment_variable_default('GEOLITE2_DATABASE_LOCATION',
-                                                             'geoip2/city-db/GeoLite2-City.mmdb')
-        reader = geoip2.database.Reader(database_location)
-        response = reader.city(ip_address)
-
-    except geoip2.errors.AddressNotFoundError as e:
+        response = get_geoip_reader().city(ip_address)
+    except (geoip2.errors.AddressNotFoundError, ValueError) as e:
         if 'test' not in sys.argv:
-            logger.error("voter_location_retrieve_from_ip_for_api ip " + ip_address + " not found: " + str(e))
-
-        response_content = {
+            logger.error("retrieve_location_from_ip_address ip " + ip_address + " not found: " + str(e))
+        return {
             'success':              True,
             'status':               'LOCATION_NOT_FOUND',
             'voter_location_found': False,
@@ -76,13 +97,8 @@ def voter_location_retrieve_from_ip_for_api(request, ip_address=''):
             'city':                 '',
             'region':               '',
             'postal_code':          '',
-            'ip_address':           ip_address,
-            'x_forwarded_for':      x_forwarded_for,
-            'http_x_forwarded_for': http_x_forwarded_for,
         }
 
-        return response_content
-
     voter_location = ''
     city = ''
     region = ''  # could be state_code
@@ -111,11 +127,11 @@ def voter_location_retrieve_from_ip_for_api(request, ip_address=''):
             voter_location_found = False
 
     except Exception as e:
-        logger.error("voter_location_retrieve_from_ip_for_api ip " + ip_address + " parse error: " + str(e))
+        logger.error("retrieve_location_from_ip_address ip " + ip_address + " parse error: " + str(e))
         status = str(e)
         success = False
 
-    response_content = {
+    return {
         'success':              success,
         'status':               status,
         'voter_location_found': voter_location_found,
@@ -123,9 +139,84 @@ def voter_location_retrieve_from_ip_for_api(request, ip_address=''):
         'city':                 city,
         'region':               region,
         'postal_code':          postal_code,
-        'ip_address':           ip_address,
-        'x_forwarded_for':      x_forwarded_for,
-        'http_x_forwarded_for': http_x_forwarded_for,
     }
 
+
+def retrieve_locations_from_ip_address_list(ip_address_list):
+    """
+    Batch lookup for analytics backfills. Duplicate ip addresses are only looked up once.
+    :param ip_address_list:
+    :return: dict of ip_address -> location dict
+    """
+    location_by_ip_address_dict = {}
+    for ip_address in ip_address_list:
+        if not positive_value_exists(ip_address) or ip_address in location_by_ip_address_dict:
+            continue
+        try:
+            location_by_ip_address_dict[ip_address] = dict(retrieve_location_from_ip_address(ip_address))
+        except Exception as e:
+            location_by_ip_address_dict[ip_address] = {
+                'success':              False,
+                'status':               'LOCATION_RETRIEVE_FAILED: ' + str(e),
+                'voter_location_found': False,
+                'voter_location':       '',
+                'city':                 '',
+                'region':               '',
+                'postal_code':          '',
+            }
+    return location_by_ip_address_dict
+
+
+def voter_location_retrieve_from_ip_for_api(request, ip_address=''):
+    """
+    Used by the api voterLocationRetrieveFromIP
+    https://www.maxmind.com/en/geoip2-databases
+    https://geoip2.readthedocs.io/en/latest/#city-database
+    https://www.maxmind.com/en/geoip-demo
+    :param request:
+    :param ip_address:
+    :return:
+    """
+    x_forwarded_for = request.META.get('X-Forwarded-For')
+    http_x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
+
+    if not positive_value_exists(ip_address):
+        ip_address = get_ip_from_headers(request)
+
+    # For testing - NY IP Address
+    # if not positive_value_exists(ip_address):
+    #     ip_address = '108.46.177.24'
+
+    if ip_address == '127.0.0.1' and 'test' not in sys.argv:
+        ip_address = '73.158.32.221'
+        try:
+            if 'only_log_ip_substitution_once' not in sys.argv:
+                sys.argv.append('only_log_ip_substitution_once')
+                print("Running on a local dev server, "
+                      "so we are sending a valid Oakland IP address 73.158.32.221 for use in geolocation")
+        except Exception as e:
+            pass
+
+    if not positive_value_exists(ip_address):
+        # return HttpResponse('missing ip_address request parameter', status=400)
+        response_content = {
+            'success':              False,
+            'status':               'LOCATION_RETRIEVE_IP_ADDRESS_REQUEST_PARAMETER_MISSING',
+            'voter_location_found': False,
+            'voter_location':       '',
+            'city':                 '',
+            'region':               '',
+            'postal_code':          '',
+            'ip_address':           ip_address,
+            'x_forwarded_for':      x_forwarded_for,
+            'http_x_forwarded_for': http_x_forwarded_for,
+        }
+
+        return response_content
+
+    response_content = dict(retrieve_location_from_ip_address(ip_address))
+    response_content['ip_address'] = ip_address
+    response_content['x_forwarded_for'] = x_forwarded_for
+    response_content['http_x_forwarded_for'] = http_x_forwarded_for
+
     return response_content
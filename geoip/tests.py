@@ -1,3 +1,72 @@
-from django.test import TestCase
+from django.test import SimpleTestCase
+import geoip2.errors
+import geoip.controllers
+from geoip.controllers import retrieve_location_from_ip_address, retrieve_locations_from_ip_address_list
 
-# Create your tests here.
+
+class FakeNamedRecord(object):
+    def __init__(self, name=None, iso_code=None, code=None):
+        self.name = name
+        self.iso_code = iso_code
+        self.code = code
+
+
+class FakeSubdivisions(object):
+    def __init__(self, iso_code):
+        self.most_specific = FakeNamedRecord(iso_code=iso_code)
+
+
+class FakeCityResponse(object):
+    def __init__(self, city_name, region, postal_code):
+        self.city = FakeNamedRecord(name=city_name)
+        self.subdivisions = FakeSubdivisions(region)
+        self.postal = FakeNamedRecord(code=postal_code)
+
+
+class FakeGeoIPReader(object):
+    def __init__(self):
+        self.lookup_count = 0
+
+    def city(self, ip_address):
+        self.lookup_count += 1
+        if ip_address == '73.158.32.221':
+            return FakeCityResponse('Oakland', 'CA', '94612')
+        if ip_address == '73.158.32.222':
+            # A response we can't read
+            return object()
+        raise geoip2.errors.AddressNotFoundError(ip_address + ' not in database')
+
+    def close(self):
+        pass
+
+
+class GeoIPSharedReaderTests(SimpleTestCase):
+    def setUp(self):
+        self.fake_reader = FakeGeoIPReader()
+        geoip.controllers.geoip_reader = self.fake_reader
+        geoip.controllers.clear_geoip_location_cache()
+
+    def tearDown(self):
+        geoip.controllers.geoip_reader = None
+        geoip.controllers.clear_geoip_location_cache()
+
+    def test_repeat_lookups_are_cached(self):
+        first_results = retrieve_location_from_ip_address('73.158.32.221')
+        second_results = retrieve_location_from_ip_address('73.158.32.221')
+        self.assertEqual(first_results['voter_location'], 'Oakland, CA 94612')
+        self.assertEqual(first_results, second_results)
+        self.assertEqual(self.fake_reader.lookup_count, 1)
+
+    def test_failed_lookups_are_not_cached(self):
+        self.assertFalse(retrieve_location_from_ip_address('73.158.32.222')['success'])
+        self.assertFalse(retrieve_location_from_ip_address('73.158.32.222')['success'])
+        self.assertEqual(self.fake_reader.lookup_count, 2)
+
+    def test_batch_lookup(self):
+        location_dict = retrieve_locations_from_ip_address_list(
+            ['73.158.32.221', '0.2.1.1', '73.158.32.221', ''])
+        self.assertEqual(set(location_dict.keys()), {'73.158.32.221', '0.2.1.1'})
+        self.assertTrue(location_dict['73.158.32.221']['voter_location_found'])
+        self.assertFalse(location_dict['0.2.1.1']['voter_location_found'])
+        self.assertEqual(location_dict['0.2.1.1']['status'], 'LOCATION_NOT_FOUND')
+        self.assertEqual(self.fake_reader.lookup_count, 2)
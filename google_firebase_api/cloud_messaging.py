@@ -20,6 +20,7 @@ from __future__ import print_function
 import datetime
 
 import firebase_admin
+from firebase_admin import exceptions as firebase_exceptions
 from firebase_admin import messaging
 import os
 from config.base import get_environment_variable
@@ -44,20 +45,26 @@ def test_msg_to_my_phone():
     send_single_message('ANDROID', registration_token, "Hello mom", "It is smokey today, again", 2020)
 
 
-def send_single_message(type, token, title, body, badge_number):
+FCM_MULTICAST_TOKEN_LIMIT = 500
+FCM_SEND_OK = 'FCM_SEND_OK'
+FCM_SEND_RETRY = 'FCM_SEND_RETRY'  # Worth trying again later, ex/ FCM was unavailable or over quota
+FCM_TOKEN_NOT_VALID = 'FCM_TOKEN_NOT_VALID'  # The app was uninstalled, or the token belongs to another project
+# FCM refused the message itself (ex/ too large), which sending again won't fix, but the token is still good
+FCM_MESSAGE_NOT_VALID = 'FCM_MESSAGE_NOT_VALID'
+
+
+def platform_message_config(type, title, body, badge_number):
     """
-    Send a message to a single device by firebase_fcm_token (from voter_voterdevicelink)
+    The part of a message that depends on the type of device
     :param type: 'IOS', 'ANDROID', or 'WEBAPP'
-    :param token: The firebase_fcm_token stored in the table from the phone when received from service
     :param title: Title of the message
     :param body: Body of the message
     :param badge_number: The red numeric badge that appears on the icon in iOS
-    :return: the response code
+    :return: keyword arguments for messaging.Message or messaging.MulticastMessage
     """
-
     if type == 'IOS':
-        message = messaging.Message(
-            apns=messaging.APNSConfig(
+        return {
+            'apns': messaging.APNSConfig(
                 headers={'apns-priority': '10'},
                 payload=messaging.APNSPayload(
                     aps=messaging.Aps(
@@ -69,22 +76,32 @@ def send_single_message(type, token, title, body, badge_number):
                     ),
                 ),
             ),
-            token=token,
-        )
-    else:
-        message = messaging.Message(
-            android=messaging.AndroidConfig(
-                ttl=datetime.timedelta(seconds=3600),
-                priority='normal',
-                notification=messaging.AndroidNotification(
-                    title=title,
-                    body=body,
-                    # icon='stock_ticker_update',
-                    # color='#f45342'
-                ),
+        }
+    return {
+        'android': messaging.AndroidConfig(
+            ttl=datetime.timedelta(seconds=3600),
+            priority='normal',
+            notification=messaging.AndroidNotification(
+                title=title,
+                body=body,
+                # icon='stock_ticker_update',
+                # color='#f45342'
             ),
-            token=token,
-        )
+        ),
+    }
+
+
+def send_single_message(type, token, title, body, badge_number):
+    """
+    Send a message to a single device by firebase_fcm_token (from voter_voterdevicelink)
+    :param type: 'IOS', 'ANDROID', or 'WEBAPP'
+    :param token: The firebase_fcm_token stored in the table from the phone when received from service
+    :param title: Title of the message
+    :param body: Body of the message
+    :param badge_number: The red numeric badge that appears on the icon in iOS
+    :return: the response code
+    """
+    message = messaging.Message(token=token, **platform_message_config(type, title, body, badge_number))
 
     response = messaging.send(message)
     # Response is a message ID string.
@@ -92,6 +109,39 @@ def send_single_message(type, token, title, body, badge_number):
     return response
 
 
+def fcm_send_result(send_response):
+    if send_response.success:
+        return FCM_SEND_OK
+    if isinstance(send_response.exception, (messaging.UnregisteredError, messaging.SenderIdMismatchError)):
+        return FCM_TOKEN_NOT_VALID
+    if isinstance(send_response.exception, firebase_exceptions.InvalidArgumentError):
+        return FCM_MESSAGE_NOT_VALID
+    return FCM_SEND_RETRY
+
+
+class FirebaseCloudMessagingTransport(object):
+    """
+    Sends the same message to up to FCM_MULTICAST_TOKEN_LIMIT devices of one type in one request
+    """
+
+    def send_multicast(self, type, token_list, title, body, badge_number):
+        """
+        :param type: 'IOS', 'ANDROID', or 'WEBAPP'
+        :param token_list: firebase_fcm_tokens, no more than FCM_MULTICAST_TOKEN_LIMIT
+        :param title:
+        :param body:
+        :param badge_number:
+        :return: FCM_SEND_OK, FCM_SEND_RETRY or FCM_TOKEN_NOT_VALID for each token, in the same order
+        """
+        message = messaging.MulticastMessage(
+            tokens=token_list, **platform_message_config(type, title, body, badge_number))
+        if hasattr(messaging, 'send_each_for_multicast'):
+            batch_response = messaging.send_each_for_multicast(message)
+        else:
+            batch_response = messaging.send_multicast(message)
+        return [fcm_send_result(send_response) for send_response in batch_response.responses]
+
+
 def send_to_token(registration_token):
     # [START send_to_token]
     # This registration token comes from the client FCM SDKs.
@@ -38,6 +38,7 @@ from voter_guide.controllers import refresh_existing_voter_guides
 from voter_guide.models import ORGANIZATION_WORD
 import wevote_functions.admin
 from wevote_functions.functions import convert_to_int, extract_twitter_handle_from_text_string, positive_value_exists
+from wevote_settings.models import cache_version_increments_deferred
 
 logger = wevote_functions.admin.get_logger(__name__)
 
@@ -5589,10 +5590,12 @@ def delete_ballot_item_data_from_batch_row_actions(batch_header_id, ballot_item_
     return results
 
 
+@cache_version_increments_deferred()
 def import_data_from_batch_row_actions(kind_of_batch, kind_of_action, batch_header_id, batch_row_id=0, state_code="",
                                        ballot_item_id=0):
     """
-    Cycle through and process batch_row_action entries.
+    Cycle through and process batch_row_action entries. The ballot cache versions of the elections touched are
+    bumped once, when the whole batch has been imported.
     The kind_of_action is either IMPORT_CREATE or IMPORT_ADD_TO_EXISTING or IMPORT_DELETE.
     :param kind_of_batch:
     :param kind_of_action:
@@ -15,6 +15,7 @@ from .models import ACTIVITY_NOTICE_PROCESS, API_REFRESH_REQUEST, \
     RETRIEVE_BALLOT_ITEMS_FROM_POLLING_LOCATIONS, REFRESH_BALLOT_ITEMS_FROM_POLLING_LOCATIONS, \
     REFRESH_BALLOT_ITEMS_FROM_VOTERS, SEARCH_TWITTER_FOR_CANDIDATE_TWITTER_HANDLE, UPDATE_TWITTER_DATA_FROM_TWITTER
 from activity.controllers import process_activity_notice_seeds_triggered_by_batch_process
+from activity.push_notifications import dispatch_push_notifications
 from analytics.controllers import calculate_sitewide_daily_metrics, \
     process_one_analytics_batch_process_augment_with_election_id, \
     process_one_analytics_batch_process_augment_with_first_visit, process_sitewide_voter_metrics, \
@@ -22,6 +23,7 @@ from analytics.controllers import calculate_sitewide_daily_metrics, \
 from analytics.models import AnalyticsManager
 from api_internal_cache.models import ApiInternalCacheManager
 from ballot.models import BallotReturnedListManager
+from campaign.models import CampaignXManager
 from datetime import timedelta
 from django.utils.timezone import now
 from election.models import ElectionManager
@@ -32,13 +34,16 @@ from import_export_twitter.controllers import fetch_number_of_candidates_needing
     retrieve_possible_twitter_handles_in_bulk
 from issue.controllers import update_issue_statistics
 import json
+from polling_location.geocoding import GEOCODING_MAINTENANCE_MAX_SECONDS, run_geocoding_jobs
+from share.shared_links import rebuild_shared_link_clicked_summaries
+from stripe_donations.webhook_events import process_stripe_webhook_events, STRIPE_WEBHOOK_EVENT_MAINTENANCE_MAX_BATCHES
 from voter_guide.controllers import voter_guides_upcoming_retrieve_for_api
 import wevote_functions.admin
 from wevote_functions.functions import positive_value_exists
 from wevote_settings.models import fetch_batch_process_system_on, fetch_batch_process_system_activity_notices_on, \
     fetch_batch_process_system_api_refresh_on, fetch_batch_process_system_ballot_items_on, \
     fetch_batch_process_system_calculate_analytics_on, fetch_batch_process_system_search_twitter_on, \
-    fetch_batch_process_system_update_twitter_on
+    fetch_batch_process_system_update_twitter_on, cache_version_increments_deferred
 
 logger = wevote_functions.admin.get_logger(__name__)
 
@@ -84,6 +89,10 @@ def process_next_activity_notices():
         }
         return results
 
+    # Push notifications a web server didn't get to (ex/ it restarted), and the ones due a retry
+    push_notification_results = dispatch_push_notifications()
+    status += push_notification_results['status']
+
     # Retrieve list of all active ActivityNotice BatchProcess so we can decide what new batches to schedule
     #  NOTE: We do not run directly from this list below
     results = batch_process_manager.retrieve_batch_process_list(
@@ -432,6 +441,19 @@ def process_next_general_maintenance():
         }
         return results
 
+    # Stripe webhook events a web server didn't get to (ex/ it restarted), parked events, and retries
+    stripe_webhook_event_results = process_stripe_webhook_events(
+        max_batches=STRIPE_WEBHOOK_EVENT_MAINTENANCE_MAX_BATCHES)
+    status += stripe_webhook_event_results['status']
+
+    # Geocoding jobs whose quota pause is over, or that a web server stopped running
+    geocoding_job_results = run_geocoding_jobs(max_seconds=GEOCODING_MAINTENANCE_MAX_SECONDS)
+    status += geocoding_job_results['status']
+
+    # Voter merges change who counts as a unique sharer or viewer, so the click summaries are counted again daily
+    shared_link_clicked_summary_results = rebuild_shared_link_clicked_summaries()
+    status += shared_link_clicked_summary_results['status']
+
     if not positive_value_exists(len(kind_of_processes_to_run)):
         status += "ALL_BATCH_PROCESS_SYSTEM_KINDS_TURNED_OFF "
         results = {
@@ -2415,6 +2437,10 @@ def process_one_sitewide_daily_analytics_batch_process(batch_process):
     update_results = update_issue_statistics()
     status += update_results['status']
 
+    campaignx_manager = CampaignXManager()
+    update_results = campaignx_manager.reconcile_campaignx_counts()
+    status += update_results['status']
+
     daily_metrics_calculated = False
     results = calculate_sitewide_daily_metrics(batch_process.analytics_date_as_integer)
     status += results['status']
@@ -2566,17 +2592,19 @@ def process_batch_set(batch_set_id=0, analyze_all=False, create_all=False, delet
 
         batch_rows_created = 0
         batch_rows_not_created = 0
-        for one_batch_description in batch_list:
-            results = import_data_from_batch_row_actions(
-                one_batch_description.kind_of_batch, IMPORT_CREATE, one_batch_description.batch_header_id)
-            if results['number_of_table_rows_created']:
-                batch_rows_created += 1
-            else:
-                batch_rows_not_created += 1
-                if batch_rows_not_created < 10:
+        # Bump each election's ballot cache versions once for the whole batch set
+        with cache_version_increments_deferred():
+            for one_batch_description in batch_list:
+                results = import_data_from_batch_row_actions(
+                    one_batch_description.kind_of_batch, IMPORT_CREATE, one_batch_description.batch_header_id)
+                if results['number_of_table_rows_created']:
+                    batch_rows_created += 1
+                else:
+                    batch_rows_not_created += 1
+                    if batch_rows_not_created < 10:
+                        status += results['status']
+                if not positive_value_exists(results['success']) and len(status) < 1024:
                     status += results['status']
-            if not positive_value_exists(results['success']) and len(status) < 1024:
-                status += results['status']
         status += "BATCH_ROWS_CREATED: " + str(batch_rows_created) + ", "
         if positive_value_exists(batch_rows_not_created):
             status += "BATCH_ROWS_NOT_CREATED: " + str(batch_rows_not_created) + ", "
@@ -2586,14 +2614,16 @@ def process_batch_set(batch_set_id=0, analyze_all=False, create_all=False, delet
         batch_list = list(batch_description_query)
 
         batch_rows_deleted = 0
-        for one_batch_description in batch_list:
-            results = import_data_from_batch_row_actions(
-                one_batch_description.kind_of_batch, IMPORT_DELETE, one_batch_description.batch_header_id)
-            if results['number_of_table_rows_deleted']:
-                batch_rows_deleted += 1
-
-            if not positive_value_exists(results['success']) and len(status) < 1024:
-                status += results['status']
+        # Bump each election's ballot cache versions once for the whole batch set
+        with cache_version_increments_deferred():
+            for one_batch_description in batch_list:
+                results = import_data_from_batch_row_actions(
+                    one_batch_description.kind_of_batch, IMPORT_DELETE, one_batch_description.batch_header_id)
+                if results['number_of_table_rows_deleted']:
+                    batch_rows_deleted += 1
+
+                if not positive_value_exists(results['success']) and len(status) < 1024:
+                    status += results['status']
         status += "BATCH_ROWS_DELETED: " + str(batch_rows_deleted) + ", "
     else:
         status += "MUST_SPECIFY_ANALYZE_CREATE_OR_DELETE "
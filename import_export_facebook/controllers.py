@@ -571,7 +571,7 @@ def voter_facebook_sign_in_retrieve_for_api(voter_device_id):  # voterFacebookSi
                 try:
                     facebook_linked_voter.linked_organization_we_vote_id = None
                     facebook_linked_voter.save()
-                    # All positions should have already been moved with move_positions_to_another_voter
+                    # All positions should have already been moved with merge_voter_tables_set_based
                 except Exception as e:
                     status += \
                         "FAILED_TO_REMOVE_FROM_FACEBOOK_LINKED_VOTER-LINKED_ORGANIZATION_WE_VOTE_ID " \
@@ -23,8 +23,9 @@ from candidate.controllers import refresh_candidate_data_from_master_tables
 from candidate.models import CandidateCampaign, CandidateManager, CandidateListManager
 from config.base import get_environment_variable
 from election.models import ElectionManager
+from exception.models import handle_exception
 from image.controllers import TWITTER, cache_master_and_resized_image
-from image.models import WeVoteImageManager
+from image.models import WeVoteImage, WeVoteImageManager
 from import_export_batches.models import BatchProcessManager, UPDATE_TWITTER_DATA_FROM_TWITTER
 from import_export_twitter.models import TwitterAuthManager
 from office.models import ContestOfficeManager
@@ -34,8 +35,9 @@ from organization.models import GROUP, Organization, OrganizationListManager, Or
 from politician.models import PoliticianManager
 from position.controllers import update_all_position_details_from_candidate, \
     update_position_entered_details_from_organization, update_position_for_friends_details_from_voter
-from twitter.functions import retrieve_twitter_user_info
-from twitter.models import TwitterLinkPossibility, TwitterUserManager
+from twitter.functions import retrieve_twitter_user_info, retrieve_twitter_user_info_list, \
+    TWITTER_USERS_LOOKUP_BATCH_SIZE
+from twitter.models import TwitterLinkPossibility, TwitterUser, TwitterUserManager
 from voter.models import VoterManager
 from voter_guide.models import VoterGuideListManager
 from wevote_functions.functions import convert_to_int, extract_twitter_handle_from_text_string, \
@@ -571,7 +573,12 @@ def delete_possible_twitter_handles(candidate):
     return results
 
 
-def refresh_twitter_candidate_details(candidate):
+def refresh_twitter_candidate_details(candidate, twitter_json=None):
+    """
+    :param candidate:
+    :param twitter_json: Already retrieved from Twitter (ex/ by a bulk lookup), so we don't reach out again
+    :return:
+    """
     status = ""
     candidate_manager = CandidateManager()
     politician_manager = PoliticianManager()
@@ -587,9 +594,15 @@ def refresh_twitter_candidate_details(candidate):
         return results
 
     if candidate.candidate_twitter_handle:
-        status += "CANDIDATE_REACHING_OUT_TO_TWITTER: " + str(candidate.candidate_twitter_handle) + " "
-        twitter_user_id = 0
-        results = retrieve_twitter_user_info(twitter_user_id, candidate.candidate_twitter_handle)
+        if twitter_json:
+            results = {
+                'success':      True,
+                'twitter_json': twitter_json,
+            }
+        else:
+            status += "CANDIDATE_REACHING_OUT_TO_TWITTER: " + str(candidate.candidate_twitter_handle) + " "
+            twitter_user_id = 0
+            results = retrieve_twitter_user_info(twitter_user_id, candidate.candidate_twitter_handle)
 
         if results['success']:
             status += "DETAILS_RETRIEVED_FROM_TWITTER "
@@ -790,12 +803,13 @@ def process_twitter_images(twitter_image_load_info):
     return results
 
 
-def refresh_twitter_organization_details(organization, twitter_user_id=0):
+def refresh_twitter_organization_details(organization, twitter_user_id=0, twitter_json=None):
     """
     This function assumes TwitterLinkToOrganization is happening outside of this function. It relies on our caching
     organization_twitter_handle in the organization object.
     :param organization:
     :param twitter_user_id:
+    :param twitter_json: Already retrieved from Twitter (ex/ by a bulk lookup), so we don't reach out again
     :return:
     """
     organization_manager = OrganizationManager()
@@ -817,8 +831,12 @@ def refresh_twitter_organization_details(organization, twitter_user_id=0):
         return results
 
     twitter_user_found = False
-    twitter_json = {}
-    if positive_value_exists(twitter_user_id):
+    if twitter_json:
+        twitter_user_found = True
+        twitter_user_id = twitter_json.get('id', twitter_user_id)
+    else:
+        twitter_json = {}
+    if not twitter_user_found and positive_value_exists(twitter_user_id):
         try:
             status += "REACHING_OUT_TO_TWITTER_BY_USER_ID "
             results = retrieve_twitter_user_info(twitter_user_id)
@@ -904,6 +922,253 @@ def refresh_twitter_organization_details(organization, twitter_user_id=0):
     return results
 
 
+def apply_twitter_json_to_entity(entity, twitter_json, twitter_handle_field_name):
+    """
+    Copy the Twitter profile fields we store without any processing onto a candidate, organization or TwitterUser.
+    Profile images are not included, since they need to be cached first.
+    :param entity:
+    :param twitter_json:
+    :param twitter_handle_field_name: ex/ 'candidate_twitter_handle'
+    :return: The names of the fields that changed
+    """
+    changed_field_list = []
+    new_value_dict = {}
+    if positive_value_exists(twitter_json.get('id')) and hasattr(entity, 'twitter_user_id'):
+        new_value_dict['twitter_user_id'] = convert_to_int(twitter_json['id'])
+    if positive_value_exists(twitter_json.get('screen_name')):
+        new_value_dict[twitter_handle_field_name] = twitter_json['screen_name']
+    if positive_value_exists(twitter_json.get('name')):
+        new_value_dict['twitter_name'] = twitter_json['name']
+    if positive_value_exists(twitter_json.get('followers_count')):
+        new_value_dict['twitter_followers_count'] = convert_to_int(twitter_json['followers_count'])
+    # No value required to update description or location (so we can clear out)
+    if 'description' in twitter_json:
+        new_value_dict['twitter_description'] = twitter_json['description']
+    if 'location' in twitter_json:
+        new_value_dict['twitter_location'] = twitter_json['location']
+
+    for field_name, new_value in new_value_dict.items():
+        if getattr(entity, field_name) != new_value:
+            setattr(entity, field_name, new_value)
+            changed_field_list.append(field_name)
+    return changed_field_list
+
+
+def twitter_profile_image_changed(cached_original_image_url, twitter_json):
+    """
+    We cache "..._normal.jpg" Twitter profile images at full size, as "....jpg" or "..._400x400.jpg"
+    :param cached_original_image_url: From the most recent original size WeVoteImage
+    :param twitter_json:
+    :return:
+    """
+    profile_image_url_https = twitter_json.get('profile_image_url_https')
+    if not positive_value_exists(profile_image_url_https):
+        return False
+    if not positive_value_exists(cached_original_image_url):
+        return True
+    return cached_original_image_url not in (
+        profile_image_url_https,
+        profile_image_url_https.replace("_normal", ""),
+        profile_image_url_https.replace("_normal", "_400x400"))
+
+
+def retrieve_cached_twitter_profile_image_url_dict(candidate_we_vote_id_list=None, organization_we_vote_id_list=None):
+    cached_original_image_url_dict = {}
+    try:
+        we_vote_image_query = WeVoteImage.objects.using('readonly').filter(
+            kind_of_image_twitter_profile=True,
+            kind_of_image_original=True,
+            is_active_version=True)
+        we_vote_image_query = we_vote_image_query.filter(
+            Q(candidate_we_vote_id__in=candidate_we_vote_id_list or []) |
+            Q(organization_we_vote_id__in=organization_we_vote_id_list or []))
+        for candidate_we_vote_id, organization_we_vote_id, twitter_profile_image_url_https in \
+                we_vote_image_query.order_by('date_image_saved').values_list(
+                    'candidate_we_vote_id', 'organization_we_vote_id', 'twitter_profile_image_url_https'):
+            # Ordered so the most recent image for each candidate or organization is kept
+            if positive_value_exists(candidate_we_vote_id):
+                cached_original_image_url_dict[candidate_we_vote_id] = twitter_profile_image_url_https
+            if positive_value_exists(organization_we_vote_id):
+                cached_original_image_url_dict[organization_we_vote_id] = twitter_profile_image_url_https
+    except Exception as e:
+        handle_exception(e, logger=logger, exception_message="RETRIEVE_CACHED_TWITTER_PROFILE_IMAGES_FAILED ")
+    return cached_original_image_url_dict
+
+
+def refresh_twitter_details_in_bulk(candidate_list=None, organization_list=None, api=None, rate_limiter=None):
+    """
+    Refresh candidates and organizations from Twitter with one users/lookup request per 100 handles. Each profile
+    is compared with what we have stored, and only the rows that changed are written, with one bulk_update per
+    table. A candidate or organization with a new profile image, name or handle goes through the
+    refresh_twitter_..._details path, which caches the images and copies the name to politicians, positions and
+    voter guides.
+    :param candidate_list:
+    :param organization_list:
+    :param api: A tweepy.API (or a fake one in tests)
+    :param rate_limiter: Defaults to the users/lookup rate limiter shared by all processes
+    :return:
+    """
+    status = ""
+    success = True
+    candidate_list = list(candidate_list or [])
+    organization_list = list(organization_list or [])
+    candidate_we_vote_id_list_processed = []
+    organization_we_vote_id_list_processed = []
+    candidates_updated = 0
+    organizations_updated = 0
+    organizations_not_updated = 0
+    bulk_update_batch_size = 500
+
+    twitter_handle_list = [candidate.candidate_twitter_handle for candidate in candidate_list] + \
+        [organization.organization_twitter_handle for organization in organization_list]
+    lookup_results = retrieve_twitter_user_info_list(twitter_handle_list, api=api, rate_limiter=rate_limiter)
+    status += lookup_results['status']
+    twitter_json_by_handle = lookup_results['twitter_json_by_handle']
+    twitter_handles_not_found = set(lookup_results['twitter_handles_not_found'])
+
+    cached_original_image_url_dict = retrieve_cached_twitter_profile_image_url_dict(
+        candidate_we_vote_id_list=[candidate.we_vote_id for candidate in candidate_list],
+        organization_we_vote_id_list=[organization.we_vote_id for organization in organization_list])
+    fields_that_need_full_refresh = \
+        ['twitter_user_id', 'candidate_twitter_handle', 'organization_twitter_handle', 'twitter_name']
+
+    candidate_list_to_bulk_update = []
+    candidate_field_set = set()
+    for candidate in candidate_list:
+        twitter_handle_lower = str(candidate.candidate_twitter_handle).lower()
+        twitter_json = twitter_json_by_handle.get(twitter_handle_lower)
+        if twitter_json is None:
+            if twitter_handle_lower in twitter_handles_not_found:
+                status += "HANDLE_NOT_FOUND_OR_SUSPENDED: " + str(candidate.candidate_twitter_handle) + " "
+                candidate.candidate_twitter_updates_failing = True
+                candidate_list_to_bulk_update.append(candidate)
+                candidate_field_set.add('candidate_twitter_updates_failing')
+                candidate_we_vote_id_list_processed.append(candidate.we_vote_id)
+            continue
+        candidate_we_vote_id_list_processed.append(candidate.we_vote_id)
+        image_changed = twitter_profile_image_changed(cached_original_image_url_dict.get(candidate.we_vote_id),
+                                                      twitter_json)
+        changed_field_list = apply_twitter_json_to_entity(candidate, twitter_json, 'candidate_twitter_handle')
+        if image_changed or any(field_name in fields_that_need_full_refresh for field_name in changed_field_list):
+            try:
+                results = refresh_twitter_candidate_details(candidate, twitter_json=twitter_json)
+                status += results['status']
+                refresh_candidate_data_from_master_tables(candidate.we_vote_id)
+                candidates_updated += 1
+            except Exception as e:
+                status += "REFRESH_TWITTER_CANDIDATE_DETAILS_FAILED: " + str(e) + " "
+        else:
+            if len(changed_field_list):
+                candidate_list_to_bulk_update.append(candidate)
+                candidate_field_set.update(changed_field_list)
+            candidates_updated += 1
+    if len(candidate_list_to_bulk_update):
+        try:
+            CandidateCampaign.objects.bulk_update(
+                candidate_list_to_bulk_update, sorted(candidate_field_set), batch_size=bulk_update_batch_size)
+            status += "CANDIDATES_BULK_UPDATED: " + str(len(candidate_list_to_bulk_update)) + " "
+        except Exception as e:
+            status += "CANDIDATE_BULK_UPDATE_FAILED: " + str(e) + " "
+            success = False
+
+    organization_list_to_bulk_update = []
+    organization_field_set = set()
+    organization_manager = OrganizationManager()
+    for organization in organization_list:
+        twitter_handle_lower = str(organization.organization_twitter_handle).lower()
+        twitter_json = twitter_json_by_handle.get(twitter_handle_lower)
+        if twitter_json is None:
+            if twitter_handle_lower in twitter_handles_not_found:
+                status += "ORGANIZATION_HANDLE_NOT_FOUND_OR_SUSPENDED: " + \
+                          str(organization.organization_twitter_handle) + " "
+                organization.organization_twitter_updates_failing = True
+                organization_list_to_bulk_update.append(organization)
+                organization_field_set.add('organization_twitter_updates_failing')
+                organization_we_vote_id_list_processed.append(organization.we_vote_id)
+                organizations_not_updated += 1
+                try:
+                    clear_results = organization_manager.clear_organization_twitter_details(organization)
+                    if clear_results['success']:
+                        update_social_media_statistics_in_other_tables(organization)
+                except Exception as e:
+                    status += "ORGANIZATION_TWITTER_DETAILS_NOT_CLEARED: " + str(e) + " "
+            continue
+        organization_we_vote_id_list_processed.append(organization.we_vote_id)
+        image_changed = twitter_profile_image_changed(cached_original_image_url_dict.get(organization.we_vote_id),
+                                                      twitter_json)
+        changed_field_list = apply_twitter_json_to_entity(organization, twitter_json, 'organization_twitter_handle')
+        if image_changed or any(field_name in fields_that_need_full_refresh for field_name in changed_field_list):
+            try:
+                results = refresh_twitter_organization_details(organization, twitter_json=twitter_json)
+                status += results['status']
+                organizations_updated += 1
+            except Exception as e:
+                status += "REFRESH_TWITTER_ORGANIZATION_DETAILS_FAILED: " + str(e) + " "
+                organizations_not_updated += 1
+        else:
+            if len(changed_field_list):
+                organization_list_to_bulk_update.append(organization)
+                organization_field_set.update(changed_field_list)
+            organizations_updated += 1
+    if len(organization_list_to_bulk_update):
+        try:
+            Organization.objects.bulk_update(
+                organization_list_to_bulk_update, sorted(organization_field_set), batch_size=bulk_update_batch_size)
+            status += "ORGANIZATIONS_BULK_UPDATED: " + str(len(organization_list_to_bulk_update)) + " "
+            if 'twitter_followers_count' in organization_field_set:
+                for organization in organization_list_to_bulk_update:
+                    update_social_media_statistics_in_other_tables(organization)
+        except Exception as e:
+            status += "ORGANIZATION_BULK_UPDATE_FAILED: " + str(e) + " "
+            success = False
+
+    # Keep our copy of each Twitter account current too
+    twitter_json_by_twitter_id = {
+        convert_to_int(twitter_json.get('id')): twitter_json for twitter_json in twitter_json_by_handle.values()}
+    if len(twitter_json_by_twitter_id):
+        try:
+            twitter_user_list_to_bulk_update = []
+            twitter_user_field_set = set()
+            for twitter_user in TwitterUser.objects.filter(twitter_id__in=list(twitter_json_by_twitter_id.keys())):
+                changed_field_list = apply_twitter_json_to_entity(
+                    twitter_user, twitter_json_by_twitter_id[twitter_user.twitter_id], 'twitter_handle')
+                if len(changed_field_list):
+                    twitter_user_list_to_bulk_update.append(twitter_user)
+                    twitter_user_field_set.update(changed_field_list)
+            if len(twitter_user_list_to_bulk_update):
+                TwitterUser.objects.bulk_update(
+                    twitter_user_list_to_bulk_update, sorted(twitter_user_field_set),
+                    batch_size=bulk_update_batch_size)
+        except Exception as e:
+            status += "TWITTER_USER_BULK_UPDATE_FAILED: " + str(e) + " "
+
+    # Record that we have retrieved from Twitter for these candidates and organizations
+    try:
+        RemoteRequestHistory.objects.bulk_create(
+            [RemoteRequestHistory(kind_of_action=RETRIEVE_UPDATE_DATA_FROM_TWITTER,
+                                  candidate_campaign_we_vote_id=candidate_we_vote_id)
+             for candidate_we_vote_id in candidate_we_vote_id_list_processed] +
+            [RemoteRequestHistory(kind_of_action=RETRIEVE_UPDATE_DATA_FROM_TWITTER,
+                                  organization_we_vote_id=organization_we_vote_id)
+             for organization_we_vote_id in organization_we_vote_id_list_processed],
+            batch_size=bulk_update_batch_size)
+    except Exception as e:
+        status += "REMOTE_REQUEST_HISTORY_BULK_CREATE_FAILED: " + str(e) + " "
+        success = False
+
+    results = {
+        'success':                                  success,
+        'status':                                   status,
+        'candidates_updated':                       candidates_updated,
+        'candidate_we_vote_id_list_processed':      candidate_we_vote_id_list_processed,
+        'organizations_updated':                    organizations_updated,
+        'organizations_not_updated':                organizations_not_updated,
+        'organization_we_vote_id_list_processed':   organization_we_vote_id_list_processed,
+        'twitter_handles_not_retrieved':            lookup_results['twitter_handles_not_retrieved'],
+    }
+    return results
+
+
 def retrieve_possible_twitter_handles(candidate):
     status = ""
     success = True
@@ -1127,35 +1392,20 @@ def retrieve_and_update_candidates_needing_twitter_update(
         success = False
 
     if positive_value_exists(success):
-        # Limit so we don't overwhelm Twitter's rate limiting
-        # https://developer.twitter.com/en/docs/basics/rate-limits
-        # GET users/search is limited to 900 per 15 minutes
-        # Since we run one batch per minute, that means that 900 / 15 = 60
-        # We have other processes which might reach out to Twitter, so we limit the number of
-        # candidates we analyze to 20 per minute
+        # Twitter's rate limits are enforced by the shared rate limiter in retrieve_twitter_user_info_list,
+        #  which looks up 100 candidates per request
         if positive_value_exists(limit):
             number_of_candidates_limit = limit
         else:
-            number_of_candidates_limit = 20
+            number_of_candidates_limit = TWITTER_USERS_LOOKUP_BATCH_SIZE * 10
         candidate_list = candidate_queryset[:number_of_candidates_limit]
 
-        candidates_updated = 0
         status += "UPDATE_FROM_TWITTER_LOOP_TOTAL: " + str(candidates_to_update) + " "
-        remote_request_history_manager = RemoteRequestHistoryManager()
-        for candidate in candidate_list:
-            results = refresh_twitter_candidate_details(candidate)
-            status += results['status']
-            if results['success']:
-                candidates_updated += 1
-                refresh_candidate_results = refresh_candidate_data_from_master_tables(candidate.we_vote_id)
-
-            # Create a record denoting that we have retrieved from Twitter for this candidate
-            save_results_history = remote_request_history_manager.create_remote_request_history_entry(
-                kind_of_action=RETRIEVE_UPDATE_DATA_FROM_TWITTER,
-                candidate_campaign_we_vote_id=candidate.we_vote_id)
-            if not save_results_history['success']:
-                status += save_results_history['status']
-                success = False
+        results = refresh_twitter_details_in_bulk(candidate_list=candidate_list)
+        status += results['status']
+        candidates_updated = results['candidates_updated']
+        if not results['success']:
+            success = False
 
     results = {
         'success':              success,
@@ -1221,19 +1471,18 @@ def retrieve_and_update_organizations_needing_twitter_update(batch_process_id=0)
         success = False
 
     if positive_value_exists(success):
-        # Limit so we don't overwhelm Twitter's rate limiting
-        # https://developer.twitter.com/en/docs/basics/rate-limits
-        # GET users/search is limited to 900 per 15 minutes
-        # Since we run one batch per minute, that means that 900 / 15 = 60
-        # We have other processes which might reach out to Twitter, so we limit the number of
-        # candidates we analyze to 20 per minute
-        number_of_organizations_limit = 20
+        # Twitter's rate limits are enforced by the shared rate limiter in retrieve_twitter_user_info_list,
+        #  which looks up 100 organizations per request
+        number_of_organizations_limit = TWITTER_USERS_LOOKUP_BATCH_SIZE * 10
         organization_list = organization_queryset[:number_of_organizations_limit]
 
-        organizations_updated = 0
         status += "RETRIEVE_ORGANIZATION_UPDATE_DATA_FROM_TWITTER_LOOP_TOTAL: " + str(organizations_to_update) + " "
-        for organization in organization_list:
-            status += "[" + str(organization.organization_twitter_handle) + "]"
+        results = refresh_twitter_details_in_bulk(organization_list=organization_list)
+        status += results['status']
+        organizations_updated = results['organizations_updated']
+        organizations_not_updated = results['organizations_not_updated']
+        if not results['success']:
+            success = False
 
         batch_process_manager = BatchProcessManager()
         batch_process_manager.create_batch_process_log_entry(
@@ -1241,32 +1490,6 @@ def retrieve_and_update_organizations_needing_twitter_update(batch_process_id=0)
             kind_of_process=UPDATE_TWITTER_DATA_FROM_TWITTER,
             status=status,
         )
-        remote_request_history_manager = RemoteRequestHistoryManager()
-        for organization in organization_list:
-            try:
-                results = refresh_twitter_organization_details(organization)
-                status += results['status']
-                if results['twitter_user_found']:
-                    organizations_updated += 1
-                else:
-                    organizations_not_updated += 1
-            except Exception as e:
-                status += "REFRESH_TWITTER_ORGANIZATION_DETAILS_FAILED: " + str(e) + " "
-                organizations_not_updated += 1
-
-            batch_process_manager.create_batch_process_log_entry(
-                batch_process_id=batch_process_id,
-                kind_of_process=UPDATE_TWITTER_DATA_FROM_TWITTER,
-                status=status,
-            )
-
-            # Create a record denoting that we have retrieved from Twitter for this candidate
-            save_results_history = remote_request_history_manager.create_remote_request_history_entry(
-                kind_of_action=RETRIEVE_UPDATE_DATA_FROM_TWITTER,
-                organization_we_vote_id=organization.we_vote_id)
-            if not save_results_history['success']:
-                status += save_results_history['status']
-                success = False
 
     results = {
         'success':                  success,
@@ -4,6 +4,154 @@
 
 # See also WeVoteServer/twitter/tests.py for routines that manage internal twitter data
 
-from django.test import TestCase
+import time
+import tweepy
+from unittest.mock import patch
+from django.test import SimpleTestCase, TestCase
+from candidate.models import CandidateCampaign
+from import_export_twitter.controllers import apply_twitter_json_to_entity, refresh_twitter_details_in_bulk, \
+    twitter_profile_image_changed
+from twitter.functions import retrieve_twitter_user_info_list
+from wevote_settings.models import RemoteRequestHistory, RETRIEVE_UPDATE_DATA_FROM_TWITTER
 
-# Create your tests here.
+
+class FakeTwitterUser(object):
+    def __init__(self, twitter_json):
+        self._json = twitter_json
+
+
+class FakeTooManyRequestsResponse(object):
+    status_code = 429
+    reason = 'Too Many Requests'
+
+    def __init__(self, reset_seconds_from_now):
+        self.headers = {'x-rate-limit-reset': str(int(time.time() + reset_seconds_from_now))}
+
+    def json(self):
+        return {'errors': [{'code': 88, 'message': 'Rate limit exceeded'}]}
+
+
+class FakeTweepyAPI(object):
+    """
+    Answers users/lookup from a dict of profiles keyed by lower case handle, the way tweepy.API.lookup_users does
+    """
+
+    def __init__(self, twitter_json_by_handle, rate_limited_after_lookup_count=None):
+        self.twitter_json_by_handle = twitter_json_by_handle
+        self.rate_limited_after_lookup_count = rate_limited_after_lookup_count
+        self.lookup_handle_list_list = []
+
+    def lookup_users(self, screen_name=None, user_id=None):
+        if self.rate_limited_after_lookup_count is not None and \
+                len(self.lookup_handle_list_list) >= self.rate_limited_after_lookup_count:
+            raise tweepy.TooManyRequests(FakeTooManyRequestsResponse(600))
+        self.lookup_handle_list_list.append(list(screen_name))
+        return [FakeTwitterUser(dict(self.twitter_json_by_handle[twitter_handle.lower()]))
+                for twitter_handle in screen_name if twitter_handle.lower() in self.twitter_json_by_handle]
+
+
+class FakeRateLimiter(object):
+    def __init__(self):
+        self.acquire_count = 0
+        self.empty_until_seconds = None
+
+    def acquire(self, cost=1, max_wait_seconds=0):
+        self.acquire_count += cost
+        return True
+
+    def empty_until(self, seconds_from_now):
+        self.empty_until_seconds = seconds_from_now
+
+
+def fake_twitter_json(twitter_handle, twitter_id, followers_count=100):
+    return {
+        'id':                       twitter_id,
+        'screen_name':              twitter_handle,
+        'name':                     twitter_handle.upper(),
+        'followers_count':          followers_count,
+        'description':              'Running for office',
+        'location':                 'Oakland, CA',
+        'profile_image_url_https':  'https://pbs.twimg.com/profile_images/' + str(twitter_id) + '/photo_normal.jpg',
+    }
+
+
+class TwitterUsersLookupTests(SimpleTestCase):
+
+    def test_handles_are_looked_up_100_at_a_time(self):
+        twitter_json_by_handle = {
+            'handle' + str(number): fake_twitter_json('Handle' + str(number), number) for number in range(240)}
+        api = FakeTweepyAPI(twitter_json_by_handle)
+        rate_limiter = FakeRateLimiter()
+        twitter_handle_list = ['handle' + str(number) for number in range(250)] + ['HANDLE1', '', None, 'False']
+        results = retrieve_twitter_user_info_list(twitter_handle_list, api=api, rate_limiter=rate_limiter)
+        self.assertEqual([len(handle_list) for handle_list in api.lookup_handle_list_list], [100, 100, 50])
+        self.assertEqual(rate_limiter.acquire_count, 3)
+        self.assertEqual(len(results['twitter_json_by_handle']), 240)
+        self.assertEqual(sorted(results['twitter_handles_not_found']),
+                         sorted('handle' + str(number) for number in range(240, 250)))
+        self.assertEqual(results['twitter_handles_not_retrieved'], [])
+
+    def test_rate_limit_response_empties_the_shared_bucket(self):
+        twitter_json_by_handle = {
+            'handle' + str(number): fake_twitter_json('handle' + str(number), number) for number in range(300)}
+        api = FakeTweepyAPI(twitter_json_by_handle, rate_limited_after_lookup_count=1)
+        rate_limiter = FakeRateLimiter()
+        results = retrieve_twitter_user_info_list(list(twitter_json_by_handle.keys()), api=api,
+                                                  rate_limiter=rate_limiter)
+        self.assertFalse(results['success'])
+        self.assertEqual(len(results['twitter_json_by_handle']), 100)
+        self.assertEqual(len(results['twitter_handles_not_retrieved']), 200)
+        self.assertEqual(results['twitter_handles_not_found'], [])
+        self.assertGreater(rate_limiter.empty_until_seconds, 500)
+
+    def test_only_changed_fields_are_reported(self):
+        candidate = CandidateCampaign(
+            candidate_twitter_handle='handle1', twitter_user_id=1, twitter_name='HANDLE1',
+            twitter_followers_count=90, twitter_description='Running for office', twitter_location='Oakland, CA')
+        changed_field_list = apply_twitter_json_to_entity(
+            candidate, fake_twitter_json('handle1', 1, followers_count=100), 'candidate_twitter_handle')
+        self.assertEqual(changed_field_list, ['twitter_followers_count'])
+        self.assertEqual(candidate.twitter_followers_count, 100)
+
+    def test_profile_image_changed(self):
+        twitter_json = fake_twitter_json('handle1', 1)
+        self.assertFalse(twitter_profile_image_changed(
+            'https://pbs.twimg.com/profile_images/1/photo.jpg', twitter_json))
+        self.assertFalse(twitter_profile_image_changed(
+            'https://pbs.twimg.com/profile_images/1/photo_400x400.jpg', twitter_json))
+        self.assertTrue(twitter_profile_image_changed(
+            'https://pbs.twimg.com/profile_images/1/old_photo.jpg', twitter_json))
+        self.assertTrue(twitter_profile_image_changed(None, twitter_json))
+
+
+class TwitterBulkRefreshTests(TestCase):
+    databases = '__all__'
+
+    def test_changed_candidates_are_bulk_updated(self):
+        candidate_list = []
+        for number in range(1, 4):
+            candidate = CandidateCampaign.objects.create(
+                candidate_name='Candidate ' + str(number), candidate_twitter_handle='handle' + str(number),
+                twitter_user_id=number, twitter_name='HANDLE' + str(number), twitter_followers_count=100,
+                twitter_description='Running for office', twitter_location='Oakland, CA')
+            candidate_list.append(candidate)
+        api = FakeTweepyAPI({
+            'handle1': fake_twitter_json('handle1', 1, followers_count=100),
+            'handle2': fake_twitter_json('handle2', 2, followers_count=250),
+        })
+        # The profile images were cached earlier, and haven't changed
+        cached_original_image_url_dict = {
+            candidate.we_vote_id: 'https://pbs.twimg.com/profile_images/' + str(candidate.twitter_user_id) +
+                                  '/photo.jpg' for candidate in candidate_list}
+        with patch('import_export_twitter.controllers.retrieve_cached_twitter_profile_image_url_dict',
+                   return_value=cached_original_image_url_dict):
+            results = refresh_twitter_details_in_bulk(
+                candidate_list=candidate_list, api=api, rate_limiter=FakeRateLimiter())
+
+        self.assertTrue(results['success'], results['status'])
+        self.assertEqual(len(api.lookup_handle_list_list), 1)
+        self.assertEqual(results['candidates_updated'], 2)
+        self.assertEqual(CandidateCampaign.objects.get(id=candidate_list[1].id).twitter_followers_count, 250)
+        self.assertTrue(CandidateCampaign.objects.get(id=candidate_list[2].id).candidate_twitter_updates_failing)
+        self.assertEqual(RemoteRequestHistory.objects.filter(
+            kind_of_action=RETRIEVE_UPDATE_DATA_FROM_TWITTER).count(), 3)
@@ -8,11 +8,13 @@ from django.http import HttpResponse
 from exception.models import handle_exception
 import json
 from ballot.models import BallotReturnedManager
-from follow.models import FollowIssueList, FOLLOWING
+from follow.models import FollowIssue, FollowIssueList, FOLLOWING
+from issue.issue_stance_matrix import fetch_issue_stance_matrix
 from issue.models import OrganizationLinkToIssueList
 from position.models import ANY_STANCE, PositionListManager
 from voter.models import fetch_voter_we_vote_id_from_voter_device_link
 import wevote_functions.admin
+from wevote_functions.denormalized_counts import DenormalizedCount, refresh_denormalized_counts
 from wevote_functions.functions import positive_value_exists, process_request_from_master
 
 logger = wevote_functions.admin.get_logger(__name__)
@@ -24,36 +26,34 @@ ORGANIZATION_LINK_TO_ISSUE_SYNC_URL = \
 
 
 def update_issue_statistics():
-    follow_issue_list_manager = FollowIssueList()
-    organization_link_to_issue_list_manager = OrganizationLinkToIssueList()
-    issues_not_updated_count = 0
-    issues_updated_count = 0
-    status = ''
-
-    try:
-        issue_list_query = Issue.objects.all()
-        issue_list_query = issue_list_query.filter(hide_issue=False)
-        issue_list = list(issue_list_query)
-
-        for one_issue in issue_list:
-            try:
-                one_issue.issue_followers_count = \
-                    follow_issue_list_manager.fetch_follow_issue_count_by_issue_we_vote_id(one_issue.we_vote_id)
-                one_issue.linked_organization_count = \
-                    organization_link_to_issue_list_manager.fetch_linked_organization_count(one_issue.we_vote_id)
-                one_issue.save()
-                issues_updated_count += 1
-            except Exception as e:
-                issues_not_updated_count += 1
-                status += "FAILED: " + str(e) + " "
-    except Exception as e:
-        pass
-
+    """
+    Recount followers and linked organizations for every visible issue, with one grouped count query for each, and
+    save the counts that have changed
+    :return:
+    """
+    denormalized_count_list = [
+        DenormalizedCount(
+            'issue_followers_count',
+            FollowIssue.objects.using('readonly').filter(following_status=FOLLOWING),
+            'issue_we_vote_id', case_insensitive=True),
+        DenormalizedCount(
+            'linked_organization_count',
+            OrganizationLinkToIssue.objects.using('readonly').filter(link_active=True),
+            'issue_we_vote_id', case_insensitive=True),
+    ]
+    refresh_results = refresh_denormalized_counts(
+        Issue.objects.filter(hide_issue=False), 'we_vote_id', denormalized_count_list)
+    issues_updated_count = refresh_results['updated_count']
+    issues_not_updated_count = 0 if refresh_results['success'] \
+        else Issue.objects.filter(hide_issue=False).count() - refresh_results['checked_count']
+
+    status = refresh_results['status']
     status += "ISSUE_IMPORT_PROCESS_COMPLETE, " \
-              "updated: " + str(issues_updated_count) + \
+              "checked: " + str(refresh_results['checked_count']) + \
+              ", updated: " + str(issues_updated_count) + \
               ', not_updated: ' + str(issues_not_updated_count) + ' '
     results = {
-        'success':                  issues_updated_count > 0,
+        'success':                  refresh_results['success'],
         'status':                   status,
         'issues_updated_count':     issues_updated_count,
         'issues_not_updated_count': issues_not_updated_count,
@@ -746,108 +746,20 @@ def retrieve_issue_score_list(voters_issue_we_vote_ids, google_civic_election_id
 
 def retrieve_issues_under_ballot_items_list(all_issue_we_vote_ids, google_civic_election_id):
     """
-
+    Read from this worker's issue stance matrix for the election, which is the same for every voter
     :param all_issue_we_vote_ids: This should be all issues
     :param google_civic_election_id:
     :return:
     """
-    success = True
     status = ""
-    issues_under_ballot_items_list = []
-    ballot_item_we_vote_ids_list = []
-    organization_we_vote_ids_for_all_issues = []
-
-    cached_issue_we_vote_ids_under_each_organization = {}  # key organization_we_vote_id, value list issue_we_vote_ids
-    organizations_included_by_issue_list = {}  # key is issue_we_vote_id, value is list of organizations
-    issue_we_vote_id_list_by_ballot_item_list = {}  # key is ballot_item_we_vote_id, value is list of issue_we_vote_ids
-    oppose_issue_we_vote_id_list = {}  # key is ballot_item_we_vote_id, value is list of issue_we_vote_ids opposing
-    support_issue_we_vote_id_list = {}  # key is ballot_item_we_vote_id, value is list of issue_we_vote_ids supporting
-
-    organization_link_to_issue_list = OrganizationLinkToIssueList()
-    # By issue, return a list of organization_we_vote_ids tagged with that issue
-    for issue_we_vote_id in all_issue_we_vote_ids:
-        one_issue_list = [issue_we_vote_id]
-        organization_we_vote_id_list = \
-            organization_link_to_issue_list.fetch_organization_we_vote_id_list_by_issue_we_vote_id_list(one_issue_list)
-        organizations_included_by_issue_list[issue_we_vote_id] = organization_we_vote_id_list
-        for organization_we_vote_id in organization_we_vote_id_list:
-            if organization_we_vote_id not in organization_we_vote_ids_for_all_issues:
-                organization_we_vote_ids_for_all_issues.append(organization_we_vote_id)
-
-    # Retrieve public positions for this election from every group linked to an issue the voter is following
-    # (We sort them below)
-    stance_we_are_looking_for = ANY_STANCE
-    retrieve_public_positions = True
-    position_list_manager = PositionListManager()
-    # This function returns a list, not a results dict
-    public_position_list = position_list_manager.retrieve_all_positions_for_election(
-        google_civic_election_id, stance_we_are_looking_for, retrieve_public_positions,
-        organization_we_vote_ids_for_all_issues)
-
-    # Now we loop through all of these positions and assemble a list of ballot_item_we_vote_ids for all positions
-    for one_position in public_position_list:
-        if positive_value_exists(one_position.candidate_campaign_we_vote_id):
-            ballot_item_we_vote_ids_list.append(one_position.candidate_campaign_we_vote_id)
-
-            # If there is a position on the voter's ballot, we want to retrieve the issues from the organization
-            #  taking the position
-            if one_position.is_support_or_positive_rating() or one_position.is_oppose_or_negative_rating():
-                if one_position.organization_we_vote_id not in cached_issue_we_vote_ids_under_each_organization:
-                    # Only retrieve this once per organization
-                    cached_issue_we_vote_ids_under_each_organization[one_position.organization_we_vote_id] = \
-                        organization_link_to_issue_list.fetch_issue_we_vote_id_list_by_organization_we_vote_id(
-                            one_position.organization_we_vote_id)
-
-                # Deprecate in late 2022
-                if one_position.candidate_campaign_we_vote_id not in issue_we_vote_id_list_by_ballot_item_list:
-                    issue_we_vote_id_list_by_ballot_item_list[one_position.candidate_campaign_we_vote_id] = []
-                for issue_we_vote_id in \
-                        cached_issue_we_vote_ids_under_each_organization[one_position.organization_we_vote_id]:
-                    if issue_we_vote_id not in \
-                            issue_we_vote_id_list_by_ballot_item_list[one_position.candidate_campaign_we_vote_id]:
-                        issue_we_vote_id_list_by_ballot_item_list[one_position.candidate_campaign_we_vote_id].append(
-                            issue_we_vote_id)
-
-            if one_position.is_support_or_positive_rating():
-                if one_position.candidate_campaign_we_vote_id not in support_issue_we_vote_id_list:
-                    support_issue_we_vote_id_list[one_position.candidate_campaign_we_vote_id] = []
-                for issue_we_vote_id in \
-                        cached_issue_we_vote_ids_under_each_organization[one_position.organization_we_vote_id]:
-                    if issue_we_vote_id not in \
-                            support_issue_we_vote_id_list[one_position.candidate_campaign_we_vote_id]:
-                        support_issue_we_vote_id_list[one_position.candidate_campaign_we_vote_id].append(
-                            issue_we_vote_id)
-            elif one_position.is_oppose_or_negative_rating():
-                if one_position.candidate_campaign_we_vote_id not in oppose_issue_we_vote_id_list:
-                    oppose_issue_we_vote_id_list[one_position.candidate_campaign_we_vote_id] = []
-                for issue_we_vote_id in \
-                        cached_issue_we_vote_ids_under_each_organization[one_position.organization_we_vote_id]:
-                    if issue_we_vote_id not in \
-                            oppose_issue_we_vote_id_list[one_position.candidate_campaign_we_vote_id]:
-                        oppose_issue_we_vote_id_list[one_position.candidate_campaign_we_vote_id].append(
-                            issue_we_vote_id)
-
-        elif positive_value_exists(one_position.contest_measure_we_vote_id):
-            ballot_item_we_vote_ids_list.append(one_position.contest_measure_we_vote_id)
-
-    for one_ballot_item_we_vote_id in ballot_item_we_vote_ids_list:
-        issue_we_vote_id_list_for_one_ballot_item = \
-            issue_we_vote_id_list_by_ballot_item_list[one_ballot_item_we_vote_id] \
-            if one_ballot_item_we_vote_id in issue_we_vote_id_list_by_ballot_item_list else []
-        oppose_by_ballot_item_list = \
-            oppose_issue_we_vote_id_list[one_ballot_item_we_vote_id] \
-            if one_ballot_item_we_vote_id in oppose_issue_we_vote_id_list else []
-        support_by_ballot_item_list = \
-            support_issue_we_vote_id_list[one_ballot_item_we_vote_id] \
-            if one_ballot_item_we_vote_id in support_issue_we_vote_id_list else []
-        one_ballot_item = {
-            "ballot_item_we_vote_id":   one_ballot_item_we_vote_id,  # DEPRECATE in late 2022
-            "ballot_item":              one_ballot_item_we_vote_id,
-            "issue_we_vote_id_list":    issue_we_vote_id_list_for_one_ballot_item,  # DEPRECATE in late 2022
-            "oppose":                   oppose_by_ballot_item_list,
-            "support":                  support_by_ballot_item_list,
-        }
-        issues_under_ballot_items_list.append(one_ballot_item)
+    try:
+        issue_stance_matrix = fetch_issue_stance_matrix(google_civic_election_id)
+        issues_under_ballot_items_list = issue_stance_matrix.issues_under_ballot_items_list(all_issue_we_vote_ids)
+        success = True
+    except Exception as e:
+        status += "ISSUE_STANCE_MATRIX_FAILED: " + str(e) + " "
+        issues_under_ballot_items_list = []
+        success = False
 
     results = {
         'success':          success,
@@ -0,0 +1,171 @@
+# issue/issue_stance_matrix.py
+# Brought to you by We Vote. Be good.
+# -*- coding: UTF-8 -*-
+
+"""
+For each election, which issues are behind the organizations supporting and opposing each ballot item.
+This doesn't depend on the voter, so each worker builds it once per election and rebuilds it only when a position
+in that election, or an organization's issues, change.
+"""
+
+from collections import OrderedDict
+import threading
+import time
+
+from django.db.models import Q
+
+from candidate.models import CandidateListManager
+from issue.models import fetch_issue_stance_matrix_version, OrganizationLinkToIssue
+from position.models import OPPOSE, PERCENT_RATING, PositionEntered, SUPPORT
+import wevote_functions.admin
+from wevote_functions.functions import convert_to_int
+
+logger = wevote_functions.admin.get_logger(__name__)
+
+ISSUE_STANCE_MATRIX_VERSION_CHECK_SECONDS = 10
+# Positions changed with QuerySet.update() don't send signals, so a matrix is rebuilt at least this often
+ISSUE_STANCE_MATRIX_MAX_AGE_SECONDS = 900
+ISSUE_STANCE_MATRIX_ELECTIONS_KEPT = 50
+ISSUES_UNDER_BALLOT_ITEMS_LISTS_KEPT = 4
+
+
+class IssueStanceMatrix(object):
+    """
+    One election's ballot items, each with the issues of the organizations taking a public position on it, and of
+    those supporting and opposing it
+    """
+
+    def __init__(self, google_civic_election_id, version_tuple=(0, 0)):
+        self.google_civic_election_id = convert_to_int(google_civic_election_id)
+        self.version_tuple = version_tuple
+        # Newest position first, as the positions are retrieved
+        self.ballot_item_we_vote_id_list = []
+        self.issue_we_vote_id_set_by_ballot_item = {}
+        self.support_issue_we_vote_id_set_by_ballot_item = {}
+        self.oppose_issue_we_vote_id_set_by_ballot_item = {}
+        # key is the frozenset of issue_we_vote_ids asked for
+        self.issues_under_ballot_items_list_dict = {}
+        self.lock = threading.Lock()
+        self.loaded_time = time.monotonic()
+        self.version_checked_time = self.loaded_time
+
+    def load(self):
+        issue_we_vote_id_set_by_organization = {}
+        for organization_we_vote_id, issue_we_vote_id in OrganizationLinkToIssue.objects.using('readonly') \
+                .filter(link_active=True) \
+                .values_list('organization_we_vote_id', 'issue_we_vote_id'):
+            issue_we_vote_id_set_by_organization.setdefault(organization_we_vote_id, set()).add(issue_we_vote_id)
+
+        candidate_list_manager = CandidateListManager()
+        candidate_we_vote_id_list = candidate_list_manager.fetch_candidate_we_vote_id_list_from_election_list(
+            google_civic_election_id_list=[self.google_civic_election_id])
+        # The same positions as PositionListManager.retrieve_all_positions_for_election, for organizations with issues
+        position_query = PositionEntered.objects.using('readonly') \
+            .filter(Q(candidate_campaign_we_vote_id__in=candidate_we_vote_id_list) |
+                    Q(google_civic_election_id=self.google_civic_election_id)) \
+            .exclude(stance__iexact=PERCENT_RATING) \
+            .filter(organization_we_vote_id__in=OrganizationLinkToIssue.objects.using('readonly')
+                    .filter(link_active=True).values('organization_we_vote_id')) \
+            .order_by('-date_entered') \
+            .values_list('candidate_campaign_we_vote_id', 'contest_measure_we_vote_id', 'organization_we_vote_id',
+                         'stance')
+
+        for candidate_we_vote_id, contest_measure_we_vote_id, organization_we_vote_id, stance in position_query:
+            ballot_item_we_vote_id = candidate_we_vote_id or contest_measure_we_vote_id
+            if not ballot_item_we_vote_id:
+                continue
+            if ballot_item_we_vote_id not in self.issue_we_vote_id_set_by_ballot_item:
+                self.ballot_item_we_vote_id_list.append(ballot_item_we_vote_id)
+                self.issue_we_vote_id_set_by_ballot_item[ballot_item_we_vote_id] = set()
+            issue_we_vote_id_set = issue_we_vote_id_set_by_organization.get(organization_we_vote_id, set())
+            self.issue_we_vote_id_set_by_ballot_item[ballot_item_we_vote_id] |= issue_we_vote_id_set
+            if not candidate_we_vote_id:
+                # We only show the issues supporting and opposing candidates
+                continue
+            if stance == SUPPORT:
+                self.support_issue_we_vote_id_set_by_ballot_item.setdefault(ballot_item_we_vote_id, set()) \
+                    .update(issue_we_vote_id_set)
+            elif stance == OPPOSE:
+                self.oppose_issue_we_vote_id_set_by_ballot_item.setdefault(ballot_item_we_vote_id, set()) \
+                    .update(issue_we_vote_id_set)
+        self.loaded_time = time.monotonic()
+        self.version_checked_time = self.loaded_time
+
+    def issues_under_ballot_items_list(self, issue_we_vote_id_list):
+        """
+        Built once for each set of issues asked for, which is the list of all visible issues for every voter
+        :param issue_we_vote_id_list:
+        :return: list of dicts, one for each ballot item with a position from an organization linked to these issues
+        """
+        issue_we_vote_id_set = frozenset(issue_we_vote_id_list)
+        issues_under_ballot_items_list = self.issues_under_ballot_items_list_dict.get(issue_we_vote_id_set)
+        if issues_under_ballot_items_list is not None:
+            return issues_under_ballot_items_list
+
+        issues_under_ballot_items_list = []
+        for ballot_item_we_vote_id in self.ballot_item_we_vote_id_list:
+            if not self.issue_we_vote_id_set_by_ballot_item[ballot_item_we_vote_id] & issue_we_vote_id_set:
+                continue
+            support_list = sorted(
+                self.support_issue_we_vote_id_set_by_ballot_item.get(ballot_item_we_vote_id, set()) &
+                issue_we_vote_id_set)
+            oppose_list = sorted(
+                self.oppose_issue_we_vote_id_set_by_ballot_item.get(ballot_item_we_vote_id, set()) &
+                issue_we_vote_id_set)
+            issues_under_ballot_items_list.append({
+                "ballot_item_we_vote_id":   ballot_item_we_vote_id,  # DEPRECATE in late 2022
+                "ballot_item":              ballot_item_we_vote_id,
+                "issue_we_vote_id_list":    sorted(set(support_list) | set(oppose_list)),  # DEPRECATE in late 2022
+                "oppose":                   oppose_list,
+                "support":                  support_list,
+            })
+        with self.lock:
+            if len(self.issues_under_ballot_items_list_dict) >= ISSUES_UNDER_BALLOT_ITEMS_LISTS_KEPT:
+                self.issues_under_ballot_items_list_dict.clear()
+            self.issues_under_ballot_items_list_dict[issue_we_vote_id_set] = issues_under_ballot_items_list
+        return issues_under_ballot_items_list
+
+
+issue_stance_matrix_dict = OrderedDict()  # key is google_civic_election_id, most recently used last
+issue_stance_matrix_lock = threading.Lock()
+
+
+def fetch_issue_stance_matrix(google_civic_election_id):
+    """
+    This worker's matrix for the election, built the first time it is needed and rebuilt when a position in the
+    election, or any organization's issues, change
+    :param google_civic_election_id:
+    :return: IssueStanceMatrix
+    """
+    google_civic_election_id = convert_to_int(google_civic_election_id)
+    now = time.monotonic()
+    issue_stance_matrix = issue_stance_matrix_dict.get(google_civic_election_id)
+    if issue_stance_matrix is not None \
+            and now - issue_stance_matrix.version_checked_time < ISSUE_STANCE_MATRIX_VERSION_CHECK_SECONDS:
+        return issue_stance_matrix
+
+    with issue_stance_matrix_lock:
+        issue_stance_matrix = issue_stance_matrix_dict.get(google_civic_election_id)
+        if issue_stance_matrix is not None \
+                and now - issue_stance_matrix.version_checked_time < ISSUE_STANCE_MATRIX_VERSION_CHECK_SECONDS:
+            # Another thread checked while we were waiting
+            return issue_stance_matrix
+        version_tuple = fetch_issue_stance_matrix_version(google_civic_election_id)
+        if issue_stance_matrix is not None and issue_stance_matrix.version_tuple == version_tuple \
+                and now - issue_stance_matrix.loaded_time < ISSUE_STANCE_MATRIX_MAX_AGE_SECONDS:
+            issue_stance_matrix.version_checked_time = now
+            issue_stance_matrix_dict.move_to_end(google_civic_election_id)
+            return issue_stance_matrix
+        new_issue_stance_matrix = IssueStanceMatrix(google_civic_election_id, version_tuple=version_tuple)
+        new_issue_stance_matrix.load()
+        # Readers holding the old matrix keep using it, so we swap in a complete new one
+        issue_stance_matrix_dict[google_civic_election_id] = new_issue_stance_matrix
+        issue_stance_matrix_dict.move_to_end(google_civic_election_id)
+        while len(issue_stance_matrix_dict) > ISSUE_STANCE_MATRIX_ELECTIONS_KEPT:
+            issue_stance_matrix_dict.popitem(last=False)
+        return new_issue_stance_matrix
+
+
+def clear_issue_stance_matrix_cache():
+    with issue_stance_matrix_lock:
+        issue_stance_matrix_dict.clear()
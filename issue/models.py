@@ -3,9 +3,12 @@
 # -*- coding: UTF-8 -*-
 
 from django.db import models
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from exception.models import handle_exception, handle_record_found_more_than_one_exception, \
     handle_record_not_found_exception, handle_record_not_saved_exception
-from wevote_settings.models import fetch_next_we_vote_id_issue_integer, fetch_site_unique_id_prefix
+from wevote_settings.models import fetch_next_we_vote_id_issue_integer, fetch_site_unique_id_prefix, \
+    increment_cache_version, WeVoteSetting
 import wevote_functions.admin
 from wevote_functions.functions import convert_to_int, positive_value_exists
 
@@ -981,3 +984,57 @@ class OrganizationLinkToIssueManager(models.Manager):
             'MultipleObjectsReturned':  exception_multiple_object_returned,
         }
         return results
+
+
+ISSUE_STANCE_MATRIX_LINKS_VERSION_NAME = 'issue_stance_matrix_links_version'
+
+
+def issue_stance_matrix_version_name(google_civic_election_id):
+    return 'issue_stance_matrix_version_' + str(convert_to_int(google_civic_election_id))
+
+
+def fetch_issue_stance_matrix_version(google_civic_election_id):
+    """
+    The version stamps an election's issue stance matrix depends on, with one query (see issue/issue_stance_matrix.py)
+    :param google_civic_election_id:
+    :return: (election version, organization links version)
+    """
+    election_version_name = issue_stance_matrix_version_name(google_civic_election_id)
+    version_dict = {}
+    try:
+        for setting_name, integer_value in WeVoteSetting.objects.filter(
+                name__in=[election_version_name, ISSUE_STANCE_MATRIX_LINKS_VERSION_NAME]) \
+                .values_list('name', 'integer_value'):
+            version_dict[setting_name] = convert_to_int(integer_value)
+    except Exception as e:
+        logger.error("fetch_issue_stance_matrix_version failed: " + str(e))
+    return version_dict.get(election_version_name, 0), version_dict.get(ISSUE_STANCE_MATRIX_LINKS_VERSION_NAME, 0)
+
+
+def invalidate_issue_stance_matrix_for_election(google_civic_election_id):
+    if positive_value_exists(google_civic_election_id):
+        increment_cache_version(issue_stance_matrix_version_name(google_civic_election_id))
+
+
+def organization_is_linked_to_issues(organization_we_vote_id):
+    """
+    Only the positions of organizations linked to issues are part of the issue stance matrix
+    :param organization_we_vote_id:
+    :return:
+    """
+    if not positive_value_exists(organization_we_vote_id):
+        return False
+    try:
+        return OrganizationLinkToIssue.objects.filter(
+            organization_we_vote_id=organization_we_vote_id, link_active=True).exists()
+    except Exception as e:
+        logger.error("organization_is_linked_to_issues failed: " + str(e))
+        # We can't tell, so the matrix is rebuilt
+        return True
+
+
+@receiver(post_save, sender=OrganizationLinkToIssue)
+@receiver(post_delete, sender=OrganizationLinkToIssue)
+def organization_link_to_issue_changed_signal(sender, instance, **kwargs):
+    # An organization's issues are part of the matrix for every election it has positions in
+    increment_cache_version(ISSUE_STANCE_MATRIX_LINKS_VERSION_NAME)
@@ -0,0 +1,104 @@
+# issue/tests.py
+# Brought to you by We Vote. Be good.
+# -*- coding: UTF-8 -*-
+
+from datetime import datetime, timezone
+from django.test import SimpleTestCase, TestCase
+
+from issue.issue_stance_matrix import clear_issue_stance_matrix_cache, fetch_issue_stance_matrix, IssueStanceMatrix
+from issue.models import fetch_issue_stance_matrix_version, OrganizationLinkToIssue
+from position.models import OPPOSE, PositionEntered, SUPPORT
+
+
+class IssueStanceMatrixTestCase(SimpleTestCase):
+
+    def test_only_the_issues_asked_for_are_returned(self):
+        issue_stance_matrix = IssueStanceMatrix(1000)
+        issue_stance_matrix.ballot_item_we_vote_id_list = ['wv01cand2', 'wv01cand1', 'wv01meas1']
+        issue_stance_matrix.issue_we_vote_id_set_by_ballot_item = {
+            'wv01cand1': {'wv01issue1', 'wv01issue2'},
+            'wv01cand2': {'wv01issue3'},
+            'wv01meas1': {'wv01issue1'},
+        }
+        issue_stance_matrix.support_issue_we_vote_id_set_by_ballot_item = {'wv01cand1': {'wv01issue2', 'wv01issue1'}}
+        issue_stance_matrix.oppose_issue_we_vote_id_set_by_ballot_item = {'wv01cand1': {'wv01issue2'}}
+
+        issues_under_ballot_items_list = issue_stance_matrix.issues_under_ballot_items_list(
+            ['wv01issue1', 'wv01issue2'])
+
+        self.assertEqual(issues_under_ballot_items_list, [
+            {
+                'ballot_item_we_vote_id':   'wv01cand1',
+                'ballot_item':              'wv01cand1',
+                'issue_we_vote_id_list':    ['wv01issue1', 'wv01issue2'],
+                'oppose':                   ['wv01issue2'],
+                'support':                  ['wv01issue1', 'wv01issue2'],
+            },
+            {
+                'ballot_item_we_vote_id':   'wv01meas1',
+                'ballot_item':              'wv01meas1',
+                'issue_we_vote_id_list':    [],
+                'oppose':                   [],
+                'support':                  [],
+            },
+        ])
+        # Every voter asks for the same issues, so the list is only built once
+        self.assertIs(issue_stance_matrix.issues_under_ballot_items_list(['wv01issue2', 'wv01issue1']),
+                      issues_under_ballot_items_list)
+
+
+class IssueStanceMatrixLoadTestCase(TestCase):
+    databases = '__all__'
+
+    def setUp(self):
+        clear_issue_stance_matrix_cache()
+
+    def tearDown(self):
+        clear_issue_stance_matrix_cache()
+
+    def test_each_ballot_item_is_listed_once(self):
+        OrganizationLinkToIssue.objects.create(organization_we_vote_id='wv01org1', issue_we_vote_id='wv01issue1')
+        OrganizationLinkToIssue.objects.create(organization_we_vote_id='wv01org2', issue_we_vote_id='wv01issue2')
+        PositionEntered.objects.create(
+            we_vote_id='wv01pos1', organization_we_vote_id='wv01org1', candidate_campaign_we_vote_id='wv01cand1',
+            google_civic_election_id='1000', stance=SUPPORT, date_entered=datetime(2026, 1, 1, tzinfo=timezone.utc))
+        PositionEntered.objects.create(
+            we_vote_id='wv01pos2', organization_we_vote_id='wv01org2', candidate_campaign_we_vote_id='wv01cand1',
+            google_civic_election_id='1000', stance=OPPOSE, date_entered=datetime(2026, 1, 2, tzinfo=timezone.utc))
+
+        issues_under_ballot_items_list = fetch_issue_stance_matrix(1000).issues_under_ballot_items_list(
+            ['wv01issue1', 'wv01issue2'])
+        self.assertEqual(len(issues_under_ballot_items_list), 1)
+        self.assertEqual(issues_under_ballot_items_list[0]['support'], ['wv01issue1'])
+        self.assertEqual(issues_under_ballot_items_list[0]['oppose'], ['wv01issue2'])
+
+        # A new position in the election means the matrix is rebuilt on the next version check
+        PositionEntered.objects.create(
+            we_vote_id='wv01pos3', organization_we_vote_id='wv01org2', candidate_campaign_we_vote_id='wv01cand2',
+            google_civic_election_id='1000', stance=SUPPORT, date_entered=datetime(2026, 1, 3, tzinfo=timezone.utc))
+        fetch_issue_stance_matrix(1000).version_checked_time = 0
+        issues_under_ballot_items_list = fetch_issue_stance_matrix(1000).issues_under_ballot_items_list(
+            ['wv01issue1', 'wv01issue2'])
+        self.assertEqual([one_ballot_item['ballot_item'] for one_ballot_item in issues_under_ballot_items_list],
+                         ['wv01cand2', 'wv01cand1'])
+
+    def test_only_positions_in_the_matrix_invalidate_it(self):
+        OrganizationLinkToIssue.objects.create(organization_we_vote_id='wv01org1', issue_we_vote_id='wv01issue1')
+        position = PositionEntered.objects.create(
+            we_vote_id='wv01pos1', organization_we_vote_id='wv01org1', candidate_campaign_we_vote_id='wv01cand1',
+            google_civic_election_id='1000', stance=SUPPORT)
+        election_version = fetch_issue_stance_matrix_version(1000)[0]
+
+        # A voter's own position, from an organization without issues
+        PositionEntered.objects.create(
+            we_vote_id='wv01pos2', organization_we_vote_id='wv01org2', candidate_campaign_we_vote_id='wv01cand1',
+            google_civic_election_id='1000', stance=OPPOSE)
+        # A new statement doesn't change the stance
+        position.statement_text = "Strong record on housing"
+        position.save()
+        PositionEntered.objects.get(we_vote_id='wv01pos1').save()
+        self.assertEqual(fetch_issue_stance_matrix_version(1000)[0], election_version)
+
+        position.stance = OPPOSE
+        position.save()
+        self.assertEqual(fetch_issue_stance_matrix_version(1000)[0], election_version + 1)
@@ -3,9 +3,10 @@
 # -*- coding: UTF-8 -*-
 
 from .models import ContestMeasure, ContestMeasureListManager, ContestMeasureManager, \
-    CONTEST_MEASURE_UNIQUE_IDENTIFIERS
+    ContestMeasuresAreNotDuplicates, CONTEST_MEASURE_UNIQUE_IDENTIFIERS
 from ballot.models import MEASURE
 from config.base import get_environment_variable
+from django.db.models import Q
 from django.http import HttpResponse
 from election.models import ElectionManager
 import json
@@ -13,6 +14,8 @@ from position.controllers import update_all_position_details_from_contest_measur
 import wevote_functions.admin
 from wevote_functions.functions import convert_state_code_to_state_text, convert_to_int, MEASURE_TITLE_SYNONYMS, \
     positive_value_exists, process_request_from_master, strip_html_tags
+from wevote_functions.functions_duplicates import DuplicateFinder, normalize_text_for_matching
+from wevote_settings.models import cache_version_increments_deferred
 
 
 logger = wevote_functions.admin.get_logger(__name__)
@@ -35,6 +38,69 @@ def fetch_duplicate_measure_count(contest_measure, ignore_measure_we_vote_id_lis
         contest_measure.office_name, ignore_measure_we_vote_id_list)
 
 
+def find_duplicate_contest_measures_in_election(google_civic_election_id, contest_measure_list=None):
+    """
+    Rank every likely duplicate pair among the contest measures in this election in one pass, instead of searching the
+    database once per contest measure like find_duplicate_contest_measure. See DuplicateFinder.
+    :param google_civic_election_id:
+    :param contest_measure_list: Pass in if the caller already has the contest measures
+    :return:
+    """
+    status = ""
+    duplicate_suggestion_list = []
+    try:
+        if contest_measure_list is None:
+            contest_measure_list = list(ContestMeasure.objects.using('readonly')
+                                       .filter(google_civic_election_id=google_civic_election_id))
+        contest_measure_dict = {contest_measure.we_vote_id: contest_measure for contest_measure in contest_measure_list}
+        not_duplicate_query = ContestMeasuresAreNotDuplicates.objects.using('readonly') \
+            .filter(Q(contest_measure1_we_vote_id__in=list(contest_measure_dict.keys())) |
+                    Q(contest_measure2_we_vote_id__in=list(contest_measure_dict.keys()))) \
+            .values_list('contest_measure1_we_vote_id', 'contest_measure2_we_vote_id')
+        ignore_pair_set = set(frozenset(pair) for pair in not_duplicate_query)
+    except Exception as e:
+        status += "FIND_DUPLICATE_CONTEST_MEASURES_QUERY_FAILED: " + str(e) + " "
+        results = {
+            'success':                      False,
+            'status':                       status,
+            'contest_measure_dict':         {},
+            'duplicate_suggestion_list':    duplicate_suggestion_list,
+        }
+        return results
+
+    duplicate_finder = DuplicateFinder(kind_of_name='title')
+    for contest_measure_we_vote_id, contest_measure in contest_measure_dict.items():
+        state_code = contest_measure.state_code.lower() if positive_value_exists(contest_measure.state_code) else ''
+        # The same title (ignoring case and punctuation) always matches, even when every word is too common to block on
+        identifier_list = []
+        if positive_value_exists(normalize_text_for_matching(contest_measure.measure_title)):
+            identifier_list.append('title:' + normalize_text_for_matching(contest_measure.measure_title))
+        if positive_value_exists(contest_measure.vote_usa_measure_id):
+            identifier_list.append('vote_usa:' + str(contest_measure.vote_usa_measure_id))
+        if positive_value_exists(contest_measure.ballotpedia_measure_id):
+            identifier_list.append('ballotpedia:' + str(contest_measure.ballotpedia_measure_id))
+        if positive_value_exists(contest_measure.ctcl_uuid):
+            identifier_list.append('ctcl:' + str(contest_measure.ctcl_uuid))
+        duplicate_finder.add(
+            contest_measure_we_vote_id,
+            name_list=[
+                contest_measure.measure_title,
+                contest_measure.google_civic_measure_title,
+                contest_measure.google_civic_measure_title2],
+            scope_list=[(state_code, contest_measure.google_civic_election_id)],
+            identifier_list=identifier_list)
+    duplicate_suggestion_list = duplicate_finder.find_duplicates(ignore_pair_set=ignore_pair_set)
+    status += "FIND_DUPLICATE_CONTEST_MEASURES_SUGGESTIONS: " + str(len(duplicate_suggestion_list)) + " "
+
+    results = {
+        'success':                      True,
+        'status':                       status,
+        'contest_measure_dict':         contest_measure_dict,
+        'duplicate_suggestion_list':    duplicate_suggestion_list,
+    }
+    return results
+
+
 def figure_out_measure_conflict_values(contest_measure1, contest_measure2):
     contest_measure_merge_conflict_values = {}
 
@@ -68,29 +134,47 @@ def figure_out_measure_conflict_values(contest_measure1, contest_measure2):
 def filter_measures_structured_json_for_local_duplicates(structured_json):  # Consumes measuresSyncOut
     """
     With this function, we remove measures that seem to be duplicates, but have different we_vote_id's.
+    The local measures in the elections being imported are indexed once (see DuplicateFinder), instead of searching
+    the database once per incoming measure.
     :param structured_json:
     :return:
     """
+    status = ""
     duplicates_removed = 0
     filtered_structured_json = []
-    measure_list_manager = ContestMeasureListManager()
-    for one_measure in structured_json:
-        measure_title = one_measure['measure_title'] if 'measure_title' in one_measure else ''
-        we_vote_id = one_measure['we_vote_id'] if 'we_vote_id' in one_measure else ''
-        google_civic_election_id = \
-            one_measure['google_civic_election_id'] if 'google_civic_election_id' in one_measure else ''
-        measure_url = one_measure['measure_url'] if 'measure_url' in one_measure else ''
-        maplight_id = one_measure['maplight_id'] if 'maplight_id' in one_measure else ''
-        vote_smart_id = one_measure['vote_smart_id'] if 'vote_smart_id' in one_measure else ''
-
+    google_civic_election_id_list = list(set(
+        convert_to_int(one_measure['google_civic_election_id']) for one_measure in structured_json
+        if positive_value_exists(one_measure.get('google_civic_election_id'))))
+    duplicate_finder = DuplicateFinder(kind_of_name='title')
+    try:
+        local_measure_query = ContestMeasure.objects.using('readonly') \
+            .filter(google_civic_election_id__in=google_civic_election_id_list) \
+            .values_list('we_vote_id', 'measure_title', 'google_civic_election_id', 'measure_url', 'maplight_id',
+                         'vote_smart_id')
+        for we_vote_id, measure_title, google_civic_election_id, measure_url, maplight_id, vote_smart_id \
+                in local_measure_query:
+            add_measure_to_duplicate_finder(
+                duplicate_finder, we_vote_id, measure_title, google_civic_election_id, measure_url, maplight_id,
+                vote_smart_id)
+    except Exception as e:
+        status += "FILTER_MEASURES_LOCAL_MEASURE_QUERY_FAILED: " + str(e) + " "
+
+    incoming_key_list = []
+    ignore_pair_set = set()
+    for index, one_measure in enumerate(structured_json):
+        incoming_key = 'incoming' + str(index)
+        incoming_key_list.append(incoming_key)
+        add_measure_to_duplicate_finder(
+            duplicate_finder, incoming_key, one_measure.get('measure_title', ''),
+            one_measure.get('google_civic_election_id', 0), one_measure.get('measure_url', ''),
+            one_measure.get('maplight_id', ''), one_measure.get('vote_smart_id', ''))
         # Check to see if there is an entry that matches in all critical ways, minus the we_vote_id
-        we_vote_id_from_master = we_vote_id
-
-        results = measure_list_manager.retrieve_possible_duplicate_measures(
-            measure_title, google_civic_election_id, measure_url, maplight_id, vote_smart_id,
-            we_vote_id_from_master)
+        if positive_value_exists(one_measure.get('we_vote_id')):
+            ignore_pair_set.add(frozenset((incoming_key, one_measure['we_vote_id'])))
+    duplicate_dict = duplicate_finder.find_duplicates_of(incoming_key_list, ignore_pair_set=ignore_pair_set)
 
-        if results['measure_list_found']:
+    for incoming_key, one_measure in zip(incoming_key_list, structured_json):
+        if incoming_key in duplicate_dict:
             # There seems to be a duplicate already in this database using a different we_vote_id
             duplicates_removed += 1
         else:
@@ -98,13 +182,32 @@ def filter_measures_structured_json_for_local_duplicates(structured_json):  # Co
 
     candidates_results = {
         'success':              True,
-        'status':               "FILTER_MEASURES_FOR_DUPLICATES_PROCESS_COMPLETE",
+        'status':               status + "FILTER_MEASURES_FOR_DUPLICATES_PROCESS_COMPLETE",
         'duplicates_removed':   duplicates_removed,
         'structured_json':      filtered_structured_json,
     }
     return candidates_results
 
 
+def add_measure_to_duplicate_finder(duplicate_finder, we_vote_id, measure_title, google_civic_election_id,
+                                    measure_url, maplight_id, vote_smart_id):
+    # The same title (ignoring case and punctuation) always matches, even when every word is too common to block on
+    identifier_list = []
+    if positive_value_exists(measure_title):
+        identifier_list.append('title:' + normalize_text_for_matching(measure_title))
+    if positive_value_exists(measure_url):
+        identifier_list.append('url:' + str(measure_url).lower())
+    if positive_value_exists(maplight_id):
+        identifier_list.append('maplight:' + str(maplight_id))
+    if positive_value_exists(vote_smart_id):
+        identifier_list.append('vote_smart:' + str(vote_smart_id))
+    duplicate_finder.add(
+        we_vote_id,
+        name_list=[measure_title],
+        scope_list=[convert_to_int(google_civic_election_id)],
+        identifier_list=identifier_list)
+
+
 def find_duplicate_contest_measure(contest_measure, ignore_measure_we_vote_id_list):
     if not hasattr(contest_measure, 'google_civic_election_id'):
         error_results = {
@@ -299,6 +402,7 @@ def measures_import_from_master_server(request, google_civic_election_id, state_
     return import_results
 
 
+@cache_version_increments_deferred()
 def measures_import_from_structured_json(structured_json):  # Consumes measuresSyncOut
     """
     This pathway in requires a we_vote_id, and is not used when we import from Google Civic
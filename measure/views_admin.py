@@ -3,8 +3,8 @@
 # -*- coding: UTF-8 -*-
 
 
-from .controllers import fetch_duplicate_measure_count, figure_out_measure_conflict_values, \
-    find_duplicate_contest_measure, \
+from .controllers import figure_out_measure_conflict_values, \
+    find_duplicate_contest_measure, find_duplicate_contest_measures_in_election, \
     measures_import_from_master_server
 from .models import ContestMeasure, ContestMeasureListManager, ContestMeasureManager, \
     CONTEST_MEASURE_UNIQUE_IDENTIFIERS
@@ -87,11 +87,9 @@ def find_and_merge_duplicate_measures_view(request):
         return redirect_to_sign_in_page(request, authority_required)
 
     contest_measure_list = []
-    ignore_measure_we_vote_id_list = []
     find_number_of_duplicates = request.GET.get('find_number_of_duplicates', 0)
     google_civic_election_id = request.GET.get('google_civic_election_id', 0)
     google_civic_election_id = convert_to_int(google_civic_election_id)
-    contest_measure_manager = ContestMeasureManager()
 
     # We only want to process if a google_civic_election_id comes in
     if not positive_value_exists(google_civic_election_id):
@@ -106,47 +104,35 @@ def find_and_merge_duplicate_measures_view(request):
     except ContestMeasure.DoesNotExist:
         pass
 
-    # Loop through all the measures in this election to see how many have possible duplicates
-    if positive_value_exists(find_number_of_duplicates):
-        duplicate_measure_count = 0
-        for contest_measure in contest_measure_list:
-            # Note that we don't reset the ignore_measure_we_vote_id_list, so we don't search for a duplicate
-            # both directions
-            ignore_measure_we_vote_id_list.append(contest_measure.we_vote_id)
-            duplicate_measure_count_temp = fetch_duplicate_measure_count(contest_measure,
-                                                                         ignore_measure_we_vote_id_list)
-            duplicate_measure_count += duplicate_measure_count_temp
+    # Find and rank all the possible duplicates in this election in one pass
+    duplicate_results = find_duplicate_contest_measures_in_election(
+        google_civic_election_id=google_civic_election_id, contest_measure_list=contest_measure_list)
+    contest_measure_dict = duplicate_results['contest_measure_dict']
+    duplicate_suggestion_list = duplicate_results['duplicate_suggestion_list']
 
+    if positive_value_exists(find_number_of_duplicates):
+        duplicate_measure_count = len(duplicate_suggestion_list)
         if positive_value_exists(duplicate_measure_count):
             messages.add_message(request, messages.INFO, "There are approximately {duplicate_measure_count} "
                                                          "possible duplicates."
                                                          "".format(duplicate_measure_count=duplicate_measure_count))
 
-    # Loop through all the contest measures in this election
-    ignore_measure_we_vote_id_list = []
-    for contest_measure in contest_measure_list:
-        # Add current contest measure entry to the ignore list
-        ignore_measure_we_vote_id_list.append(contest_measure.we_vote_id)
-        # Now check to for other contest measures we have labeled as "not a duplicate"
-        not_a_duplicate_list = contest_measure_manager.fetch_measures_are_not_duplicates_list_we_vote_ids(
-            contest_measure.we_vote_id)
-
-        ignore_measure_we_vote_id_list += not_a_duplicate_list
-
-        results = find_duplicate_contest_measure(contest_measure, ignore_measure_we_vote_id_list)
-        ignore_measure_we_vote_id_list = []
-
-        # If we find contest measures to merge, stop and ask for confirmation
-        if results['contest_measure_merge_possibility_found']:
-            contest_measure_option1_for_template = contest_measure
-            contest_measure_option2_for_template = results['contest_measure_merge_possibility']
-
-            # This view function takes us to displaying a template
-            remove_duplicate_process = True  # Try to find another measure to merge after finishing
-            return render_contest_measure_merge_form(request, contest_measure_option1_for_template,
-                                                     contest_measure_option2_for_template,
-                                                     results['contest_measure_merge_conflict_values'],
-                                                     remove_duplicate_process)
+    # Show the most likely duplicate first
+    if len(duplicate_suggestion_list):
+        duplicate_suggestion = duplicate_suggestion_list[0]
+        contest_measure_option1_for_template, contest_measure_option2_for_template = sorted(
+            [contest_measure_dict[duplicate_suggestion['we_vote_id1']],
+             contest_measure_dict[duplicate_suggestion['we_vote_id2']]],
+            key=lambda one_contest_measure: one_contest_measure.id)
+        contest_measure_merge_conflict_values = figure_out_measure_conflict_values(
+            contest_measure_option1_for_template, contest_measure_option2_for_template)
+
+        # This view function takes us to displaying a template
+        remove_duplicate_process = True  # Try to find another measure to merge after finishing
+        return render_contest_measure_merge_form(request, contest_measure_option1_for_template,
+                                                 contest_measure_option2_for_template,
+                                                 contest_measure_merge_conflict_values,
+                                                 remove_duplicate_process)
 
     message = "Google Civic Election ID: {election_id}, " \
               "No duplicate contest measures found for this election." \
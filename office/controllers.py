@@ -2,19 +2,23 @@
 # Brought to you by We Vote. Be good.
 # -*- coding: UTF-8 -*-
 
-from .models import ContestOfficeListManager, ContestOfficeManager, CONTEST_OFFICE_UNIQUE_IDENTIFIERS, ContestOffice
+from .models import ContestOfficeListManager, ContestOfficeManager, CONTEST_OFFICE_UNIQUE_IDENTIFIERS, ContestOffice, \
+    ContestOfficesAreNotDuplicates
 from ballot.controllers import move_ballot_items_to_another_office
 from ballot.models import OFFICE
 from bookmark.models import BookmarkItemList
 from candidate.controllers import move_candidates_to_another_office
 from config.base import get_environment_variable
 from django.contrib import messages
+from django.db.models import Q
 from django.http import HttpResponse
 import json
 from position.controllers import move_positions_to_another_office, update_all_position_details_from_contest_office
 import requests
 import wevote_functions.admin
-from wevote_functions.functions import positive_value_exists, process_request_from_master
+from wevote_functions.functions import convert_to_int, positive_value_exists, process_request_from_master
+from wevote_functions.functions_duplicates import DuplicateFinder, normalize_text_for_matching
+from wevote_settings.models import cache_version_increments_deferred
 
 logger = wevote_functions.admin.get_logger(__name__)
 
@@ -195,6 +199,69 @@ def find_duplicate_contest_office(contest_office, ignore_office_we_vote_id_list)
     return results
 
 
+def find_duplicate_contest_offices_in_election(google_civic_election_id, contest_office_list=None):
+    """
+    Rank every likely duplicate pair among the contest offices in this election in one pass, instead of searching the
+    database once per contest office like find_duplicate_contest_office. See DuplicateFinder.
+    :param google_civic_election_id:
+    :param contest_office_list: Pass in if the caller already has the contest offices
+    :return:
+    """
+    status = ""
+    duplicate_suggestion_list = []
+    try:
+        if contest_office_list is None:
+            contest_office_list = list(ContestOffice.objects.using('readonly')
+                                       .filter(google_civic_election_id=google_civic_election_id))
+        contest_office_dict = {contest_office.we_vote_id: contest_office for contest_office in contest_office_list}
+        not_duplicate_query = ContestOfficesAreNotDuplicates.objects.using('readonly') \
+            .filter(Q(contest_office1_we_vote_id__in=list(contest_office_dict.keys())) |
+                    Q(contest_office2_we_vote_id__in=list(contest_office_dict.keys()))) \
+            .values_list('contest_office1_we_vote_id', 'contest_office2_we_vote_id')
+        ignore_pair_set = set(frozenset(pair) for pair in not_duplicate_query)
+    except Exception as e:
+        status += "FIND_DUPLICATE_CONTEST_OFFICES_QUERY_FAILED: " + str(e) + " "
+        results = {
+            'success':                      False,
+            'status':                       status,
+            'contest_office_dict':          {},
+            'duplicate_suggestion_list':    duplicate_suggestion_list,
+        }
+        return results
+
+    duplicate_finder = DuplicateFinder(kind_of_name='title')
+    for contest_office_we_vote_id, contest_office in contest_office_dict.items():
+        state_code = contest_office.state_code.lower() if positive_value_exists(contest_office.state_code) else ''
+        # The same name (ignoring case and punctuation) always matches, even when every word is too common to block on
+        identifier_list = []
+        if positive_value_exists(normalize_text_for_matching(contest_office.office_name)):
+            identifier_list.append('name:' + normalize_text_for_matching(contest_office.office_name))
+        if positive_value_exists(contest_office.vote_usa_office_id):
+            identifier_list.append('vote_usa:' + str(contest_office.vote_usa_office_id))
+        if positive_value_exists(contest_office.ballotpedia_race_id):
+            identifier_list.append('ballotpedia:' + str(contest_office.ballotpedia_race_id))
+        if positive_value_exists(contest_office.ctcl_uuid):
+            identifier_list.append('ctcl:' + str(contest_office.ctcl_uuid))
+        duplicate_finder.add(
+            contest_office_we_vote_id,
+            name_list=[
+                contest_office.office_name,
+                contest_office.google_civic_office_name,
+                contest_office.google_civic_office_name2],
+            scope_list=[(state_code, contest_office.google_civic_election_id)],
+            identifier_list=identifier_list)
+    duplicate_suggestion_list = duplicate_finder.find_duplicates(ignore_pair_set=ignore_pair_set)
+    status += "FIND_DUPLICATE_CONTEST_OFFICES_SUGGESTIONS: " + str(len(duplicate_suggestion_list)) + " "
+
+    results = {
+        'success':                      True,
+        'status':                       status,
+        'contest_office_dict':          contest_office_dict,
+        'duplicate_suggestion_list':    duplicate_suggestion_list,
+    }
+    return results
+
+
 def figure_out_office_conflict_values(contest_office1, contest_office2):
     contest_office_merge_conflict_values = {}
 
@@ -458,47 +525,48 @@ def merge_these_two_offices(contest_office1_we_vote_id, contest_office2_we_vote_
 
 def filter_offices_structured_json_for_local_duplicates(structured_json):
     """
-    With this function, we remove offices that seem to be duplicates, but have different we_vote_id's
+    With this function, we remove offices that seem to be duplicates, but have different we_vote_id's.
+    The local offices in the elections being imported are indexed once (see DuplicateFinder), instead of searching the
+    database once per incoming office.
     :param structured_json:
     :return:
     """
-    office_manager_list = ContestOfficeListManager()
+    status = ""
     duplicates_removed = 0
     filtered_structured_json = []
-    for one_office in structured_json:
-        google_civic_election_id = one_office['google_civic_election_id'] \
-            if 'google_civic_election_id' in one_office else 0
-        state_code = one_office['state_code'] if 'state_code' in one_office else ''
-        we_vote_id = one_office['we_vote_id'] if 'we_vote_id' in one_office else ''
-        office_name = one_office['office_name'] if 'office_name' in one_office else ''
-
-        # district_id = one_office['district_id'] if 'district_id' in one_office else ''
-        # ocd_division_id = one_office['ocd_division_id'] if 'ocd_division_id' in one_office else ''
-        # number_voting_for = one_office['number_voting_for'] if 'number_voting_for' in one_office else ''
-        # number_elected = one_office['number_elected'] if 'number_elected' in one_office else ''
-        # contest_level0 = one_office['contest_level0'] if 'contest_level0' in one_office else ''
-        # contest_level1 = one_office['contest_level1'] if 'contest_level1' in one_office else ''
-        # contest_level2 = one_office['contest_level2'] if 'contest_level2' in one_office else ''
-        # primary_party = one_office['primary_party'] if 'primary_party' in one_office else ''
-        # district_name = one_office['district_name'] if 'district_name' in one_office else ''
-        # district_scope = one_office['district_scope'] if 'district_scope' in one_office else ''
-        # electorate_specifications = one_office['electorate_specifications'] \
-        #     if 'electorate_specifications' in one_office else ''
-        # special = one_office['special'] if 'special' in one_office else ''
-        # maplight_id = one_office['maplight_id'] if 'maplight_id' in one_office else 0
-        # ballotpedia_id = one_office['ballotpedia_id'] if 'ballotpedia_id' in one_office else ''
-        # wikipedia_id = one_office['wikipedia_id'] if 'wikipedia_id' in one_office else ''
+    google_civic_election_id_list = list(set(
+        convert_to_int(one_office['google_civic_election_id']) for one_office in structured_json
+        if positive_value_exists(one_office.get('google_civic_election_id'))))
+    duplicate_finder = DuplicateFinder(kind_of_name='title')
+    try:
+        local_office_query = ContestOffice.objects.using('readonly') \
+            .filter(google_civic_election_id__in=google_civic_election_id_list) \
+            .values_list('we_vote_id', 'office_name', 'google_civic_election_id', 'state_code')
+        for we_vote_id, office_name, google_civic_election_id, state_code in local_office_query:
+            # Incoming offices without a state code match local offices in any state
+            add_office_to_duplicate_finder(duplicate_finder, we_vote_id, office_name, [
+                (convert_to_int(google_civic_election_id), ''),
+                (convert_to_int(google_civic_election_id), state_code.lower() if state_code else '')])
+    except Exception as e:
+        status += "FILTER_OFFICES_LOCAL_OFFICE_QUERY_FAILED: " + str(e) + " "
 
+    incoming_key_list = []
+    ignore_pair_set = set()
+    for index, one_office in enumerate(structured_json):
+        incoming_key = 'incoming' + str(index)
+        incoming_key_list.append(incoming_key)
+        state_code = one_office['state_code'] if 'state_code' in one_office else ''
+        add_office_to_duplicate_finder(
+            duplicate_finder, incoming_key, one_office.get('office_name', ''),
+            [(convert_to_int(one_office.get('google_civic_election_id', 0)),
+              state_code.lower() if state_code else '')])
         # Check to see if there is an entry that matches in all critical ways, minus the we_vote_id
-        we_vote_id_from_master = we_vote_id
+        if positive_value_exists(one_office.get('we_vote_id')):
+            ignore_pair_set.add(frozenset((incoming_key, one_office['we_vote_id'])))
+    duplicate_dict = duplicate_finder.find_duplicates_of(incoming_key_list, ignore_pair_set=ignore_pair_set)
 
-        results = office_manager_list.retrieve_possible_duplicate_offices(
-            google_civic_election_id,
-            state_code,
-            office_name,
-            we_vote_id_from_master)
-
-        if results['office_list_found']:
+    for incoming_key, one_office in zip(incoming_key_list, structured_json):
+        if incoming_key in duplicate_dict:
             # There seems to be a duplicate already in this database using a different we_vote_id
             duplicates_removed += 1
         else:
@@ -506,13 +574,23 @@ def filter_offices_structured_json_for_local_duplicates(structured_json):
 
     offices_results = {
         'success':              True,
-        'status':               "FILTER_OFFICES_PROCESS_COMPLETE ",
+        'status':               status + "FILTER_OFFICES_PROCESS_COMPLETE ",
         'duplicates_removed':   duplicates_removed,
         'structured_json':      filtered_structured_json,
     }
     return offices_results
 
 
+def add_office_to_duplicate_finder(duplicate_finder, we_vote_id, office_name, scope_list):
+    # The same name (ignoring case and punctuation) always matches, even when every word is too common to block on
+    duplicate_finder.add(
+        we_vote_id,
+        name_list=[office_name],
+        scope_list=scope_list,
+        identifier_list=['name:' + normalize_text_for_matching(office_name)] if office_name else [])
+
+
+@cache_version_increments_deferred()
 def offices_import_from_structured_json(structured_json):
     office_manager = ContestOfficeManager()
     offices_saved = 0
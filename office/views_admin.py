@@ -2,7 +2,7 @@
 # Brought to you by We Vote. Be good.
 # -*- coding: UTF-8 -*-
 
-from .controllers import add_contest_office_name_to_next_spot, fetch_duplicate_office_count, \
+from .controllers import add_contest_office_name_to_next_spot, find_duplicate_contest_offices_in_election, \
     find_duplicate_contest_office, figure_out_office_conflict_values, merge_if_duplicate_offices, \
     offices_import_from_master_server
 from .models import ContestOffice, ContestOfficeListManager, ContestOfficeManager, CONTEST_OFFICE_UNIQUE_IDENTIFIERS
@@ -1370,12 +1370,10 @@ def find_and_merge_duplicate_offices_view(request):
         return redirect_to_sign_in_page(request, authority_required)
 
     contest_office_list = []
-    ignore_office_we_vote_id_list = []
     find_number_of_duplicates = request.GET.get('find_number_of_duplicates', 0)
     google_civic_election_id = request.GET.get('google_civic_election_id', 0)
     google_civic_election_id = convert_to_int(google_civic_election_id)
     state_code = request.GET.get('state_code', "")
-    contest_office_manager = ContestOfficeManager()
 
     # We only want to process if a google_civic_election_id comes in
     if not positive_value_exists(google_civic_election_id):
@@ -1390,69 +1388,60 @@ def find_and_merge_duplicate_offices_view(request):
     except ContestOffice.DoesNotExist:
         pass
 
-    # Loop through all of the offices in this election to see how many have possible duplicates
-    if positive_value_exists(find_number_of_duplicates):
-        duplicate_office_count = 0
-        for contest_office in contest_office_list:
-            # Note that we don't reset the ignore_office_we_vote_id_list, so we don't search for a duplicate
-            # both directions
-            ignore_office_we_vote_id_list.append(contest_office.we_vote_id)
-            duplicate_office_count_temp = fetch_duplicate_office_count(contest_office,
-                                                                       ignore_office_we_vote_id_list)
-            duplicate_office_count += duplicate_office_count_temp
+    # Find and rank all the possible duplicates in this election in one pass
+    duplicate_results = find_duplicate_contest_offices_in_election(
+        google_civic_election_id=google_civic_election_id, contest_office_list=contest_office_list)
+    contest_office_dict = duplicate_results['contest_office_dict']
+    duplicate_suggestion_list = duplicate_results['duplicate_suggestion_list']
 
+    if positive_value_exists(find_number_of_duplicates):
+        duplicate_office_count = len(duplicate_suggestion_list)
         if positive_value_exists(duplicate_office_count):
             messages.add_message(request, messages.INFO, "There are approximately {duplicate_office_count} "
                                                          "possible duplicates."
                                                          "".format(duplicate_office_count=duplicate_office_count))
 
-    # Loop through all of the contest offices in this election
-    ignore_office_we_vote_id_list = []
-    for contest_office in contest_office_list:
-        # Add current contest office entry to the ignore list
-        ignore_office_we_vote_id_list.append(contest_office.we_vote_id)
-        # Now check to for other contest offices we have labeled as "not a duplicate"
-        not_a_duplicate_list = contest_office_manager.fetch_offices_are_not_duplicates_list_we_vote_ids(
-            contest_office.we_vote_id)
-
-        ignore_office_we_vote_id_list += not_a_duplicate_list
-
-        results = find_duplicate_contest_office(contest_office, ignore_office_we_vote_id_list)
-        ignore_office_we_vote_id_list = []
+    # Loop through the possible duplicates, most likely first
+    for duplicate_suggestion in duplicate_suggestion_list:
+        contest_office, other_contest_office = sorted(
+            [contest_office_dict[duplicate_suggestion['we_vote_id1']],
+             contest_office_dict[duplicate_suggestion['we_vote_id2']]],
+            key=lambda one_contest_office: one_contest_office.id)
 
         # If we find contest offices to merge, stop and ask for confirmation
-        if results['contest_office_merge_possibility_found']:
-            contest_office_option1_for_template = contest_office
-            contest_office_option2_for_template = results['contest_office_merge_possibility']
-
-            # Can we automatically merge these offices?
-            merge_results = merge_if_duplicate_offices(
-                contest_office_option1_for_template, contest_office_option2_for_template,
-                results['contest_office_merge_conflict_values'])
-
-            if merge_results['offices_merged']:
-                office = merge_results['office']
-                message = "Office '{office_name}' automatically merged.".format(office_name=office.office_name)
-                # print_to_log(logger, exception_message_optional=message)
-                print("Offices merged:", message)
-                # try:
-                #     messages.add_message(request, messages.INFO, "Office {office_name} automatically merged."
-                #                                                  "".format(office_name=office.office_name))
-                # except Exception as e:
-                #     pass
-                return HttpResponseRedirect(reverse('office:find_and_merge_duplicate_offices', args=()) +
-                                            "?google_civic_election_id=" + str(google_civic_election_id) +
-                                            "&state_code=" + str(state_code))
-            else:
-                if merge_results['success'] is False:
-                    messages.add_message(request, messages.INFO, "AUTO_MERGE_ATTEMPT_FAILED: {status} "
-                                                                 "".format(status=merge_results['status']))
-                # This view function takes us to displaying a template
-                remove_duplicate_process = True  # Try to find another office to merge after finishing
-                return render_contest_office_merge_form(request, contest_office_option1_for_template,
-                                                        contest_office_option2_for_template,
-                                                        results['contest_office_merge_conflict_values'],
-                                                        remove_duplicate_process)
+        contest_office_option1_for_template = contest_office
+        contest_office_option2_for_template = other_contest_office
+        contest_office_merge_conflict_values = figure_out_office_conflict_values(
+            contest_office_option1_for_template, contest_office_option2_for_template)
+
+        # Can we automatically merge these offices?
+        merge_results = merge_if_duplicate_offices(
+            contest_office_option1_for_template, contest_office_option2_for_template,
+            contest_office_merge_conflict_values)
+
+        if merge_results['offices_merged']:
+            office = merge_results['office']
+            message = "Office '{office_name}' automatically merged.".format(office_name=office.office_name)
+            # print_to_log(logger, exception_message_optional=message)
+            print("Offices merged:", message)
+            # try:
+            #     messages.add_message(request, messages.INFO, "Office {office_name} automatically merged."
+            #                                                  "".format(office_name=office.office_name))
+            # except Exception as e:
+            #     pass
+            return HttpResponseRedirect(reverse('office:find_and_merge_duplicate_offices', args=()) +
+                                        "?google_civic_election_id=" + str(google_civic_election_id) +
+                                        "&state_code=" + str(state_code))
+        else:
+            if merge_results['success'] is False:
+                messages.add_message(request, messages.INFO, "AUTO_MERGE_ATTEMPT_FAILED: {status} "
+                                                             "".format(status=merge_results['status']))
+            # This view function takes us to displaying a template
+            remove_duplicate_process = True  # Try to find another office to merge after finishing
+            return render_contest_office_merge_form(request, contest_office_option1_for_template,
+                                                    contest_office_option2_for_template,
+                                                    contest_office_merge_conflict_values,
+                                                    remove_duplicate_process)
 
     message = "Google Civic Election ID: {election_id}, " \
               "No duplicate contest offices found for this election." \
@@ -39,8 +39,9 @@ from wevote_functions.functions import convert_to_int, \
     process_request_from_master, extract_website_from_url
 from .controllers_fastly import add_wevote_subdomain_to_fastly, add_subdomain_route53_record, \
     get_wevote_subdomain_status
-from .models import Organization, OrganizationListManager, OrganizationManager, OrganizationMembershipLinkToVoter, \
-    OrganizationReservedDomain, OrganizationTeamMember, ORGANIZATION_UNIQUE_IDENTIFIERS
+from .models import fetch_site_configuration_from_cache, Organization, OrganizationListManager, OrganizationManager, \
+    OrganizationMembershipLinkToVoter, OrganizationReservedDomain, OrganizationTeamMember, \
+    ORGANIZATION_UNIQUE_IDENTIFIERS, store_site_configuration_in_cache
 
 logger = wevote_functions.admin.get_logger(__name__)
 
@@ -3134,6 +3135,12 @@ def site_configuration_retrieve_for_api(hostname):  # siteConfigurationRetrieve
             'reserved_by_we_vote':              reserved_by_we_vote,
         }
         return results
+    cached_results = fetch_site_configuration_from_cache(hostname)
+    if cached_results is not None:
+        cached_results['status'] = status + "SITE_CONFIGURATION_FROM_CACHE "
+        return cached_results
+
+    incoming_hostname = hostname
     results = organization_manager.retrieve_organization_from_incoming_hostname(hostname, read_only=True)
     organization_found = results['organization_found']
     organization = results['organization']
@@ -3178,6 +3185,8 @@ def site_configuration_retrieve_for_api(hostname):  # siteConfigurationRetrieve
         'organization_we_vote_id':          organization_we_vote_id,
         'reserved_by_we_vote':              reserved_by_we_vote,
     }
+    if success:
+        store_site_configuration_in_cache(incoming_hostname, results)
     return results
 
 
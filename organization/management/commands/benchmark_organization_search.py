@@ -0,0 +1,110 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test.utils import setup_databases, setup_test_environment, teardown_databases, \
+    teardown_test_environment
+
+from organization.models import Organization
+from organization.organization_search import create_organization_search_indexes, search_organizations
+
+NAME_WORD_LIST = [
+    'Action', 'Alliance', 'American', 'Association', 'Bay', 'Citizens', 'Clean', 'Coalition', 'Committee',
+    'Community', 'Conservation', 'Council', 'Democratic', 'Education', 'Energy', 'Fair', 'Families', 'Federation',
+    'Forward', 'Fund', 'Green', 'Housing', 'Independent', 'League', 'Liberty', 'Network', 'Parents', 'Project',
+    'Republican', 'Rights', 'Safe', 'Streets', 'Taxpayers', 'Teachers', 'Transit', 'Union', 'Valley', 'Voters',
+    'Water', 'Women', 'Workers', 'Youth',
+]
+
+
+def seed_benchmark_organizations(organization_count, batch_size=5000):
+    random_generator = random.Random(2022)
+    organization_list = []
+    for number in range(organization_count):
+        name_word_list = random_generator.sample(NAME_WORD_LIST, random_generator.randint(2, 4))
+        organization_twitter_handle = ''.join(name_word_list)[:12] + str(number)
+        organization_list.append(Organization(
+            we_vote_id='wvbenchorg' + str(number),
+            organization_name=' '.join(name_word_list),
+            organization_twitter_handle=organization_twitter_handle,
+            organization_website='https://www.' + organization_twitter_handle.lower() + '.org',
+            organization_email='info@' + organization_twitter_handle.lower() + '.org',
+            organization_facebook=organization_twitter_handle.lower(),
+            twitter_followers_count=random_generator.randint(0, 100000),
+        ))
+        if len(organization_list) >= batch_size:
+            Organization.objects.bulk_create(organization_list)
+            organization_list = []
+    if len(organization_list):
+        Organization.objects.bulk_create(organization_list)
+
+
+def benchmark_search_list(organization_count):
+    # Handles from seed_benchmark_organizations end with the organization's number
+    one_organization = Organization.objects.get(we_vote_id='wvbenchorg' + str(organization_count // 2))
+    another_organization = Organization.objects.get(we_vote_id='wvbenchorg' + str(organization_count // 3))
+    return [
+        ('name word', {'organization_name': 'Teachers'}),
+        ('search term, 2 words', {'organization_search_term': 'clean water'}),
+        ('search term, exact', {'organization_search_term': one_organization.organization_name,
+                                'exact_match': True}),
+        ('twitter handle', {'organization_twitter_handle': one_organization.organization_twitter_handle}),
+        ('twitter handle list', {'twitter_handle_list': [one_organization.organization_twitter_handle,
+                                                         another_organization.organization_twitter_handle]}),
+        ('twitter handle, partial', {'organization_twitter_handle': 'VotersUnion'}),
+        ('website', {'organization_website': one_organization.organization_website}),
+    ]
+
+
+def time_search_list(search_list, iterations):
+    measurement_dict = {}
+    for search_name, search_kwargs in search_list:
+        millisecond_list = []
+        organization_count = 0
+        for iteration in range(iterations):
+            start_time = time.perf_counter()
+            results = search_organizations(**search_kwargs)
+            millisecond_list.append((time.perf_counter() - start_time) * 1000)
+            organization_count = len(results['organization_list'])
+        measurement_dict[search_name] = {
+            'p50_ms':               statistics.median(millisecond_list),
+            'organization_count':   organization_count,
+        }
+    return measurement_dict
+
+
+class Command(BaseCommand):
+    help = 'Seeds organizations in a throwaway test database, and times organization search before and after ' \
+           'the organization search indexes are created'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--organizations', type=int, default=50000)
+        parser.add_argument('--iterations', type=int, default=10)
+        parser.add_argument('--keepdb', action='store_true')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_database_config = setup_databases(verbosity=options['verbosity'], interactive=False,
+                                              keepdb=options['keepdb'])
+        try:
+            seed_benchmark_organizations(options['organizations'])
+            search_list = benchmark_search_list(options['organizations'])
+            with connections['default'].cursor() as cursor:
+                cursor.execute('ANALYZE "' + Organization._meta.db_table + '"')
+            before_dict = time_search_list(search_list, options['iterations'])
+            index_results = create_organization_search_indexes()
+            with connections['default'].cursor() as cursor:
+                cursor.execute('ANALYZE "' + Organization._meta.db_table + '"')
+            after_dict = time_search_list(search_list, options['iterations'])
+        finally:
+            teardown_databases(old_database_config, verbosity=options['verbosity'], keepdb=options['keepdb'])
+            teardown_test_environment()
+
+        self.stdout.write('Organizations: ' + str(options['organizations']) + ', ' + index_results['status'])
+        self.stdout.write('{:<30}{:>14}{:>14}{:>10}'.format('Search', 'before p50 ms', 'after p50 ms', 'found'))
+        for search_name, before in before_dict.items():
+            self.stdout.write('{:<30}{:>14.1f}{:>14.1f}{:>10}'.format(
+                search_name, before['p50_ms'], after_dict[search_name]['p50_ms'],
+                after_dict[search_name]['organization_count']))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from organization.organization_search import create_organization_search_indexes
+
+
+class Command(BaseCommand):
+    help = 'Creates the pg_trgm extension and the indexes used by organization search, without locking the ' \
+           'organization table. Safe to run again.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        results = create_organization_search_indexes(database_alias=options['database'])
+        if not results['success']:
+            raise CommandError(results['status'])
+        self.stdout.write(results['status'])
@@ -5,6 +5,11 @@
 from django.core.validators import RegexValidator
 from django.db import models
 from django.db.models import Q
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from collections import OrderedDict
+import threading
+import time
 
 import wevote_functions.admin
 from exception.models import handle_exception, \
@@ -2106,6 +2111,7 @@ class OrganizationListManager(models.Manager):
         We want to find *any* possible organization that includes any of the search terms
         We do "OR" across the incoming fields like name, twitter_handle, website, etc.
         We do "AND" with multiple words coming in for organization_search_term
+        The best matches come first: see organization/organization_search.py
         :param organization_name:
         :param organization_twitter_handle:
         :param organization_website:
@@ -2117,115 +2123,21 @@ class OrganizationListManager(models.Manager):
         :param exact_match:
         :return:
         """
-        organization_list_for_json = {}
-        if positive_value_exists(organization_search_term):
-            organization_search_term_array = organization_search_term.split()
-        else:
-            organization_search_term_array = []
+        organization_list_for_json = []
         try:
-            filters = []
-            and_filters = []
-            organization_list_for_json = []
-            organization_objects_list = []
-            if positive_value_exists(organization_search_term):
-                for search_term in organization_search_term_array:
-                    if positive_value_exists(exact_match):
-                        organization_twitter_search = extract_twitter_handle_from_text_string(search_term)
-                        new_filter = Q(organization_name__iexact=search_term) | \
-                            Q(organization_website__iexact=search_term) | \
-                            Q(organization_email__iexact=search_term) | \
-                            Q(organization_facebook__iexact=search_term) | \
-                            Q(organization_twitter_handle__iexact=organization_twitter_search)
-                        and_filters.append(new_filter)
-                    else:
-                        organization_twitter_search = extract_twitter_handle_from_text_string(search_term)
-                        new_filter = Q(organization_name__icontains=search_term) | \
-                            Q(organization_website__icontains=search_term) | \
-                            Q(organization_email__icontains=search_term) | \
-                            Q(organization_facebook__icontains=search_term) | \
-                            Q(organization_twitter_handle__icontains=organization_twitter_search)
-                        and_filters.append(new_filter)
-
-            if positive_value_exists(organization_name):
-                if positive_value_exists(exact_match):
-                    new_filter = Q(organization_name__iexact=organization_name)
-                else:
-                    new_filter = Q(organization_name__icontains=organization_name)
-                filters.append(new_filter)
-
-            # The master organization twitter_handle data is in TwitterLinkToOrganization but we try to keep
-            # organization_twitter_handle up-to-date for rapid searches like this.
-            if positive_value_exists(organization_twitter_handle):
-                organization_twitter_handle2 = extract_twitter_handle_from_text_string(organization_twitter_handle)
-                if positive_value_exists(exact_match):
-                    new_filter = Q(organization_twitter_handle__iexact=organization_twitter_handle2)
-                else:
-                    new_filter = Q(organization_twitter_handle__icontains=organization_twitter_handle2)
-                filters.append(new_filter)
-
-            if positive_value_exists(twitter_handle_list):
-                for one_twitter_handle in twitter_handle_list:
-                    one_twitter_handle2 = extract_twitter_handle_from_text_string(one_twitter_handle)
-                    if positive_value_exists(exact_match):
-                        new_filter = Q(organization_twitter_handle__iexact=one_twitter_handle2)
-                    else:
-                        new_filter = Q(organization_twitter_handle__icontains=one_twitter_handle2)
-                    filters.append(new_filter)
-
-            if positive_value_exists(facebook_page_list):
-                for one_facebook_page in facebook_page_list:
-                    one_facebook_page2 = extract_twitter_handle_from_text_string(one_facebook_page)
-                    if positive_value_exists(exact_match):
-                        new_filter = Q(organization_facebook__iexact=one_facebook_page2)
-                    else:
-                        new_filter = Q(organization_facebook__icontains=one_facebook_page2)
-                    filters.append(new_filter)
-
-            if positive_value_exists(organization_website):
-                if positive_value_exists(exact_match):
-                    new_filter = Q(organization_website__iexact=organization_website)
-                else:
-                    new_filter = Q(organization_website__icontains=organization_website)
-                filters.append(new_filter)
-
-            if positive_value_exists(organization_email):
-                if positive_value_exists(exact_match):
-                    new_filter = Q(organization_email__iexact=organization_email)
-                else:
-                    new_filter = Q(organization_email__icontains=organization_email)
-                filters.append(new_filter)
-
-            if positive_value_exists(organization_facebook):
-                if positive_value_exists(exact_match):
-                    new_filter = Q(organization_facebook__iexact=organization_facebook)
-                else:
-                    new_filter = Q(organization_facebook__icontains=organization_facebook)
-                filters.append(new_filter)
-
-            organization_query = Organization.objects.all()
-            # "OR" filters
-            or_filters_found = False
-            if len(filters) > 0:
-                or_filters_found = True
-                final_filters = filters.pop()
-                # ...and "OR" the remaining items in the list
-                for item in filters:
-                    final_filters |= item
-
-                organization_query = organization_query.filter(final_filters)
-            # "AND" filters
-            and_filters_found = False
-            if len(and_filters) > 0:
-                and_filters_found = True
-                final_and_filters = and_filters.pop()
-                # ...and "AND" the remaining items in the list
-                for item in and_filters:
-                    final_and_filters &= item
-                organization_query = organization_query.filter(final_and_filters)
-
-            if or_filters_found or and_filters_found:
-                organization_query = organization_query[:250]
-                organization_objects_list = list(organization_query)
+            # Imported here since organization_search imports Organization
+            from organization.organization_search import search_organizations
+            search_results = search_organizations(
+                organization_name=organization_name,
+                organization_twitter_handle=organization_twitter_handle,
+                organization_website=organization_website,
+                organization_email=organization_email,
+                organization_facebook=organization_facebook,
+                organization_search_term=organization_search_term,
+                twitter_handle_list=twitter_handle_list,
+                facebook_page_list=facebook_page_list,
+                exact_match=exact_match)
+            organization_objects_list = search_results['organization_list']
 
             if len(organization_objects_list):
                 organizations_found = True
@@ -2266,6 +2178,7 @@ class OrganizationListManager(models.Manager):
             else:
                 organizations_found = False
                 status = 'NO_ORGANIZATIONS_RETRIEVED '
+            status += search_results['status']
             success = True
         except Organization.DoesNotExist:
             # No organizations found. Not a problem.
@@ -2277,7 +2190,7 @@ class OrganizationListManager(models.Manager):
             handle_exception(e, logger=logger,
                              exception_message="exception thrown in organization_search_find_any_possibilities")
             status = 'FAILED organization_search_find_any_possibilities ' \
-                     '{error} [type: {error_type}]'.format(error=e.message, error_type=type(e))
+                     '{error} [type: {error_type}]'.format(error=e, error_type=type(e))
             success = False
 
         results = {
@@ -3194,3 +3107,75 @@ class OrganizationTeamMember(models.Model):
     voter_we_vote_id = models.CharField(max_length=255, null=True, blank=True, unique=False, db_index=True)
     we_vote_hosted_profile_image_url_tiny = models.TextField(blank=True, null=True)
     date_last_changed = models.DateTimeField(verbose_name='date last changed', null=True, auto_now=True, db_index=True)
+
+
+# siteConfigurationRetrieve is called for the same few hostnames on every campaignListRetrieve, and the answer only
+#  changes when an organization's domain or branding is edited. Edits in this process clear the matching entries
+#  right away; other processes see the edit once their entry is this old.
+#  The hostname comes from the client, so only the most recently used SITE_CONFIGURATION_CACHE_MAX_ENTRIES are kept.
+SITE_CONFIGURATION_CACHE_SECONDS = 60
+SITE_CONFIGURATION_CACHE_MAX_ENTRIES = 1000
+site_configuration_cache = OrderedDict()
+site_configuration_cache_lock = threading.Lock()
+
+
+def fetch_site_configuration_from_cache(hostname):
+    with site_configuration_cache_lock:
+        cache_entry = site_configuration_cache.get(hostname)
+        if cache_entry is None:
+            return None
+        if time.monotonic() - cache_entry['date_cached'] > SITE_CONFIGURATION_CACHE_SECONDS:
+            site_configuration_cache.pop(hostname, None)
+            return None
+        site_configuration_cache.move_to_end(hostname)
+    return dict(cache_entry['results'])
+
+
+def store_site_configuration_in_cache(hostname, results):
+    with site_configuration_cache_lock:
+        site_configuration_cache[hostname] = {
+            'date_cached':  time.monotonic(),
+            'results':      dict(results),
+        }
+        site_configuration_cache.move_to_end(hostname)
+        while len(site_configuration_cache) > SITE_CONFIGURATION_CACHE_MAX_ENTRIES:
+            site_configuration_cache.popitem(last=False)
+
+
+def clear_site_configuration_cache(organization_we_vote_id='', hostname_list=None):
+    """
+    Remove cached site configurations that belong to this organization or answer for one of these hostnames.
+    With no arguments, everything is cleared.
+    :param organization_we_vote_id:
+    :param hostname_list:
+    :return:
+    """
+    hostname_list = [hostname.strip().lower() for hostname in (hostname_list or []) if positive_value_exists(hostname)]
+    with site_configuration_cache_lock:
+        if not positive_value_exists(organization_we_vote_id) and not len(hostname_list):
+            site_configuration_cache.clear()
+            return
+        for hostname in list(site_configuration_cache.keys()):
+            cached_organization_we_vote_id = site_configuration_cache[hostname]['results']['organization_we_vote_id']
+            if hostname in hostname_list or (positive_value_exists(organization_we_vote_id) and
+                                             cached_organization_we_vote_id == organization_we_vote_id):
+                site_configuration_cache.pop(hostname, None)
+
+
+@receiver(post_save, sender=Organization)
+@receiver(post_delete, sender=Organization)
+def organization_site_configuration_changed_signal(sender, instance, **kwargs):
+    hostname_list = [instance.chosen_domain_string]
+    if positive_value_exists(instance.chosen_subdomain_string):
+        hostname_list.append(instance.chosen_subdomain_string + '.wevote.us')
+    clear_site_configuration_cache(organization_we_vote_id=instance.we_vote_id, hostname_list=hostname_list)
+
+
+@receiver(post_save, sender=OrganizationReservedDomain)
+@receiver(post_delete, sender=OrganizationReservedDomain)
+def organization_reserved_domain_changed_signal(sender, instance, **kwargs):
+    hostname_list = [instance.full_domain_string]
+    if positive_value_exists(instance.subdomain_string):
+        hostname_list.append(instance.subdomain_string + '.wevote.us')
+    clear_site_configuration_cache(organization_we_vote_id=instance.organization_we_vote_id,
+                                   hostname_list=hostname_list)
@@ -0,0 +1,230 @@
+# organization/organization_search.py
+# Brought to you by We Vote. Be good.
+# -*- coding: UTF-8 -*-
+
+"""
+Organization search for the admin pages, endorsement imports and organizationSearch.
+Django compares UPPER("column"::text) for both icontains and iexact on PostgreSQL, so the trigram (GIN) and UPPER()
+indexes created by create_organization_search_indexes serve the same filters we have always used. Matches are
+ranked: exact Twitter handles first, then how close the name is, then Twitter followers.
+"""
+
+from django.db import connections
+from django.db.models import Case, F, FloatField, Q, Value, When
+from django.contrib.postgres.search import TrigramSimilarity
+
+from organization.models import Organization
+import wevote_functions.admin
+from wevote_functions.functions import extract_twitter_handle_from_text_string, positive_value_exists
+
+logger = wevote_functions.admin.get_logger(__name__)
+
+ORGANIZATION_SEARCH_LIMIT = 250
+# Field -> short name for its indexes (index names are limited to 63 characters)
+ORGANIZATION_SEARCH_INDEX_FIELD_DICT = {
+    'organization_name':            'name',
+    'organization_twitter_handle':  'twitter_handle',
+    'organization_website':         'website',
+    'organization_email':           'email',
+    'organization_facebook':        'facebook',
+}
+trigram_similarity_available_dict = {}  # key is database alias
+
+
+def organization_search_index_sql_list():
+    table_name = Organization._meta.db_table
+    sql_list = ["CREATE EXTENSION IF NOT EXISTS pg_trgm"]
+    for field_name, short_name in ORGANIZATION_SEARCH_INDEX_FIELD_DICT.items():
+        column_name = Organization._meta.get_field(field_name).column
+        # For icontains
+        sql_list.append(
+            'CREATE INDEX CONCURRENTLY IF NOT EXISTS organization_search_{short_name}_trgm ON "{table_name}" '
+            'USING gin (UPPER("{column_name}"::text) gin_trgm_ops)'.format(
+                short_name=short_name, table_name=table_name, column_name=column_name))
+        # For iexact, ex/ the exact Twitter handle lookups
+        sql_list.append(
+            'CREATE INDEX CONCURRENTLY IF NOT EXISTS organization_search_{short_name}_upper ON "{table_name}" '
+            '(UPPER("{column_name}"::text))'.format(
+                short_name=short_name, table_name=table_name, column_name=column_name))
+    return sql_list
+
+
+def create_organization_search_indexes(database_alias='default'):
+    """
+    Safe to run again. The indexes are built CONCURRENTLY, so the organization table stays writable.
+    We don't commit migrations, so this is run once on each database with "python manage.py
+    create_organization_search_indexes".
+    :param database_alias:
+    :return:
+    """
+    status = ""
+    connection = connections[database_alias]
+    if connection.vendor != 'postgresql':
+        return {
+            'success':  True,
+            'status':   "ORGANIZATION_SEARCH_INDEXES_ONLY_FOR_POSTGRESQL ",
+        }
+    success = True
+    try:
+        with connection.cursor() as cursor:
+            for sql in organization_search_index_sql_list():
+                cursor.execute(sql)
+        status += "ORGANIZATION_SEARCH_INDEXES_CREATED "
+    except Exception as e:
+        status += "ORGANIZATION_SEARCH_INDEXES_FAILED: " + str(e) + " "
+        success = False
+    trigram_similarity_available_dict.pop(database_alias, None)
+    return {
+        'success':  success,
+        'status':   status,
+    }
+
+
+def is_trigram_similarity_available(database_alias='default'):
+    """
+    Names are only ranked by similarity where the pg_trgm extension is installed. Checked once per worker.
+    :param database_alias:
+    :return:
+    """
+    if database_alias not in trigram_similarity_available_dict:
+        available = False
+        connection = connections[database_alias]
+        if connection.vendor == 'postgresql':
+            try:
+                with connection.cursor() as cursor:
+                    cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+                    available = cursor.fetchone() is not None
+            except Exception as e:
+                logger.error("is_trigram_similarity_available: " + str(e))
+        trigram_similarity_available_dict[database_alias] = available
+    return trigram_similarity_available_dict[database_alias]
+
+
+def search_organizations(
+        organization_name='', organization_twitter_handle='', organization_website='', organization_email='',
+        organization_facebook='', organization_search_term='', twitter_handle_list=None, facebook_page_list=None,
+        exact_match=False, limit=ORGANIZATION_SEARCH_LIMIT):
+    """
+    We do "OR" across the incoming fields like name, twitter_handle, website, etc.
+    We do "AND" with multiple words coming in for organization_search_term
+    When we are only given Twitter handles, and each one belongs to an organization, we return those organizations
+    without searching for handles that contain them.
+    :return: the best limit matches, best first
+    """
+    status = ""
+    exact_match = positive_value_exists(exact_match)
+    twitter_handle_to_find_list = []
+    if positive_value_exists(organization_twitter_handle):
+        twitter_handle_to_find_list.append(extract_twitter_handle_from_text_string(organization_twitter_handle))
+    if positive_value_exists(twitter_handle_list):
+        for one_twitter_handle in twitter_handle_list:
+            twitter_handle_to_find_list.append(extract_twitter_handle_from_text_string(one_twitter_handle))
+    twitter_handle_to_find_list = [twitter_handle for twitter_handle in twitter_handle_to_find_list
+                                   if positive_value_exists(twitter_handle)]
+    exact_twitter_handle_filter = None
+    for twitter_handle in twitter_handle_to_find_list:
+        new_filter = Q(organization_twitter_handle__iexact=twitter_handle)
+        exact_twitter_handle_filter = new_filter if exact_twitter_handle_filter is None \
+            else exact_twitter_handle_filter | new_filter
+
+    only_twitter_handles = len(twitter_handle_to_find_list) and not positive_value_exists(organization_name) \
+        and not positive_value_exists(organization_website) and not positive_value_exists(organization_email) \
+        and not positive_value_exists(organization_facebook) \
+        and not positive_value_exists(organization_search_term) and not positive_value_exists(facebook_page_list)
+    if only_twitter_handles:
+        organization_list = list(Organization.objects.filter(exact_twitter_handle_filter)
+                                 .order_by(F('twitter_followers_count').desc(nulls_last=True), 'id')[:limit])
+        twitter_handle_found_set = set(organization.organization_twitter_handle.upper()
+                                       for organization in organization_list
+                                       if organization.organization_twitter_handle)
+        every_twitter_handle_found = all(twitter_handle.upper() in twitter_handle_found_set
+                                         for twitter_handle in twitter_handle_to_find_list)
+        if exact_match or every_twitter_handle_found:
+            status += "ORGANIZATION_SEARCH_EXACT_TWITTER_HANDLE "
+            return {
+                'success':              True,
+                'status':               status,
+                'organization_list':    organization_list,
+            }
+
+    filters = []
+    and_filters = []
+    if positive_value_exists(organization_search_term):
+        for search_term in organization_search_term.split():
+            organization_twitter_search = extract_twitter_handle_from_text_string(search_term)
+            if exact_match:
+                new_filter = Q(organization_name__iexact=search_term) | \
+                    Q(organization_website__iexact=search_term) | \
+                    Q(organization_email__iexact=search_term) | \
+                    Q(organization_facebook__iexact=search_term) | \
+                    Q(organization_twitter_handle__iexact=organization_twitter_search)
+            else:
+                new_filter = Q(organization_name__icontains=search_term) | \
+                    Q(organization_website__icontains=search_term) | \
+                    Q(organization_email__icontains=search_term) | \
+                    Q(organization_facebook__icontains=search_term) | \
+                    Q(organization_twitter_handle__icontains=organization_twitter_search)
+            and_filters.append(new_filter)
+
+    # The master organization twitter_handle data is in TwitterLinkToOrganization but we try to keep
+    # organization_twitter_handle up-to-date for rapid searches like this.
+    for twitter_handle in twitter_handle_to_find_list:
+        if exact_match:
+            filters.append(Q(organization_twitter_handle__iexact=twitter_handle))
+        else:
+            filters.append(Q(organization_twitter_handle__icontains=twitter_handle))
+
+    if positive_value_exists(facebook_page_list):
+        for one_facebook_page in facebook_page_list:
+            one_facebook_page2 = extract_twitter_handle_from_text_string(one_facebook_page)
+            if exact_match:
+                filters.append(Q(organization_facebook__iexact=one_facebook_page2))
+            else:
+                filters.append(Q(organization_facebook__icontains=one_facebook_page2))
+
+    for field_name, field_value in (('organization_name', organization_name),
+                                    ('organization_website', organization_website),
+                                    ('organization_email', organization_email),
+                                    ('organization_facebook', organization_facebook)):
+        if positive_value_exists(field_value):
+            lookup = field_name + ('__iexact' if exact_match else '__icontains')
+            filters.append(Q(**{lookup: field_value}))
+
+    if not len(filters) and not len(and_filters):
+        return {
+            'success':              True,
+            'status':               status,
+            'organization_list':    [],
+        }
+
+    organization_query = Organization.objects.all()
+    if len(filters):
+        # "OR" filters
+        final_filters = filters.pop()
+        for item in filters:
+            final_filters |= item
+        organization_query = organization_query.filter(final_filters)
+    for item in and_filters:
+        # "AND" filters
+        organization_query = organization_query.filter(item)
+
+    # Rank the matches
+    rank_expression = Value(0.0, output_field=FloatField())
+    if exact_twitter_handle_filter is not None:
+        rank_expression = rank_expression + Case(
+            When(exact_twitter_handle_filter, then=Value(2.0)), default=Value(0.0), output_field=FloatField())
+    name_to_rank_by = organization_name if positive_value_exists(organization_name) else organization_search_term
+    if positive_value_exists(name_to_rank_by):
+        rank_expression = rank_expression + Case(
+            When(organization_name__iexact=name_to_rank_by, then=Value(1.0)),
+            default=Value(0.0), output_field=FloatField())
+        if not exact_match and is_trigram_similarity_available():
+            rank_expression = rank_expression + TrigramSimilarity('organization_name', name_to_rank_by)
+    organization_query = organization_query.annotate(search_rank=rank_expression) \
+        .order_by('-search_rank', F('twitter_followers_count').desc(nulls_last=True), 'id')
+    organization_list = list(organization_query[:limit])
+    return {
+        'success':              True,
+        'status':               status,
+        'organization_list':    organization_list,
+    }
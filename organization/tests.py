@@ -0,0 +1,37 @@
+# organization/tests.py
+# Brought to you by We Vote. Be good.
+# -*- coding: UTF-8 -*-
+
+from django.test import TestCase
+
+from organization.models import Organization, OrganizationListManager
+
+
+class OrganizationSearchTestCase(TestCase):
+    databases = '__all__'
+
+    def setUp(self):
+        Organization.objects.create(we_vote_id='wv01org1', organization_name='Clean Water Voters',
+                                    organization_twitter_handle='CleanWaterVotersBay', twitter_followers_count=900)
+        Organization.objects.create(we_vote_id='wv01org2', organization_name='Clean Water',
+                                    organization_twitter_handle='CleanWater', twitter_followers_count=10)
+        Organization.objects.create(we_vote_id='wv01org3', organization_name='Transit Riders',
+                                    organization_twitter_handle='TransitRiders', twitter_followers_count=50)
+
+    def test_exact_twitter_handle_is_found_without_partial_matches(self):
+        results = OrganizationListManager().organization_search_find_any_possibilities(
+            twitter_handle_list=['@cleanwater'])
+        self.assertTrue(results['success'])
+        self.assertEqual([organization['organization_we_vote_id'] for organization in results['organizations_list']],
+                         ['wv01org2'])
+
+    def test_best_match_comes_first(self):
+        results = OrganizationListManager().organization_search_find_any_possibilities(
+            organization_name='Clean Water')
+        self.assertEqual([organization['organization_we_vote_id'] for organization in results['organizations_list']],
+                         ['wv01org2', 'wv01org1'])
+        # The handle doesn't belong to anyone, so we look for handles containing it
+        results = OrganizationListManager().organization_search_find_any_possibilities(
+            organization_twitter_handle='Transit')
+        self.assertEqual([organization['organization_we_vote_id'] for organization in results['organizations_list']],
+                         ['wv01org3'])
@@ -2,20 +2,29 @@
 # Brought to you by We Vote. Be good.
 # -*- coding: UTF-8 -*-
 
-from .models import PollingLocationManager
+from .models import PollingLocation, PollingLocationManager
 from config.base import get_environment_variable
 from django.contrib import messages
+from django.db import transaction
 import glob
 import json
 import requests
 import wevote_functions.admin
 from wevote_functions.functions import positive_value_exists, process_request_from_master
+from wevote_settings.models import generate_we_vote_id_list
 import xml.etree.ElementTree as MyElementTree
 
 logger = wevote_functions.admin.get_logger(__name__)
 
 WE_VOTE_API_KEY = get_environment_variable("WE_VOTE_API_KEY")
 POLLING_LOCATIONS_SYNC_URL = get_environment_variable("POLLING_LOCATIONS_SYNC_URL")  # pollingLocationsSyncOut
+POLLING_LOCATION_IMPORT_BATCH_SIZE = 1000
+# Element -> the address element with its name
+POLLING_LOCATION_XML_LOCATION_NAME_TAG_DICT = {
+    'polling_location':     'location_name',
+    'early_vote_site':      'name',
+}
+POLLING_LOCATION_XML_CITIES_NOT_SAVED = ('A BALLOT FOR EACH ELECTION', '0')
 
 
 # def polling_locations_import_from_master_server(request, state_code):
@@ -189,164 +198,216 @@ def merge_polling_location_results(*dict_args):
     results = {
         'updated':          0,
         'saved':            0,
+        'unchanged':        0,
         'not_processed':    0,
     }
     for incoming_results in dict_args:
-        new_results = {
-            'updated':          results['updated'] + incoming_results['updated'],
-            'saved':            results['saved'] + incoming_results['saved'],
-            'not_processed':    results['not_processed'] + incoming_results['not_processed'],
-        }
-        results = new_results
+        for key in results:
+            results[key] += incoming_results.get(key, 0)
     return results
 
 
 def import_and_save_polling_location_data(xml_file_location):
-    polling_locations_list = retrieve_polling_locations_data_from_xml(xml_file_location)
-    results = save_polling_locations_from_list(polling_locations_list)
-    return results
+    return save_polling_locations_from_list(retrieve_polling_locations_data_from_xml(xml_file_location))
+
+
+def polling_location_dict_from_xml_element(polling_location, location_name_tag):
+    """
+    :param polling_location: a polling_location or early_vote_site element
+    :param location_name_tag:
+    :return: None for the map points we don't want to save
+    """
+    address = polling_location.find('address')
+    if address is not None:
+        location_name_text = address.findtext(location_name_tag, default='')
+        line1_text = address.findtext('line1', default='')
+        city_text = address.findtext('city', default='')
+        if city_text in POLLING_LOCATION_XML_CITIES_NOT_SAVED:
+            # We don't want to save this map point
+            return None
+        state_text = address.findtext('state', default='')
+        zip_long_text = address.findtext('zip', default='')
+    else:
+        location_name_text = ''
+        line1_text = ''
+        city_text = ''
+        state_text = ''
+        zip_long_text = ''
+    return {
+        "polling_location_id": polling_location.get('id'),
+        "location_name": location_name_text,
+        "polling_hours_text": polling_location.findtext('polling_hours', default=''),
+        "directions": polling_location.findtext('directions', default=''),
+        "line1": line1_text,
+        "line2": '',
+        "city": city_text,
+        "state": state_text,
+        "zip_long": zip_long_text,
+    }
 
 
 def retrieve_polling_locations_data_from_xml(xml_file_location):
-    # We parse the XML file, which can be quite large
-    # <polling_location id="80037">
-    #   <polling_hours>6:00 AM - 7:00 PM</polling_hours>
-    #   <address>
-    #     <city>HARRISONBURG</city>
-    #     <line1>400 MOUNTAIN VIEW DRIVE</line1>
-    #     <state>VA</state>
-    #     <location_name>SPOTSWOOD ELEMENTARY SCHOOL</location_name>
-    #     <zip>22801</zip>
-    #   </address>
-    # </polling_location>
-    tree = MyElementTree.parse(xml_file_location)
-    root = tree.getroot()
-    polling_locations_list = []
-    for polling_location in root.findall('polling_location'):
-        address = polling_location.find('address')
-        if address is not None:
-            location_name = address.find('location_name')
-            location_name_text = location_name.text if location_name is not None else ''
-            line1 = address.find('line1')
-            line1_text = line1.text if line1 is not None else ''
-            city = address.find('city')
-            city_text = city.text if city is not None else ''
-            if city_text == 'A BALLOT FOR EACH ELECTION':
-                # We don't want to save this map point
-                continue
-            if city_text == '0':
-                # We don't want to save this map point
-                continue
-            state = address.find('state')
-            state_text = state.text if state is not None else ''
-            zip_long = address.find('zip')
-            zip_long_text = zip_long.text if zip_long is not None else ''
-        else:
-            location_name_text = ''
-            line1_text = ''
-            city_text = ''
-            state_text = ''
-            zip_long_text = ''
-        polling_hours = polling_location.find('polling_hours')
-        polling_hours_text = polling_hours.text if polling_hours is not None else ''
-        directions = polling_location.find('directions')
-        directions_text = directions.text if directions is not None else ''
-        one_entry = {
-            "polling_location_id": polling_location.get('id'),
-            "location_name": location_name_text,
-            "polling_hours_text": polling_hours_text,
-            "directions": directions_text,
-            "line1": line1_text,
-            "line2": '',
-            "city": city_text,
-            "state": state_text,
-            "zip_long": zip_long_text,
-        }
-        polling_locations_list.append(one_entry)
-    # Some states, like Oregon, have early_vote_site instead of polling_location
-    for polling_location in root.findall('early_vote_site'):
-        address = polling_location.find('address')
-        if address is not None:
-            location_name = address.find('name')  # name instead of location_name
-            location_name_text = location_name.text if location_name is not None else ''
-            line1 = address.find('line1')
-            line1_text = line1.text if line1 is not None else ''
-            city = address.find('city')
-            city_text = city.text if city is not None else ''
-            if city_text == 'A BALLOT FOR EACH ELECTION':
-                # We don't want to save this map point
-                continue
-            if city_text == '0':
-                # We don't want to save this map point
-                continue
-            state = address.find('state')
-            state_text = state.text if state is not None else ''
-            zip_long = address.find('zip')
-            zip_long_text = zip_long.text if zip_long is not None else ''
-        else:
-            location_name_text = ''
-            line1_text = ''
-            city_text = ''
-            state_text = ''
-            zip_long_text = ''
-        polling_hours = polling_location.find('polling_hours')
-        polling_hours_text = polling_hours.text if polling_hours is not None else ''
-        directions = polling_location.find('directions')
-        directions_text = directions.text if directions is not None else ''
-        one_entry = {
-            "polling_location_id": polling_location.get('id'),
-            "location_name": location_name_text,
-            "polling_hours_text": polling_hours_text,
-            "directions": directions_text,
-            "line1": line1_text,
-            "line2": '',
-            "city": city_text,
-            "state": state_text,
-            "zip_long": zip_long_text,
-        }
-        polling_locations_list.append(one_entry)
-    return polling_locations_list
+    """
+    We parse the XML file, which can be quite large, one map point at a time
+    <polling_location id="80037">
+      <polling_hours>6:00 AM - 7:00 PM</polling_hours>
+      <address>
+        <city>HARRISONBURG</city>
+        <line1>400 MOUNTAIN VIEW DRIVE</line1>
+        <state>VA</state>
+        <location_name>SPOTSWOOD ELEMENTARY SCHOOL</location_name>
+        <zip>22801</zip>
+      </address>
+    </polling_location>
+    Some states, like Oregon, have early_vote_site instead of polling_location
+    :param xml_file_location:
+    :return: a generator of map point dicts, with None for each map point we don't want to save
+    """
+    root = None
+    depth = 0
+    for event, element in MyElementTree.iterparse(xml_file_location, events=('start', 'end')):
+        if event == 'start':
+            if root is None:
+                root = element
+            depth += 1
+            continue
+        depth -= 1
+        if depth != 1:
+            continue
+        # One child of the root element has been read
+        if element.tag in POLLING_LOCATION_XML_LOCATION_NAME_TAG_DICT:
+            yield polling_location_dict_from_xml_element(
+                element, POLLING_LOCATION_XML_LOCATION_NAME_TAG_DICT[element.tag])
+        # We are done with it, so don't keep it in memory
+        root.clear()
 
 
-def save_polling_locations_from_list(polling_locations_list):
-    polling_location_manager = PollingLocationManager()
-    polling_locations_updated = 0
+def polling_location_values_from_dict(polling_location):
+    """
+    The values update_or_create_polling_location would save
+    :param polling_location:
+    :return:
+    """
+    values = {
+        'location_name':        (polling_location.get('location_name') or '').strip(),
+        'polling_hours_text':   (polling_location.get('polling_hours_text') or '').strip(),
+        'directions_text':      (polling_location.get('directions') or '').strip(),
+        'line1':                (polling_location.get('line1') or '').strip(),
+        'line2':                polling_location.get('line2') or '',
+        'city':                 (polling_location.get('city') or '').strip(),
+        'state':                polling_location.get('state') or '',
+    }
+    if positive_value_exists(polling_location.get('zip_long')):
+        # Otherwise we keep the ZIP code the geocoder found
+        values['zip_long'] = polling_location['zip_long']
+    if 'polling_location_deleted' in polling_location:
+        values['polling_location_deleted'] = positive_value_exists(polling_location['polling_location_deleted'])
+    if positive_value_exists(polling_location.get('use_for_bulk_retrieve')):
+        values['use_for_bulk_retrieve'] = True
+    if polling_location.get('latitude') and polling_location.get('longitude'):
+        values['latitude'] = polling_location['latitude']
+        values['longitude'] = polling_location['longitude']
+    return values
+
+
+def save_polling_locations_batch(polling_location_dict_list):
+    """
+    Create or update a batch of map points from an import, matching existing map points on polling_location_id
+    and state (VIP ids are only unique within a state)
+    :param polling_location_dict_list:
+    :return:
+    """
     polling_locations_saved = 0
+    polling_locations_updated = 0
+    polling_locations_unchanged = 0
     polling_locations_not_processed = 0
-    polling_location_we_vote_id = ''
-    for polling_location in polling_locations_list:
-        latitude = polling_location['latitude'] if 'latitude' in polling_location else 0
-        longitude = polling_location['longitude'] if 'longitude' in polling_location else 0
-        polling_location_deleted = polling_location['polling_location_deleted'] \
-            if 'polling_location_deleted' in polling_location else False
-        use_for_bulk_retrieve = polling_location['use_for_bulk_retrieve'] \
-            if 'use_for_bulk_retrieve' in polling_location else False
-
-        results = polling_location_manager.update_or_create_polling_location(
-            polling_location_we_vote_id,
-            polling_location['polling_location_id'],
-            polling_location['location_name'],
-            polling_location['polling_hours_text'],
-            polling_location['directions'],
-            polling_location['line1'],
-            polling_location['line2'],
-            polling_location['city'],
-            polling_location['state'],
-            polling_location['zip_long'],
-            latitude=latitude,
-            longitude=longitude,
-            use_for_bulk_retrieve=use_for_bulk_retrieve,
-            polling_location_deleted=polling_location_deleted)
-        if results['success']:
-            if results['polling_location_created']:
-                polling_locations_saved += 1
-            else:
-                polling_locations_updated += 1
-        else:
+
+    values_by_key = {}
+    for polling_location in polling_location_dict_list:
+        values = polling_location_values_from_dict(polling_location)
+        polling_location_id = polling_location.get('polling_location_id')
+        if not positive_value_exists(polling_location_id) or not positive_value_exists(values['state']) or \
+                ('latitude' not in values and not (values['line1'] and values['city'])):
             polling_locations_not_processed += 1
-    save_results = {
-        'updated': polling_locations_updated,
-        'saved': polling_locations_saved,
-        'not_processed': polling_locations_not_processed,
+            continue
+        key = (str(polling_location_id), values['state'].upper())
+        if key in values_by_key:
+            # The feed lists this map point more than once; the last one wins
+            polling_locations_not_processed += 1
+        values_by_key[key] = values
+
+    address_field_list = ['line1', 'city', 'zip_long']
+    field_set = set()
+    polling_location_to_update_list = []
+    existing_query = PollingLocation.objects.filter(
+        polling_location_id__in=list(set(key[0] for key in values_by_key.keys()))).order_by('id')
+    for polling_location in existing_query:
+        key = (polling_location.polling_location_id, (polling_location.state or '').upper())
+        values = values_by_key.get(key)
+        if values is None:
+            continue
+        values['found'] = True
+        # None and '' are the same to us
+        changed_field_list = [field_name for field_name, value in values.items()
+                              if field_name != 'found' and (getattr(polling_location, field_name) or value)
+                              and getattr(polling_location, field_name) != value]
+        if not len(changed_field_list):
+            polling_locations_unchanged += 1
+            continue
+        if 'latitude' not in values and \
+                any(field_name in address_field_list for field_name in changed_field_list):
+            # The map point moved, so it needs to be geocoded again
+            changed_field_list += ['latitude', 'longitude']
+            polling_location.latitude = None
+            polling_location.longitude = None
+        for field_name in changed_field_list:
+            if field_name in values:
+                setattr(polling_location, field_name, values[field_name])
+        field_set.update(changed_field_list)
+        polling_location_to_update_list.append(polling_location)
+
+    new_key_list = [key for key, values in values_by_key.items() if not values.get('found')]
+    polling_location_to_create_list = []
+    if len(new_key_list):
+        we_vote_id_list = generate_we_vote_id_list(
+            'ploc', 'we_vote_id_last_polling_location_integer', len(new_key_list))
+        for key, we_vote_id in zip(new_key_list, we_vote_id_list):
+            polling_location_to_create_list.append(
+                PollingLocation(we_vote_id=we_vote_id, polling_location_id=key[0], **values_by_key[key]))
+
+    with transaction.atomic():
+        if len(polling_location_to_update_list):
+            PollingLocation.objects.bulk_update(polling_location_to_update_list, sorted(field_set))
+        if len(polling_location_to_create_list):
+            PollingLocation.objects.bulk_create(polling_location_to_create_list)
+    polling_locations_updated += len(polling_location_to_update_list)
+    polling_locations_saved += len(polling_location_to_create_list)
+    return {
+        'updated':          polling_locations_updated,
+        'saved':            polling_locations_saved,
+        'unchanged':        polling_locations_unchanged,
+        'not_processed':    polling_locations_not_processed,
     }
-    return save_results
+
+
+def save_polling_locations_from_list(polling_locations_list):
+    """
+    :param polling_locations_list: any iterable of map point dicts, ex/ from retrieve_polling_locations_data_from_xml.
+      None entries are counted as not processed
+    :return:
+    """
+    results_list = []
+    polling_location_dict_list = []
+    not_processed_count = 0
+    for polling_location in polling_locations_list:
+        if polling_location is None:
+            not_processed_count += 1
+            continue
+        polling_location_dict_list.append(polling_location)
+        if len(polling_location_dict_list) >= POLLING_LOCATION_IMPORT_BATCH_SIZE:
+            results_list.append(save_polling_locations_batch(polling_location_dict_list))
+            polling_location_dict_list = []
+    if len(polling_location_dict_list):
+        results_list.append(save_polling_locations_batch(polling_location_dict_list))
+    results_list.append({'not_processed': not_processed_count})
+    return merge_polling_location_results(*results_list)
@@ -0,0 +1,319 @@
+# polling_location/geocoding.py
+# Brought to you by We Vote. Be good.
+# -*- coding: UTF-8 -*-
+
+"""
+Background geocoding for the BallotReturned and PollingLocation rows that are missing latitude and longitude.
+A GeocodingJob works through the rows in id order and saves its cursor (last_id_processed) with each batch of
+bulk_update writes. All the jobs together make no more than GEOCODING_REQUESTS_PER_SECOND requests. When the geocoder
+quota runs out the job is paused, and it is resumed by process_next_general_maintenance, the web server's background
+thread, or "python manage.py geocode_missing_coordinates".
+"""
+
+from datetime import timedelta
+import time
+
+from django.db.models import Q
+from django.utils.timezone import now
+from geopy.exc import GeocoderQuotaExceeded, GeocoderRateLimited
+from geopy.geocoders import get_geocoder_for_service
+
+from ballot.models import BallotReturned
+from config.base import get_environment_variable_default
+from polling_location.models import GEOCODE_TIMEOUT, GOOGLE_MAPS_API_KEY, GeocodingJob, PollingLocation
+import wevote_functions.admin
+from wevote_functions.background_task import BackgroundTask
+from wevote_functions.functions import convert_to_int, positive_value_exists
+from wevote_settings.models import SharedRateLimiter
+
+logger = wevote_functions.admin.get_logger(__name__)
+
+GEOCODING_JOB_KIND_BALLOT_RETURNED = 'BALLOT_RETURNED'
+GEOCODING_JOB_KIND_POLLING_LOCATION = 'POLLING_LOCATION'
+GEOCODING_JOB_KIND_CHOICES = (GEOCODING_JOB_KIND_BALLOT_RETURNED, GEOCODING_JOB_KIND_POLLING_LOCATION)
+GEOCODING_BATCH_SIZE = 100
+GEOCODING_CHECKED_OUT_EXPIRATION_SECONDS = 600
+GEOCODING_REQUESTS_PER_SECOND = convert_to_int(get_environment_variable_default("GEOCODING_REQUESTS_PER_SECOND", 10))
+GEOCODING_QUOTA_PAUSE_SECONDS = convert_to_int(get_environment_variable_default("GEOCODING_QUOTA_PAUSE_SECONDS", 3600))
+GEOCODING_RATE_LIMITED_PAUSE_SECONDS = 60
+GEOCODING_RATE_LIMIT_MAX_WAIT_SECONDS = 5
+# So the rest of general maintenance isn't held up behind a big state
+GEOCODING_MAINTENANCE_MAX_SECONDS = 45
+# Every process running a geocoding job draws from the same allowance, since the quota is for our Google API key
+geocoder_rate_limiter = SharedRateLimiter(
+    setting_name='rate_limit_google_geocoder', request_limit=GEOCODING_REQUESTS_PER_SECOND, period_seconds=1)
+
+
+def geocoding_job_row_query(geocoding_job):
+    """
+    :param geocoding_job:
+    :return: the rows this job has yet to look at, in the order it looks at them
+    """
+    if geocoding_job.kind_of_job == GEOCODING_JOB_KIND_BALLOT_RETURNED:
+        row_query = BallotReturned.objects.all()
+        # Don't retrieve entries for voters
+        row_query = row_query.exclude(Q(polling_location_we_vote_id=None) | Q(polling_location_we_vote_id=""))
+        if positive_value_exists(geocoding_job.google_civic_election_id):
+            row_query = row_query.filter(google_civic_election_id=geocoding_job.google_civic_election_id)
+        if positive_value_exists(geocoding_job.state_code):
+            row_query = row_query.filter(normalized_state__iexact=geocoding_job.state_code)
+    else:
+        row_query = PollingLocation.objects.exclude(polling_location_deleted=True)
+        if positive_value_exists(geocoding_job.state_code):
+            row_query = row_query.filter(state__iexact=geocoding_job.state_code)
+    row_query = row_query.filter(Q(latitude__isnull=True) | Q(latitude=0))
+    return row_query.filter(id__gt=geocoding_job.last_id_processed).order_by('id')
+
+
+def geocoding_job_progress(geocoding_job):
+    """
+    :param geocoding_job:
+    :return: a dict for admin pages and logs
+    """
+    return {
+        'geocoding_job_id':                 geocoding_job.id,
+        'kind_of_job':                      geocoding_job.kind_of_job,
+        'geocoded_count':                   geocoding_job.geocoded_count,
+        'not_found_count':                  geocoding_job.not_found_count,
+        'error_count':                      geocoding_job.error_count,
+        'polling_location_updated_count':   geocoding_job.polling_location_updated_count,
+        'remaining_count':                  0 if geocoding_job.date_completed
+        else geocoding_job_row_query(geocoding_job).count(),
+        'date_paused_until':                geocoding_job.date_paused_until,
+        'date_completed':                   geocoding_job.date_completed,
+    }
+
+
+def geocoding_job_progress_text(geocoding_job):
+    progress = geocoding_job_progress(geocoding_job)
+    text = "Geocoding job {geocoding_job_id} ({kind_of_job}): geocoded: {geocoded_count}, " \
+           "not found: {not_found_count}, errors: {error_count}, remaining: {remaining_count}".format(**progress)
+    if positive_value_exists(progress['polling_location_updated_count']):
+        text += ", map points updated: " + str(progress['polling_location_updated_count'])
+    if progress['date_completed']:
+        text += ", completed"
+    elif progress['date_paused_until'] and progress['date_paused_until'] > now():
+        text += ", paused until " + progress['date_paused_until'].strftime('%Y-%m-%d %H:%M UTC')
+    return text
+
+
+def start_geocoding_job(kind_of_job, state_code='', google_civic_election_id=0):
+    """
+    Return the unfinished job for these rows, or start a new one
+    :param kind_of_job:
+    :param state_code:
+    :param google_civic_election_id:
+    :return:
+    """
+    state_code = state_code.upper() if positive_value_exists(state_code) else None
+    google_civic_election_id = convert_to_int(google_civic_election_id) \
+        if kind_of_job == GEOCODING_JOB_KIND_BALLOT_RETURNED and positive_value_exists(google_civic_election_id) \
+        else None
+    try:
+        geocoding_job = GeocodingJob.objects.filter(
+            kind_of_job=kind_of_job, state_code=state_code, google_civic_election_id=google_civic_election_id,
+            date_completed__isnull=True).order_by('-id').first()
+        if geocoding_job:
+            status = "GEOCODING_JOB_ALREADY_STARTED "
+        else:
+            geocoding_job = GeocodingJob.objects.create(
+                kind_of_job=kind_of_job, state_code=state_code, google_civic_election_id=google_civic_election_id)
+            status = "GEOCODING_JOB_STARTED "
+    except Exception as e:
+        status = "GEOCODING_JOB_NOT_STARTED: " + str(e) + " "
+        logger.error(status)
+        return {
+            'success':          False,
+            'status':           status,
+            'geocoding_job':    None,
+        }
+    return {
+        'success':          True,
+        'status':           status,
+        'geocoding_job':    geocoding_job,
+    }
+
+
+def claim_geocoding_job(geocoding_job):
+    """
+    :param geocoding_job:
+    :return: True if this process now has the job, so two servers don't geocode the same rows
+    """
+    checked_out_expired_time = now() - timedelta(seconds=GEOCODING_CHECKED_OUT_EXPIRATION_SECONDS)
+    claimed_count = GeocodingJob.objects.filter(id=geocoding_job.id, date_completed__isnull=True) \
+        .filter(Q(date_checked_out__isnull=True) | Q(date_checked_out__lte=checked_out_expired_time)) \
+        .update(date_checked_out=now())
+    return claimed_count == 1
+
+
+class GeocodingJobRunner(object):
+
+    def __init__(self, geocoding_job, geocoder=None, rate_limiter=None, batch_size=GEOCODING_BATCH_SIZE):
+        self.geocoding_job = geocoding_job
+        self.geocoder = geocoder
+        self.rate_limiter = geocoder_rate_limiter if rate_limiter is None else rate_limiter
+        self.batch_size = batch_size
+
+    def fetch_geocoder(self):
+        if self.geocoder is None:
+            self.geocoder = get_geocoder_for_service('google')(GOOGLE_MAPS_API_KEY)
+        return self.geocoder
+
+    def update_row(self, row, location):
+        row.latitude = location.latitude
+        row.longitude = location.longitude
+        if self.geocoding_job.kind_of_job == GEOCODING_JOB_KIND_POLLING_LOCATION \
+                and not positive_value_exists(row.zip_long):
+            # Repair the map point to include the ZIP code
+            raw = getattr(location, 'raw', None) or {}
+            for one_address_component in raw.get('address_components', []):
+                if 'postal_code' in one_address_component.get('types', []) \
+                        and positive_value_exists(one_address_component.get('long_name')):
+                    row.zip_long = one_address_component['long_name']
+
+    def save_rows(self, updated_row_list):
+        if self.geocoding_job.kind_of_job == GEOCODING_JOB_KIND_BALLOT_RETURNED:
+            BallotReturned.objects.bulk_update(updated_row_list, ['latitude', 'longitude'])
+            # Write the lat/long back to the map points that don't have it yet
+            ballot_returned_by_polling_location = {
+                ballot_returned.polling_location_we_vote_id: ballot_returned for ballot_returned in updated_row_list}
+            polling_location_list = list(PollingLocation.objects.filter(
+                Q(latitude__isnull=True) | Q(latitude=0) | Q(longitude__isnull=True) | Q(longitude=0),
+                we_vote_id__in=list(ballot_returned_by_polling_location.keys())))
+            for polling_location in polling_location_list:
+                ballot_returned = ballot_returned_by_polling_location[polling_location.we_vote_id]
+                polling_location.latitude = ballot_returned.latitude
+                polling_location.longitude = ballot_returned.longitude
+            PollingLocation.objects.bulk_update(polling_location_list, ['latitude', 'longitude'])
+            self.geocoding_job.polling_location_updated_count += len(polling_location_list)
+        else:
+            PollingLocation.objects.bulk_update(updated_row_list, ['latitude', 'longitude', 'zip_long'])
+
+    def pause(self, seconds, status):
+        self.geocoding_job.date_paused_until = now() + timedelta(seconds=seconds)
+        self.geocoding_job.status = status
+
+    def run_one_batch(self):
+        """
+        :return: True if there may be more to do now
+        """
+        geocoding_job = self.geocoding_job
+        row_list = list(geocoding_job_row_query(geocoding_job)[:self.batch_size])
+        if not len(row_list):
+            geocoding_job.date_completed = now()
+            geocoding_job.status = "COMPLETED "
+            return False
+
+        updated_row_list = []
+        keep_going = True
+        for row in row_list:
+            address = row.get_text_for_geocoder()
+            if address is None:
+                geocoding_job.not_found_count += 1
+                geocoding_job.last_id_processed = row.id
+                continue
+            if not self.rate_limiter.acquire(max_wait_seconds=GEOCODING_RATE_LIMIT_MAX_WAIT_SECONDS):
+                # Other jobs are using the allowance, or the quota ran out for all of them
+                self.pause(GEOCODING_RATE_LIMITED_PAUSE_SECONDS, "PAUSED-GEOCODING_RATE_LIMIT ")
+                keep_going = False
+                break
+            try:
+                location = self.fetch_geocoder().geocode(address, sensor=False, timeout=GEOCODE_TIMEOUT)
+            except GeocoderQuotaExceeded:
+                # Come back to this row when the quota resets
+                self.rate_limiter.empty_until(GEOCODING_QUOTA_PAUSE_SECONDS)
+                self.pause(GEOCODING_QUOTA_PAUSE_SECONDS, "PAUSED-GEOCODER_QUOTA_EXCEEDED ")
+                keep_going = False
+                break
+            except GeocoderRateLimited as e:
+                pause_seconds = e.retry_after or GEOCODING_RATE_LIMITED_PAUSE_SECONDS
+                self.rate_limiter.empty_until(pause_seconds)
+                self.pause(pause_seconds, "PAUSED-GEOCODER_RATE_LIMITED ")
+                keep_going = False
+                break
+            except Exception as e:
+                geocoding_job.error_count += 1
+                geocoding_job.status = "GEOCODER_EXCEPTION: " + str(e) + " "
+                geocoding_job.last_id_processed = row.id
+                continue
+            if location is None:
+                geocoding_job.not_found_count += 1
+            else:
+                self.update_row(row, location)
+                updated_row_list.append(row)
+                geocoding_job.geocoded_count += 1
+            geocoding_job.last_id_processed = row.id
+
+        if len(updated_row_list):
+            self.save_rows(updated_row_list)
+        return keep_going
+
+    def run(self, max_seconds=None):
+        """
+        Geocode a batch at a time until the job is done, paused, or has run for max_seconds
+        :param max_seconds:
+        :return:
+        """
+        geocoding_job = self.geocoding_job
+        status = ""
+        success = True
+        start_time = time.monotonic()
+        geocoding_job.date_paused_until = None
+        try:
+            keep_going = True
+            while keep_going:
+                keep_going = self.run_one_batch()
+                geocoding_job.date_last_run = now()
+                # Saving the cursor also keeps the job checked out to us
+                geocoding_job.date_checked_out = now() if keep_going else None
+                geocoding_job.save()
+                if max_seconds is not None and time.monotonic() - start_time >= max_seconds:
+                    break
+        except Exception as e:
+            status += "GEOCODING_JOB_FAILED: " + str(e) + " "
+            logger.error(status)
+            success = False
+        if geocoding_job.date_checked_out:
+            GeocodingJob.objects.filter(id=geocoding_job.id).update(date_checked_out=None)
+            geocoding_job.date_checked_out = None
+        status += geocoding_job.status or ""
+        return {
+            'success':  success,
+            'status':   status,
+            'progress': geocoding_job_progress(geocoding_job),
+        }
+
+
+def run_geocoding_jobs(max_seconds=None, geocoder=None):
+    """
+    Resume every unfinished job that isn't paused or being run by another process
+    :param max_seconds: across all the jobs
+    :param geocoder:
+    :return:
+    """
+    status = ""
+    start_time = time.monotonic()
+    geocoding_job_list = list(GeocodingJob.objects.filter(date_completed__isnull=True)
+                              .filter(Q(date_paused_until__isnull=True) | Q(date_paused_until__lte=now()))
+                              .order_by('id'))
+    for geocoding_job in geocoding_job_list:
+        seconds_left = None
+        if max_seconds is not None:
+            seconds_left = max_seconds - (time.monotonic() - start_time)
+            if seconds_left <= 0:
+                break
+        if not claim_geocoding_job(geocoding_job):
+            continue
+        results = GeocodingJobRunner(geocoding_job, geocoder=geocoder).run(max_seconds=seconds_left)
+        status += results['status']
+    return {
+        'success':  True,
+        'status':   status,
+    }
+
+
+geocoding_job_task = BackgroundTask('geocoding_jobs', run_geocoding_jobs)
+
+
+def run_geocoding_jobs_soon():
+    geocoding_job_task.run_soon()
@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+from django.utils.timezone import now
+
+from polling_location.geocoding import GEOCODING_JOB_KIND_BALLOT_RETURNED, GEOCODING_JOB_KIND_CHOICES, \
+    GeocodingJobRunner, claim_geocoding_job, geocoding_job_progress_text, run_geocoding_jobs, start_geocoding_job
+from polling_location.models import GeocodingJob
+
+
+class Command(BaseCommand):
+    help = 'Looks up latitude and longitude for the BallotReturned or PollingLocation entries missing them, ' \
+           'resuming the job for the same state (and election) where it stopped. With no --kind, resumes every ' \
+           'unfinished job that is not paused.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--kind', choices=GEOCODING_JOB_KIND_CHOICES, default=None)
+        parser.add_argument('--state_code', default='')
+        parser.add_argument('--google_civic_election_id', type=int, default=0)
+        parser.add_argument('--max_seconds', type=int, default=None)
+        parser.add_argument('--resume_paused', action='store_true',
+                            help='Run the job now even if it is paused, ex/ after raising the geocoder quota')
+
+    def handle(self, *args, **options):
+        if not options['kind']:
+            results = run_geocoding_jobs(max_seconds=options['max_seconds'])
+            self.stdout.write(results['status'] or 'No geocoding jobs are due')
+            return
+
+        job_results = start_geocoding_job(
+            options['kind'], state_code=options['state_code'],
+            google_civic_election_id=options['google_civic_election_id']
+            if options['kind'] == GEOCODING_JOB_KIND_BALLOT_RETURNED else 0)
+        geocoding_job = job_results['geocoding_job']
+        if not job_results['success']:
+            self.stdout.write(job_results['status'])
+            return
+        if options['resume_paused']:
+            GeocodingJob.objects.filter(id=geocoding_job.id).update(date_paused_until=None)
+        elif geocoding_job.date_paused_until and geocoding_job.date_paused_until > now():
+            self.stdout.write(geocoding_job_progress_text(geocoding_job))
+            return
+        if not claim_geocoding_job(geocoding_job):
+            self.stdout.write('Geocoding job ' + str(geocoding_job.id) + ' is being run by another process')
+            return
+        GeocodingJobRunner(geocoding_job).run(max_seconds=options['max_seconds'])
+        self.stdout.write(geocoding_job_progress_text(geocoding_job))
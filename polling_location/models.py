@@ -95,6 +95,16 @@ class PollingLocation(models.Model):
         results = self.get_text_for_map_search_results()
         return results['text_for_map_search']
 
+    def get_text_for_geocoder(self):
+        """
+        :return: the address to look up, or None when the map point doesn't have enough of one
+        """
+        # We require line1, city and state. Some states, like Alaska, do not provide ZIP codes
+        if not positive_value_exists(self.line1) or not positive_value_exists(self.city) or \
+                not positive_value_exists(self.state):
+            return None
+        return '{}, {}, {} {}'.format(self.line1, self.city, self.state, self.zip_long or '')
+
     # We override the save function so we can auto-generate we_vote_id
     def save(self, *args, **kwargs):
         # Even if this data came from another source we still need a unique we_vote_id
@@ -131,6 +141,28 @@ class PollingLocationLogEntry(models.Model):
     voter_we_vote_id = models.CharField(db_index=True, max_length=255, null=True, unique=False)
 
 
+class GeocodingJob(models.Model):
+    """
+    Looks up latitude and longitude for the BallotReturned or PollingLocation rows that are missing them, in id
+    order. last_id_processed is saved after each batch, so a job that is paused (ex/ the geocoder quota ran out)
+    or interrupted picks up where it stopped. See polling_location/geocoding.py
+    """
+    kind_of_job = models.CharField(max_length=50, null=False, db_index=True)  # GEOCODING_JOB_KIND_CHOICES
+    state_code = models.CharField(max_length=2, null=True, blank=True)
+    google_civic_election_id = models.PositiveIntegerField(null=True, blank=True)
+    last_id_processed = models.PositiveIntegerField(default=0, null=False)
+    geocoded_count = models.PositiveIntegerField(default=0, null=False)
+    not_found_count = models.PositiveIntegerField(default=0, null=False)
+    error_count = models.PositiveIntegerField(default=0, null=False)
+    polling_location_updated_count = models.PositiveIntegerField(default=0, null=False)
+    date_started = models.DateTimeField(null=False, auto_now_add=True)
+    date_last_run = models.DateTimeField(null=True)
+    date_paused_until = models.DateTimeField(null=True)
+    date_checked_out = models.DateTimeField(null=True)
+    date_completed = models.DateTimeField(null=True, db_index=True)
+    status = models.TextField(null=True, blank=True)
+
+
 class PollingLocationManager(models.Manager):
 
     def create_polling_location_log_entry(
@@ -641,34 +673,18 @@ class PollingLocationManager(models.Manager):
             }
             return results
 
-        #  or not positive_value_exists(polling_location.zip_long)
-        if not positive_value_exists(polling_location.line1) or not \
-                positive_value_exists(polling_location.city) or not \
-                positive_value_exists(polling_location.state):
-            if positive_value_exists(polling_location.line1) and \
-                    positive_value_exists(polling_location.city) and \
-                    positive_value_exists(polling_location.state) and \
-                    'ak' == polling_location.state.lower() and not \
-                    positive_value_exists(polling_location.zip_long):
-                # We do not need a ZIP code in Alaska
-                pass
-            else:
-                # We require all four values
-                results = {
-                    'status':                   "POPULATE_LATITUDE_AND_LONGITUDE-MISSING_REQUIRED_ADDRESS_INFO ",
-                    'geocoder_quota_exceeded':  False,
-                    'success':                  False,
-                    'latitude':                 latitude,
-                    'longitude':                longitude,
-                    'polling_location':         polling_location,
-                }
-                return results
-
-        full_ballot_address = '{}, {}, {} {}'.format(
-            polling_location.line1,
-            polling_location.city,
-            polling_location.state,
-            polling_location.zip_long)
+        full_ballot_address = polling_location.get_text_for_geocoder()
+        if full_ballot_address is None:
+            results = {
+                'status':                   "POPULATE_LATITUDE_AND_LONGITUDE-MISSING_REQUIRED_ADDRESS_INFO ",
+                'geocoder_quota_exceeded':  False,
+                'success':                  False,
+                'latitude':                 latitude,
+                'longitude':                longitude,
+                'polling_location':         polling_location,
+            }
+            return results
+
         try:
             location = self.google_client.geocode(full_ballot_address, sensor=False, timeout=GEOCODE_TIMEOUT)
         except GeocoderQuotaExceeded:
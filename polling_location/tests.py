@@ -0,0 +1,139 @@
+# polling_location/tests.py
+# Brought to you by We Vote. Be good.
+# -*- coding: UTF-8 -*-
+
+from collections import namedtuple
+import io
+
+from django.test import SimpleTestCase, TestCase
+from geopy.exc import GeocoderQuotaExceeded
+
+from ballot.models import BallotReturned
+from polling_location.controllers import retrieve_polling_locations_data_from_xml, \
+    save_polling_locations_from_list
+from polling_location.geocoding import GEOCODING_JOB_KIND_BALLOT_RETURNED, GeocodingJobRunner, start_geocoding_job
+from polling_location.models import PollingLocation
+
+Location = namedtuple('Location', ['latitude', 'longitude', 'raw'])
+
+VIP_FEED_XML = """<?xml version="1.0" standalone="yes" ?>
+<vip_object schemaVersion="3.0">
+<polling_location id="80037">
+  <polling_hours>6:00 AM - 7:00 PM</polling_hours>
+  <address><location_name>SPOTSWOOD ELEMENTARY SCHOOL</location_name><line1>{line1}</line1>
+    <city>HARRISONBURG</city><state>VA</state><zip>22801</zip></address>
+</polling_location>
+<polling_location id="80038">
+  <address><location_name>NOWHERE</location_name><line1>1 MAIN ST</line1><city>0</city><state>VA</state></address>
+</polling_location>
+<early_vote_site id="90001">
+  <address><name>COUNTY OFFICE</name><line1>20 E GAY ST</line1><city>HARRISONBURG</city><state>VA</state></address>
+</early_vote_site>
+</vip_object>
+"""
+
+
+class StubGeocoder(object):
+
+    def __init__(self, quota_after=None):
+        self.quota_after = quota_after
+        self.address_list = []
+
+    def geocode(self, address, **kwargs):
+        if self.quota_after is not None and len(self.address_list) >= self.quota_after:
+            raise GeocoderQuotaExceeded('Quota exceeded')
+        self.address_list.append(address)
+        if address.startswith('Nowhere'):
+            return None
+        return Location(37.0 + len(self.address_list), -122.0, {})
+
+
+class FakeRateLimiter(object):
+
+    def __init__(self):
+        self.empty_until_seconds = 0
+
+    def acquire(self, cost=1, max_wait_seconds=0):
+        return True
+
+    def empty_until(self, seconds_from_now):
+        self.empty_until_seconds = seconds_from_now
+
+
+class GeocodingJobTestCase(TestCase):
+    databases = ["default", "readonly"]
+
+    def test_job_pauses_at_the_quota_and_resumes_where_it_stopped(self):
+        polling_location = PollingLocation.objects.create(polling_location_id='1', state='CA')
+        for line1 in ['1 Main St', 'Nowhere', '3 Main St', '4 Main St']:
+            BallotReturned.objects.create(
+                google_civic_election_id=1000, polling_location_we_vote_id=polling_location.we_vote_id,
+                normalized_line1=line1, normalized_city='Oakland', normalized_state='CA', normalized_zip='94612')
+        geocoding_job = start_geocoding_job(GEOCODING_JOB_KIND_BALLOT_RETURNED, state_code='ca',
+                                            google_civic_election_id=1000)['geocoding_job']
+
+        rate_limiter = FakeRateLimiter()
+        results = GeocodingJobRunner(geocoding_job, geocoder=StubGeocoder(quota_after=2), rate_limiter=rate_limiter,
+                                     batch_size=3).run()
+
+        progress = results['progress']
+        self.assertEqual((progress['geocoded_count'], progress['not_found_count']), (1, 1))
+        self.assertEqual(progress['remaining_count'], 2)
+        self.assertIsNotNone(progress['date_paused_until'])
+        # No other job uses the quota either
+        self.assertGreater(rate_limiter.empty_until_seconds, 0)
+        self.assertEqual(PollingLocation.objects.get(id=polling_location.id).latitude, 38.0)
+
+        # The next run picks up the same job, at the row the quota stopped
+        self.assertEqual(start_geocoding_job(GEOCODING_JOB_KIND_BALLOT_RETURNED, state_code='CA',
+                                             google_civic_election_id=1000)['geocoding_job'].id, geocoding_job.id)
+        geocoder = StubGeocoder()
+        results = GeocodingJobRunner(geocoding_job, geocoder=geocoder, rate_limiter=FakeRateLimiter(),
+                                     batch_size=3).run()
+
+        self.assertEqual(geocoder.address_list, ['3 Main St, Oakland, CA 94612', '4 Main St, Oakland, CA 94612'])
+        self.assertEqual(results['progress']['geocoded_count'], 3)
+        self.assertIsNotNone(results['progress']['date_completed'])
+        self.assertEqual(BallotReturned.objects.filter(latitude__isnull=True).count(), 1)
+
+
+class GeocoderAddressTestCase(SimpleTestCase):
+
+    def test_map_points_without_zip_are_geocoded(self):
+        self.assertEqual(PollingLocation(line1='101 Main St', city='Nome', state='AK').get_text_for_geocoder(),
+                         '101 Main St, Nome, AK ')
+        self.assertIsNone(PollingLocation(line1='101 Main St', state='AK', zip_long='99762').get_text_for_geocoder())
+        self.assertIsNone(BallotReturned(normalized_line1='1 Main St', normalized_city='Oakland',
+                                         normalized_state='CA').get_text_for_geocoder())
+
+
+class PollingLocationXmlTestCase(SimpleTestCase):
+
+    def test_map_points_are_read_in_order(self):
+        polling_location_list = list(retrieve_polling_locations_data_from_xml(
+            io.BytesIO(VIP_FEED_XML.format(line1='400 MOUNTAIN VIEW DRIVE').encode())))
+        self.assertIsNone(polling_location_list[1])
+        self.assertEqual([(polling_location['polling_location_id'], polling_location['location_name'])
+                          for polling_location in polling_location_list if polling_location],
+                         [('80037', 'SPOTSWOOD ELEMENTARY SCHOOL'), ('90001', 'COUNTY OFFICE')])
+
+
+class PollingLocationImportTestCase(TestCase):
+    databases = ["default", "readonly"]
+
+    def test_import_again_updates_instead_of_duplicating(self):
+        results = save_polling_locations_from_list(retrieve_polling_locations_data_from_xml(
+            io.BytesIO(VIP_FEED_XML.format(line1='400 MOUNTAIN VIEW DRIVE').encode())))
+        self.assertEqual((results['saved'], results['updated'], results['not_processed']), (2, 0, 1))
+        PollingLocation.objects.filter(polling_location_id='80037').update(latitude=38.4, longitude=-78.9)
+
+        results = save_polling_locations_from_list(retrieve_polling_locations_data_from_xml(
+            io.BytesIO(VIP_FEED_XML.format(line1='410 MOUNTAIN VIEW DRIVE').encode())))
+
+        self.assertEqual((results['saved'], results['updated'], results['unchanged']), (0, 1, 1))
+        self.assertEqual(PollingLocation.objects.count(), 2)
+        polling_location = PollingLocation.objects.get(polling_location_id='80037')
+        self.assertEqual(polling_location.line1, '410 MOUNTAIN VIEW DRIVE')
+        self.assertTrue(polling_location.we_vote_id.startswith('wv'))
+        # It moved, so it is geocoded again
+        self.assertIsNone(polling_location.latitude)
@@ -5,6 +5,8 @@
 from .models import KIND_OF_LOG_ENTRY_ADDRESS_PARSE_ERROR, KIND_OF_LOG_ENTRY_API_END_POINT_CRASH, \
     KIND_OF_LOG_ENTRY_BALLOT_RECEIVED, KIND_OF_LOG_ENTRY_NO_BALLOT_JSON, KIND_OF_LOG_ENTRY_NO_CONTESTS, \
     PollingLocation, PollingLocationManager
+from .geocoding import GEOCODING_JOB_KIND_POLLING_LOCATION, geocoding_job_progress_text, run_geocoding_jobs_soon, \
+    start_geocoding_job
 from .controllers import filter_polling_locations_structured_json_for_local_duplicates, \
     import_and_save_all_polling_locations_data, polling_locations_import_from_structured_json
 from admin_tools.views import redirect_to_sign_in_page
@@ -309,9 +311,10 @@ def import_polling_locations_process_view(request):
 
     messages.add_message(request, messages.INFO,
                          'Polling locations retrieved from file. '
-                         '({saved} added, {updated} updated, {not_processed} not_processed)'.format(
+                         '({saved} added, {updated} updated, {unchanged} unchanged, {not_processed} skipped)'.format(
                              saved=results['saved'],
                              updated=results['updated'],
+                             unchanged=results['unchanged'],
                              not_processed=results['not_processed'],))
     return HttpResponseRedirect(reverse('polling_location:polling_location_list',
                                         args=()) + "?state_code={var}".format(
@@ -890,7 +893,8 @@ def polling_locations_add_address_from_latitude_and_longitude_view(request):
 @login_required
 def polling_locations_add_latitude_and_longitude_view(request):
     """
-    Find map point entries that don't have latitude/longitude (up to a limit), and update them
+    Start (or resume) the background job for the map points that don't have latitude/longitude. With refresh_all,
+    look it up again for map points that have it (up to a limit)
     :param request:
     :return:
     """
@@ -911,26 +915,33 @@ def polling_locations_add_latitude_and_longitude_view(request):
                                     "?google_civic_election_id=" + str(google_civic_election_id) +
                                     "&state_code=" + str(state_code))
 
-    polling_location_manager = PollingLocationManager()
     polling_location_we_vote_id = ""
+    if not positive_value_exists(refresh_all):
+        # Geocode the map points missing lat/long in the background, picking up where the last run stopped
+        job_results = start_geocoding_job(GEOCODING_JOB_KIND_POLLING_LOCATION, state_code=state_code)
+        if job_results['success']:
+            run_geocoding_jobs_soon()
+            messages.add_message(request, messages.INFO, geocoding_job_progress_text(job_results['geocoding_job']))
+        else:
+            messages.add_message(request, messages.ERROR, job_results['status'])
+        return HttpResponseRedirect(reverse('polling_location:polling_location_list', args=()) +
+                                    "?google_civic_election_id=" + str(google_civic_election_id) +
+                                    "&state_code=" + str(state_code))
+
+    polling_location_manager = PollingLocationManager()
     polling_location_list = []
     polling_locations_saved = 0
     polling_locations_not_saved = 0
 
     try:
-        # Find all map points with an empty latitude (with limit)
+        # Look up lat/long again for map points that have it (with limit)
         polling_location_query = PollingLocation.objects.all()
-        if positive_value_exists(refresh_all):
-            # Do not restrict to entries without lat/long
-            pass
-        else:
-            polling_location_query = polling_location_query.filter(Q(latitude__isnull=True) | Q(latitude__exact=0.0))
         polling_location_query = polling_location_query.filter(state__iexact=state_code)
         polling_location_query = polling_location_query.exclude(polling_location_deleted=True)
         polling_location_query = polling_location_query.order_by('location_name')[:limit]
         polling_location_list = list(polling_location_query)
     except Exception as e:
-        messages.add_message(request, messages.ERROR, 'No map points found that need lat/long: ' + str(e))
+        messages.add_message(request, messages.ERROR, 'No map points found: ' + str(e))
 
     for polling_location_on_stage in polling_location_list:
         try:
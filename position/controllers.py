@@ -7,6 +7,7 @@ from .models import PositionEntered, PositionForFriends, PositionManager, Positi
     ALL_ELECTIONS, SUPPORT, OPPOSE, INFORMATION_ONLY, NO_STANCE
 from ballot.controllers import figure_out_google_civic_election_id_voter_is_watching, \
     figure_out_google_civic_election_id_voter_is_watching_by_voter_id
+from ballot.election_snapshot import fetch_election_snapshot
 from ballot.models import BallotItemListManager, OFFICE, CANDIDATE, MEASURE
 from candidate.models import CandidateCampaign, CandidateManager, CandidateListManager, \
     CandidateToOfficeLink
@@ -1352,226 +1353,6 @@ def move_positions_to_another_politician(
     return results
 
 
-def move_positions_to_another_voter(from_voter_id, from_voter_we_vote_id,
-                                    to_voter_id, to_voter_we_vote_id,
-                                    to_voter_linked_organization_id, to_voter_linked_organization_we_vote_id):
-    status = ''
-    success = False
-    position_entries_moved = 0
-    position_entries_not_moved = 0
-    position_manager = PositionManager()
-    position_list_manager = PositionListManager()
-    organization_manager = OrganizationManager()
-    to_organization_name = ""
-    to_organization_type = None
-    to_twitter_followers_count = None
-
-    if from_voter_id == to_voter_id:
-        status += "MOVE_POSITIONS_TO_ANOTHER_VOTER-from_voter_id and to_voter_id identical "
-        results = {
-            'status': status,
-            'success': success,
-            'from_voter_id': from_voter_id,
-            'from_voter_we_vote_id': from_voter_we_vote_id,
-            'to_voter_id': to_voter_id,
-            'to_voter_we_vote_id': to_voter_we_vote_id,
-            'position_entries_moved': position_entries_moved,
-            'position_entries_not_moved': position_entries_not_moved,
-        }
-        return results
-
-    if from_voter_we_vote_id == to_voter_we_vote_id:
-        status += "MOVE_POSITIONS_TO_ANOTHER_VOTER-from_voter_we_vote_id and to_voter_we_vote_id identical "
-        results = {
-            'status': status,
-            'success': success,
-            'from_voter_id': from_voter_id,
-            'from_voter_we_vote_id': from_voter_we_vote_id,
-            'to_voter_id': to_voter_id,
-            'to_voter_we_vote_id': to_voter_we_vote_id,
-            'position_entries_moved': position_entries_moved,
-            'position_entries_not_moved': position_entries_not_moved,
-        }
-        return results
-
-    if positive_value_exists(to_voter_linked_organization_we_vote_id):
-        results = organization_manager.retrieve_organization_from_we_vote_id(to_voter_linked_organization_we_vote_id)
-        if results['organization_found']:
-            to_voter_organization = results['organization']
-            to_organization_name = to_voter_organization.organization_name
-            to_organization_type = to_voter_organization.organization_type
-            to_twitter_followers_count = to_voter_organization.twitter_followers_count
-
-    # Find private positions for the "from_voter" that we are moving away from
-    stance_we_are_looking_for = ANY_STANCE
-    friends_vs_public = FRIENDS_ONLY
-    from_position_private_list_results = position_list_manager.retrieve_all_positions_for_voter(
-        from_voter_id, from_voter_we_vote_id,
-        stance_we_are_looking_for, friends_vs_public)
-    from_position_private_list = from_position_private_list_results['position_list']
-
-    position_we_vote_id = ""
-    # We don't want the organization_id to affect the retrieve
-    empty_organization_id = 0
-    empty_organization_we_vote_id = 0
-    for from_position_entry in from_position_private_list:
-        # See if the "to_voter" already has the same entry
-        results = position_manager.retrieve_position_table_unknown(
-            position_we_vote_id, empty_organization_id, empty_organization_we_vote_id,
-            to_voter_id,
-            from_position_entry.contest_office_id, from_position_entry.candidate_campaign_id,
-            from_position_entry.contest_measure_id,
-            to_voter_we_vote_id,
-            from_position_entry.contest_office_we_vote_id,
-            from_position_entry.candidate_campaign_we_vote_id, from_position_entry.contest_measure_we_vote_id)
-
-        if results['position_found']:
-            # Look to see if there is a statement that can be preserved (i.e., moved from from_position to to_position
-            to_position_entry = results['position']
-            if not positive_value_exists(to_position_entry.statement_html):
-                # If the "to_position" does NOT have a statement_html, we look to see if the "from_position" has one
-                # we can use
-                if positive_value_exists(from_position_entry.statement_html):
-                    to_position_entry.statement_html = from_position_entry.statement_html
-            if not positive_value_exists(to_position_entry.statement_text):
-                # If the "to_position" does NOT have a statement_html, we look to see if the "from_position" has one
-                # we can use
-                if positive_value_exists(from_position_entry.statement_text):
-                    to_position_entry.statement_text = from_position_entry.statement_text
-            # Update the organization values
-            to_position_entry.organization_we_vote_id = to_voter_linked_organization_we_vote_id
-            to_position_entry.organization_id = to_voter_linked_organization_id
-            # Update cached organization information
-            if positive_value_exists(to_organization_name):
-                to_position_entry.speaker_display_name = to_organization_name
-            if positive_value_exists(to_organization_type):
-                to_position_entry.speaker_type = to_organization_type
-            if positive_value_exists(to_twitter_followers_count):
-                to_position_entry.twitter_followers_count = to_twitter_followers_count
-            try:
-                to_position_entry.save()
-            except Exception as e:
-                status += "MOVE_TO_ANOTHER_VOTER-UNABLE_TO_SAVE_FRIENDS_ONLY_ORGANIZATION_UPDATE: " + str(e) + " "
-        else:
-            # Change the position values to the new values
-            try:
-                from_position_entry.organization_id = to_voter_linked_organization_id
-                from_position_entry.organization_we_vote_id = to_voter_linked_organization_we_vote_id
-                from_position_entry.voter_id = to_voter_id
-                from_position_entry.voter_we_vote_id = to_voter_we_vote_id
-                # Update cached organization information
-                if positive_value_exists(to_organization_name):
-                    from_position_entry.speaker_display_name = to_organization_name
-                if positive_value_exists(to_organization_type):
-                    from_position_entry.speaker_type = to_organization_type
-                if positive_value_exists(to_twitter_followers_count):
-                    from_position_entry.twitter_followers_count = to_twitter_followers_count
-
-                from_position_entry.save()
-                position_entries_moved += 1
-            except Exception as e:
-                status += "MOVE_TO_ANOTHER_VOTER-UNABLE_TO_SAVE_FRIENDS_ONLY_ORGANIZATION_UPDATE2: " + str(e) + " "
-                position_entries_not_moved += 1
-
-    from_position_private_list_remaining_results = position_list_manager.retrieve_all_positions_for_voter(
-        from_voter_id, from_voter_we_vote_id,
-        stance_we_are_looking_for, friends_vs_public)
-    from_position_private_list_remaining = from_position_private_list_remaining_results['position_list']
-    for from_position_entry in from_position_private_list_remaining:
-        # Delete the remaining position values
-        try:
-            from_position_entry.delete()
-        except Exception as e:
-            pass
-
-    # Find public positions for the "from_voter" that we are moving away from
-    stance_we_are_looking_for = ANY_STANCE
-    friends_vs_public = PUBLIC_ONLY
-    from_position_public_results = position_list_manager.retrieve_all_positions_for_voter(
-        from_voter_id, from_voter_we_vote_id,
-        stance_we_are_looking_for, friends_vs_public)
-    from_position_public_list = from_position_public_results['position_list']
-
-    position_we_vote_id = ""
-    # We don't want the organization_id to affect the retrieve
-    empty_organization_id = 0
-    empty_organization_we_vote_id = 0
-    for from_position_entry in from_position_public_list:
-        # See if the "to_voter" already has the same entry
-        results = position_manager.retrieve_position_table_unknown(
-            position_we_vote_id, empty_organization_id, empty_organization_we_vote_id,
-            to_voter_id,
-            from_position_entry.contest_office_id, from_position_entry.candidate_campaign_id,
-            from_position_entry.contest_measure_id,
-            to_voter_we_vote_id,
-            from_position_entry.contest_office_we_vote_id,
-            from_position_entry.candidate_campaign_we_vote_id, from_position_entry.contest_measure_we_vote_id)
-
-        if results['position_found']:
-            # Look to see if there is a statement that can be preserved
-            to_position_entry = results['position']
-            if not positive_value_exists(to_position_entry.statement_html):
-                # If the "to_position" does NOT have a statement_html, we look to see if the "from_position" has one
-                # we can use
-                if positive_value_exists(from_position_entry.statement_html):
-                    to_position_entry.statement_html = from_position_entry.statement_html
-            if not positive_value_exists(to_position_entry.statement_text):
-                # If the "to_position" does NOT have a statement_html, we look to see if the "from_position" has one
-                # we can use
-                if positive_value_exists(from_position_entry.statement_text):
-                    to_position_entry.statement_text = from_position_entry.statement_text
-            # Update the organization values
-            to_position_entry.organization_we_vote_id = to_voter_linked_organization_we_vote_id
-            to_position_entry.organization_id = to_voter_linked_organization_id
-            try:
-                to_position_entry.save()
-            except Exception as e:
-                status += "MOVE_TO_ANOTHER_VOTER-UNABLE_TO_SAVE_PUBLIC_ORGANIZATION_UPDATE "
-        else:
-            # Change the position values to the new we_vote_id
-            try:
-                from_position_entry.organization_id = to_voter_linked_organization_id
-                from_position_entry.organization_we_vote_id = to_voter_linked_organization_we_vote_id
-                from_position_entry.voter_id = to_voter_id
-                from_position_entry.voter_we_vote_id = to_voter_we_vote_id
-                # Update cached organization information
-                if positive_value_exists(to_organization_name):
-                    from_position_entry.speaker_display_name = to_organization_name
-                if positive_value_exists(to_organization_type):
-                    from_position_entry.speaker_type = to_organization_type
-                if positive_value_exists(to_twitter_followers_count):
-                    from_position_entry.twitter_followers_count = to_twitter_followers_count
-
-                from_position_entry.save()
-                position_entries_moved += 1
-            except Exception as e:
-                position_entries_not_moved += 1
-                status += "MOVE_TO_ANOTHER_VOTER-UNABLE_TO_SAVE_PUBLIC_ORGANIZATION_UPDATE2 "
-
-    from_position_public_results = position_list_manager.retrieve_all_positions_for_voter(
-        from_voter_id, from_voter_we_vote_id,
-        stance_we_are_looking_for, friends_vs_public)
-    from_position_public_list_remaining = from_position_public_results['position_list']
-    for from_position_entry in from_position_public_list_remaining:
-        # Delete the remaining position values
-        try:
-            from_position_entry.delete()
-        except Exception as e:
-            pass
-
-    results = {
-        'status':                       status,
-        'success':                      success,
-        'from_voter_id':                from_voter_id,
-        'from_voter_we_vote_id':        from_voter_we_vote_id,
-        'to_voter_id':                  to_voter_id,
-        'to_voter_we_vote_id':          to_voter_we_vote_id,
-        'position_entries_moved':       position_entries_moved,
-        'position_entries_not_moved':   position_entries_not_moved,
-    }
-    return results
-
-
 def duplicate_positions_to_another_voter(from_voter_id, from_voter_we_vote_id,
                                          to_voter_id, to_voter_we_vote_id,
                                          to_voter_linked_organization_id, to_voter_linked_organization_we_vote_id):
@@ -2062,7 +1843,11 @@ def position_list_for_ballot_item_for_api(office_id, office_we_vote_id,  # posit
         # we retrieve the following so we can get the ballot item's id and we_vote_id (per the request of
         # the WebApp team)
         candidate_manager = CandidateManager()
-        if positive_value_exists(candidate_id):
+        snapshot_candidate = fetch_election_snapshot().candidate(
+            candidate_id=candidate_id, candidate_we_vote_id=candidate_we_vote_id)
+        if snapshot_candidate is not None:
+            results = {'candidate_found': True, 'candidate': snapshot_candidate}
+        elif positive_value_exists(candidate_id):
             results = candidate_manager.retrieve_candidate_from_id(candidate_id)
         else:
             results = candidate_manager.retrieve_candidate_from_we_vote_id(candidate_we_vote_id)
@@ -2095,7 +1880,11 @@ def position_list_for_ballot_item_for_api(office_id, office_we_vote_id,  # posit
         # for this ballot_item, we retrieve the following so we can get the id and we_vote_id (per the request of
         # the WebApp team)
         contest_measure_manager = ContestMeasureManager()
-        if positive_value_exists(measure_id):
+        snapshot_contest_measure = fetch_election_snapshot().contest_measure(
+            contest_measure_id=measure_id, contest_measure_we_vote_id=measure_we_vote_id)
+        if snapshot_contest_measure is not None:
+            results = {'contest_measure_found': True, 'contest_measure': snapshot_contest_measure}
+        elif positive_value_exists(measure_id):
             results = contest_measure_manager.retrieve_contest_measure_from_id(measure_id)
         else:
             results = contest_measure_manager.retrieve_contest_measure_from_we_vote_id(measure_we_vote_id)
@@ -2131,7 +1920,11 @@ def position_list_for_ballot_item_for_api(office_id, office_we_vote_id,  # posit
         # we retrieve the following so we can get the ballot item's id and we_vote_id (per the request of
         # the WebApp team)
         contest_office_manager = ContestOfficeManager()
-        if positive_value_exists(office_id):
+        snapshot_contest_office = fetch_election_snapshot().contest_office(
+            contest_office_id=office_id, contest_office_we_vote_id=office_we_vote_id)
+        if snapshot_contest_office is not None:
+            results = {'contest_office_found': True, 'contest_office': snapshot_contest_office}
+        elif positive_value_exists(office_id):
             results = contest_office_manager.retrieve_contest_office_from_id(office_id)
         else:
             results = contest_office_manager.retrieve_contest_office_from_we_vote_id(office_we_vote_id)
@@ -2539,7 +2332,11 @@ def retrieve_position_list_for_ballot_item_from_friends(
         # we retrieve the following so we can get the ballot item's id and we_vote_id (per the request of
         # the WebApp team)
         candidate_manager = CandidateManager()
-        if positive_value_exists(candidate_id):
+        snapshot_candidate = fetch_election_snapshot().candidate(
+            candidate_id=candidate_id, candidate_we_vote_id=candidate_we_vote_id)
+        if snapshot_candidate is not None:
+            results = {'candidate_found': True, 'candidate': snapshot_candidate}
+        elif positive_value_exists(candidate_id):
             results = candidate_manager.retrieve_candidate_from_id(candidate_id)
         else:
             results = candidate_manager.retrieve_candidate_from_we_vote_id(candidate_we_vote_id)
@@ -2592,7 +2389,11 @@ def retrieve_position_list_for_ballot_item_from_friends(
         # for this ballot_item, we retrieve the following so we can get the id and we_vote_id (per the request of
         # the WebApp team)
         contest_measure_manager = ContestMeasureManager()
-        if positive_value_exists(measure_id):
+        snapshot_contest_measure = fetch_election_snapshot().contest_measure(
+            contest_measure_id=measure_id, contest_measure_we_vote_id=measure_we_vote_id)
+        if snapshot_contest_measure is not None:
+            results = {'contest_measure_found': True, 'contest_measure': snapshot_contest_measure}
+        elif positive_value_exists(measure_id):
             results = contest_measure_manager.retrieve_contest_measure_from_id(measure_id)
         else:
             results = contest_measure_manager.retrieve_contest_measure_from_we_vote_id(measure_we_vote_id)
@@ -2652,7 +2453,11 @@ def retrieve_position_list_for_ballot_item_from_friends(
         # we retrieve the following so we can get the ballot item's id and we_vote_id (per the request of
         # the WebApp team)
         contest_office_manager = ContestOfficeManager()
-        if positive_value_exists(office_id):
+        snapshot_contest_office = fetch_election_snapshot().contest_office(
+            contest_office_id=office_id, contest_office_we_vote_id=office_we_vote_id)
+        if snapshot_contest_office is not None:
+            results = {'contest_office_found': True, 'contest_office': snapshot_contest_office}
+        elif positive_value_exists(office_id):
             results = contest_office_manager.retrieve_contest_office_from_id(office_id)
         else:
             results = contest_office_manager.retrieve_contest_office_from_we_vote_id(office_we_vote_id)
@@ -2827,7 +2632,11 @@ def retrieve_position_list_for_ballot_item_from_shared_items(
         # we retrieve the following so we can get the ballot item's id and we_vote_id (per the request of
         # the WebApp team)
         candidate_manager = CandidateManager()
-        if positive_value_exists(candidate_id):
+        snapshot_candidate = fetch_election_snapshot().candidate(
+            candidate_id=candidate_id, candidate_we_vote_id=candidate_we_vote_id)
+        if snapshot_candidate is not None:
+            results = {'candidate_found': True, 'candidate': snapshot_candidate}
+        elif positive_value_exists(candidate_id):
             results = candidate_manager.retrieve_candidate_from_id(candidate_id)
         else:
             results = candidate_manager.retrieve_candidate_from_we_vote_id(candidate_we_vote_id)
@@ -2876,7 +2685,11 @@ def retrieve_position_list_for_ballot_item_from_shared_items(
         # for this ballot_item, we retrieve the following so we can get the id and we_vote_id (per the request of
         # the WebApp team)
         contest_measure_manager = ContestMeasureManager()
-        if positive_value_exists(measure_id):
+        snapshot_contest_measure = fetch_election_snapshot().contest_measure(
+            contest_measure_id=measure_id, contest_measure_we_vote_id=measure_we_vote_id)
+        if snapshot_contest_measure is not None:
+            results = {'contest_measure_found': True, 'contest_measure': snapshot_contest_measure}
+        elif positive_value_exists(measure_id):
             results = contest_measure_manager.retrieve_contest_measure_from_id(measure_id)
         else:
             results = contest_measure_manager.retrieve_contest_measure_from_we_vote_id(measure_we_vote_id)
@@ -2925,7 +2738,11 @@ def retrieve_position_list_for_ballot_item_from_shared_items(
         # we retrieve the following so we can get the ballot item's id and we_vote_id (per the request of
         # the WebApp team)
         contest_office_manager = ContestOfficeManager()
-        if positive_value_exists(office_id):
+        snapshot_contest_office = fetch_election_snapshot().contest_office(
+            contest_office_id=office_id, contest_office_we_vote_id=office_we_vote_id)
+        if snapshot_contest_office is not None:
+            results = {'contest_office_found': True, 'contest_office': snapshot_contest_office}
+        elif positive_value_exists(office_id):
             results = contest_office_manager.retrieve_contest_office_from_id(office_id)
         else:
             results = contest_office_manager.retrieve_contest_office_from_we_vote_id(office_we_vote_id)
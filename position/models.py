@@ -5,18 +5,21 @@
 
 from activity.controllers import update_or_create_activity_notice_seed_for_voter_position
 from analytics.models import ACTION_POSITION_TAKEN, AnalyticsManager
-from candidate.models import CandidateCampaign, CandidateListManager, CandidateManager
+from candidate.models import CandidateCampaign, CandidateListManager, CandidateManager, CandidateToOfficeLink
 from ballot.controllers import figure_out_google_civic_election_id_voter_is_watching, \
     figure_out_google_civic_election_id_voter_is_watching_by_voter_we_vote_id
 from django.core.exceptions import ObjectDoesNotExist, MultipleObjectsReturned
 from django.db import models
 from django.db.models import Q
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
 from django.utils.timezone import now
 from election.models import Election
 from exception.models import handle_exception, handle_record_found_more_than_one_exception,\
     handle_record_not_found_exception, handle_record_not_saved_exception, print_to_log
 from follow.models import FollowOrganizationManager, FollowOrganizationList
 from friend.models import FriendManager
+from issue.models import invalidate_issue_stance_matrix_for_election, organization_is_linked_to_issues
 from measure.models import ContestMeasure, ContestMeasureManager
 from office.models import ContestOffice, ContestOfficeManager
 from organization.models import Organization, OrganizationManager, \
@@ -8501,3 +8504,69 @@ class PositionMetricsManager(models.Manager):
         total_positions_count = position_entered_count + position_for_friends_count
 
         return total_positions_count
+
+
+# The PositionEntered fields the issue stance matrix is built from (see issue/issue_stance_matrix.py)
+ISSUE_STANCE_MATRIX_POSITION_FIELD_NAMES = (
+    'candidate_campaign_we_vote_id', 'contest_measure_we_vote_id', 'google_civic_election_id',
+    'organization_we_vote_id', 'stance')
+
+
+def issue_stance_matrix_position_values(position, load_deferred_fields=True):
+    if not load_deferred_fields:
+        # Fields left out with .only() are None
+        return tuple(position.__dict__.get(field_name) for field_name in ISSUE_STANCE_MATRIX_POSITION_FIELD_NAMES)
+    return tuple(getattr(position, field_name) for field_name in ISSUE_STANCE_MATRIX_POSITION_FIELD_NAMES)
+
+
+def issue_stance_matrix_election_id_set(position_values):
+    """
+    Public positions from organizations linked to issues are part of the issue stance matrix of their election
+    :param position_values: from issue_stance_matrix_position_values
+    :return: the elections whose issue stance matrix includes a position with these values
+    """
+    candidate_we_vote_id, contest_measure_we_vote_id, google_civic_election_id, organization_we_vote_id, stance = \
+        position_values
+    if stance == PERCENT_RATING or not organization_is_linked_to_issues(organization_we_vote_id):
+        return set()
+    if positive_value_exists(google_civic_election_id):
+        return {convert_to_int(google_civic_election_id)}
+    if positive_value_exists(candidate_we_vote_id):
+        try:
+            return set(convert_to_int(google_civic_election_id) for google_civic_election_id in
+                       CandidateToOfficeLink.objects.filter(candidate_we_vote_id=candidate_we_vote_id)
+                       .values_list('google_civic_election_id', flat=True).distinct())
+        except Exception as e:
+            logger.error("issue_stance_matrix_election_id_set: " + str(e))
+    return set()
+
+
+@receiver(post_init, sender=PositionEntered)
+def position_entered_initialized_signal(sender, instance, **kwargs):
+    instance.issue_stance_matrix_values = issue_stance_matrix_position_values(instance, load_deferred_fields=False)
+
+
+@receiver(post_save, sender=PositionEntered)
+def position_entered_saved_signal(sender, instance, created, **kwargs):
+    """
+    Most saves (ex/ a new statement, or a voter's own position) don't change the issue stance matrix, so we only
+    invalidate it when the stance or the ballot item changes
+    """
+    previous_values = getattr(instance, 'issue_stance_matrix_values', None)
+    position_values = issue_stance_matrix_position_values(instance)
+    instance.issue_stance_matrix_values = position_values
+    if not created and position_values == previous_values:
+        return
+    google_civic_election_id_set = issue_stance_matrix_election_id_set(position_values)
+    if not created and previous_values is not None:
+        # Ex/ moved to another ballot item, or no longer counted
+        google_civic_election_id_set |= issue_stance_matrix_election_id_set(previous_values)
+    for google_civic_election_id in google_civic_election_id_set:
+        invalidate_issue_stance_matrix_for_election(google_civic_election_id)
+
+
+@receiver(post_delete, sender=PositionEntered)
+def position_entered_deleted_signal(sender, instance, **kwargs):
+    # Ex/ a position made friends-only is deleted here and saved as a PositionForFriends
+    for google_civic_election_id in issue_stance_matrix_election_id_set(issue_stance_matrix_position_values(instance)):
+        invalidate_issue_stance_matrix_for_election(google_civic_election_id)
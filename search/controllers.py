@@ -7,6 +7,7 @@ from config.base import get_environment_variable
 from elasticsearch import Elasticsearch
 from organization.models import OrganizationManager
 from politician.models import PoliticianManager
+from search.indexer import SEARCH_INDEX_NAME_LIST
 from voter.models import fetch_voter_id_from_voter_device_link
 import wevote_functions.admin
 from wevote_functions.functions import is_voter_device_id_valid, positive_value_exists
@@ -186,7 +187,8 @@ def search_all_elastic_for_api(text_from_search_field, voter_device_id):
     candidate_manager = CandidateManager()
     organization_manager = OrganizationManager()
     try:
-        res = elastic_search_object.search(body=query)
+        # Only the aliases, so a new index that is still being built by a full rebuild isn't searched too
+        res = elastic_search_object.search(index=','.join(SEARCH_INDEX_NAME_LIST), body=query, ignore_unavailable=True)
         # See bottom of this file for example results from Elastic Search
 
         search_results_elastic_search_raw = res['hits']['hits']
@@ -0,0 +1,365 @@
+# search/indexer.py
+# Brought to you by We Vote. Be good.
+# -*- coding: UTF-8 -*-
+
+"""
+Sends candidates, offices, measures, elections and organizations to Elastic Search.
+A full rebuild streams each table into a new index, then moves the search alias over to it, so searches keep
+working while it runs. An incremental pass only sends the rows recorded in SearchIndexChange since the last pass.
+"""
+
+from datetime import timedelta
+import time
+
+from django.utils.timezone import now
+from elasticsearch import helpers
+
+from ballot.models import BallotReturned
+from candidate.models import CandidateCampaign
+from election.models import Election
+from measure.models import ContestMeasure
+from office.models import ContestOffice
+from organization.models import Organization
+from search.models import SearchIndexChange, convert_state_code_to_state_text
+import wevote_functions.admin
+from wevote_functions.functions import convert_to_int, positive_value_exists
+from wevote_settings.models import WeVoteSettingsManager
+
+logger = wevote_functions.admin.get_logger(__name__)
+
+SEARCH_INDEX_BULK_CHUNK_SIZE = 500
+# Changes newer than this are left for the next pass, so a change committed late with a lower id isn't skipped
+SEARCH_INDEX_CHANGE_SETTLE_SECONDS = 10
+SEARCH_INDEX_HIGH_WATER_MARK_PREFIX = 'search_index_change_last_id_'
+# Sent changes are kept this long, so a full rebuild can replay the changes made while it ran
+SEARCH_INDEX_CHANGE_KEEP_DAYS = 1
+# Sorted to the bottom of the results (see search_all_elastic_for_api), below elections with a real date
+ELECTION_DAY_TEXT_UNKNOWN = "1111-11-11"
+
+DEFAULT_INDEX_BODY = {'settings': {'number_of_shards': 3, 'number_of_replicas': 0}}
+MEASURE_INDEX_BODY = {
+    "mappings": {
+        "measure": {
+            "properties": {
+                "google_civic_election_id": {"type": "string"},
+                "measure_subtitle": {"type": "string", "analyzer": "measure_synonyms"},
+                "measure_text": {"type": "string", "analyzer": "measure_synonyms"},
+                "measure_title": {"type": "string", "analyzer": "measure_synonyms"},
+                "state_code": {"type": "string"},
+                "we_vote_id": {"type": "string"},
+            }
+        }
+    },
+    "settings": {
+        "index": {"number_of_shards": "3", "number_of_replicas": "0"},
+        "analysis": {
+            "filter": {"measure_synonym_filter": {"type": "synonym", "synonyms": ["proposition,prop"]}},
+            "analyzer": {
+                "measure_synonyms": {"tokenizer": "standard", "filter": ["lowercase", "measure_synonym_filter"]},
+            },
+        },
+    },
+}
+
+# 2016-08-27 We no longer index politician data
+SEARCH_INDEX_DEFINITION_DICT = {
+    'candidates': {
+        'doc_type':     'candidate',
+        'model':        CandidateCampaign,
+        'field_list':   ['candidate_name', 'candidate_twitter_handle', 'twitter_name', 'party',
+                         'google_civic_election_id', 'state_code', 'we_vote_id'],
+        'index_body':   DEFAULT_INDEX_BODY,
+    },
+    'elections': {
+        'doc_type':     'election',
+        'model':        Election,
+        'field_list':   ['election_name', 'election_day_text', 'google_civic_election_id', 'state_code'],
+        'index_body':   DEFAULT_INDEX_BODY,
+    },
+    'measures': {
+        'doc_type':     'measure',
+        'model':        ContestMeasure,
+        'field_list':   ['we_vote_id', 'measure_subtitle', 'measure_text', 'measure_title',
+                         'google_civic_election_id', 'state_code'],
+        'index_body':   MEASURE_INDEX_BODY,
+    },
+    'offices': {
+        'doc_type':     'office',
+        'model':        ContestOffice,
+        'field_list':   ['we_vote_id', 'office_name', 'google_civic_election_id', 'state_code'],
+        'index_body':   DEFAULT_INDEX_BODY,
+    },
+    'organizations': {
+        'doc_type':     'organization',
+        'model':        Organization,
+        'field_list':   ['we_vote_id', 'organization_name', 'organization_twitter_handle', 'organization_website',
+                         'twitter_description', 'state_served_code'],
+        'index_body':   DEFAULT_INDEX_BODY,
+    },
+}
+SEARCH_INDEX_NAME_LIST = sorted(SEARCH_INDEX_DEFINITION_DICT.keys())
+
+
+def generate_search_document(index_name, row_dict):
+    field_list = SEARCH_INDEX_DEFINITION_DICT[index_name]['field_list']
+    document = {field_name: row_dict[field_name] for field_name in field_list}
+    if index_name == 'elections':
+        document['state_name'] = convert_state_code_to_state_text(row_dict['state_code'] or '')
+    else:
+        document['election_day_text'] = ELECTION_DAY_TEXT_UNKNOWN
+    return document
+
+
+def generate_index_action(index_name, index_to_write, row_dict):
+    return {
+        '_op_type': 'index',
+        '_index':   index_to_write,
+        '_type':    SEARCH_INDEX_DEFINITION_DICT[index_name]['doc_type'],
+        '_id':      row_dict['id'],
+        '_source':  generate_search_document(index_name, row_dict),
+    }
+
+
+def generate_delete_action(index_name, index_to_write, object_id):
+    return {
+        '_op_type': 'delete',
+        '_index':   index_to_write,
+        '_type':    SEARCH_INDEX_DEFINITION_DICT[index_name]['doc_type'],
+        '_id':      object_id,
+    }
+
+
+def generate_action_chunks(action_iterator, chunk_size=SEARCH_INDEX_BULK_CHUNK_SIZE):
+    """
+    Groups actions into lists of chunk_size, so only one chunk is in memory at a time
+    :param action_iterator:
+    :param chunk_size:
+    :return:
+    """
+    action_chunk = []
+    for action in action_iterator:
+        action_chunk.append(action)
+        if len(action_chunk) >= chunk_size:
+            yield action_chunk
+            action_chunk = []
+    if len(action_chunk):
+        yield action_chunk
+
+
+class ElasticSearchBulkSink(object):
+    """
+    Sends one chunk of actions in one bulk request. Returns (success_count, error_list).
+    Deleting a document that isn't in the index is not an error.
+    """
+
+    def __init__(self, elastic_search_object):
+        self.elastic_search_object = elastic_search_object
+
+    def __call__(self, action_list):
+        success_count, error_list = helpers.bulk(
+            self.elastic_search_object, action_list, chunk_size=len(action_list) or 1,
+            raise_on_error=False, raise_on_exception=False)
+        error_list = [error for error in error_list
+                      if not ('delete' in error and error['delete'].get('status') == 404)]
+        return success_count, error_list
+
+
+class SearchIndexer(object):
+    """
+    :param elastic_search_object: used to create indexes and move aliases
+    :param bulk_sink: called with each chunk of actions, defaults to ElasticSearchBulkSink
+    :param chunk_size: rows read from the database cursor, and actions sent to Elastic Search, at a time
+    """
+
+    def __init__(self, elastic_search_object, bulk_sink=None, chunk_size=SEARCH_INDEX_BULK_CHUNK_SIZE):
+        self.elastic_search_object = elastic_search_object
+        self.bulk_sink = bulk_sink if bulk_sink is not None else ElasticSearchBulkSink(elastic_search_object)
+        self.chunk_size = chunk_size
+        self.we_vote_settings_manager = WeVoteSettingsManager()
+
+    def fetch_row_iterator(self, index_name, object_id_list=None, read_only=True):
+        """
+        Rows come from a server-side cursor, chunk_size at a time, instead of loading the whole table
+        :param index_name:
+        :param object_id_list: only these rows, for an incremental pass
+        :param read_only:
+        :return:
+        """
+        index_definition = SEARCH_INDEX_DEFINITION_DICT[index_name]
+        model = index_definition['model']
+        if positive_value_exists(read_only):
+            queryset = model.objects.using('readonly').all()
+        else:
+            queryset = model.objects.all()
+        if object_id_list is not None:
+            queryset = queryset.filter(id__in=object_id_list)
+        if index_name == 'elections':
+            # Only elections we have ballots for, as in BallotReturnedManager.should_election_search_data_be_saved
+            #  (Election keeps google_civic_election_id as a string, BallotReturned as an integer)
+            ballot_returned_election_id_list = BallotReturned.objects.using('readonly') \
+                .exclude(google_civic_election_id__isnull=True) \
+                .values_list('google_civic_election_id', flat=True).distinct()
+            queryset = queryset.filter(
+                google_civic_election_id__in=[str(election_id) for election_id in ballot_returned_election_id_list])
+        return queryset.order_by('id').values('id', *index_definition['field_list']).iterator(
+            chunk_size=self.chunk_size)
+
+    def send_actions(self, action_iterator):
+        success_count = 0
+        error_count = 0
+        for action_chunk in generate_action_chunks(action_iterator, chunk_size=self.chunk_size):
+            chunk_success_count, chunk_error_list = self.bulk_sink(action_chunk)
+            success_count += chunk_success_count
+            error_count += len(chunk_error_list)
+            for error in chunk_error_list[:3]:
+                logger.error("SEARCH_INDEXER_BULK_ERROR: " + str(error))
+        return success_count, error_count
+
+    def create_new_index(self, index_name):
+        new_index_name = index_name + '_' + now().strftime('%Y%m%d%H%M%S')
+        self.elastic_search_object.indices.create(
+            index=new_index_name, body=SEARCH_INDEX_DEFINITION_DICT[index_name]['index_body'])
+        return new_index_name
+
+    def move_alias_to_index(self, index_name, new_index_name):
+        """
+        Points the alias that searches use at the new index, in one update, and removes the old index
+        :param index_name: the alias, ex/ 'candidates'
+        :param new_index_name:
+        :return: the list of old indexes removed
+        """
+        indices = self.elastic_search_object.indices
+        if indices.exists(index=index_name) and not indices.exists_alias(name=index_name):
+            # Built by the old populate_data.py as a real index, which has to go before an alias can take its name
+            logger.error("SEARCH_INDEXER: replacing index " + index_name + " with an alias")
+            indices.delete(index=index_name)
+        old_index_name_list = []
+        if indices.exists_alias(name=index_name):
+            old_index_name_list = [one_index_name for one_index_name in indices.get_alias(name=index_name).keys()
+                                   if one_index_name != new_index_name]
+        action_list = [{'remove': {'index': old_index_name, 'alias': index_name}}
+                       for old_index_name in old_index_name_list]
+        action_list.append({'add': {'index': new_index_name, 'alias': index_name}})
+        indices.update_aliases(body={'actions': action_list})
+        for old_index_name in old_index_name_list:
+            indices.delete(index=old_index_name)
+        return old_index_name_list
+
+    def full_rebuild(self, index_name):
+        status = ""
+        start_time = time.time()
+        # Changes from here on may have been sent to the old index only, or missed by the rows we read. Once the alias
+        #  moves, the high-water mark goes back to here, so the next incremental pass sends them to the new index.
+        last_change_id = self.fetch_last_change_id(index_name)
+        try:
+            new_index_name = self.create_new_index(index_name)
+        except Exception as e:
+            return {
+                'success':          False,
+                'status':           "SEARCH_INDEXER_CREATE_INDEX_FAILED " + index_name + ": " + str(e) + " ",
+                'index_name':       index_name,
+                'indexed_count':    0,
+                'error_count':      0,
+            }
+
+        action_iterator = (generate_index_action(index_name, new_index_name, row_dict)
+                           for row_dict in self.fetch_row_iterator(index_name))
+        success_count, error_count = self.send_actions(action_iterator)
+        if error_count:
+            # Leave searches on the old index. The half-built new one is removed.
+            status += "SEARCH_INDEXER_FULL_REBUILD_ERRORS " + index_name + ": " + str(error_count) + " "
+            try:
+                self.elastic_search_object.indices.delete(index=new_index_name)
+            except Exception as e:
+                status += "SEARCH_INDEXER_DELETE_NEW_INDEX_FAILED: " + str(e) + " "
+            success = False
+        else:
+            try:
+                old_index_name_list = self.move_alias_to_index(index_name, new_index_name)
+                self.save_high_water_mark(index_name, last_change_id)
+                status += "SEARCH_INDEXER_FULL_REBUILD " + index_name + " -> " + new_index_name + \
+                    " (replaced " + str(len(old_index_name_list)) + ") "
+                success = True
+            except Exception as e:
+                status += "SEARCH_INDEXER_ALIAS_SWAP_FAILED " + index_name + ": " + str(e) + " "
+                success = False
+        logger.info("{status}{count} documents in {seconds:.1f} seconds".format(
+            status=status, count=success_count, seconds=time.time() - start_time))
+        return {
+            'success':          success,
+            'status':           status,
+            'index_name':       index_name,
+            'indexed_count':    success_count,
+            'error_count':      error_count,
+        }
+
+    def incremental_update(self, index_name):
+        """
+        Sends the rows changed since the high-water mark, one chunk of changes at a time. Several changes to one
+        row are sent once, and rows that no longer exist (or elections without ballots) are deleted.
+        :param index_name:
+        :return:
+        """
+        status = ""
+        high_water_mark = self.fetch_high_water_mark(index_name)
+        settled_before = now() - timedelta(seconds=SEARCH_INDEX_CHANGE_SETTLE_SECONDS)
+        indexed_count = 0
+        deleted_count = 0
+        error_count = 0
+        while True:
+            change_list = list(SearchIndexChange.objects
+                               .filter(index_name=index_name, id__gt=high_water_mark,
+                                       date_changed__lt=settled_before)
+                               .order_by('id')
+                               .values_list('id', 'object_id')[:self.chunk_size])
+            if not len(change_list):
+                break
+            changed_object_id_set = set(object_id for change_id, object_id in change_list)
+            found_object_id_set = set()
+            action_list = []
+            for row_dict in self.fetch_row_iterator(index_name, object_id_list=changed_object_id_set,
+                                                    read_only=False):
+                found_object_id_set.add(row_dict['id'])
+                action_list.append(generate_index_action(index_name, index_name, row_dict))
+            for object_id in sorted(changed_object_id_set - found_object_id_set):
+                action_list.append(generate_delete_action(index_name, index_name, object_id))
+            success_count, chunk_error_count = self.send_actions(action_list)
+            if chunk_error_count:
+                # Stop without moving the high-water mark, so these changes are tried again next time
+                status += "SEARCH_INDEXER_INCREMENTAL_ERRORS " + index_name + ": " + str(chunk_error_count) + " "
+                error_count += chunk_error_count
+                break
+            indexed_count += len(found_object_id_set)
+            deleted_count += len(changed_object_id_set - found_object_id_set)
+            high_water_mark = change_list[-1][0]
+            self.save_high_water_mark(index_name, high_water_mark)
+        SearchIndexChange.objects.filter(
+            index_name=index_name, id__lte=high_water_mark,
+            date_changed__lt=now() - timedelta(days=SEARCH_INDEX_CHANGE_KEEP_DAYS)).delete()
+        status += "SEARCH_INDEXER_INCREMENTAL " + index_name + " indexed: " + str(indexed_count) + \
+            " deleted: " + str(deleted_count) + " "
+        return {
+            'success':          not error_count,
+            'status':           status,
+            'index_name':       index_name,
+            'indexed_count':    indexed_count,
+            'deleted_count':    deleted_count,
+            'error_count':      error_count,
+            'high_water_mark':  high_water_mark,
+        }
+
+    def fetch_high_water_mark(self, index_name):
+        results = self.we_vote_settings_manager.fetch_setting_results(
+            SEARCH_INDEX_HIGH_WATER_MARK_PREFIX + index_name, read_only=False)
+        return convert_to_int(results['setting_value']) or 0
+
+    def save_high_water_mark(self, index_name, change_id):
+        self.we_vote_settings_manager.save_setting(SEARCH_INDEX_HIGH_WATER_MARK_PREFIX + index_name, change_id)
+
+    @staticmethod
+    def fetch_last_change_id(index_name):
+        # Changes from the last few seconds may not be on the read replica the rebuild reads from yet
+        settled_before = now() - timedelta(seconds=SEARCH_INDEX_CHANGE_SETTLE_SECONDS)
+        last_change = SearchIndexChange.objects.filter(index_name=index_name, date_changed__lt=settled_before) \
+            .order_by('-id').only('id').first()
+        return last_change.id if last_change is not None else 0
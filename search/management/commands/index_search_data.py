@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from elasticsearch import Elasticsearch
+
+from config.base import get_environment_variable
+from search.indexer import SEARCH_INDEX_BULK_CHUNK_SIZE, SEARCH_INDEX_NAME_LIST, SearchIndexer
+
+
+class Command(BaseCommand):
+    help = 'Sends the rows changed since the last run to Elastic Search, or with --full rebuilds each index ' \
+           'and moves its alias over once it is complete'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', default=False)
+        parser.add_argument('--index', action='append', default=None, choices=SEARCH_INDEX_NAME_LIST)
+        parser.add_argument('--chunk_size', type=int, default=SEARCH_INDEX_BULK_CHUNK_SIZE)
+        parser.add_argument('--elastic_search_host', default=None,
+                            help='Defaults to ELASTIC_SEARCH_CONNECTION_STRING')
+
+    def handle(self, *args, **options):
+        elastic_search_host = options['elastic_search_host'] or \
+            get_environment_variable("ELASTIC_SEARCH_CONNECTION_STRING")
+        elastic_search_object = Elasticsearch(
+            [elastic_search_host], timeout=20, max_retries=5, retry_on_timeout=True)
+        search_indexer = SearchIndexer(elastic_search_object, chunk_size=options['chunk_size'])
+        all_success = True
+        for index_name in options['index'] or SEARCH_INDEX_NAME_LIST:
+            if options['full']:
+                results = search_indexer.full_rebuild(index_name)
+            else:
+                results = search_indexer.incremental_update(index_name)
+            self.stdout.write(results['status'])
+            all_success = all_success and results['success']
+        if not all_success:
+            self.stderr.write('Some indexes were not updated')
@@ -5,6 +5,7 @@
 from ballot.models import BallotReturnedManager
 from config.base import get_environment_variable
 from candidate.models import CandidateCampaign
+from django.db import models
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from elasticsearch import Elasticsearch
@@ -77,6 +78,10 @@ STATE_CODE_MAP = {
 }
 
 ELASTIC_SEARCH_TURNED_ON = False
+# When on, each save or delete of an indexed row is written to SearchIndexChange, and
+#  "python manage.py index_search_data" sends only those rows to Elastic Search
+SEARCH_INDEX_CHANGE_TRACKING_ON = \
+    positive_value_exists(get_environment_variable("SEARCH_INDEX_CHANGE_TRACKING", no_exception=True))
 
 
 def convert_state_code_to_state_text(incoming_state_code):
@@ -95,10 +100,33 @@ if positive_value_exists(ELASTIC_SEARCH_CONNECTION_STRING):
     )
 
 
+class SearchIndexChange(models.Model):
+    """
+    One row for each save or delete of a row we index. The indexer remembers the last id it has sent for each
+    index (its high-water mark), so an incremental pass only reads the rows changed since then.
+    Changes made with QuerySet.update() or bulk_update() don't send signals, so they are only picked up by a full
+    rebuild.
+    """
+    index_name = models.CharField(max_length=50, db_index=True)
+    object_id = models.BigIntegerField()
+    deleted = models.BooleanField(default=False)
+    date_changed = models.DateTimeField(auto_now_add=True, db_index=True)
+
+
+def record_search_index_change(index_name, instance, deleted=False):
+    if not SEARCH_INDEX_CHANGE_TRACKING_ON or not positive_value_exists(instance.id):
+        return
+    try:
+        SearchIndexChange.objects.create(index_name=index_name, object_id=instance.id, deleted=deleted)
+    except Exception as e:
+        logger.error("RECORD_SEARCH_INDEX_CHANGE, " + index_name + ": " + str(e))
+
+
 # CandidateCampaign
 @receiver(post_save, sender=CandidateCampaign)
 def save_candidate_campaign_signal(sender, instance, **kwargs):
     # logger.debug("search.save_candidate_campaign_signal")
+    record_search_index_change('candidates', instance)
     if ELASTIC_SEARCH_TURNED_ON and 'elastic_search_object' in globals():
         doc = {
             "candidate_name": instance.candidate_name,
@@ -121,6 +149,7 @@ def save_candidate_campaign_signal(sender, instance, **kwargs):
 @receiver(post_delete, sender=CandidateCampaign)
 def delete_candidate_campaign_signal(sender, instance, **kwargs):
     # logger.debug("search.delete_CandidateCampaign_signal")
+    record_search_index_change('candidates', instance, deleted=True)
     if ELASTIC_SEARCH_TURNED_ON and 'elastic_search_object' in globals():
         try:
             res = elastic_search_object.delete(index="candidates", doc_type='candidate', id=instance.id)
@@ -135,6 +164,7 @@ def delete_candidate_campaign_signal(sender, instance, **kwargs):
 @receiver(post_save, sender=ContestMeasure)
 def save_contest_measure_signal(sender, instance, **kwargs):
     # logger.debug("search.save_ContestMeasure_signal")
+    record_search_index_change('measures', instance)
     if ELASTIC_SEARCH_TURNED_ON and 'elastic_search_object' in globals():
         doc = {
             "we_vote_id": instance.we_vote_id,
@@ -156,6 +186,7 @@ def save_contest_measure_signal(sender, instance, **kwargs):
 @receiver(post_delete, sender=ContestMeasure)
 def delete_contest_measure_signal(sender, instance, **kwargs):
     # logger.debug("search.delete_ContestMeasure_signal")
+    record_search_index_change('measures', instance, deleted=True)
     if ELASTIC_SEARCH_TURNED_ON and 'elastic_search_object' in globals():
         try:
             res = elastic_search_object.delete(index="measures", doc_type='measure', id=instance.id)
@@ -170,6 +201,7 @@ def delete_contest_measure_signal(sender, instance, **kwargs):
 @receiver(post_save, sender=ContestOffice)
 def save_contest_office_signal(sender, instance, **kwargs):
     # logger.debug("search.save_ContestOffice_signal")
+    record_search_index_change('offices', instance)
     if ELASTIC_SEARCH_TURNED_ON and 'elastic_search_object' in globals():
         doc = {
             "we_vote_id": instance.we_vote_id,
@@ -189,6 +221,7 @@ def save_contest_office_signal(sender, instance, **kwargs):
 @receiver(post_delete, sender=ContestOffice)
 def delete_contest_office_signal(sender, instance, **kwargs):
     # logger.debug("search.delete_ContestOffice_signal")
+    record_search_index_change('offices', instance, deleted=True)
     if ELASTIC_SEARCH_TURNED_ON and 'elastic_search_object' in globals():
         try:
             res = elastic_search_object.delete(index="offices", doc_type='office', id=instance.id)
@@ -203,6 +236,7 @@ def delete_contest_office_signal(sender, instance, **kwargs):
 @receiver(post_save, sender=Election)
 def save_election_signal(sender, instance, **kwargs):
     # logger.debug("search.save_Election_signal")
+    record_search_index_change('elections', instance)
     if ELASTIC_SEARCH_TURNED_ON and 'elastic_search_object' in globals():
         ballot_returned_manager = BallotReturnedManager()
         if ballot_returned_manager.should_election_search_data_be_saved(instance.google_civic_election_id):
@@ -233,6 +267,7 @@ def save_election_signal(sender, instance, **kwargs):
 @receiver(post_delete, sender=Election)
 def delete_election_signal(sender, instance, **kwargs):
     # logger.debug("search.delete_Election_signal")
+    record_search_index_change('elections', instance, deleted=True)
     if ELASTIC_SEARCH_TURNED_ON and 'elastic_search_object' in globals():
         try:
             res = elastic_search_object.delete(index="elections", doc_type='election', id=instance.id)
@@ -247,6 +282,7 @@ def delete_election_signal(sender, instance, **kwargs):
 @receiver(post_save, sender=Organization)
 def save_organization_signal(sender, instance, **kwargs):
     # logger.debug("search.save_Organization_signal")
+    record_search_index_change('organizations', instance)
     if ELASTIC_SEARCH_TURNED_ON and 'elastic_search_object' in globals():
         doc = {
             "we_vote_id": instance.we_vote_id,
@@ -268,6 +304,7 @@ def save_organization_signal(sender, instance, **kwargs):
 @receiver(post_delete, sender=Organization)
 def delete_organization_signal(sender, instance, **kwargs):
     # logger.debug("search.delete_Organization_signal")
+    record_search_index_change('organizations', instance, deleted=True)
     if ELASTIC_SEARCH_TURNED_ON and 'elastic_search_object' in globals():
         try:
             res = elastic_search_object.delete(index="organizations", doc_type='organization', id=instance.id)
@@ -0,0 +1,149 @@
+# search/tests.py
+# Brought to you by We Vote. Be good.
+# -*- coding: UTF-8 -*-
+
+from datetime import timedelta
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase
+from django.utils.timezone import now
+
+from candidate.models import CandidateCampaign
+from search import models as search_models
+from search.indexer import SearchIndexer
+from search.models import SearchIndexChange
+
+
+class FakeBulkSink(object):
+    def __init__(self):
+        self.chunk_list = []
+
+    def __call__(self, action_list):
+        self.chunk_list.append(list(action_list))
+        return len(action_list), []
+
+
+class FakeIndices(object):
+    def __init__(self, alias_dict):
+        self.alias_dict = alias_dict
+        self.created_index_list = []
+        self.deleted_index_list = []
+        self.update_aliases_body_list = []
+
+    def create(self, index, body):
+        self.created_index_list.append(index)
+
+    def delete(self, index):
+        self.deleted_index_list.append(index)
+
+    def exists(self, index):
+        return index in self.alias_dict or index in self.created_index_list
+
+    def exists_alias(self, name):
+        return name in self.alias_dict
+
+    def get_alias(self, name):
+        return {index_name: {'aliases': {name: {}}} for index_name in self.alias_dict[name]}
+
+    def update_aliases(self, body):
+        self.update_aliases_body_list.append(body)
+
+
+class FakeElasticSearch(object):
+    def __init__(self, alias_dict):
+        self.indices = FakeIndices(alias_dict)
+
+
+class SearchIndexerWithRowList(SearchIndexer):
+    def __init__(self, row_list, *args, **kwargs):
+        super(SearchIndexerWithRowList, self).__init__(*args, **kwargs)
+        self.row_list = row_list
+
+    def fetch_row_iterator(self, index_name, object_id_list=None, read_only=True):
+        return iter(self.row_list)
+
+    def fetch_high_water_mark(self, index_name):
+        return 0
+
+    def save_high_water_mark(self, index_name, change_id):
+        pass
+
+    @staticmethod
+    def fetch_last_change_id(index_name):
+        return 0
+
+
+class SearchIndexerFullRebuildTestCase(SimpleTestCase):
+
+    def test_full_rebuild_streams_chunks_then_swaps_alias(self):
+        row_list = [{'id': number, 'we_vote_id': 'wv01off' + str(number), 'office_name': 'Office ' + str(number),
+                     'google_civic_election_id': '1000', 'state_code': 'CA'} for number in range(1, 8)]
+        fake_elastic_search = FakeElasticSearch({'offices': ['offices_20200101000000']})
+        bulk_sink = FakeBulkSink()
+        search_indexer = SearchIndexerWithRowList(row_list, fake_elastic_search, bulk_sink=bulk_sink, chunk_size=3)
+
+        results = search_indexer.full_rebuild('offices')
+
+        self.assertTrue(results['success'])
+        self.assertEqual(results['indexed_count'], 7)
+        self.assertEqual([len(action_chunk) for action_chunk in bulk_sink.chunk_list], [3, 3, 1])
+        new_index_name = fake_elastic_search.indices.created_index_list[0]
+        first_action = bulk_sink.chunk_list[0][0]
+        self.assertEqual(first_action['_index'], new_index_name)
+        self.assertEqual(first_action['_type'], 'office')
+        self.assertEqual(first_action['_source']['office_name'], 'Office 1')
+        self.assertEqual(first_action['_source']['election_day_text'], '1111-11-11')
+        # Both alias moves are in one update, then the old index is removed
+        self.assertEqual(fake_elastic_search.indices.update_aliases_body_list, [{'actions': [
+            {'remove': {'index': 'offices_20200101000000', 'alias': 'offices'}},
+            {'add': {'index': new_index_name, 'alias': 'offices'}},
+        ]}])
+        self.assertEqual(fake_elastic_search.indices.deleted_index_list, ['offices_20200101000000'])
+
+    def test_alias_stays_on_old_index_when_bulk_errors(self):
+        row_list = [{'id': 1, 'we_vote_id': 'wv01off1', 'office_name': 'Office 1',
+                     'google_civic_election_id': '1000', 'state_code': 'CA'}]
+        fake_elastic_search = FakeElasticSearch({'offices': ['offices_20200101000000']})
+        search_indexer = SearchIndexerWithRowList(
+            row_list, fake_elastic_search, bulk_sink=lambda action_list: (0, [{'index': {'status': 500}}]))
+
+        results = search_indexer.full_rebuild('offices')
+
+        self.assertFalse(results['success'])
+        self.assertEqual(fake_elastic_search.indices.update_aliases_body_list, [])
+        self.assertEqual(fake_elastic_search.indices.deleted_index_list,
+                         fake_elastic_search.indices.created_index_list)
+
+
+class SearchIndexerIncrementalTestCase(TestCase):
+    databases = '__all__'
+
+    def test_incremental_update_sends_changed_rows_once(self):
+        with mock.patch.object(search_models, 'SEARCH_INDEX_CHANGE_TRACKING_ON', True):
+            candidate = CandidateCampaign.objects.create(
+                candidate_name='Jane Doe', we_vote_id='wv01cand9991', google_civic_election_id='1000')
+            candidate.candidate_name = 'Jane Q. Doe'
+            candidate.save()
+            deleted_candidate = CandidateCampaign.objects.create(
+                candidate_name='John Doe', we_vote_id='wv01cand9992', google_civic_election_id='1000')
+            deleted_candidate_id = deleted_candidate.id
+            deleted_candidate.delete()
+        SearchIndexChange.objects.update(date_changed=now() - timedelta(minutes=1))
+        bulk_sink = FakeBulkSink()
+        search_indexer = SearchIndexer(FakeElasticSearch({}), bulk_sink=bulk_sink)
+
+        results = search_indexer.incremental_update('candidates')
+
+        self.assertTrue(results['success'])
+        self.assertEqual(results['indexed_count'], 1)
+        self.assertEqual(results['deleted_count'], 1)
+        action_list = [action for action_chunk in bulk_sink.chunk_list for action in action_chunk]
+        self.assertEqual([(action['_op_type'], action['_id']) for action in action_list],
+                         [('index', candidate.id), ('delete', deleted_candidate_id)])
+        self.assertEqual(action_list[0]['_source']['candidate_name'], 'Jane Q. Doe')
+
+        # Nothing has changed since, so the next pass sends nothing
+        bulk_sink.chunk_list = []
+        results = search_indexer.incremental_update('candidates')
+        self.assertEqual(results['indexed_count'], 0)
+        self.assertEqual(bulk_sink.chunk_list, [])
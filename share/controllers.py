@@ -15,6 +15,7 @@ import json
 from organization.models import OrganizationManager
 import robot_detection
 from share.models import SharedItem, SharedLinkClicked, SharedPermissionsGranted
+from share.shared_links import invalidate_shared_item_cache, record_shared_link_clicked, retrieve_cached_shared_item
 from voter.models import VoterDeviceLinkManager, VoterManager
 import wevote_functions.admin
 from wevote_functions.functions import positive_value_exists
@@ -30,6 +31,7 @@ def move_shared_items_to_another_voter(from_voter_we_vote_id, to_voter_we_vote_i
     success = True
     shared_item_entries_moved = 0
     shared_item_entries_not_moved = 0
+    shared_item_organization_entries_moved = 0
 
     if not positive_value_exists(from_voter_we_vote_id) or not positive_value_exists(to_voter_we_vote_id):
         status += "MOVE_SHARED_ITEMS-MISSING_EITHER_FROM_OR_TO_VOTER_WE_VOTE_ID "
@@ -87,7 +89,8 @@ def move_shared_items_to_another_voter(from_voter_we_vote_id, to_voter_we_vote_i
             status += "FAILED-SHARED_PERMISSIONS_GRANTED-SHARED_BY_VOTER_WE_VOTE_ID-INCLUDING_ORG: " + str(e) + " "
     else:
         try:
-            SharedItem.objects.filter(shared_by_voter_we_vote_id__iexact=from_voter_we_vote_id)\
+            shared_item_entries_moved += SharedItem.objects\
+                .filter(shared_by_voter_we_vote_id__iexact=from_voter_we_vote_id)\
                 .update(shared_by_voter_we_vote_id=to_voter_we_vote_id)
         except Exception as e:
             status += "FAILED-SHARED_ITEM-SHARED_BY_VOTER_WE_VOTE_ID: " + str(e) + " "
@@ -108,9 +111,11 @@ def move_shared_items_to_another_voter(from_voter_we_vote_id, to_voter_we_vote_i
 
     if positive_value_exists(from_organization_we_vote_id) and positive_value_exists(to_organization_we_vote_id):
         try:
-            SharedItem.objects.filter(site_owner_organization_we_vote_id__iexact=from_organization_we_vote_id) \
+            shared_item_organization_entries_moved += SharedItem.objects\
+                .filter(site_owner_organization_we_vote_id__iexact=from_organization_we_vote_id) \
                 .update(site_owner_organization_we_vote_id=to_organization_we_vote_id)
-            SharedItem.objects.filter(shared_by_organization_we_vote_id__iexact=from_organization_we_vote_id) \
+            shared_item_organization_entries_moved += SharedItem.objects\
+                .filter(shared_by_organization_we_vote_id__iexact=from_organization_we_vote_id) \
                 .update(shared_by_organization_we_vote_id=to_organization_we_vote_id)
         except Exception as e:
             status += "FAILED-SHARED_ITEM-SITE_OWNER_ORGANIZATION_WE_VOTE_ID: " + str(e) + " "
@@ -133,6 +138,11 @@ def move_shared_items_to_another_voter(from_voter_we_vote_id, to_voter_we_vote_i
     else:
         status += "MOVE_SHARED_ITEMS-MISSING_EITHER_FROM_OR_TO_ORGANIZATION_WE_VOTE_ID "
 
+    if positive_value_exists(shared_item_entries_moved) or \
+            positive_value_exists(shared_item_organization_entries_moved):
+        # Queryset updates don't send post_save, so the cached shared items are invalidated here
+        invalidate_shared_item_cache()
+
     results = {
         'status': status,
         'success': success,
@@ -189,10 +199,13 @@ def shared_item_retrieve_for_api(  # sharedItemRetrieve
         viewed_by_organization_we_vote_id = voter.linked_organization_we_vote_id
         is_signed_in = voter.is_signed_in()
 
-    results = share_manager.retrieve_shared_item(
-        destination_full_url=destination_full_url,
-        shared_by_voter_we_vote_id=viewed_by_voter_we_vote_id,
-        shared_item_code=shared_item_code)
+    if positive_value_exists(shared_item_code):
+        # Shared links are clicked many times, and the shared item behind a code rarely changes
+        results = retrieve_cached_shared_item(shared_item_code)
+    else:
+        results = share_manager.retrieve_shared_item(
+            destination_full_url=destination_full_url,
+            shared_by_voter_we_vote_id=viewed_by_voter_we_vote_id)
     status += results['status']
     if not results['shared_item_found']:
         status += "SHARED_ITEM_NOT_FOUND "
@@ -249,7 +262,7 @@ def shared_item_retrieve_for_api(  # sharedItemRetrieve
         #  (as opposed to public AND friends only opinion). shared_item_code_public_opinions is not implemented yet.
         include_public_positions = shared_item.shared_item_code_all_opinions == shared_item_code
         include_friends_only_positions = shared_item.shared_item_code_all_opinions == shared_item_code
-        clicked_results = share_manager.create_shared_link_clicked(
+        clicked_results = record_shared_link_clicked(
             destination_full_url=shared_item.destination_full_url,
             shared_item_code=shared_item_code,
             shared_item_id=shared_item_id,
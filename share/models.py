@@ -2,13 +2,28 @@
 # Brought to you by We Vote. Be good.
 # -*- coding: UTF-8 -*-
 
-from django.db import models
-from django.db.models import Q
+from django.db import IntegrityError, models, transaction
+from django.db.models import F, Q
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from django.utils.timezone import localtime, now
 from organization.models import ORGANIZATION_TYPE_CHOICES, UNKNOWN
 import sys
+import wevote_functions.admin
 from wevote_functions.functions import convert_to_int, generate_random_string, positive_value_exists
 
+logger = wevote_functions.admin.get_logger(__name__)
+
+SHARED_ITEM_CACHE_VERSION_NAME = 'shared_item_cache_version'
+# field_for_distinct_filter -> the SharedLinkClickedSummary count
+SHARED_LINK_CLICKED_SUMMARY_FIELD_DICT = {
+    '':                             'click_count',
+    'id':                           'click_count',
+    'shared_by_voter_we_vote_id':   'unique_sharer_count',
+    'viewed_by_voter_we_vote_id':   'unique_viewer_count',
+    'shared_item_id':               'shared_links_count',
+}
+
 
 class SharedItem(models.Model):
     """
@@ -110,7 +125,7 @@ class SharedLinkClicked(models.Model):
     viewed_by_organization_we_vote_id = models.CharField(max_length=255, null=True, blank=True, db_index=True)
     viewed_by_state_code = models.CharField(max_length=2, null=True, db_index=True)
     # Information about the share item clicked
-    shared_item_id = models.PositiveIntegerField(default=0, null=True, blank=True)
+    shared_item_id = models.PositiveIntegerField(default=0, null=True, blank=True, db_index=True)
     shared_item_code = models.CharField(max_length=50, null=True, blank=True, db_index=True)
     site_owner_organization_we_vote_id = models.CharField(max_length=255, null=True)
     include_public_positions = models.BooleanField(default=False)
@@ -120,6 +135,21 @@ class SharedLinkClicked(models.Model):
     year_as_integer = models.PositiveIntegerField(null=True, unique=False, db_index=True)
 
 
+class SharedLinkClickedSummary(models.Model):
+    """
+    The SharedLinkClicked counts for one year (0 for all years), so we don't count distinct values across every click
+    each time they are shown. The counts are added to as clicks are saved (see save_shared_link_clicked_list), and
+    rebuilt from SharedLinkClicked once a day, since moving clicks from one voter to another can change them.
+    """
+    year_as_integer = models.PositiveIntegerField(unique=True)
+    click_count = models.PositiveIntegerField(default=0)
+    unique_sharer_count = models.PositiveIntegerField(default=0)
+    unique_viewer_count = models.PositiveIntegerField(default=0)
+    shared_links_count = models.PositiveIntegerField(default=0)
+    click_without_reclick_count = models.PositiveIntegerField(default=0)
+    date_rebuilt = models.DateTimeField(null=True)
+
+
 class ShareManager(models.Manager):
 
     def __unicode__(self):
@@ -224,7 +254,8 @@ class ShareManager(models.Manager):
             include_public_positions = positive_value_exists(include_public_positions)
             include_friends_only_positions = positive_value_exists(include_friends_only_positions)
             year_as_integer = self.generate_year_as_integer()
-            shared_link_clicked = SharedLinkClicked.objects.create(
+            shared_link_clicked = SharedLinkClicked(
+                date_clicked=now(),
                 destination_full_url=destination_full_url,
                 include_public_positions=include_public_positions,
                 include_friends_only_positions=include_friends_only_positions,
@@ -238,6 +269,10 @@ class ShareManager(models.Manager):
                 viewed_by_organization_we_vote_id=viewed_by_organization_we_vote_id,
                 year_as_integer=year_as_integer,
             )
+            # Saved with the SharedLinkClickedSummary counts. Clicks from sharedItemRetrieve are buffered instead.
+            save_results = save_shared_link_clicked_list([shared_link_clicked])
+            if not save_results['success']:
+                raise Exception(save_results['status'])
             shared_link_clicked_saved = True
             success = True
             status += "SHARED_LINK_CLICKED_CREATED "
@@ -722,6 +757,14 @@ class ShareManager(models.Manager):
             viewed_by_state_code_list=[],
             year_as_integer_list=[],
             field_for_distinct_filter=''):
+        summary_count = self.fetch_shared_link_clicked_summary_count(
+            SHARED_LINK_CLICKED_SUMMARY_FIELD_DICT.get(field_for_distinct_filter),
+            shared_by_state_code_list=shared_by_state_code_list,
+            viewed_by_state_code_list=viewed_by_state_code_list,
+            year_as_integer_list=year_as_integer_list)
+        if summary_count is not None:
+            return summary_count
+
         if 'test' in sys.argv:
             # If coming from a test, we cannot use readonly
             queryset = SharedLinkClicked.objects.all()
@@ -747,6 +790,14 @@ class ShareManager(models.Manager):
 
     def fetch_shared_link_clicked_shared_links_click_without_reclick_count(
             self, shared_by_state_code_list=[], viewed_by_state_code_list=[], year_as_integer_list=[]):
+        summary_count = self.fetch_shared_link_clicked_summary_count(
+            'click_without_reclick_count',
+            shared_by_state_code_list=shared_by_state_code_list,
+            viewed_by_state_code_list=viewed_by_state_code_list,
+            year_as_integer_list=year_as_integer_list)
+        if summary_count is not None:
+            return summary_count
+
         if 'test' in sys.argv:
             # If coming from a test, we cannot use readonly
             queryset = SharedLinkClicked.objects.all()
@@ -770,6 +821,30 @@ class ShareManager(models.Manager):
 
         return shared_link_clicked_count
 
+    def fetch_shared_link_clicked_summary_count(
+            self, summary_field_name,
+            shared_by_state_code_list=[],
+            viewed_by_state_code_list=[],
+            year_as_integer_list=[]):
+        """
+        :return: the count from SharedLinkClickedSummary, or None if it has to be counted from the clicks
+        """
+        if not positive_value_exists(summary_field_name) or positive_value_exists(len(shared_by_state_code_list)) \
+                or positive_value_exists(len(viewed_by_state_code_list)) or len(year_as_integer_list) > 1:
+            # The summaries are only kept by year
+            return None
+        year_as_integer = convert_to_int(year_as_integer_list[0]) if len(year_as_integer_list) else 0
+        try:
+            if 'test' in sys.argv:
+                # If coming from a test, we cannot use readonly
+                queryset = SharedLinkClickedSummary.objects.all()
+            else:
+                queryset = SharedLinkClickedSummary.objects.using('readonly').all()
+            return queryset.filter(year_as_integer=year_as_integer) \
+                .values_list(summary_field_name, flat=True).first()
+        except Exception:
+            return None
+
     def generate_year_as_integer(self):
         # We want to store the day as an integer for extremely quick database indexing and lookup
         datetime_now = localtime(now()).date()  # We Vote uses Pacific Time for TIME_ZONE
@@ -1259,3 +1334,132 @@ class SuperShareEmailRecipient(models.Model):
     recipient_voter_we_vote_id = models.CharField(max_length=255, default=None, null=True, db_index=True)
     shared_by_voter_we_vote_id = models.CharField(max_length=255, default=None, null=True, db_index=True)
     super_share_item_id = models.PositiveIntegerField(default=0, null=True, blank=True)
+
+
+def shared_link_clicked_query(year_as_integer):
+    if positive_value_exists(year_as_integer):
+        return SharedLinkClicked.objects.filter(year_as_integer=year_as_integer)
+    return SharedLinkClicked.objects.all()
+
+
+def shared_link_clicked_counts(queryset):
+    """
+    Count everything again from the clicks
+    :param queryset:
+    :return:
+    """
+    return {
+        'click_count':                  queryset.count(),
+        'unique_sharer_count':          queryset.values('shared_by_voter_we_vote_id').distinct().count(),
+        'unique_viewer_count':          queryset.values('viewed_by_voter_we_vote_id').distinct().count(),
+        'shared_links_count':           queryset.values('shared_item_id').distinct().count(),
+        'click_without_reclick_count':
+            queryset.values('shared_item_id', 'viewed_by_voter_we_vote_id').distinct().count(),
+    }
+
+
+def value_filter(field_name, value_set):
+    # "__in" never matches NULL
+    value_filter_q = Q(**{field_name + '__in': [value for value in value_set if value is not None]})
+    if None in value_set:
+        value_filter_q |= Q(**{field_name + '__isnull': True})
+    return value_filter_q
+
+
+def new_value_count(queryset, field_name, value_set):
+    """
+    :return: how many of the values in value_set aren't in queryset yet
+    """
+    existing_value_set = set(queryset.filter(value_filter(field_name, value_set))
+                             .values_list(field_name, flat=True).distinct())
+    return len(value_set - existing_value_set)
+
+
+def shared_link_clicked_count_change_dict(year_as_integer, shared_link_clicked_list):
+    """
+    :param year_as_integer: 0 for all years
+    :param shared_link_clicked_list: clicks not saved yet
+    :return: how much each of the year's summary counts goes up when the clicks are saved
+    """
+    click_list = [shared_link_clicked for shared_link_clicked in shared_link_clicked_list
+                  if not year_as_integer or shared_link_clicked.year_as_integer == year_as_integer]
+    queryset = shared_link_clicked_query(year_as_integer)
+    pair_set = set((shared_link_clicked.shared_item_id, shared_link_clicked.viewed_by_voter_we_vote_id)
+                   for shared_link_clicked in click_list)
+    existing_pair_set = set(
+        queryset.filter(value_filter('shared_item_id', set(pair[0] for pair in pair_set)))
+        .filter(value_filter('viewed_by_voter_we_vote_id', set(pair[1] for pair in pair_set)))
+        .values_list('shared_item_id', 'viewed_by_voter_we_vote_id').distinct())
+    return {
+        'click_count':                  len(click_list),
+        'unique_sharer_count':          new_value_count(queryset, 'shared_by_voter_we_vote_id', set(
+            shared_link_clicked.shared_by_voter_we_vote_id for shared_link_clicked in click_list)),
+        'unique_viewer_count':          new_value_count(queryset, 'viewed_by_voter_we_vote_id', set(
+            shared_link_clicked.viewed_by_voter_we_vote_id for shared_link_clicked in click_list)),
+        'shared_links_count':           new_value_count(queryset, 'shared_item_id', set(
+            shared_link_clicked.shared_item_id for shared_link_clicked in click_list)),
+        'click_without_reclick_count':  len(pair_set - existing_pair_set),
+    }
+
+
+def fetch_shared_link_clicked_summary_id(year_as_integer):
+    """
+    :param year_as_integer:
+    :return: the id of the summary for the year, which is counted from the clicks when it is first needed
+    """
+    shared_link_clicked_summary_id = SharedLinkClickedSummary.objects.filter(year_as_integer=year_as_integer) \
+        .values_list('id', flat=True).first()
+    if shared_link_clicked_summary_id is None:
+        try:
+            with transaction.atomic():
+                shared_link_clicked_summary_id = SharedLinkClickedSummary.objects.create(
+                    year_as_integer=year_as_integer, date_rebuilt=now(),
+                    **shared_link_clicked_counts(shared_link_clicked_query(year_as_integer))).id
+        except IntegrityError:
+            # Another worker made it first
+            shared_link_clicked_summary_id = SharedLinkClickedSummary.objects.get(year_as_integer=year_as_integer).id
+    return shared_link_clicked_summary_id
+
+
+def save_shared_link_clicked_list(shared_link_clicked_list):
+    """
+    Save clicks with bulk_create, and add them to the summaries for their year and for all years. The lookups for
+    what is new are made before the transaction, which only holds the summary rows for the insert and two updates.
+    Two workers saving clicks by the same new viewer at the same moment can both count the viewer, until
+    rebuild_shared_link_clicked_summaries counts the summary again.
+    :param shared_link_clicked_list:
+    :return:
+    """
+    status = ""
+    year_as_integer_list = sorted(set(shared_link_clicked.year_as_integer or 0
+                                      for shared_link_clicked in shared_link_clicked_list) | {0})
+    try:
+        count_change_list = [(fetch_shared_link_clicked_summary_id(year_as_integer),
+                              shared_link_clicked_count_change_dict(year_as_integer, shared_link_clicked_list))
+                             for year_as_integer in year_as_integer_list]
+        with transaction.atomic():
+            SharedLinkClicked.objects.bulk_create(shared_link_clicked_list)
+            # Always updated in the same order
+            for shared_link_clicked_summary_id, count_change_dict in count_change_list:
+                SharedLinkClickedSummary.objects.filter(id=shared_link_clicked_summary_id).update(
+                    **{field_name: F(field_name) + count_change
+                       for field_name, count_change in count_change_dict.items()})
+        status += "SHARED_LINK_CLICKED_SAVED: " + str(len(shared_link_clicked_list)) + " "
+        success = True
+    except Exception as e:
+        status += "SHARED_LINK_CLICKED_NOT_SAVED: " + str(e) + " "
+        logger.error(status)
+        success = False
+    return {
+        'success':  success,
+        'status':   status,
+    }
+
+
+@receiver(post_save, sender=SharedItem)
+@receiver(post_delete, sender=SharedItem)
+def shared_item_changed_signal(sender, instance, created=False, **kwargs):
+    # A new shared item can't be in anyone's cache yet
+    if not created:
+        from share.shared_links import invalidate_shared_item_cache
+        invalidate_shared_item_cache()
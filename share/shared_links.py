@@ -0,0 +1,209 @@
+# share/shared_links.py
+# Brought to you by We Vote. Be good.
+# -*- coding: UTF-8 -*-
+
+"""
+Shared links are clicked far more often than they are created or changed, so each worker keeps the SharedItems it has
+looked up by shared_item_code, and checks the shared_item_cache_version (moved forward whenever a SharedItem is changed)
+at most every SHARED_ITEM_CACHE_VERSION_CHECK_SECONDS.
+Clicks are added to a buffer and saved together with bulk_create on the web server's background thread. As they are
+saved, the SharedLinkClickedSummary counts for their year (and for all years) are added to (see
+save_shared_link_clicked_list in share/models.py), so the fetch_shared_link_clicked_* counts don't need a
+COUNT DISTINCT over every click.
+"""
+
+from collections import OrderedDict
+from datetime import timedelta
+import threading
+import time
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils.timezone import now
+
+from share.models import SHARED_ITEM_CACHE_VERSION_NAME, save_shared_link_clicked_list, shared_link_clicked_counts, \
+    shared_link_clicked_query, SharedLinkClicked, SharedLinkClickedSummary, ShareManager
+import wevote_functions.admin
+from wevote_functions.background_task import BackgroundTask
+from wevote_functions.functions import positive_value_exists
+from wevote_settings.models import fetch_cache_version, increment_cache_version
+
+logger = wevote_functions.admin.get_logger(__name__)
+
+# Also a backstop for SharedItem changes made with a queryset update, which doesn't move the cache version
+SHARED_ITEM_CACHE_MAX_AGE_SECONDS = 900
+SHARED_ITEM_CACHE_MAX_ENTRIES = 10000
+SHARED_ITEM_CACHE_VERSION_CHECK_SECONDS = 10
+# If the database can't be reached, we keep this many clicks to try again
+SHARED_LINK_CLICKED_BUFFER_MAX_ENTRIES = 10000
+SHARED_LINK_CLICKED_SUMMARY_REBUILD_SECONDS = 24 * 60 * 60
+shared_item_cache = OrderedDict()
+shared_item_cache_version_list = []  # [cache_version, time checked], once it has been checked
+shared_item_cache_lock = threading.Lock()
+shared_link_clicked_buffer = []
+shared_link_clicked_buffer_lock = threading.Lock()
+
+
+def current_shared_item_cache_version():
+    with shared_item_cache_lock:
+        if len(shared_item_cache_version_list) and \
+                time.monotonic() - shared_item_cache_version_list[1] < SHARED_ITEM_CACHE_VERSION_CHECK_SECONDS:
+            return shared_item_cache_version_list[0]
+    cache_version = fetch_cache_version(SHARED_ITEM_CACHE_VERSION_NAME)
+    with shared_item_cache_lock:
+        shared_item_cache_version_list[:] = [cache_version, time.monotonic()]
+    return cache_version
+
+
+def retrieve_cached_shared_item(shared_item_code):
+    """
+    Same results as ShareManager().retrieve_shared_item(shared_item_code=shared_item_code), from this worker's cache
+    when we can. The shared_item returned is shared with other requests, so don't change it.
+    :param shared_item_code:
+    :return:
+    """
+    cache_version = current_shared_item_cache_version()
+    with shared_item_cache_lock:
+        cache_entry = shared_item_cache.get(shared_item_code)
+        if cache_entry is not None:
+            if cache_entry['cache_version'] == cache_version and \
+                    time.monotonic() - cache_entry['date_cached'] < SHARED_ITEM_CACHE_MAX_AGE_SECONDS:
+                shared_item_cache.move_to_end(shared_item_code)
+                return {
+                    'success':              True,
+                    'status':               "RETRIEVE_SHARED_ITEM_FOUND_IN_CACHE ",
+                    'shared_item_found':    True,
+                    'shared_item_id':       cache_entry['shared_item'].id,
+                    'shared_item':          cache_entry['shared_item'],
+                }
+            shared_item_cache.pop(shared_item_code, None)
+
+    results = ShareManager().retrieve_shared_item(shared_item_code=shared_item_code)
+    if results['shared_item_found']:
+        with shared_item_cache_lock:
+            shared_item_cache[shared_item_code] = {
+                'shared_item':      results['shared_item'],
+                'cache_version':    cache_version,
+                'date_cached':      time.monotonic(),
+            }
+            while len(shared_item_cache) > SHARED_ITEM_CACHE_MAX_ENTRIES:
+                shared_item_cache.popitem(last=False)
+    return results
+
+
+def invalidate_shared_item_cache():
+    """
+    Tell every worker that the shared items it cached may be out of date, ex/ after a queryset update
+    :return:
+    """
+    increment_cache_version(SHARED_ITEM_CACHE_VERSION_NAME)
+    clear_shared_item_cache()
+
+
+def clear_shared_item_cache():
+    with shared_item_cache_lock:
+        shared_item_cache.clear()
+        del shared_item_cache_version_list[:]
+
+
+def record_shared_link_clicked(
+        destination_full_url='',
+        shared_item_code='',
+        shared_item_id=0,
+        shared_by_voter_we_vote_id='',
+        shared_by_organization_type='',
+        shared_by_organization_we_vote_id='',
+        site_owner_organization_we_vote_id='',
+        viewed_by_voter_we_vote_id='',
+        viewed_by_organization_we_vote_id='',
+        include_public_positions=False,
+        include_friends_only_positions=False):
+    """
+    Add the click to this worker's buffer, which is saved on the background thread
+    :return:
+    """
+    shared_link_clicked = SharedLinkClicked(
+        destination_full_url=destination_full_url,
+        include_public_positions=positive_value_exists(include_public_positions),
+        include_friends_only_positions=positive_value_exists(include_friends_only_positions),
+        shared_item_code=shared_item_code,
+        shared_item_id=shared_item_id,
+        shared_by_voter_we_vote_id=shared_by_voter_we_vote_id,
+        shared_by_organization_type=shared_by_organization_type,
+        shared_by_organization_we_vote_id=shared_by_organization_we_vote_id,
+        site_owner_organization_we_vote_id=site_owner_organization_we_vote_id,
+        viewed_by_voter_we_vote_id=viewed_by_voter_we_vote_id,
+        viewed_by_organization_we_vote_id=viewed_by_organization_we_vote_id,
+        # auto_now_add is only applied by save(), and we save with bulk_create
+        date_clicked=now(),
+        year_as_integer=ShareManager().generate_year_as_integer(),
+    )
+    with shared_link_clicked_buffer_lock:
+        shared_link_clicked_buffer.append(shared_link_clicked)
+    save_shared_link_clicked_buffer_soon()
+    return {
+        'success':  True,
+        'status':   "SHARED_LINK_CLICKED_BUFFERED ",
+    }
+
+
+def save_shared_link_clicked_buffer():
+    with shared_link_clicked_buffer_lock:
+        shared_link_clicked_list = shared_link_clicked_buffer[:]
+        del shared_link_clicked_buffer[:]
+    if not len(shared_link_clicked_list):
+        return {
+            'success':  True,
+            'status':   "",
+        }
+    results = save_shared_link_clicked_list(shared_link_clicked_list)
+    if not results['success']:
+        # Try them again with the next click
+        with shared_link_clicked_buffer_lock:
+            shared_link_clicked_buffer[:0] = shared_link_clicked_list
+            dropped_count = len(shared_link_clicked_buffer) - SHARED_LINK_CLICKED_BUFFER_MAX_ENTRIES
+            if dropped_count > 0:
+                del shared_link_clicked_buffer[:dropped_count]
+                logger.error("save_shared_link_clicked_buffer dropped clicks: " + str(dropped_count))
+    return results
+
+
+shared_link_clicked_task = BackgroundTask('shared_link_clicked', save_shared_link_clicked_buffer)
+
+
+def save_shared_link_clicked_buffer_soon():
+    shared_link_clicked_task.run_soon()
+
+
+def rebuild_shared_link_clicked_summaries(max_age_seconds=SHARED_LINK_CLICKED_SUMMARY_REBUILD_SECONDS):
+    """
+    Count the summaries not rebuilt in max_age_seconds again from the clicks. Run by process_next_general_maintenance.
+    :param max_age_seconds:
+    :return:
+    """
+    status = ""
+    success = True
+    rebuilt_before = now() - timedelta(seconds=max_age_seconds)
+    year_as_integer_list = list(SharedLinkClickedSummary.objects.filter(
+        Q(date_rebuilt__isnull=True) | Q(date_rebuilt__lt=rebuilt_before))
+        .values_list('year_as_integer', flat=True))
+    for year_as_integer in year_as_integer_list:
+        try:
+            with transaction.atomic():
+                # Clicks saved meanwhile wait for the lock, and are added to the rebuilt counts
+                shared_link_clicked_summary = SharedLinkClickedSummary.objects.select_for_update() \
+                    .get(year_as_integer=year_as_integer)
+                for field_name, count in \
+                        shared_link_clicked_counts(shared_link_clicked_query(year_as_integer)).items():
+                    setattr(shared_link_clicked_summary, field_name, count)
+                shared_link_clicked_summary.date_rebuilt = now()
+                shared_link_clicked_summary.save()
+            status += "SHARED_LINK_CLICKED_SUMMARY_REBUILT-" + str(year_as_integer) + " "
+        except Exception as e:
+            status += "SHARED_LINK_CLICKED_SUMMARY_NOT_REBUILT: " + str(e) + " "
+            logger.error(status)
+            success = False
+    return {
+        'success':  success,
+        'status':   status,
+    }
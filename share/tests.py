@@ -0,0 +1,54 @@
+# share/tests.py
+# Brought to you by We Vote. Be good.
+# -*- coding: UTF-8 -*-
+
+from unittest.mock import patch
+
+from django.test import TestCase
+
+from share.models import ShareManager, SharedItem
+from share.shared_links import clear_shared_item_cache, record_shared_link_clicked, retrieve_cached_shared_item, \
+    save_shared_link_clicked_buffer
+
+
+class SharedLinkTestCase(TestCase):
+    databases = ["default", "readonly"]
+
+    def setUp(self):
+        clear_shared_item_cache()
+
+    @patch('share.shared_links.shared_link_clicked_task.run_soon')
+    def test_summary_counts_match_the_clicks(self, run_soon):
+        share_manager = ShareManager()
+        record_shared_link_clicked(shared_item_id=1, shared_by_voter_we_vote_id='wv01voter1',
+                                   viewed_by_voter_we_vote_id='wv01voter2')
+        self.assertTrue(save_shared_link_clicked_buffer()['success'])
+        # The summary exists now, and the next clicks are added to it
+        record_shared_link_clicked(shared_item_id=1, shared_by_voter_we_vote_id='wv01voter1',
+                                   viewed_by_voter_we_vote_id='wv01voter2')
+        record_shared_link_clicked(shared_item_id=2, shared_by_voter_we_vote_id='wv01voter1',
+                                   viewed_by_voter_we_vote_id='wv01voter3')
+        self.assertTrue(save_shared_link_clicked_buffer()['success'])
+
+        self.assertEqual(share_manager.fetch_shared_link_clicked_shared_links_click_count(), 3)
+        self.assertEqual(share_manager.fetch_shared_link_clicked_shared_links_click_without_reclick_count(), 2)
+        self.assertEqual(share_manager.fetch_shared_link_clicked_unique_sharer_count(), 1)
+        self.assertEqual(share_manager.fetch_shared_link_clicked_unique_viewer_count(), 2)
+        self.assertEqual(share_manager.fetch_shared_link_clicked_shared_links_count(
+            year_as_integer_list=[share_manager.generate_year_as_integer()]), 2)
+        # Filtered by state, it is counted from the clicks
+        self.assertEqual(share_manager.fetch_shared_link_clicked_shared_links_click_count(
+            viewed_by_state_code_list=['CA']), 0)
+
+    def test_cached_shared_item_is_dropped_when_it_changes(self):
+        shared_item = SharedItem.objects.create(shared_item_code_no_opinions='abc123',
+                                                destination_full_url='https://wevote.us/ballot')
+        self.assertEqual(retrieve_cached_shared_item('abc123')['shared_item'].destination_full_url,
+                         'https://wevote.us/ballot')
+        with self.assertNumQueries(0):
+            self.assertTrue(retrieve_cached_shared_item('abc123')['shared_item_found'])
+
+        shared_item.destination_full_url = 'https://wevote.us/ready'
+        shared_item.save()
+        self.assertEqual(retrieve_cached_shared_item('abc123')['shared_item'].destination_full_url,
+                         'https://wevote.us/ready')
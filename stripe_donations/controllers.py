@@ -592,9 +592,9 @@ def donation_lists_for_a_voter(voter_we_vote_id):
 
 def donation_process_stripe_webhook_event(event):  # donationStripeWebhook
     """
-    NOTE: These are the only six events that we handle from the webhook
+    NOTE: These are the only seven events that we handle from the webhook
     :param event:
-    :return:
+    :return: False if the event should be processed again, True once it has been handled or ignored
     """
     etype = event.type
     api_version = event.api_version
@@ -612,12 +612,12 @@ def donation_process_stripe_webhook_event(event):  # donationStripeWebhook
         return donation_process_subscription_payment(event)
     elif etype == 'charge.refunded':
         return donation_process_refund_payment(event)
-    elif event['type'] == 'charge.dispute.created' or 'charge.dispute.funds_withdrawn':
+    elif etype in ('charge.dispute.created', 'charge.dispute.funds_withdrawn'):
         return donation_process_dispute(event)
 
     print("WEBHOOK ignored: donation_process_stripe_webhook_event: " + event['type'])
     logger.info("WEBHOOK ignored: donation_process_stripe_webhook_event: " + event['type'])
-    return
+    return True
 
 
 def write_event_to_local_file(event):
@@ -630,9 +630,9 @@ def write_event_to_local_file(event):
 def donation_process_charge(event):           # 'charge.succeeded' webhook
     """
     :param event:
-    :return:
+    :return: success
     """
-
+    success = True
     try:
         # print('first line in stripe_donation donation_process_charge')
         # is_one_time_donation = True if 'one_time_donation' in metadata else False
@@ -724,19 +724,21 @@ def donation_process_charge(event):           # 'charge.succeeded' webhook
         body = e.json_body
         error_from_json = body['error']
         logger.error("donation_process_charge, Stripe: " + error_from_json)
+        success = False
 
     except Exception as err:
         logger.error("donation_process_charge, general: " + str(err))
+        success = False
 
-    return
+    return success
 
 
 def donation_update_subscription_with_charge_info(event):
     """
      :param event:
-     :return:
+     :return: success
      """
-
+    success = True
     try:
         # print('first line in stripe_donation donation_update_subscription_with_charge_info')
         charge = event['data']['object']
@@ -777,15 +779,16 @@ def donation_update_subscription_with_charge_info(event):
 
     except Exception as err:
         logger.error("donation_update_subscription_with_charge_info, error: " + str(err))
+        success = False
 
-    return
+    return success
 
 
 def donation_process_subscription_deleted(event):
     """
 
     :param event:
-    :return:
+    :return: success
     """
     donation_manager = StripeManager()
     data = event['data']
@@ -797,9 +800,10 @@ def donation_process_subscription_deleted(event):
 
     # At this time we are only supporting the UI for canceling subscriptions
     if subscription_canceled_at is not None or subscription_ended_at is not None:
-        donation_manager.mark_donation_journal_canceled_or_ended(
+        results = donation_manager.mark_donation_journal_canceled_or_ended(
             stripe_subscription_id, customer_id, subscription_ended_at, subscription_canceled_at)
-    return None
+        return results['success']
+    return True
 
 
 # Handle this event (in the same way for now) if it comes in from Stripe
@@ -807,7 +811,7 @@ def donation_process_subscription_updated(event):
     """
 
     :param event:
-    :return:
+    :return: success
     """
     return donation_process_subscription_deleted(event)
 
@@ -913,6 +917,7 @@ def move_donation_info_to_another_voter(from_voter, to_voter):
 
 # see https://stripe.com/docs/subscriptions/lifecycle
 def donation_process_subscription_payment(event):    # invoice.payment_succeeded
+    success = True
     try:
         dataobject = event['data']['object']
         if 'pending_webhooks' in dataobject:
@@ -999,19 +1004,21 @@ def donation_process_subscription_payment(event):    # invoice.payment_succeeded
         StripeManager.stripe_payment_create_or_update(stripe_payment)
     except Exception as err:
         logger.error("donation_process_subscription_payment: " + str(err))
+        success = False
 
-    return None
+    return success
 
 
 def donation_process_refund_payment(event):
     # The Stripe webhook has sent a refund event "charge.refunded"
-    success = False
+    success = True
     logger.debug("donation_process_refund_payment: " + json.dumps(event))
     dataobject = event['data']['object']
     charge = dataobject['id']
     paid = dataobject['paid']  # boolean
     if paid:
-        success = StripeManager.update_journal_entry_for_refund_completed(charge)
+        # Returns "True" or "False"
+        success = StripeManager.update_journal_entry_for_refund_completed(charge) == "True"
 
     return success
 
@@ -1219,6 +1226,7 @@ def local_datetime_string_from_utc_timestamp(utc_timestamp):
 
 
 def donation_process_dispute(event):           # 'charge.dispute.created' and 'charge.dispute.funds_withdrawn' webhooks
+    success = True
     try:
         dispute = {}
         dispute['created'] = local_datetime_string_from_utc_timestamp(event['created'])
@@ -1263,8 +1271,10 @@ def donation_process_dispute(event):           # 'charge.dispute.created' and 'c
         body = e.json_body
         error_from_json = body['error']
         logger.error("donation_process_dispute, Stripe: " + error_from_json)
+        success = False
 
     except Exception as err:
         logger.error("donation_process_dispute, general: " + str(err))
+        success = False
 
-    return
+    return success
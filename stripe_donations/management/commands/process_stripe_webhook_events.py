@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from django.utils.timezone import now
+
+from stripe_donations.models import StripeWebhookEvent
+from stripe_donations.webhook_events import process_stripe_webhook_events
+
+
+class Command(BaseCommand):
+    help = 'Processes the saved Stripe webhook events that are due. With --replay EVENT_ID, processes that event ' \
+           'again, ex/ after fixing what made it fail.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--replay', action='append', default=None)
+
+    def handle(self, *args, **options):
+        if options['replay']:
+            replay_count = StripeWebhookEvent.objects.filter(stripe_event_id__in=options['replay']).update(
+                date_processed=None, processing_failed=False, attempt_count=0, date_checked_out=None,
+                date_to_process=now())
+            self.stdout.write('Events to replay: ' + str(replay_count))
+        results = process_stripe_webhook_events()
+        self.stdout.write(results['status'] or 'No Stripe webhook events are due')
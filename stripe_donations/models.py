@@ -2135,3 +2135,26 @@ class StripeDispute(models.Model):
             logger.error('%s', "save_dispute_transaction: " + str(err))
 
         return
+
+
+class StripeWebhookEvent(models.Model):
+    """
+    Each event Stripe sends to donationStripeWebhook, saved before we acknowledge it, and processed from here by
+    stripe_donations/webhook_events.py. An event Stripe sends again has the same stripe_event_id, so it is only
+    processed once.
+    """
+    stripe_event_id = models.CharField(verbose_name="Stripe event id", max_length=255, unique=True)
+    event_type = models.CharField(verbose_name="Stripe event type", max_length=64, null=True, blank=True)
+    stripe_created = models.DateTimeField(verbose_name="when Stripe created the event", null=True)
+    payload = models.TextField(verbose_name="the event as Stripe sent it", null=True, blank=True)
+    date_received = models.DateTimeField(verbose_name="when we received the event", null=True, auto_now_add=True)
+    date_to_process = models.DateTimeField(verbose_name="when to try processing the event next", null=True,
+                                           db_index=True)
+    date_checked_out = models.DateTimeField(verbose_name="when processing started", null=True)
+    date_processed = models.DateTimeField(verbose_name="when the event was processed", null=True, db_index=True)
+    # The invoice, subscription or charge this event is parked waiting for, ex/ "subscription:sub_1234"
+    waiting_for = models.CharField(verbose_name="record the event is waiting for", max_length=255, null=True,
+                                   blank=True, db_index=True)
+    attempt_count = models.PositiveIntegerField(verbose_name="times processing failed", default=0)
+    processing_failed = models.BooleanField(verbose_name="gave up processing the event", default=False)
+    status = models.TextField(verbose_name="our generated status message", null=True, blank=True)
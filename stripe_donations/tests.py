@@ -1,3 +1,58 @@
+from unittest.mock import patch
+
 from django.test import TestCase
 
-# Create your tests here.
+from stripe_donations.models import StripeSubscription, StripeWebhookEvent
+from stripe_donations.webhook_events import process_stripe_webhook_events, save_stripe_webhook_event
+
+CHARGE_EVENT = {
+    'id': 'evt_charge', 'type': 'charge.succeeded', 'created': 1650000000,
+    'data': {'object': {'id': 'ch_1', 'description': 'Subscription creation'}},
+}
+INVOICE_EVENT = {
+    'id': 'evt_invoice', 'type': 'invoice.payment_succeeded', 'created': 1650000001,
+    'data': {'object': {'id': 'in_1', 'charge': 'ch_1', 'subscription': 'sub_1'}},
+}
+
+
+class StripeWebhookEventTestCase(TestCase):
+    databases = '__all__'
+
+    @patch('stripe_donations.webhook_events.donation_process_stripe_webhook_event')
+    def test_charge_waits_for_its_invoice_and_replays_are_ignored(self, donation_process_stripe_webhook_event):
+        def process_event(event):
+            if event['type'] == 'invoice.payment_succeeded':
+                StripeSubscription.objects.create(we_plan_id='wv01voter1-monthly-500', stripe_subscription_id='sub_1',
+                                                  stripe_charge_id='ch_1')
+            return True
+        donation_process_stripe_webhook_event.side_effect = process_event
+
+        self.assertTrue(save_stripe_webhook_event(CHARGE_EVENT)['event_is_new'])
+        results = process_stripe_webhook_events()
+        self.assertEqual(results['parked_count'], 1)
+        self.assertEqual(StripeWebhookEvent.objects.get(stripe_event_id='evt_charge').waiting_for, 'charge:ch_1')
+
+        self.assertTrue(save_stripe_webhook_event(INVOICE_EVENT)['event_is_new'])
+        # Stripe sends an event again when it doesn't hear back in time
+        self.assertFalse(save_stripe_webhook_event(INVOICE_EVENT)['event_is_new'])
+        results = process_stripe_webhook_events()
+
+        self.assertEqual(results['processed_count'], 2)
+        self.assertEqual([call[0][0]['type'] for call in donation_process_stripe_webhook_event.call_args_list],
+                         ['invoice.payment_succeeded', 'charge.succeeded'])
+        self.assertEqual(StripeWebhookEvent.objects.filter(date_processed__isnull=True).count(), 0)
+
+    @patch('stripe_donations.webhook_events.donation_process_stripe_webhook_event', return_value=False)
+    def test_failed_event_is_retried_and_does_not_wake_parked_events(self, donation_process_stripe_webhook_event):
+        save_stripe_webhook_event(CHARGE_EVENT)
+        process_stripe_webhook_events()
+        save_stripe_webhook_event(INVOICE_EVENT)
+
+        results = process_stripe_webhook_events()
+
+        self.assertEqual(results['failed_count'], 1)
+        invoice_event = StripeWebhookEvent.objects.get(stripe_event_id='evt_invoice')
+        self.assertEqual(invoice_event.attempt_count, 1)
+        self.assertIsNone(invoice_event.date_processed)
+        self.assertEqual(StripeWebhookEvent.objects.get(stripe_event_id='evt_charge').status,
+                         "PARKED_WAITING_FOR charge:ch_1")
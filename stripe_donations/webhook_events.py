@@ -0,0 +1,219 @@
+# stripe_donations/webhook_events.py
+# Brought to you by We Vote. Be good.
+# -*- coding: UTF-8 -*-
+
+"""
+donationStripeWebhook saves each event and acknowledges it right away. The events are processed here, in the order
+Stripe created them, on the web server's background thread, by process_next_general_maintenance, or by
+"python manage.py process_stripe_webhook_events".
+Stripe doesn't promise the order it sends events in, so an event that needs a record another event creates
+(ex/ the subscription for a "Subscription creation" charge) is parked until that event has been processed.
+"""
+
+from datetime import datetime, timedelta, timezone
+import json
+
+from django.db import IntegrityError, transaction
+from django.utils.timezone import now
+import stripe
+
+from config.base import get_environment_variable
+from stripe_donations.controllers import donation_process_stripe_webhook_event
+from stripe_donations.models import StripePayments, StripeSubscription, StripeWebhookEvent
+import wevote_functions.admin
+from wevote_functions.background_task import BackgroundTask
+
+logger = wevote_functions.admin.get_logger(__name__)
+
+STRIPE_WEBHOOK_EVENT_BATCH_SIZE = 100
+# process_next_general_maintenance leaves the rest of a backlog for its next run
+STRIPE_WEBHOOK_EVENT_MAINTENANCE_MAX_BATCHES = 5
+STRIPE_WEBHOOK_EVENT_CHECKED_OUT_EXPIRATION_SECONDS = 300
+STRIPE_WEBHOOK_EVENT_MAX_ATTEMPTS = 5
+STRIPE_WEBHOOK_EVENT_RETRY_BASE_SECONDS = 60
+# A parked event is checked again this often, in case what it waits for was created some other way...
+STRIPE_WEBHOOK_EVENT_PARKED_RECHECK_SECONDS = 60
+# ...and after this long we stop waiting and process it anyway, as we did before events were parked
+STRIPE_WEBHOOK_EVENT_PARKED_MAX_SECONDS = 3600
+
+
+def stripe_webhook_event_waits_for(event_dict):
+    """
+    :param event_dict:
+    :return: (waiting_for key, True if that record exists), or (None, True)
+    """
+    event_type = event_dict.get('type')
+    data_object = event_dict.get('data', {}).get('object', {})
+    if event_type == 'charge.succeeded' and data_object.get('description') == "Subscription creation":
+        # invoice.payment_succeeded puts the charge on the subscription
+        charge_id = data_object.get('id')
+        return 'charge:' + str(charge_id), StripeSubscription.objects.filter(stripe_charge_id=charge_id).exists()
+    if event_type in ('customer.subscription.deleted', 'customer.subscription.updated'):
+        stripe_subscription_id = data_object.get('id')
+        return 'subscription:' + str(stripe_subscription_id), \
+            StripeSubscription.objects.filter(stripe_subscription_id=stripe_subscription_id).exists()
+    if event_type == 'charge.refunded':
+        charge_id = data_object.get('id')
+        return 'payment:' + str(charge_id), StripePayments.objects.filter(stripe_charge_id=charge_id).exists()
+    return None, True
+
+
+def stripe_webhook_event_provides(event_dict):
+    """
+    :param event_dict:
+    :return: the waiting_for keys of the events that can go ahead once this event has been processed
+    """
+    event_type = event_dict.get('type')
+    data_object = event_dict.get('data', {}).get('object', {})
+    if event_type == 'invoice.payment_succeeded':
+        return ['charge:' + str(data_object.get('charge')), 'payment:' + str(data_object.get('charge')),
+                'subscription:' + str(data_object.get('subscription'))]
+    if event_type == 'charge.succeeded':
+        return ['payment:' + str(data_object.get('id'))]
+    return []
+
+
+def save_stripe_webhook_event(event_dict):
+    """
+    Save an event as Stripe sent it, once, however many times it is sent
+    :param event_dict:
+    :return:
+    """
+    stripe_event_id = event_dict.get('id')
+    if not stripe_event_id:
+        return {
+            'success':          False,
+            'status':           "STRIPE_WEBHOOK_EVENT_MISSING_ID ",
+            'event_is_new':     False,
+        }
+    created = event_dict.get('created')
+    try:
+        with transaction.atomic():
+            stripe_webhook_event, event_is_new = StripeWebhookEvent.objects.get_or_create(
+                stripe_event_id=stripe_event_id,
+                defaults={
+                    'event_type':       event_dict.get('type'),
+                    'stripe_created':   datetime.fromtimestamp(created, timezone.utc) if created else None,
+                    'payload':          json.dumps(event_dict),
+                    'date_to_process':  now(),
+                })
+    except IntegrityError:
+        # The same event, sent again while we were saving it the first time
+        event_is_new = False
+    except Exception as e:
+        status = "STRIPE_WEBHOOK_EVENT_NOT_SAVED: " + str(e) + " "
+        logger.error(status)
+        return {
+            'success':          False,
+            'status':           status,
+            'event_is_new':     False,
+        }
+    return {
+        'success':          True,
+        'status':           "STRIPE_WEBHOOK_EVENT_SAVED " if event_is_new else "STRIPE_WEBHOOK_EVENT_ALREADY_RECEIVED ",
+        'event_is_new':     event_is_new,
+    }
+
+
+def claim_stripe_webhook_events(batch_size=STRIPE_WEBHOOK_EVENT_BATCH_SIZE):
+    checked_out_expired_time = now() - timedelta(seconds=STRIPE_WEBHOOK_EVENT_CHECKED_OUT_EXPIRATION_SECONDS)
+    with transaction.atomic():
+        stripe_webhook_event_list = list(
+            StripeWebhookEvent.objects.select_for_update(skip_locked=True)
+            .filter(date_processed__isnull=True, processing_failed=False, date_to_process__lte=now())
+            .exclude(date_checked_out__gt=checked_out_expired_time)
+            .order_by('stripe_created', 'id')[:batch_size])
+        for stripe_webhook_event in stripe_webhook_event_list:
+            stripe_webhook_event.date_checked_out = now()
+        StripeWebhookEvent.objects.bulk_update(stripe_webhook_event_list, ['date_checked_out'])
+    return stripe_webhook_event_list
+
+
+def process_one_stripe_webhook_event(stripe_webhook_event):
+    """
+    :param stripe_webhook_event:
+    :return: 'processed', 'parked' or 'failed'
+    """
+    event_dict = json.loads(stripe_webhook_event.payload)
+    stripe_webhook_event.date_checked_out = None
+    waiting_for, waiting_for_found = stripe_webhook_event_waits_for(event_dict)
+    parked_seconds = (now() - stripe_webhook_event.date_received).total_seconds()
+    if not waiting_for_found and parked_seconds < STRIPE_WEBHOOK_EVENT_PARKED_MAX_SECONDS:
+        stripe_webhook_event.waiting_for = waiting_for
+        stripe_webhook_event.date_to_process = now() + timedelta(seconds=STRIPE_WEBHOOK_EVENT_PARKED_RECHECK_SECONDS)
+        stripe_webhook_event.status = "PARKED_WAITING_FOR " + waiting_for
+        stripe_webhook_event.save()
+        return 'parked'
+
+    try:
+        event = stripe.Event.construct_from(event_dict, stripe.api_key)
+        success = donation_process_stripe_webhook_event(event)
+        error_message = "" if success else "handler did not succeed, see the error log"
+    except Exception as e:
+        success = False
+        error_message = str(e)
+    if not success:
+        stripe_webhook_event.attempt_count += 1
+        stripe_webhook_event.status = "PROCESSING_FAILED: " + error_message
+        if stripe_webhook_event.attempt_count >= STRIPE_WEBHOOK_EVENT_MAX_ATTEMPTS:
+            stripe_webhook_event.processing_failed = True
+        else:
+            stripe_webhook_event.date_to_process = now() + timedelta(
+                seconds=STRIPE_WEBHOOK_EVENT_RETRY_BASE_SECONDS * (2 ** (stripe_webhook_event.attempt_count - 1)))
+        stripe_webhook_event.save()
+        logger.error("process_one_stripe_webhook_event " + stripe_webhook_event.stripe_event_id + ": " + error_message)
+        return 'failed'
+
+    stripe_webhook_event.date_processed = now()
+    stripe_webhook_event.waiting_for = None
+    stripe_webhook_event.status = "PROCESSED" if waiting_for_found else "PROCESSED_AFTER_WAITING_FOR " + waiting_for
+    stripe_webhook_event.save()
+    provides_list = stripe_webhook_event_provides(event_dict)
+    if len(provides_list):
+        # Wake the events parked waiting for this one
+        StripeWebhookEvent.objects.filter(
+            waiting_for__in=provides_list, date_processed__isnull=True, processing_failed=False) \
+            .update(date_to_process=now())
+    return 'processed'
+
+
+def process_stripe_webhook_events(max_batches=None):
+    """
+    Process the events that are due, oldest first, until there are none
+    :param max_batches:
+    :return:
+    """
+    status = ""
+    success = True
+    count_dict = {'processed': 0, 'parked': 0, 'failed': 0}
+    batch_count = 0
+    stripe.api_key = get_environment_variable("STRIPE_SECRET_KEY", no_exception=True)
+    try:
+        while max_batches is None or batch_count < max_batches:
+            stripe_webhook_event_list = claim_stripe_webhook_events()
+            if not len(stripe_webhook_event_list):
+                break
+            batch_count += 1
+            for stripe_webhook_event in stripe_webhook_event_list:
+                count_dict[process_one_stripe_webhook_event(stripe_webhook_event)] += 1
+    except Exception as e:
+        status += "PROCESS_STRIPE_WEBHOOK_EVENTS_FAILED: " + str(e) + " "
+        logger.error(status)
+        success = False
+    if any(count_dict.values()):
+        status += "STRIPE_WEBHOOK_EVENTS processed: {processed}, parked: {parked}, failed: {failed} " \
+                  "".format(**count_dict)
+    return {
+        'success':          success,
+        'status':           status,
+        'processed_count':  count_dict['processed'],
+        'parked_count':     count_dict['parked'],
+        'failed_count':     count_dict['failed'],
+    }
+
+
+stripe_webhook_event_task = BackgroundTask('stripe_webhook_events', process_stripe_webhook_events)
+
+
+def process_stripe_webhook_events_soon():
+    stripe_webhook_event_task.run_soon()
@@ -2,12 +2,15 @@
 # Brought to you by We Vote. Be good.
 # -*- coding: UTF-8 -*-
 
+import time
+
 import tweepy
 
 import wevote_functions.admin
 from config.base import get_environment_variable
 from exception.models import handle_exception
 from wevote_functions.functions import positive_value_exists
+from wevote_settings.models import SharedRateLimiter
 
 logger = wevote_functions.admin.get_logger(__name__)
 
@@ -29,6 +32,12 @@ TWITTER_USER_SUSPENDED_LOG_RESPONSES = [
     "User has been suspended."
 ]
 
+# GET users/lookup takes up to 100 screen names per request, and allows 900 requests per 15 minutes per user token.
+#  We keep a third of that for ourselves, shared by every process, and leave the rest for sign in and other lookups.
+TWITTER_USERS_LOOKUP_BATCH_SIZE = 100
+twitter_users_lookup_rate_limiter = SharedRateLimiter(
+    setting_name='rate_limit_twitter_users_lookup', request_limit=300, period_seconds=15 * 60)
+
 
 def retrieve_twitter_user_info(twitter_user_id, twitter_handle=''):
     status = ""
@@ -142,3 +151,85 @@ def retrieve_twitter_user_info(twitter_user_id, twitter_handle=''):
         'twitter_user_suspended_by_twitter':    twitter_user_suspended_by_twitter,
     }
     return results
+
+
+def retrieve_twitter_user_info_list(twitter_handle_list, api=None, rate_limiter=None, max_wait_seconds=60):
+    """
+    Look up many Twitter accounts, up to 100 per request, drawing each request from the shared rate limiter.
+    Handles Twitter doesn't return have been renamed, deleted or suspended.
+    :param twitter_handle_list:
+    :param api: A tweepy.API, or an object with the same lookup_users method
+    :param rate_limiter: Defaults to twitter_users_lookup_rate_limiter
+    :param max_wait_seconds: How long to wait for the rate limiter before giving up on the remaining handles
+    :return: twitter_json_by_handle is keyed by lower case handle
+    """
+    status = ""
+    success = True
+    twitter_json_by_handle = {}
+    twitter_handles_not_found = []
+    twitter_handles_not_retrieved = []
+
+    if api is None:
+        auth = tweepy.OAuthHandler(TWITTER_CONSUMER_KEY, TWITTER_CONSUMER_SECRET)
+        auth.set_access_token(TWITTER_ACCESS_TOKEN, TWITTER_ACCESS_TOKEN_SECRET)
+        api = tweepy.API(auth, timeout=10)
+    if rate_limiter is None:
+        rate_limiter = twitter_users_lookup_rate_limiter
+
+    unique_handle_list = []
+    for twitter_handle in twitter_handle_list:
+        if not positive_value_exists(twitter_handle) or str(twitter_handle).lower() in ('false', 'none'):
+            continue
+        twitter_handle_lower = str(twitter_handle).lower()
+        if twitter_handle_lower not in unique_handle_list:
+            unique_handle_list.append(twitter_handle_lower)
+
+    lookup_count = 0
+    for start_index in range(0, len(unique_handle_list), TWITTER_USERS_LOOKUP_BATCH_SIZE):
+        handle_batch = unique_handle_list[start_index:start_index + TWITTER_USERS_LOOKUP_BATCH_SIZE]
+        if not rate_limiter.acquire(max_wait_seconds=max_wait_seconds):
+            status += "TWITTER_USERS_LOOKUP_RATE_LIMITED "
+            twitter_handles_not_retrieved += unique_handle_list[start_index:]
+            break
+        try:
+            lookup_count += 1
+            twitter_user_list = api.lookup_users(screen_name=handle_batch)
+        except tweepy.TooManyRequests as rate_limit_error:
+            success = False
+            status += 'TWITTER_RATE_LIMIT_ERROR: ' + str(rate_limit_error) + " "
+            try:
+                reset_seconds = int(rate_limit_error.response.headers['x-rate-limit-reset']) - time.time()
+            except Exception:
+                reset_seconds = 15 * 60
+            rate_limiter.empty_until(max(reset_seconds, 0))
+            twitter_handles_not_retrieved += unique_handle_list[start_index:]
+            break
+        except tweepy.NotFound:
+            # Twitter answers with a 404 when none of the handles in the request exist
+            twitter_user_list = []
+        except tweepy.errors.TweepyException as error_instance:
+            success = False
+            status += "TWITTER_USERS_LOOKUP_ERROR: " + str(error_instance) + " "
+            handle_exception(error_instance, logger=logger, exception_message=status)
+            twitter_handles_not_retrieved += handle_batch
+            continue
+
+        for twitter_user in twitter_user_list:
+            twitter_json = twitter_user._json
+            if positive_value_exists(twitter_json.get('profile_banner_url')):
+                # Dec 2019, https://developer.twitter.com/en/docs/accounts-and-users/user-profile-images-and-banners
+                twitter_json['profile_banner_url'] = twitter_json.get('profile_banner_url') + '/1500x500'
+            twitter_json_by_handle[str(twitter_json.get('screen_name', '')).lower()] = twitter_json
+        for twitter_handle_lower in handle_batch:
+            if twitter_handle_lower not in twitter_json_by_handle:
+                twitter_handles_not_found.append(twitter_handle_lower)
+
+    status += "TWITTER_USERS_LOOKUP_REQUESTS: " + str(lookup_count) + " "
+    results = {
+        'status':                           status,
+        'success':                          success,
+        'twitter_json_by_handle':           twitter_json_by_handle,
+        'twitter_handles_not_found':        twitter_handles_not_found,
+        'twitter_handles_not_retrieved':    twitter_handles_not_retrieved,
+    }
+    return results
@@ -13,7 +13,7 @@ from activity.controllers import delete_activity_comments_for_voter, delete_acti
     delete_activity_posts_for_voter, \
     move_activity_comments_to_another_voter, move_activity_notices_to_another_voter, \
     move_activity_posts_to_another_voter
-from analytics.controllers import delete_analytics_info_for_voter, move_analytics_info_to_another_voter
+from analytics.controllers import delete_analytics_info_for_voter
 from analytics.models import AnalyticsManager, ACTION_FACEBOOK_AUTHENTICATION_EXISTS, \
     ACTION_GOOGLE_AUTHENTICATION_EXISTS, \
     ACTION_TWITTER_AUTHENTICATION_EXISTS, ACTION_EMAIL_AUTHENTICATION_EXISTS
@@ -33,7 +33,7 @@ from follow.controllers import \
     delete_follow_issue_entries_for_voter, delete_follow_entries_for_voter, \
     duplicate_follow_entries_to_another_voter, \
     duplicate_follow_issue_entries_to_another_voter, \
-    move_follow_issue_entries_to_another_voter, move_follow_entries_to_another_voter, \
+    move_follow_entries_to_another_voter, \
     duplicate_organization_followers_to_another_organization
 from friend.controllers import delete_friend_invitations_for_voter, delete_friends_for_voter, \
     delete_suggested_friends_for_voter, \
@@ -52,8 +52,7 @@ from organization.controllers import delete_membership_link_entries_for_voter, d
     move_membership_link_entries_to_another_voter, move_organization_team_member_entries_to_another_voter, \
     move_organization_to_another_complete, transfer_voter_images_to_organization, transform_web_app_url
 from organization.models import OrganizationListManager, OrganizationManager, INDIVIDUAL
-from position.controllers import delete_positions_for_voter, duplicate_positions_to_another_voter, \
-    move_positions_to_another_voter
+from position.controllers import delete_positions_for_voter, duplicate_positions_to_another_voter
 from position.models import PositionListManager
 from io import BytesIO, StringIO
 from PIL import Image, ImageOps
@@ -64,6 +63,7 @@ from sms.controllers import delete_sms_phone_number_entries_for_voter, move_sms_
 from twitter.models import TwitterLinkToOrganization, TwitterLinkToVoter, TwitterUserManager
 from validate_email import validate_email
 from voter.controllers_contacts import delete_all_voter_contact_emails_for_voter
+from voter.controllers_merge import merge_voter_tables_set_based
 from voter_guide.controllers import delete_voter_guides_for_voter, duplicate_voter_guides, \
     move_voter_guides_to_another_voter
 import wevote_functions.admin
@@ -167,7 +167,7 @@ def delete_all_voter_information_permanently(voter_to_delete=None):  # voterDele
                 voter_to_delete_linked_organization_we_vote_id = None
                 voter_to_delete.linked_organization_we_vote_id = None
                 voter_to_delete.save()
-                # All positions should have already been moved with move_positions_to_another_voter
+                # All positions should have already been moved with merge_voter_tables_set_based
             except Exception as e:
                 status += "FAILED_TO_REMOVE_LINKED_ORGANIZATION_WE_VOTE_ID-VOTER_TO_DELETE " + str(e) + " "
 
@@ -208,7 +208,7 @@ def delete_all_voter_information_permanently(voter_to_delete=None):  # voterDele
         try:
             voter_to_delete.linked_organization_we_vote_id = None
             voter_to_delete.save()
-            # All positions should have already been moved with move_positions_to_another_voter
+            # All positions should have already been moved with merge_voter_tables_set_based
         except Exception as e:
             status += "CANNOT_DELETE_LINKED_ORGANIZATION_WE_VOTE_ID: " + str(e) + " "
 
@@ -2245,8 +2245,23 @@ def voter_merge_two_accounts_action(  # voterMergeTwoAccounts, part 2
         status='',
         email_owner_voter_found=False,
         facebook_owner_voter_found=False,
-        invitation_owner_voter_found=False):
-
+        invitation_owner_voter_found=False,
+        dry_run=False):
+    """
+    Move everything the from_voter owns to the new_owner_voter. Positions, issue follows and analytics are moved
+    all-or-nothing by merge_voter_tables_set_based, and if that fails the merge stops before anything else is moved.
+    The remaining move_* steps run one after another outside a shared transaction: they skip rows that cannot be
+    saved (ex/ the to_voter already has that entry) and carry on, which would abort a surrounding transaction.
+    :param from_voter:
+    :param new_owner_voter:
+    :param voter_device_link:
+    :param status:
+    :param email_owner_voter_found:
+    :param facebook_owner_voter_found:
+    :param invitation_owner_voter_found:
+    :param dry_run: Write nothing, and return in merge_row_counts how many rows merge_voter_tables_set_based would touch
+    :return:
+    """
     success = True
     current_voter_found = False
     from_voter_id = 0
@@ -2312,13 +2327,13 @@ def voter_merge_two_accounts_action(  # voterMergeTwoAccounts, part 2
             from_voter_linked_organization_id = from_linked_organization.id
         else:
             # Remove the link to the organization so we don't have a future conflict
-            try:
-                from_voter_linked_organization_we_vote_id = None
-                from_voter.linked_organization_we_vote_id = None
-                from_voter.save()
-                # All positions should have already been moved with move_positions_to_another_voter
-            except Exception as e:
-                status += "FAILED_TO_REMOVE_LINKED_ORGANIZATION_WE_VOTE_ID-FROM_VOTER " + str(e) + " "
+            from_voter_linked_organization_we_vote_id = None
+            if not dry_run:
+                try:
+                    from_voter.linked_organization_we_vote_id = None
+                    from_voter.save()
+                except Exception as e:
+                    status += "FAILED_TO_REMOVE_LINKED_ORGANIZATION_WE_VOTE_ID-FROM_VOTER " + str(e) + " "
 
     to_voter_linked_organization_we_vote_id = new_owner_voter.linked_organization_we_vote_id
     to_voter_linked_organization_id = 0
@@ -2330,13 +2345,13 @@ def voter_merge_two_accounts_action(  # voterMergeTwoAccounts, part 2
             to_voter_linked_organization_id = to_linked_organization.id
         else:
             # Remove the link to the organization so we don't have a future conflict
-            try:
-                to_voter_linked_organization_we_vote_id = None
-                new_owner_voter.linked_organization_we_vote_id = None
-                new_owner_voter.save()
-                # All positions should have already been moved with move_positions_to_another_voter
-            except Exception as e:
-                status += "FAILED_TO_REMOVE_LINKED_ORGANIZATION_WE_VOTE_ID-TO_VOTER " + str(e) + " "
+            to_voter_linked_organization_we_vote_id = None
+            if not dry_run:
+                try:
+                    new_owner_voter.linked_organization_we_vote_id = None
+                    new_owner_voter.save()
+                except Exception as e:
+                    status += "FAILED_TO_REMOVE_LINKED_ORGANIZATION_WE_VOTE_ID-TO_VOTER " + str(e) + " "
 
     # If the to_voter does not have a linked_organization_we_vote_id, then we should move the from_voter's
     #  organization_we_vote_id
@@ -2345,28 +2360,48 @@ def voter_merge_two_accounts_action(  # voterMergeTwoAccounts, part 2
         to_voter_linked_organization_we_vote_id = from_voter_linked_organization_we_vote_id
         to_voter_linked_organization_id = from_voter_linked_organization_id
 
+    # Data healing scripts before we try to move the positions
+    position_list_manager = PositionListManager()
+    if not dry_run:
+        if positive_value_exists(from_voter_id):
+            repair_results = position_list_manager.repair_all_positions_for_voter(from_voter_id)
+            status += repair_results['status']
+        if positive_value_exists(to_voter_id):
+            repair_results = position_list_manager.repair_all_positions_for_voter(to_voter_id)
+            status += repair_results['status']
+
+    # Transfer positions, followed issues and analytics from voter to new_owner_voter with set-based statements
+    merge_voter_tables_results = merge_voter_tables_set_based(
+        from_voter_id=from_voter_id,
+        from_voter_we_vote_id=from_voter_we_vote_id,
+        to_voter_id=to_voter_id,
+        to_voter_we_vote_id=to_voter_we_vote_id,
+        to_voter_linked_organization_id=to_voter_linked_organization_id,
+        to_voter_linked_organization_we_vote_id=to_voter_linked_organization_we_vote_id,
+        dry_run=dry_run)
+    status += " " + merge_voter_tables_results['status']
+    if dry_run or not merge_voter_tables_results['success']:
+        if not merge_voter_tables_results['success']:
+            status += "MERGE_TWO_ACCOUNTS_STOPPED "
+        results = {
+            'status':                       status,
+            'success':                      merge_voter_tables_results['success'],
+            'voter_device_id':              voter_device_id,
+            'current_voter_found':          current_voter_found,
+            'email_owner_voter_found':      email_owner_voter_found,
+            'facebook_owner_voter_found':   facebook_owner_voter_found,
+            'invitation_owner_voter_found': invitation_owner_voter_found,
+            'dry_run':                      dry_run,
+            'merge_row_counts':             merge_voter_tables_results['row_counts'],
+        }
+        return results
+
     # Transfer the apple_user entries to the new_owner_voter
     from apple.controllers import move_apple_user_entries_to_another_voter
     move_apple_user_results = move_apple_user_entries_to_another_voter(
         from_voter_we_vote_id, to_voter_we_vote_id)
     status += move_apple_user_results['status']
 
-    # Data healing scripts before we try to move the positions
-    position_list_manager = PositionListManager()
-    if positive_value_exists(from_voter_id):
-        repair_results = position_list_manager.repair_all_positions_for_voter(from_voter_id)
-        status += repair_results['status']
-    if positive_value_exists(to_voter_id):
-        repair_results = position_list_manager.repair_all_positions_for_voter(to_voter_id)
-        status += repair_results['status']
-
-    # Transfer positions from voter to new_owner_voter
-    move_positions_results = move_positions_to_another_voter(
-        from_voter_id, from_voter_we_vote_id,
-        to_voter_id, to_voter_we_vote_id,
-        to_voter_linked_organization_id, to_voter_linked_organization_we_vote_id)
-    status += " " + move_positions_results['status']
-
     is_organization = False
     organization_full_name = ''
     if positive_value_exists(from_voter_linked_organization_we_vote_id) and \
@@ -2405,7 +2440,7 @@ def voter_merge_two_accounts_action(  # voterMergeTwoAccounts, part 2
         try:
             from_voter.linked_organization_we_vote_id = None
             from_voter.save()
-            # All positions should have already been moved with move_positions_to_another_voter
+            # All positions should have already been moved with merge_voter_tables_set_based
         except Exception as e:
             status += "CANNOT_DELETE_LINKED_ORGANIZATION_WE_VOTE_ID: " + str(e) + " "
 
@@ -2424,10 +2459,6 @@ def voter_merge_two_accounts_action(  # voterMergeTwoAccounts, part 2
         from_voter_linked_organization_we_vote_id, to_voter_linked_organization_we_vote_id)
     status += move_organization_team_member_results['status']
 
-    # Transfer the issues that the voter is following
-    move_follow_issue_results = move_follow_issue_entries_to_another_voter(from_voter_we_vote_id, to_voter_we_vote_id)
-    status += move_follow_issue_results['status']
-
     # Make sure we bring over all emails from the from_voter over to the to_voter
     move_email_addresses_results = move_email_address_entries_to_another_voter(
         from_voter_we_vote_id, to_voter_we_vote_id, from_voter=from_voter, to_voter=new_owner_voter)
@@ -2506,10 +2537,6 @@ def voter_merge_two_accounts_action(  # voterMergeTwoAccounts, part 2
         to_organization_name=organization_full_name)
     status += " " + move_campaignx_results['status']
 
-    # Bring over Analytics information
-    move_analytics_results = move_analytics_info_to_another_voter(from_voter_we_vote_id, to_voter_we_vote_id)
-    status += " " + move_analytics_results['status']
-
     # Bring over the voter-table data
     merge_voter_accounts_results = merge_voter_accounts(from_voter, new_owner_voter)
     new_owner_voter = merge_voter_accounts_results['to_voter']
@@ -2565,6 +2592,8 @@ def voter_merge_two_accounts_action(  # voterMergeTwoAccounts, part 2
         'email_owner_voter_found':      email_owner_voter_found,
         'facebook_owner_voter_found':   facebook_owner_voter_found,
         'invitation_owner_voter_found': invitation_owner_voter_found,
+        'dry_run':                      dry_run,
+        'merge_row_counts':             merge_voter_tables_results['row_counts'],
     }
 
     return results
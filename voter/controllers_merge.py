@@ -0,0 +1,287 @@
+# voter/controllers_merge.py
+# Brought to you by We Vote. Be good.
+# -*- coding: UTF-8 -*-
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q, Subquery
+from analytics.models import AnalyticsAction
+from follow.models import FollowIssue, FOLLOWING
+from organization.models import OrganizationManager
+from position.models import PositionEntered, PositionForFriends
+import wevote_functions.admin
+from wevote_functions.functions import positive_value_exists
+
+logger = wevote_functions.admin.get_logger(__name__)
+
+POSITION_MODEL_LIST = [PositionEntered, PositionForFriends]
+
+
+def position_ballot_item_match_list():
+    """
+    A position belongs to exactly one ballot item. A candidate position is matched on candidate, a measure position
+    on measure, and a position on the office itself (no candidate or measure) on office.
+    :return: list of (we_vote_id field name, filter that selects the positions matched on that field)
+    """
+    no_candidate = Q(candidate_campaign_we_vote_id__isnull=True) | Q(candidate_campaign_we_vote_id='')
+    no_measure = Q(contest_measure_we_vote_id__isnull=True) | Q(contest_measure_we_vote_id='')
+    no_office = Q(contest_office_we_vote_id__isnull=True) | Q(contest_office_we_vote_id='')
+    return [
+        ('candidate_campaign_we_vote_id', ~no_candidate),
+        ('contest_measure_we_vote_id', no_candidate & ~no_measure),
+        ('contest_office_we_vote_id', no_candidate & no_measure & ~no_office),
+    ]
+
+
+def position_voter_filter(voter_id, voter_we_vote_id):
+    # Match retrieve_all_positions_for_voter, which gives priority to voter_id
+    if positive_value_exists(voter_id):
+        return Q(voter_id=voter_id)
+    return Q(voter_we_vote_id__iexact=voter_we_vote_id)
+
+
+def merge_positions_set_based(
+        from_voter_id, from_voter_we_vote_id,
+        to_voter_id, to_voter_we_vote_id,
+        to_voter_linked_organization_id, to_voter_linked_organization_we_vote_id,
+        to_organization_name='', to_organization_type=None, to_twitter_followers_count=None,
+        dry_run=False):
+    """
+    Move the from_voter's PositionEntered and PositionForFriends rows to the to_voter. When both voters have a position
+    on the same ballot item, the to_voter's position wins, but inherits the from_voter's statement if it has none of
+    its own. Every other from_voter position is re-pointed at the to_voter. Each step is one UPDATE or DELETE per table.
+    :return: dict of row counts
+    """
+    from_voter_filter = position_voter_filter(from_voter_id, from_voter_we_vote_id)
+    to_voter_filter = position_voter_filter(to_voter_id, to_voter_we_vote_id)
+    row_counts = {
+        'position_statements_copied':   0,
+        'position_conflicts_updated':   0,
+        'position_conflicts_deleted':   0,
+        'position_entries_moved':       0,
+    }
+
+    organization_values = {
+        'organization_id':          to_voter_linked_organization_id,
+        'organization_we_vote_id':  to_voter_linked_organization_we_vote_id,
+    }
+    if positive_value_exists(to_organization_name):
+        organization_values['speaker_display_name'] = to_organization_name
+    if positive_value_exists(to_organization_type):
+        organization_values['speaker_type'] = to_organization_type
+    if positive_value_exists(to_twitter_followers_count):
+        organization_values['twitter_followers_count'] = to_twitter_followers_count
+
+    for ballot_item_field, ballot_item_filter in position_ballot_item_match_list():
+        # 1) Copy statements onto the to_voter's positions that don't have one
+        for to_model in POSITION_MODEL_LIST:
+            for from_model in POSITION_MODEL_LIST:
+                for statement_field in ('statement_text', 'statement_html'):
+                    from_statement_query = from_model.objects \
+                        .filter(from_voter_filter, ballot_item_filter) \
+                        .filter(**{ballot_item_field: OuterRef(ballot_item_field)}) \
+                        .exclude(**{statement_field + '__isnull': True}) \
+                        .exclude(**{statement_field: ''})
+                    to_id_query = to_model.objects \
+                        .filter(to_voter_filter, ballot_item_filter) \
+                        .filter(Q(**{statement_field + '__isnull': True}) | Q(**{statement_field: ''})) \
+                        .annotate(from_statement_exists=Exists(from_statement_query)) \
+                        .filter(from_statement_exists=True) \
+                        .values('id')
+                    to_query = to_model.objects.filter(id__in=Subquery(to_id_query))
+                    if dry_run:
+                        row_counts['position_statements_copied'] += to_query.count()
+                    else:
+                        row_counts['position_statements_copied'] += to_query.update(
+                            **{statement_field: Subquery(from_statement_query.values(statement_field)[:1])})
+
+        # 2) The to_voter's positions that collide with a from_voter position take on the new organization values
+        for to_model in POSITION_MODEL_LIST:
+            annotate_dict = {}
+            for from_model in POSITION_MODEL_LIST:
+                annotate_dict['from_' + from_model._meta.model_name + '_exists'] = Exists(
+                    from_model.objects.filter(
+                        from_voter_filter, ballot_item_filter, **{ballot_item_field: OuterRef(ballot_item_field)}))
+            conflict_filter = Q()
+            for annotate_name in annotate_dict:
+                conflict_filter |= Q(**{annotate_name: True})
+            to_id_query = to_model.objects.filter(to_voter_filter, ballot_item_filter) \
+                .annotate(**annotate_dict).filter(conflict_filter).values('id')
+            to_query = to_model.objects.filter(id__in=Subquery(to_id_query))
+            if dry_run:
+                row_counts['position_conflicts_updated'] += to_query.count()
+            else:
+                row_counts['position_conflicts_updated'] += to_query.update(**organization_values)
+
+        # 3) Delete the from_voter's positions that collide with one of the to_voter's positions
+        for from_model in POSITION_MODEL_LIST:
+            annotate_dict = {}
+            for to_model in POSITION_MODEL_LIST:
+                annotate_dict['to_' + to_model._meta.model_name + '_exists'] = Exists(
+                    to_model.objects.filter(
+                        to_voter_filter, ballot_item_filter, **{ballot_item_field: OuterRef(ballot_item_field)}))
+            conflict_filter = Q()
+            for annotate_name in annotate_dict:
+                conflict_filter |= Q(**{annotate_name: True})
+            from_id_query = from_model.objects.filter(from_voter_filter, ballot_item_filter) \
+                .annotate(**annotate_dict).filter(conflict_filter).values('id')
+            from_query = from_model.objects.filter(id__in=Subquery(from_id_query))
+            if dry_run:
+                row_counts['position_conflicts_deleted'] += from_query.count()
+            else:
+                row_counts['position_conflicts_deleted'] += from_query.delete()[0]
+
+    # 4) Everything the from_voter has left moves over in one UPDATE per table
+    for from_model in POSITION_MODEL_LIST:
+        from_query = from_model.objects.filter(from_voter_filter)
+        if dry_run:
+            row_counts['position_entries_moved'] += from_query.count()
+        else:
+            row_counts['position_entries_moved'] += from_query.update(
+                voter_id=to_voter_id,
+                voter_we_vote_id=to_voter_we_vote_id,
+                **organization_values)
+    if dry_run:
+        # Nothing was deleted, so the colliding positions are still counted in the move
+        row_counts['position_entries_moved'] -= row_counts['position_conflicts_deleted']
+    return row_counts
+
+
+def merge_follow_issues_set_based(from_voter_we_vote_id, to_voter_we_vote_id, dry_run=False):
+    """
+    Move the from_voter's FollowIssue entries to the to_voter. A to_voter entry that is not FOLLOWING takes the
+    from_voter's status, colliding from_voter entries are deleted, and the rest are re-pointed at the to_voter.
+    :return: dict of row counts
+    """
+    row_counts = {
+        'follow_issue_entries_updated':     0,
+        'follow_issue_entries_deleted':     0,
+        'follow_issue_entries_moved':       0,
+    }
+    from_status_query = FollowIssue.objects.filter(
+        voter_we_vote_id__iexact=from_voter_we_vote_id, issue_we_vote_id=OuterRef('issue_we_vote_id'))
+    to_query = FollowIssue.objects.filter(voter_we_vote_id__iexact=to_voter_we_vote_id) \
+        .exclude(following_status=FOLLOWING) \
+        .annotate(from_entry_exists=Exists(from_status_query)) \
+        .filter(from_entry_exists=True)
+    to_query = FollowIssue.objects.filter(id__in=Subquery(to_query.values('id')))
+
+    to_entry_query = FollowIssue.objects.filter(
+        voter_we_vote_id__iexact=to_voter_we_vote_id, issue_we_vote_id=OuterRef('issue_we_vote_id'))
+    conflict_id_query = FollowIssue.objects.filter(voter_we_vote_id__iexact=from_voter_we_vote_id) \
+        .annotate(to_entry_exists=Exists(to_entry_query)) \
+        .filter(to_entry_exists=True) \
+        .values('id')
+    conflict_query = FollowIssue.objects.filter(id__in=Subquery(conflict_id_query))
+
+    if dry_run:
+        row_counts['follow_issue_entries_updated'] = to_query.count()
+        row_counts['follow_issue_entries_deleted'] = conflict_query.count()
+        row_counts['follow_issue_entries_moved'] = \
+            FollowIssue.objects.filter(voter_we_vote_id__iexact=from_voter_we_vote_id).count() - \
+            row_counts['follow_issue_entries_deleted']
+        return row_counts
+
+    row_counts['follow_issue_entries_updated'] = to_query.update(
+        following_status=Subquery(from_status_query.values('following_status')[:1]))
+    row_counts['follow_issue_entries_deleted'] = conflict_query.delete()[0]
+    row_counts['follow_issue_entries_moved'] = FollowIssue.objects \
+        .filter(voter_we_vote_id__iexact=from_voter_we_vote_id) \
+        .update(voter_we_vote_id=to_voter_we_vote_id)
+    return row_counts
+
+
+def merge_analytics_set_based(from_voter_we_vote_id, to_voter_we_vote_id, dry_run=False):
+    analytics_query = AnalyticsAction.objects.using('analytics').filter(voter_we_vote_id__iexact=from_voter_we_vote_id)
+    if dry_run:
+        return {'analytics_action_moved': analytics_query.count()}
+    return {'analytics_action_moved': analytics_query.update(voter_we_vote_id=to_voter_we_vote_id)}
+
+
+def merge_voter_tables_set_based(
+        from_voter_id=0,
+        from_voter_we_vote_id='',
+        to_voter_id=0,
+        to_voter_we_vote_id='',
+        to_voter_linked_organization_id=0,
+        to_voter_linked_organization_we_vote_id='',
+        dry_run=False):
+    """
+    Move the from_voter's positions, issue follows and analytics to the to_voter with set-based UPDATE/DELETE
+    statements. Only these tables are changed together: the positions and issue follows in one transaction, and
+    AnalyticsAction, which lives in the analytics database, in a second one. voter_merge_two_accounts_action stops if
+    this fails, and otherwise moves the rest of its tables one step at a time, outside these transactions.
+    With dry_run=True nothing is written, and row_counts reports how many rows each step would touch.
+    """
+    status = ""
+    success = True
+    row_counts = {}
+
+    if not positive_value_exists(from_voter_we_vote_id) or not positive_value_exists(to_voter_we_vote_id):
+        status += "MERGE_VOTER_TABLES-MISSING_FROM_OR_TO_VOTER_WE_VOTE_ID "
+        results = {
+            'status':       status,
+            'success':      False,
+            'dry_run':      dry_run,
+            'row_counts':   row_counts,
+        }
+        return results
+
+    if from_voter_we_vote_id == to_voter_we_vote_id or \
+            (positive_value_exists(from_voter_id) and from_voter_id == to_voter_id):
+        status += "MERGE_VOTER_TABLES-FROM_AND_TO_VOTER_IDENTICAL "
+        results = {
+            'status':       status,
+            'success':      False,
+            'dry_run':      dry_run,
+            'row_counts':   row_counts,
+        }
+        return results
+
+    to_organization_name = ""
+    to_organization_type = None
+    to_twitter_followers_count = None
+    if positive_value_exists(to_voter_linked_organization_we_vote_id):
+        organization_manager = OrganizationManager()
+        results = organization_manager.retrieve_organization_from_we_vote_id(to_voter_linked_organization_we_vote_id)
+        if results['organization_found']:
+            to_voter_organization = results['organization']
+            to_organization_name = to_voter_organization.organization_name
+            to_organization_type = to_voter_organization.organization_type
+            to_twitter_followers_count = to_voter_organization.twitter_followers_count
+
+    try:
+        with transaction.atomic():
+            row_counts.update(merge_positions_set_based(
+                from_voter_id, from_voter_we_vote_id,
+                to_voter_id, to_voter_we_vote_id,
+                to_voter_linked_organization_id, to_voter_linked_organization_we_vote_id,
+                to_organization_name=to_organization_name,
+                to_organization_type=to_organization_type,
+                to_twitter_followers_count=to_twitter_followers_count,
+                dry_run=dry_run))
+            row_counts.update(merge_follow_issues_set_based(
+                from_voter_we_vote_id, to_voter_we_vote_id, dry_run=dry_run))
+    except Exception as e:
+        success = False
+        status += "MERGE_VOTER_TABLES-DEFAULT_DATABASE_ROLLED_BACK: " + str(e) + " "
+        logger.error("merge_voter_tables_set_based rolled back: " + str(e))
+
+    if success:
+        try:
+            with transaction.atomic(using='analytics'):
+                row_counts.update(merge_analytics_set_based(
+                    from_voter_we_vote_id, to_voter_we_vote_id, dry_run=dry_run))
+        except Exception as e:
+            success = False
+            status += "MERGE_VOTER_TABLES-ANALYTICS_DATABASE_ROLLED_BACK: " + str(e) + " "
+
+    status += "MERGE_VOTER_TABLES_DRY_RUN " if dry_run else "MERGE_VOTER_TABLES "
+    for count_name in sorted(row_counts):
+        status += count_name + ": " + str(row_counts[count_name]) + " "
+
+    results = {
+        'status':       status,
+        'success':      success,
+        'dry_run':      dry_run,
+        'row_counts':   row_counts,
+    }
+    return results
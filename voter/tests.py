@@ -0,0 +1,80 @@
+# voter/tests.py
+# Brought to you by We Vote. Be good.
+# -*- coding: UTF-8 -*-
+
+from django.test import TestCase
+
+from analytics.models import AnalyticsAction
+from follow.models import FollowIssue, FOLLOWING, STOP_FOLLOWING
+from position.models import PositionEntered, PositionForFriends, SUPPORT
+from voter.controllers import voter_merge_two_accounts_action
+from voter.controllers_merge import merge_voter_tables_set_based
+from voter.models import Voter, VoterDeviceLink
+
+FROM_VOTER = {'voter_id': 1, 'voter_we_vote_id': 'wv01voter1'}
+TO_VOTER = {'voter_id': 2, 'voter_we_vote_id': 'wv01voter2'}
+
+
+class MergeVoterTablesTestCase(TestCase):
+    databases = '__all__'
+
+    def setUp(self):
+        # Both voters have a public position on the same candidate, and only the from_voter wrote a statement
+        PositionEntered.objects.create(
+            candidate_campaign_we_vote_id='wv01cand1', stance=SUPPORT, statement_text="Great record", **FROM_VOTER)
+        PositionEntered.objects.create(candidate_campaign_we_vote_id='wv01cand1', stance=SUPPORT, **TO_VOTER)
+        # The from_voter's friends-only position on the same candidate collides with the to_voter's public one
+        PositionForFriends.objects.create(candidate_campaign_we_vote_id='wv01cand1', stance=SUPPORT, **FROM_VOTER)
+        PositionForFriends.objects.create(contest_measure_we_vote_id='wv01meas1', stance=SUPPORT, **FROM_VOTER)
+        FollowIssue.objects.create(voter_we_vote_id='wv01voter1', issue_we_vote_id='wv01issue1',
+                                   following_status=FOLLOWING)
+        FollowIssue.objects.create(voter_we_vote_id='wv01voter2', issue_we_vote_id='wv01issue1',
+                                   following_status=STOP_FOLLOWING)
+        FollowIssue.objects.create(voter_we_vote_id='wv01voter1', issue_we_vote_id='wv01issue2',
+                                   following_status=FOLLOWING)
+        AnalyticsAction.objects.using('analytics').create(voter_we_vote_id='wv01voter1')
+
+    def merge(self, dry_run=False):
+        return merge_voter_tables_set_based(
+            from_voter_id=1, from_voter_we_vote_id='wv01voter1', to_voter_id=2, to_voter_we_vote_id='wv01voter2',
+            to_voter_linked_organization_id=20, to_voter_linked_organization_we_vote_id='wv01org2', dry_run=dry_run)
+
+    def test_colliding_positions_keep_one_position_with_the_statement(self):
+        dry_run_results = self.merge(dry_run=True)
+        self.assertEqual(PositionEntered.objects.filter(voter_id=1).count(), 1)
+
+        results = self.merge()
+
+        self.assertTrue(results['success'])
+        self.assertEqual(results['row_counts'], dry_run_results['row_counts'])
+        self.assertEqual(results['row_counts']['position_conflicts_deleted'], 2)
+        self.assertEqual(results['row_counts']['position_entries_moved'], 1)
+        self.assertFalse(PositionEntered.objects.filter(voter_id=1).exists())
+        self.assertFalse(PositionForFriends.objects.filter(voter_id=1).exists())
+        to_position = PositionEntered.objects.get(candidate_campaign_we_vote_id='wv01cand1')
+        self.assertEqual((to_position.voter_id, to_position.statement_text, to_position.organization_we_vote_id),
+                         (2, "Great record", 'wv01org2'))
+        moved_position = PositionForFriends.objects.get(contest_measure_we_vote_id='wv01meas1')
+        self.assertEqual((moved_position.voter_id, moved_position.voter_we_vote_id), (2, 'wv01voter2'))
+
+    def test_colliding_issue_follows_keep_the_to_voter_entry(self):
+        results = self.merge()
+
+        self.assertEqual(results['row_counts']['follow_issue_entries_deleted'], 1)
+        self.assertEqual(
+            sorted(FollowIssue.objects.values_list('voter_we_vote_id', 'issue_we_vote_id', 'following_status')),
+            [('wv01voter2', 'wv01issue1', FOLLOWING), ('wv01voter2', 'wv01issue2', FOLLOWING)])
+        self.assertEqual(AnalyticsAction.objects.using('analytics').get().voter_we_vote_id, 'wv01voter2')
+
+    def test_dry_run_merge_of_two_accounts_writes_nothing(self):
+        from_voter = Voter.objects.create(id=1, we_vote_id='wv01voter1')
+        to_voter = Voter.objects.create(id=2, we_vote_id='wv01voter2')
+        voter_device_link = VoterDeviceLink.objects.create(voter_device_id='device1', voter_id=1)
+
+        results = voter_merge_two_accounts_action(from_voter, to_voter, voter_device_link, dry_run=True)
+
+        self.assertTrue(results['success'])
+        self.assertEqual(results['merge_row_counts'], self.merge(dry_run=True)['row_counts'])
+        self.assertEqual(PositionEntered.objects.filter(voter_id=1).count(), 1)
+        self.assertEqual(FollowIssue.objects.filter(voter_we_vote_id='wv01voter1').count(), 2)
+        self.assertEqual(VoterDeviceLink.objects.get(voter_device_id='device1').voter_id, 1)
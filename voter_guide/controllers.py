@@ -2,6 +2,7 @@
 # Brought to you by We Vote. Be good.
 # -*- coding: UTF-8 -*-
 
+from ballot.election_snapshot import fetch_election_snapshot
 from ballot.models import OFFICE, CANDIDATE, MEASURE
 from candidate.controllers import retrieve_candidate_list_for_all_prior_elections_this_year, \
     retrieve_candidate_list_for_all_upcoming_elections
@@ -501,7 +502,6 @@ def extract_voter_guide_possibility_position_list_from_database(
         possibility_position_query = possibility_position_query.filter(id=voter_guide_possibility_position_id)
     possibility_position_query = possibility_position_query[:200]  # Limit to 200 to avoid very slow page loading
     possibility_position_list = list(possibility_position_query)
-    candidate_manager = CandidateManager()
     for possibility_position in possibility_position_list:
         candidate_alternate_names = []
         if positive_value_exists(possibility_position.more_info_url):
@@ -521,7 +521,8 @@ def extract_voter_guide_possibility_position_list_from_database(
                 if positive_value_exists(possibility_position.candidate_twitter_handle) else ""
             # If this is a list of candidates being endorsed by one organization, add on the alternate_names
             if positive_value_exists(candidate_we_vote_id):
-                candidate_results = candidate_manager.retrieve_candidate_from_we_vote_id(candidate_we_vote_id)
+                candidate_results = retrieve_candidate_for_possible_endorsement(
+                    candidate_we_vote_id, attach_objects=False)
                 if candidate_results['candidate_found']:
                     candidate_alternate_names = candidate_results['candidate'].display_alternate_names_list()
         elif voter_guide_possibility.voter_guide_possibility_type == ENDORSEMENTS_FOR_CANDIDATE:
@@ -577,6 +578,42 @@ def extract_voter_guide_possibility_position_list_from_database(
     return results
 
 
+def retrieve_candidate_for_possible_endorsement(candidate_we_vote_id, attach_objects=True):
+    """
+    When the CandidateCampaign object won't be attached, candidates in upcoming elections come from this worker's
+    election snapshot instead of the database
+    :param candidate_we_vote_id:
+    :param attach_objects:
+    :return:
+    """
+    if not positive_value_exists(attach_objects):
+        snapshot_candidate = fetch_election_snapshot().candidate(candidate_we_vote_id=candidate_we_vote_id)
+        if snapshot_candidate is not None:
+            return {
+                'success':          True,
+                'status':           'CANDIDATE_FOUND_IN_ELECTION_SNAPSHOT ',
+                'candidate_found':  True,
+                'candidate':        snapshot_candidate,
+            }
+    candidate_manager = CandidateManager()
+    return candidate_manager.retrieve_candidate_from_we_vote_id(candidate_we_vote_id)
+
+
+def retrieve_contest_measure_for_possible_endorsement(contest_measure_we_vote_id, attach_objects=True):
+    if not positive_value_exists(attach_objects):
+        snapshot_contest_measure = fetch_election_snapshot().contest_measure(
+            contest_measure_we_vote_id=contest_measure_we_vote_id)
+        if snapshot_contest_measure is not None:
+            return {
+                'success':                  True,
+                'status':                   'CONTEST_MEASURE_FOUND_IN_ELECTION_SNAPSHOT ',
+                'contest_measure_found':    True,
+                'contest_measure':          snapshot_contest_measure,
+            }
+    contest_measure_manager = ContestMeasureManager()
+    return contest_measure_manager.retrieve_contest_measure_from_we_vote_id(contest_measure_we_vote_id)
+
+
 def augment_candidate_possible_position_data(
         possible_endorsement,
         google_civic_election_id_list=[],
@@ -585,7 +622,6 @@ def augment_candidate_possible_position_data(
         attach_objects=True):
     status = ""
     success = True
-    candidate_manager = CandidateManager()
     candidate_list_manager = CandidateListManager()
     contest_office_manager = ContestOfficeManager()
 
@@ -598,8 +634,8 @@ def augment_candidate_possible_position_data(
     if 'candidate_we_vote_id' in possible_endorsement \
             and positive_value_exists(possible_endorsement['candidate_we_vote_id']):
         possible_endorsement_matched = True
-        results = candidate_manager.retrieve_candidate_from_we_vote_id(
-            possible_endorsement['candidate_we_vote_id'])
+        results = retrieve_candidate_for_possible_endorsement(
+            possible_endorsement['candidate_we_vote_id'], attach_objects=attach_objects)
         if results['candidate_found']:
             candidate = results['candidate']
             if positive_value_exists(attach_objects):
@@ -711,8 +747,8 @@ def augment_candidate_possible_position_data(
                             one_endorsement_light['google_civic_election_id']
                     else:
                         possible_endorsement['google_civic_election_id'] = 0
-                    matching_results = candidate_manager.retrieve_candidate_from_we_vote_id(
-                        possible_endorsement['candidate_we_vote_id'])
+                    matching_results = retrieve_candidate_for_possible_endorsement(
+                        possible_endorsement['candidate_we_vote_id'], attach_objects=attach_objects)
 
                     if matching_results['candidate_found']:
                         candidate = matching_results['candidate']
@@ -770,8 +806,8 @@ def augment_candidate_possible_position_data(
                                 one_endorsement_light['google_civic_election_id']
                         else:
                             possible_endorsement_copy['google_civic_election_id'] = 0
-                        matching_results = candidate_manager.retrieve_candidate_from_we_vote_id(
-                            possible_endorsement_copy['candidate_we_vote_id'])
+                        matching_results = retrieve_candidate_for_possible_endorsement(
+                            possible_endorsement_copy['candidate_we_vote_id'], attach_objects=attach_objects)
 
                         if matching_results['candidate_found']:
                             candidate = matching_results['candidate']
@@ -954,14 +990,13 @@ def match_endorsement_list_with_measures_in_database(
     possible_endorsement_list_found = False
 
     possible_endorsement_list_modified = []
-    measure_manager = ContestMeasureManager()
     measure_list_manager = ContestMeasureListManager()
     for possible_endorsement in possible_endorsement_list:
         possible_endorsement_matched = False
         if 'measure_we_vote_id' in possible_endorsement \
                 and positive_value_exists(possible_endorsement['measure_we_vote_id']):
-            results = measure_manager.retrieve_contest_measure_from_we_vote_id(
-                possible_endorsement['measure_we_vote_id'])
+            results = retrieve_contest_measure_for_possible_endorsement(
+                possible_endorsement['measure_we_vote_id'], attach_objects=attach_objects)
             if results['contest_measure_found']:
                 measure = results['contest_measure']
                 if positive_value_exists(attach_objects):
@@ -1011,8 +1046,8 @@ def match_endorsement_list_with_measures_in_database(
                         possible_endorsement['ballot_item_name'] = one_possible_measure['ballot_item_display_name']
                         possible_endorsement['google_civic_election_id'] = \
                             one_possible_measure['google_civic_election_id']
-                        matching_results = measure_manager.retrieve_contest_measure_from_we_vote_id(
-                            possible_endorsement['measure_we_vote_id'])
+                        matching_results = retrieve_contest_measure_for_possible_endorsement(
+                            possible_endorsement['measure_we_vote_id'], attach_objects=attach_objects)
 
                         if matching_results['contest_measure_found']:
                             measure = matching_results['contest_measure']
@@ -1052,8 +1087,8 @@ def match_endorsement_list_with_measures_in_database(
                                 one_possible_measure['ballot_item_display_name']
                             possible_endorsement_copy['google_civic_election_id'] = \
                                 one_possible_measure['google_civic_election_id']
-                            matching_results = measure_manager.retrieve_contest_measure_from_we_vote_id(
-                                possible_endorsement_copy['measure_we_vote_id'])
+                            matching_results = retrieve_contest_measure_for_possible_endorsement(
+                                possible_endorsement_copy['measure_we_vote_id'], attach_objects=attach_objects)
 
                             if matching_results['contest_measure_found']:
                                 measure = matching_results['contest_measure']
@@ -1951,7 +1986,6 @@ def voter_guide_possibility_highlights_retrieve_for_api(  # voterGuidePossibilit
     highlight_list = []
     voter_we_vote_id = ''
     names_already_included_list = []
-    candidate_manager = CandidateManager()
 
     # Once we know we have a voter_device_id to work with, get this working
     voter_guide_possibility_manager = VoterGuidePossibilityManager()
@@ -1985,8 +2019,8 @@ def voter_guide_possibility_highlights_retrieve_for_api(  # voterGuidePossibilit
                     }
                     highlight_list.append(one_highlight)
                 if positive_value_exists(one_possible_position['candidate_we_vote_id']):
-                    candidate_results = candidate_manager.retrieve_candidate_from_we_vote_id(
-                        one_possible_position['candidate_we_vote_id'])
+                    candidate_results = retrieve_candidate_for_possible_endorsement(
+                        one_possible_position['candidate_we_vote_id'], attach_objects=False)
                     if candidate_results['candidate_found']:
                         one_candidate = candidate_results['candidate']
                         if positive_value_exists(one_candidate.display_candidate_name()) \
@@ -3233,13 +3267,9 @@ def retrieve_voter_guides_to_follow_by_election_for_api(voter_id, google_civic_e
 
     # Start with orgs followed and ignored by this voter
     follow_organization_list_manager = FollowOrganizationList()
-    return_we_vote_id = True
-    organization_we_vote_ids_followed_by_voter = \
-        follow_organization_list_manager.retrieve_follow_organization_by_voter_id_simple_id_array(
-            voter_id, return_we_vote_id, read_only=True)
-    organization_we_vote_ids_ignored_by_voter = \
-        follow_organization_list_manager.retrieve_ignore_organization_by_voter_id_simple_id_array(
-            voter_id, return_we_vote_id, read_only=True)
+    voter_follow_state = follow_organization_list_manager.retrieve_voter_follow_state(voter_id)
+    organization_we_vote_ids_followed_by_voter = voter_follow_state['organization_we_vote_ids_followed']
+    organization_we_vote_ids_ignored_by_voter = voter_follow_state['organization_we_vote_ids_ignored']
 
     # position_list_manager = PositionListManager()
     if not positive_value_exists(google_civic_election_id):
@@ -3553,12 +3583,11 @@ def remove_voter_guides_for_voter(voter_guide_list, organizations_we_vote_ids_to
         # There aren't any organization_we_vote_ids to remove, so just return original list
         return voter_guide_list
 
-    voter_guide_list_modified = []
-    for one_voter_guide in voter_guide_list:
-        if one_voter_guide.organization_we_vote_id not in organizations_we_vote_ids_to_remove:
-            voter_guide_list_modified.append(one_voter_guide)
-
-    return voter_guide_list_modified
+    # Hash lookups instead of scanning a list for every voter guide
+    if not isinstance(organizations_we_vote_ids_to_remove, (set, frozenset)):
+        organizations_we_vote_ids_to_remove = frozenset(organizations_we_vote_ids_to_remove)
+    return [one_voter_guide for one_voter_guide in voter_guide_list
+            if one_voter_guide.organization_we_vote_id not in organizations_we_vote_ids_to_remove]
 
 
 def only_include_these_voter_guides_for_voter(voter_guide_list, organizations_we_vote_ids_to_keep):
@@ -3566,12 +3595,10 @@ def only_include_these_voter_guides_for_voter(voter_guide_list, organizations_we
         # There aren't any organization_we_vote_ids to remove, so just return original list
         return []
 
-    voter_guide_list_modified = []
-    for one_voter_guide in voter_guide_list:
-        if one_voter_guide.organization_we_vote_id in organizations_we_vote_ids_to_keep:
-            voter_guide_list_modified.append(one_voter_guide)
-
-    return voter_guide_list_modified
+    if not isinstance(organizations_we_vote_ids_to_keep, (set, frozenset)):
+        organizations_we_vote_ids_to_keep = frozenset(organizations_we_vote_ids_to_keep)
+    return [one_voter_guide for one_voter_guide in voter_guide_list
+            if one_voter_guide.organization_we_vote_id in organizations_we_vote_ids_to_keep]
 
 
 def retrieve_voter_guides_to_follow_generic_for_api(voter_id, search_string, filter_voter_guides_by_issue=False,
@@ -3592,20 +3619,15 @@ def retrieve_voter_guides_to_follow_generic_for_api(voter_id, search_string, fil
     voter_guide_list_found = False
 
     # Start with organizations followed and ignored by this voter
-    return_we_vote_id = True
     follow_organization_list_manager = FollowOrganizationList()
     if positive_value_exists(search_string):
         # If we are searching for organizations, we don't want to limit the search
         organization_we_vote_ids_followed_by_voter = []
         organization_we_vote_ids_ignored_by_voter = []
     else:
-        read_only = True
-        organization_we_vote_ids_followed_by_voter = \
-            follow_organization_list_manager.retrieve_follow_organization_by_voter_id_simple_id_array(
-                voter_id, return_we_vote_id, read_only=read_only)
-        organization_we_vote_ids_ignored_by_voter = \
-            follow_organization_list_manager.retrieve_ignore_organization_by_voter_id_simple_id_array(
-                voter_id, return_we_vote_id, read_only=read_only)
+        voter_follow_state = follow_organization_list_manager.retrieve_voter_follow_state(voter_id)
+        organization_we_vote_ids_followed_by_voter = voter_follow_state['organization_we_vote_ids_followed']
+        organization_we_vote_ids_ignored_by_voter = voter_follow_state['organization_we_vote_ids_ignored']
 
     # This is a list of orgs that the voter is already following or ignoring
     organization_we_vote_ids_followed_or_ignored_by_voter = list(chain(organization_we_vote_ids_followed_by_voter,
@@ -4560,10 +4582,8 @@ def retrieve_voter_guides_followed(voter_id):
     voter_guide_list_found = False
 
     follow_organization_list_manager = FollowOrganizationList()
-    return_we_vote_id = True
-    organization_we_vote_ids_followed_by_voter = \
-        follow_organization_list_manager.retrieve_follow_organization_by_voter_id_simple_id_array(
-            voter_id, return_we_vote_id)
+    voter_follow_state = follow_organization_list_manager.retrieve_voter_follow_state(voter_id)
+    organization_we_vote_ids_followed_by_voter = list(voter_follow_state['organization_we_vote_ids_followed'])
 
     voter_guide_list_object = VoterGuideListManager()
     results = voter_guide_list_object.retrieve_voter_guides_by_organization_list(
@@ -5070,10 +5090,8 @@ def retrieve_voter_guides_ignored(voter_id):  # voterGuidesIgnoredRetrieve
     voter_guide_list_found = False
 
     follow_organization_list_manager = FollowOrganizationList()
-    return_we_vote_id = True
-    organization_we_vote_ids_ignored_by_voter = \
-        follow_organization_list_manager.retrieve_ignore_organization_by_voter_id_simple_id_array(voter_id,
-                                                                                                  return_we_vote_id)
+    voter_follow_state = follow_organization_list_manager.retrieve_voter_follow_state(voter_id)
+    organization_we_vote_ids_ignored_by_voter = list(voter_follow_state['organization_we_vote_ids_ignored'])
 
     voter_guide_list_object = VoterGuideListManager()
     results = voter_guide_list_object.retrieve_voter_guides_by_organization_list(
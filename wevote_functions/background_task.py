@@ -0,0 +1,52 @@
+# wevote_functions/background_task.py
+# Brought to you by We Vote. Be good.
+# -*- coding: UTF-8 -*-
+
+from concurrent.futures import ThreadPoolExecutor
+import threading
+
+from django.db import connections
+
+import wevote_functions.admin
+
+logger = wevote_functions.admin.get_logger(__name__)
+
+
+class BackgroundTask(object):
+    """
+    Runs function on this process's one thread for the task, so a request can hand off work without waiting for it.
+    However many times run_soon is called before the function starts, it runs once. The function should pick up its
+    work from the database, where it is safe if the process restarts before the function runs.
+    """
+
+    def __init__(self, name, function):
+        self.name = name
+        self.function = function
+        self.executor = None
+        self.pending = False
+        self.lock = threading.Lock()
+
+    def run(self):
+        with self.lock:
+            self.pending = False
+        try:
+            self.function()
+        except Exception as e:
+            logger.error(self.name + ' threw: ' + str(e))
+        finally:
+            # This thread's database connections would otherwise stay open
+            connections.close_all()
+
+    def run_soon(self):
+        with self.lock:
+            if self.pending:
+                return
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=self.name)
+            self.pending = True
+        try:
+            self.executor.submit(self.run)
+        except Exception as e:
+            logger.error(self.name + ' not started: ' + str(e))
+            with self.lock:
+                self.pending = False
@@ -0,0 +1,149 @@
+# wevote_functions/database_router.py
+# Brought to you by We Vote. Be good.
+# -*- coding: UTF-8 -*-
+
+"""
+Sends the reads in read-only API requests to the read replica, so call sites don't each have to use .using('readonly')
+"""
+
+import threading
+import time
+
+from django.conf import settings
+from django.db import connections, DEFAULT_DB_ALIAS
+
+from config.base import get_environment_variable_default
+import wevote_functions.admin
+from wevote_functions.functions import convert_to_int, positive_value_exists
+
+logger = wevote_functions.admin.get_logger(__name__)
+
+READ_REPLICA_DATABASE_ALIAS = 'readonly'
+# Reads go back to the primary while the replica is further behind than this
+READ_REPLICA_MAX_LAG_SECONDS = convert_to_int(get_environment_variable_default("READ_REPLICA_MAX_LAG_SECONDS", 5)) or 5
+READ_REPLICA_LAG_CHECK_SECONDS = 5
+# Set READ_REPLICA_ROUTING to false to turn routing off without a deploy of the settings
+READ_REPLICA_ROUTING_SETTING = get_environment_variable_default("READ_REPLICA_ROUTING", None)
+
+request_routing_state = threading.local()
+replica_lag_lock = threading.Lock()
+replica_lag_state = {
+    'checked_time':     None,
+    'lag_seconds':      0.0,
+    'replica_usable':   True,
+}
+
+
+def read_replica_routing_enabled():
+    if READ_REPLICA_DATABASE_ALIAS not in settings.DATABASES:
+        return False
+    if READ_REPLICA_ROUTING_SETTING is not None and READ_REPLICA_ROUTING_SETTING != '' \
+            and not positive_value_exists(READ_REPLICA_ROUTING_SETTING):
+        return False
+    return True
+
+
+def start_read_replica_request():
+    """
+    Called by the middleware at the start of each request that may read from the replica
+    :return:
+    """
+    request_routing_state.read_from_replica = True
+    request_routing_state.pinned_to_primary = False
+
+
+def end_read_replica_request():
+    request_routing_state.read_from_replica = False
+    request_routing_state.pinned_to_primary = False
+
+
+def pin_request_to_primary():
+    """
+    After a request writes, the rest of its reads go to the primary so it sees its own changes
+    :return:
+    """
+    if getattr(request_routing_state, 'read_from_replica', False):
+        request_routing_state.pinned_to_primary = True
+
+
+def fetch_replica_lag_seconds(connection):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT CASE WHEN NOT pg_is_in_recovery() THEN 0 "
+            "WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+            "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END")
+        row = cursor.fetchone()
+    return float(row[0]) if row and row[0] is not None else 0.0
+
+
+def read_replica_is_usable():
+    """
+    The replica's lag is checked at most every READ_REPLICA_LAG_CHECK_SECONDS in each worker. If it is too far
+    behind, or we can't reach it, reads go to the primary until the next check.
+    :return:
+    """
+    now = time.monotonic()
+    checked_time = replica_lag_state['checked_time']
+    if checked_time is not None and now - checked_time < READ_REPLICA_LAG_CHECK_SECONDS:
+        return replica_lag_state['replica_usable']
+    with replica_lag_lock:
+        checked_time = replica_lag_state['checked_time']
+        if checked_time is not None and now - checked_time < READ_REPLICA_LAG_CHECK_SECONDS:
+            return replica_lag_state['replica_usable']
+        connection = connections[READ_REPLICA_DATABASE_ALIAS]
+        try:
+            if connection.vendor == 'postgresql':
+                lag_seconds = fetch_replica_lag_seconds(connection)
+            else:
+                lag_seconds = 0.0
+            replica_usable = lag_seconds <= READ_REPLICA_MAX_LAG_SECONDS
+            if not replica_usable:
+                logger.error("Read replica is {lag:.1f} seconds behind, reading from the primary".format(
+                    lag=lag_seconds))
+        except Exception as e:
+            lag_seconds = 0.0
+            replica_usable = False
+            logger.error("Read replica lag check failed, reading from the primary: " + str(e))
+        replica_lag_state['checked_time'] = now
+        replica_lag_state['lag_seconds'] = lag_seconds
+        replica_lag_state['replica_usable'] = replica_usable
+        return replica_usable
+
+
+class ReadReplicaRouter(object):
+    """
+    Queries that name a database with .using() are never routed. Everything else:
+    - Reads go to the replica during requests to the read-only API endpoints (see DatabaseRoutingMiddleware in
+      apis_v1/middleware.py), unless the request has already written, we are inside a transaction on the primary,
+      or the replica is lagging
+    - Writes go to the primary, and pin the rest of the request to the primary
+    """
+
+    def db_for_read(self, model, **hints):
+        if not getattr(request_routing_state, 'read_from_replica', False) \
+                or getattr(request_routing_state, 'pinned_to_primary', False):
+            return None
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db not in (None, DEFAULT_DB_ALIAS, READ_REPLICA_DATABASE_ALIAS):
+            # Ex/ related objects of a row read from analytics
+            return None
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        if not read_replica_is_usable():
+            return None
+        return READ_REPLICA_DATABASE_ALIAS
+
+    def db_for_write(self, model, **hints):
+        pin_request_to_primary()
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db not in (None, DEFAULT_DB_ALIAS, READ_REPLICA_DATABASE_ALIAS):
+            # Rows read from analytics are saved back there, as they were before we had a router
+            return None
+        # Rows read from the replica are saved to the primary
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        database_alias_set = {DEFAULT_DB_ALIAS, READ_REPLICA_DATABASE_ALIAS}
+        if obj1._state.db in database_alias_set and obj2._state.db in database_alias_set:
+            return True
+        return None
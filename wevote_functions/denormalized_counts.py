@@ -0,0 +1,110 @@
+# wevote_functions/denormalized_counts.py
+# Brought to you by We Vote. Be good.
+# -*- coding: UTF-8 -*-
+
+"""
+Recounts counts we store on a row (ex/ Issue.issue_followers_count) from the rows they count, with one grouped
+count query per count for each batch of rows, instead of a COUNT and a save() for every row
+"""
+
+from django.db.models import Count, F
+from django.db.models.functions import Lower
+
+import wevote_functions.admin
+
+logger = wevote_functions.admin.get_logger(__name__)
+
+DENORMALIZED_COUNTS_BATCH_SIZE = 1000
+
+
+class DenormalizedCount(object):
+    """
+    :param count_field_name: the field holding the count, ex/ 'issue_followers_count'
+    :param source_queryset: the rows to count, ex/ FollowIssue rows that are FOLLOWING
+    :param source_key_field_name: the field on those rows that holds our key, ex/ 'issue_we_vote_id'
+    :param case_insensitive: match keys the way __iexact does
+    """
+
+    def __init__(self, count_field_name, source_queryset, source_key_field_name, case_insensitive=False):
+        self.count_field_name = count_field_name
+        self.source_queryset = source_queryset
+        self.source_key_field_name = source_key_field_name
+        self.case_insensitive = case_insensitive
+
+    def count_key(self, key):
+        if self.case_insensitive:
+            return key.lower() if key else key
+        return key
+
+    def fetch_count_dict(self, key_list):
+        """
+        :param key_list:
+        :return: dict of key -> count, for the keys with at least one row
+        """
+        key_list = [self.count_key(key) for key in key_list if key]
+        if self.case_insensitive:
+            queryset = self.source_queryset.annotate(count_key=Lower(self.source_key_field_name))
+        else:
+            queryset = self.source_queryset.annotate(count_key=F(self.source_key_field_name))
+        return dict(queryset.filter(count_key__in=key_list)
+                    .values('count_key')
+                    .annotate(actual_count=Count('id'))
+                    .values_list('count_key', 'actual_count'))
+
+
+def refresh_denormalized_counts(queryset, key_field_name, denormalized_count_list,
+                                batch_size=DENORMALIZED_COUNTS_BATCH_SIZE):
+    """
+    Recount, for each row in queryset, every count in denormalized_count_list, and save the counts that have changed
+    with bulk_update. Rows are read batch_size at a time, in id order.
+    :param queryset: the rows holding the counts, ex/ Issue.objects.filter(hide_issue=False)
+    :param key_field_name: the field the counted rows point at, ex/ 'we_vote_id'
+    :param denormalized_count_list: list of DenormalizedCount
+    :param batch_size:
+    :return:
+    """
+    status = ""
+    success = True
+    checked_count = 0
+    updated_count = 0
+    count_field_name_list = [denormalized_count.count_field_name for denormalized_count in denormalized_count_list]
+
+    queryset = queryset.order_by('id').only('id', key_field_name, *count_field_name_list)
+    last_id = 0
+    try:
+        while True:
+            row_list = list(queryset.filter(id__gt=last_id)[:batch_size])
+            if not len(row_list):
+                break
+            last_id = row_list[-1].id
+            key_list = [getattr(row, key_field_name) for row in row_list]
+            count_dict_list = [denormalized_count.fetch_count_dict(key_list)
+                               for denormalized_count in denormalized_count_list]
+
+            row_list_to_update = []
+            for row in row_list:
+                checked_count += 1
+                key = getattr(row, key_field_name)
+                row_changed = False
+                for denormalized_count, count_dict in zip(denormalized_count_list, count_dict_list):
+                    actual_count = count_dict.get(denormalized_count.count_key(key), 0)
+                    if getattr(row, denormalized_count.count_field_name) != actual_count:
+                        setattr(row, denormalized_count.count_field_name, actual_count)
+                        row_changed = True
+                if row_changed:
+                    row_list_to_update.append(row)
+            if len(row_list_to_update):
+                queryset.model.objects.bulk_update(row_list_to_update, count_field_name_list)
+                updated_count += len(row_list_to_update)
+    except Exception as e:
+        status += "REFRESH_DENORMALIZED_COUNTS_FAILED " + queryset.model.__name__ + ": " + str(e) + " "
+        logger.error(status)
+        success = False
+
+    results = {
+        'success':          success,
+        'status':           status,
+        'checked_count':    checked_count,
+        'updated_count':    updated_count,
+    }
+    return results
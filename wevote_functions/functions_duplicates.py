@@ -0,0 +1,261 @@
+# wevote_functions/functions_duplicates.py
+# Brought to you by We Vote. Be good.
+# -*- coding: UTF-8 -*-
+
+from difflib import SequenceMatcher
+import re
+
+# Two entries that share a blocking key are compared, and are suggested as duplicates at or above this score
+DUPLICATE_SCORE_THRESHOLD = 0.85
+
+NAME_PREFIXES_AND_SUFFIXES = {
+    'dr', 'hon', 'honorable', 'ii', 'iii', 'iv', 'jr', 'judge', 'md', 'mr', 'mrs', 'ms', 'phd', 'rev', 'sen', 'sr',
+}
+# Words that appear in so many office and measure titles that they make poor blocking keys
+TITLE_STOP_WORDS = {
+    'a', 'an', 'and', 'at', 'board', 'city', 'county', 'district', 'for', 'in', 'large', 'measure', 'no', 'of',
+    'office', 'on', 'prop', 'proposition', 'seat', 'state', 'the', 'to', 'us',
+}
+NICKNAME_PATTERN = re.compile(r'"[^"]*"|\([^)]*\)')
+NOT_LETTER_OR_NUMBER_PATTERN = re.compile(r'[^a-z0-9 ]+')
+
+
+def normalize_text_for_matching(text):
+    """
+    Lower case, without punctuation and with single spaces, so "Smith, Jr.  " and "smith jr" compare as equal
+    :param text:
+    :return:
+    """
+    if not text:
+        return ''
+    text = str(text).lower().replace('.', '').replace("'", '')
+    text = NOT_LETTER_OR_NUMBER_PATTERN.sub(' ', text)
+    return ' '.join(text.split())
+
+
+def normalize_person_name_for_matching(full_name):
+    """
+    Nicknames in quotes or parentheses, titles and suffixes are dropped: 'Dr. Robert "Bob" Smith Jr.' -> 'robert smith'
+    :param full_name:
+    :return:
+    """
+    if not full_name:
+        return ''
+    full_name = NICKNAME_PATTERN.sub(' ', str(full_name))
+    if ',' in full_name:
+        # Ex/ "Smith, Robert" or "Robert Smith, Jr."
+        before_comma, after_comma = full_name.split(',', 1)
+        if normalize_text_for_matching(after_comma) not in NAME_PREFIXES_AND_SUFFIXES:
+            full_name = after_comma + ' ' + before_comma
+    word_list = [word for word in normalize_text_for_matching(full_name).split(' ')
+                 if word and word not in NAME_PREFIXES_AND_SUFFIXES]
+    return ' '.join(word_list)
+
+
+def person_name_blocking_tokens(normalized_name):
+    # Names are blocked on last name
+    word_list = normalized_name.split(' ')
+    return [word_list[-1]] if word_list and word_list[-1] else []
+
+
+def title_blocking_tokens(normalized_title):
+    # Office and measure titles are blocked on each word that isn't common to most titles, ex/ "12", "assessor"
+    return [word for word in set(normalized_title.split(' ')) if word and word not in TITLE_STOP_WORDS]
+
+
+def person_name_similarity(normalized_name1, normalized_name2):
+    """
+    Score from 0 to 1. A missing middle name or a first initial ("robert a smith" vs "r smith") still scores high.
+    :param normalized_name1:
+    :param normalized_name2:
+    :return:
+    """
+    if not normalized_name1 or not normalized_name2:
+        return 0.0
+    if normalized_name1 == normalized_name2:
+        return 1.0
+    score = text_similarity(normalized_name1, normalized_name2)
+    word_list1 = normalized_name1.split(' ')
+    word_list2 = normalized_name2.split(' ')
+    if word_list1[-1] == word_list2[-1]:
+        first1 = word_list1[0]
+        first2 = word_list2[0]
+        if first1 == first2:
+            score = max(score, 0.95)
+        elif (len(first1) == 1 or len(first2) == 1) and first1[0] == first2[0]:
+            score = max(score, 0.9)
+        elif first1.startswith(first2) or first2.startswith(first1):
+            # Ex/ "alex" and "alexander"
+            score = max(score, 0.88)
+    return score
+
+
+def text_similarity(normalized_text1, normalized_text2):
+    if not normalized_text1 or not normalized_text2:
+        return 0.0
+    if normalized_text1 == normalized_text2:
+        return 1.0
+    sorted_text1 = ' '.join(sorted(normalized_text1.split(' ')))
+    sorted_text2 = ' '.join(sorted(normalized_text2.split(' ')))
+    if sorted_text1 == sorted_text2:
+        # Same words in a different order
+        return 0.98
+    matcher = SequenceMatcher(None, normalized_text1, normalized_text2)
+    if matcher.real_quick_ratio() < DUPLICATE_SCORE_THRESHOLD - 0.2:
+        return matcher.real_quick_ratio()
+    return max(matcher.ratio(), SequenceMatcher(None, sorted_text1, sorted_text2).ratio())
+
+
+def title_similarity(normalized_title1, normalized_title2):
+    """
+    Like text_similarity, but titles with different numbers never match: "district 12" is not "district 13"
+    :param normalized_title1:
+    :param normalized_title2:
+    :return:
+    """
+    number_set1 = set(word for word in normalized_title1.split(' ') if word.isdigit())
+    number_set2 = set(word for word in normalized_title2.split(' ') if word.isdigit())
+    if number_set1 != number_set2:
+        return 0.0
+    return text_similarity(normalized_title1, normalized_title2)
+
+
+class DuplicateFinder(object):
+    """
+    Finds likely duplicates in a whole election (or import) at once. Each entry is normalized one time when added and
+    filed under blocking keys (scope + name token, where the scope is usually state code and election). Only entries
+    that share a key are scored against each other, so the work grows with the size of the blocks instead of the
+    square of the number of entries. Entries that share a strong identifier, like a Twitter handle, always match.
+    Used for candidates, offices and measures.
+    """
+
+    def __init__(self, kind_of_name='person', score_threshold=DUPLICATE_SCORE_THRESHOLD):
+        if kind_of_name == 'person':
+            self.normalize_function = normalize_person_name_for_matching
+            self.blocking_token_function = person_name_blocking_tokens
+            self.similarity_function = person_name_similarity
+        else:
+            self.normalize_function = normalize_text_for_matching
+            self.blocking_token_function = title_blocking_tokens
+            self.similarity_function = title_similarity
+        self.score_threshold = score_threshold
+        self.entry_dict = {}
+        self.block_dict = {}
+        self.identifier_dict = {}
+
+    def add(self, we_vote_id, name_list, scope_list, identifier_list=None):
+        """
+        :param we_vote_id:
+        :param name_list: Every name this entry is known by, ex/ candidate_name and google_civic_candidate_name
+        :param scope_list: Only entries with a scope in common are compared, ex/ [('CA', 1000052)]
+        :param identifier_list: Values that identify this entry for certain, ex/ ['twitter:kamalaharris']
+        :return:
+        """
+        normalized_name_set = set()
+        for name in name_list:
+            normalized_name = self.normalize_function(name)
+            if normalized_name:
+                normalized_name_set.add(normalized_name)
+        scope_set = set(scope_list)
+        identifier_set = set(str(identifier).lower() for identifier in identifier_list or [] if identifier)
+        self.entry_dict[we_vote_id] = {
+            'identifier_set':       identifier_set,
+            'normalized_name_set':  normalized_name_set,
+            'scope_set':            scope_set,
+        }
+        for scope in scope_set:
+            for normalized_name in normalized_name_set:
+                for token in self.blocking_token_function(normalized_name):
+                    self.block_dict.setdefault((scope, token), []).append(we_vote_id)
+            for identifier in identifier_set:
+                self.identifier_dict.setdefault((scope, identifier), []).append(we_vote_id)
+
+    def score_pair(self, we_vote_id1, we_vote_id2):
+        best_score = 0.0
+        for normalized_name1 in self.entry_dict[we_vote_id1]['normalized_name_set']:
+            for normalized_name2 in self.entry_dict[we_vote_id2]['normalized_name_set']:
+                best_score = max(best_score, self.similarity_function(normalized_name1, normalized_name2))
+                if best_score == 1.0:
+                    return best_score
+        return best_score
+
+    def find_duplicates(self, ignore_pair_set=None):
+        """
+        :param ignore_pair_set: frozensets of two we_vote_ids already marked as not duplicates
+        :return: list of {'we_vote_id1', 'we_vote_id2', 'score', 'matched_by'}, most likely duplicates first
+        """
+        # Pairs already scored (or not to be scored) are skipped when two entries share more than one block
+        skip_pair_set = set(ignore_pair_set or ())
+        suggestion_dict = {}
+        for (scope, identifier), we_vote_id_list in self.identifier_dict.items():
+            for pair in self.pairs_in_block(we_vote_id_list):
+                if pair not in skip_pair_set:
+                    suggestion_dict[pair] = (1.0, 'IDENTIFIER')
+                    skip_pair_set.add(pair)
+        for (scope, token), we_vote_id_list in self.block_dict.items():
+            for pair in self.pairs_in_block(we_vote_id_list):
+                if pair in skip_pair_set:
+                    continue
+                skip_pair_set.add(pair)
+                we_vote_id1, we_vote_id2 = sorted(pair)
+                score = self.score_pair(we_vote_id1, we_vote_id2)
+                if score >= self.score_threshold:
+                    suggestion_dict[pair] = (score, 'NAME')
+
+        suggestion_list = []
+        for pair, (score, matched_by) in suggestion_dict.items():
+            we_vote_id1, we_vote_id2 = sorted(pair)
+            suggestion_list.append({
+                'we_vote_id1':  we_vote_id1,
+                'we_vote_id2':  we_vote_id2,
+                'score':        round(score, 3),
+                'matched_by':   matched_by,
+            })
+        suggestion_list.sort(key=lambda suggestion: (-suggestion['score'], suggestion['we_vote_id1'],
+                                                     suggestion['we_vote_id2']))
+        return suggestion_list
+
+    def find_duplicates_of(self, we_vote_id_list, ignore_pair_set=None):
+        """
+        Like find_duplicates, but the entries in we_vote_id_list are only compared with the other entries, not with
+        each other, and entries outside the list aren't compared with each other. Imports use this to find incoming
+        entries that are already in this database under another we_vote_id.
+        :param we_vote_id_list:
+        :param ignore_pair_set: frozensets of two we_vote_ids that are not duplicates
+        :return: dict of we_vote_id from we_vote_id_list -> set of the other we_vote_ids it likely duplicates
+        """
+        we_vote_id_set = set(we_vote_id_list)
+        ignore_pair_set = ignore_pair_set or set()
+        duplicate_dict = {}
+        for we_vote_id in we_vote_id_list:
+            entry = self.entry_dict.get(we_vote_id)
+            if entry is None:
+                continue
+            other_we_vote_id_set = set()
+            for scope in entry['scope_set']:
+                for identifier in entry['identifier_set']:
+                    other_we_vote_id_set.update(self.identifier_dict.get((scope, identifier), []))
+            scored_we_vote_id_set = set(other_we_vote_id_set)
+            for scope in entry['scope_set']:
+                for normalized_name in entry['normalized_name_set']:
+                    for token in self.blocking_token_function(normalized_name):
+                        for other_we_vote_id in self.block_dict.get((scope, token), []):
+                            if other_we_vote_id in scored_we_vote_id_set or other_we_vote_id in we_vote_id_set:
+                                continue
+                            scored_we_vote_id_set.add(other_we_vote_id)
+                            if self.score_pair(we_vote_id, other_we_vote_id) >= self.score_threshold:
+                                other_we_vote_id_set.add(other_we_vote_id)
+            other_we_vote_id_set = set(
+                other_we_vote_id for other_we_vote_id in other_we_vote_id_set
+                if other_we_vote_id not in we_vote_id_set
+                and frozenset((we_vote_id, other_we_vote_id)) not in ignore_pair_set)
+            if other_we_vote_id_set:
+                duplicate_dict[we_vote_id] = other_we_vote_id_set
+        return duplicate_dict
+
+    @staticmethod
+    def pairs_in_block(we_vote_id_list):
+        unique_we_vote_id_list = sorted(set(we_vote_id_list))
+        for index, we_vote_id1 in enumerate(unique_we_vote_id_list):
+            for we_vote_id2 in unique_we_vote_id_list[index + 1:]:
+                yield frozenset((we_vote_id1, we_vote_id2))
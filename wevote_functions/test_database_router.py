@@ -0,0 +1,46 @@
+# wevote_functions/test_database_router.py
+# Brought to you by We Vote. Be good.
+# -*- coding: UTF-8 -*-
+
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from candidate.models import CandidateCampaign
+from .database_router import end_read_replica_request, ReadReplicaRouter, start_read_replica_request
+
+
+class WeVoteFunctionsTestsDatabaseRouter(SimpleTestCase):
+
+    def setUp(self):
+        self.router = ReadReplicaRouter()
+
+    def tearDown(self):
+        end_read_replica_request()
+
+    def test_reads_outside_api_requests_are_not_routed(self):
+        self.assertIsNone(self.router.db_for_read(CandidateCampaign))
+        self.assertEqual(self.router.db_for_write(CandidateCampaign), 'default')
+
+    def test_reads_go_to_replica_until_the_request_writes(self):
+        with mock.patch('wevote_functions.database_router.read_replica_is_usable', return_value=True):
+            start_read_replica_request()
+            self.assertEqual(self.router.db_for_read(CandidateCampaign), 'readonly')
+            candidate = CandidateCampaign()
+            candidate._state.db = 'readonly'
+            self.assertEqual(self.router.db_for_write(CandidateCampaign, instance=candidate), 'default')
+            self.assertIsNone(self.router.db_for_read(CandidateCampaign))
+
+            # The next request starts over
+            start_read_replica_request()
+            self.assertEqual(self.router.db_for_read(CandidateCampaign), 'readonly')
+
+    def test_lagging_replica_falls_back_to_primary(self):
+        with mock.patch('wevote_functions.database_router.read_replica_is_usable', return_value=False):
+            start_read_replica_request()
+            self.assertIsNone(self.router.db_for_read(CandidateCampaign))
+
+    def test_analytics_rows_stay_on_analytics(self):
+        candidate = CandidateCampaign()
+        candidate._state.db = 'analytics'
+        self.assertIsNone(self.router.db_for_write(CandidateCampaign, instance=candidate))
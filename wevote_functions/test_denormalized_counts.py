@@ -0,0 +1,44 @@
+# wevote_functions/test_denormalized_counts.py
+# Brought to you by We Vote. Be good.
+# -*- coding: UTF-8 -*-
+
+from django.db import connections
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from follow.models import FollowIssue, FOLLOWING, STOP_FOLLOWING
+from issue.controllers import update_issue_statistics
+from issue.models import Issue, OrganizationLinkToIssue
+
+
+class WeVoteFunctionsTestsDenormalizedCounts(TestCase):
+    databases = '__all__'
+
+    def test_issue_statistics_are_recounted_in_grouped_queries(self):
+        for number in range(1, 6):
+            Issue.objects.create(we_vote_id='wv01issue' + str(number), issue_name='Issue ' + str(number),
+                                 issue_followers_count=99, linked_organization_count=0, hide_issue=False)
+        FollowIssue.objects.create(voter_we_vote_id='wv01voter1', issue_we_vote_id='wv01issue1',
+                                   following_status=FOLLOWING)
+        # Matched the way __iexact matched, one query per issue, before
+        FollowIssue.objects.create(voter_we_vote_id='wv01voter2', issue_we_vote_id='WV01ISSUE1',
+                                   following_status=FOLLOWING)
+        FollowIssue.objects.create(voter_we_vote_id='wv01voter3', issue_we_vote_id='wv01issue1',
+                                   following_status=STOP_FOLLOWING)
+        OrganizationLinkToIssue.objects.create(organization_we_vote_id='wv01org1', issue_we_vote_id='wv01issue2')
+
+        with CaptureQueriesContext(connections['default']) as captured_queries, \
+                CaptureQueriesContext(connections['readonly']) as captured_readonly_queries:
+            results = update_issue_statistics()
+
+        self.assertTrue(results['success'])
+        self.assertEqual(results['issues_updated_count'], 5)
+        # Issues, then each count grouped, then one bulk update: the same for 5 issues or 500
+        self.assertLessEqual(len(captured_queries) + len(captured_readonly_queries), 6)
+        self.assertEqual(Issue.objects.get(we_vote_id='wv01issue1').issue_followers_count, 2)
+        self.assertEqual(Issue.objects.get(we_vote_id='wv01issue2').linked_organization_count, 1)
+        self.assertEqual(Issue.objects.get(we_vote_id='wv01issue3').issue_followers_count, 0)
+
+        # Nothing has changed, so nothing is saved
+        results = update_issue_statistics()
+        self.assertEqual(results['issues_updated_count'], 0)
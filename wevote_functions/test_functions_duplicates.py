@@ -0,0 +1,54 @@
+# wevote_functions/test_functions_duplicates.py
+# Brought to you by We Vote. Be good.
+# -*- coding: UTF-8 -*-
+
+from django.test import SimpleTestCase
+from .functions_duplicates import DuplicateFinder, normalize_person_name_for_matching
+
+
+class WeVoteFunctionsTestsDuplicates(SimpleTestCase):
+
+    def test_normalize_person_name_for_matching(self):
+        self.assertEqual(normalize_person_name_for_matching('Dr. Robert "Bob" Smith Jr.'), 'robert smith')
+        self.assertEqual(normalize_person_name_for_matching('Smith, Robert'), 'robert smith')
+
+    def test_person_duplicates_are_found_within_scope(self):
+        duplicate_finder = DuplicateFinder(kind_of_name='person')
+        duplicate_finder.add('wv01cand1', ['Robert Smith'], [('ca', 1000)])
+        duplicate_finder.add('wv01cand2', ['Smith, Robert A.'], [('ca', 1000)])
+        duplicate_finder.add('wv01cand3', ['Robert Smith'], [('or', 1000)])
+        duplicate_finder.add('wv01cand4', ['Mary Smith'], [('ca', 1000)])
+        duplicate_finder.add('wv01cand5', ['Kamala D. Harris'], [('ca', 1000)], ['twitter:kamalaharris'])
+        duplicate_finder.add('wv01cand6', ['Senator Harris'], [('ca', 1000)], ['twitter:KamalaHarris'])
+        suggestion_list = duplicate_finder.find_duplicates()
+        self.assertEqual(
+            [(suggestion['we_vote_id1'], suggestion['we_vote_id2'], suggestion['matched_by'])
+             for suggestion in suggestion_list],
+            [('wv01cand5', 'wv01cand6', 'IDENTIFIER'), ('wv01cand1', 'wv01cand2', 'NAME')])
+
+        ignore_pair_set = {frozenset(('wv01cand1', 'wv01cand2'))}
+        suggestion_list = duplicate_finder.find_duplicates(ignore_pair_set=ignore_pair_set)
+        self.assertEqual(len(suggestion_list), 1)
+
+    def test_titles_with_different_numbers_are_not_duplicates(self):
+        duplicate_finder = DuplicateFinder(kind_of_name='title')
+        duplicate_finder.add('wv01off1', ['U.S. House District 12'], [1000])
+        duplicate_finder.add('wv01off2', ['US House - District 12'], [1000])
+        duplicate_finder.add('wv01off3', ['U.S. House District 13'], [1000])
+        suggestion_list = duplicate_finder.find_duplicates()
+        self.assertEqual(len(suggestion_list), 1)
+        self.assertEqual(suggestion_list[0]['we_vote_id2'], 'wv01off2')
+
+    def test_incoming_entries_are_only_compared_with_local_entries(self):
+        duplicate_finder = DuplicateFinder(kind_of_name='title')
+        duplicate_finder.add('wv01off1', ['Mayor'], [1000], ['name:mayor'])
+        duplicate_finder.add('wv01off2', ['City Council'], [1000], ['name:city council'])
+        duplicate_finder.add('wv01off3', ['City Council'], [1000], ['name:city council'])
+        duplicate_finder.add('incoming0', ['MAYOR'], [1000], ['name:mayor'])
+        duplicate_finder.add('incoming1', ['Mayor'], [1000], ['name:mayor'])
+        duplicate_finder.add('incoming2', ['City Council'], [1000], ['name:city council'])
+        duplicate_finder.add('incoming3', ['Mayor'], [1001], ['name:mayor'])
+        duplicate_dict = duplicate_finder.find_duplicates_of(
+            ['incoming0', 'incoming1', 'incoming2', 'incoming3'],
+            ignore_pair_set={frozenset(('incoming1', 'wv01off1'))})
+        self.assertEqual(duplicate_dict, {'incoming0': {'wv01off1'}, 'incoming2': {'wv01off2', 'wv01off3'}})
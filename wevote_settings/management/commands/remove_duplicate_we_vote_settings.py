@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from wevote_settings.models import WeVoteSettingsManager
+
+
+class Command(BaseCommand):
+    help = 'Removes WeVoteSetting rows that share a name. Run before migrating the unique constraint on name'
+
+    def handle(self, *args, **options):
+        we_vote_settings_manager = WeVoteSettingsManager()
+        results = we_vote_settings_manager.remove_duplicate_settings()
+        self.stdout.write('Duplicated setting names: {}, rows deleted: {}, success: {}'.format(
+            results['duplicate_name_count'], results['deleted_count'], results['success']))
+        if not results['success']:
+            self.stderr.write(results['status'])
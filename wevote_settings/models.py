@@ -2,10 +2,18 @@
 # Brought to you by We Vote. Be good.
 # -*- coding: UTF-8 -*-
 
-from django.db import models
+from contextlib import contextmanager
+from django.db import connections, IntegrityError, models, transaction
+from django.db.models import Count, F
+from django.db.models.functions import Coalesce, Greatest
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from exception.models import handle_record_found_more_than_one_exception,\
     handle_record_not_saved_exception
+import os
 import string
+import threading
+import time
 import wevote_functions.admin
 from wevote_functions.functions import convert_to_int, generate_random_string, positive_value_exists
 
@@ -27,6 +35,10 @@ KIND_OF_ACTION_CHOICES = (
 
 logger = wevote_functions.admin.get_logger(__name__)
 
+# Number of we_vote_id integers reserved with one database round trip. Integers reserved by a process that exits
+#  before using them are skipped, so we_vote_ids are unique and increasing but not gap-free.
+WE_VOTE_ID_BLOCK_SIZE = 1000
+
 
 class WeVoteSetting(models.Model):
     """
@@ -35,7 +47,9 @@ class WeVoteSetting(models.Model):
     DoesNotExist = None
     MultipleObjectsReturned = None
     objects = None
-    name = models.CharField(verbose_name='setting name', blank=True, null=True, max_length=255)
+    # Databases created before name was unique may hold duplicate rows. Run the remove_duplicate_we_vote_settings
+    #  management command before migrating this constraint.
+    name = models.CharField(verbose_name='setting name', blank=True, null=True, max_length=255, unique=True)
 
     # We store in the settings database values of many different kind of data types
     STRING = 'S'
@@ -220,132 +234,178 @@ class WeVoteSettingsManager(models.Manager):
             we_vote_setting.string_value = setting_value
         return we_vote_setting
 
+    def remove_duplicate_settings(self):
+        """
+        Before the unique constraint on WeVoteSetting.name can be migrated, rows sharing a name must be removed.
+        For integer settings we keep the row with the highest integer_value, so we_vote_id counters and cache
+        version stamps never go backwards. For other settings we keep the most recently created row.
+        :return:
+        """
+        status = ""
+        success = True
+        duplicate_name_count = 0
+        deleted_count = 0
+        try:
+            duplicate_name_list = WeVoteSetting.objects \
+                .values('name') \
+                .annotate(name_count=Count('id')) \
+                .filter(name_count__gt=1) \
+                .values_list('name', flat=True)
+            for setting_name in list(duplicate_name_list):
+                with transaction.atomic(using='default'):
+                    we_vote_setting_list = list(WeVoteSetting.objects.select_for_update()
+                                                .filter(name=setting_name).order_by('-id'))
+                    integer_setting_list = [we_vote_setting for we_vote_setting in we_vote_setting_list
+                                            if we_vote_setting.value_type == WeVoteSetting.INTEGER]
+                    if integer_setting_list:
+                        keep_setting = max(integer_setting_list,
+                                           key=lambda we_vote_setting: convert_to_int(we_vote_setting.integer_value))
+                    else:
+                        keep_setting = we_vote_setting_list[0]
+                    deleted_count += WeVoteSetting.objects.filter(name=setting_name) \
+                        .exclude(id=keep_setting.id).delete()[0]
+                duplicate_name_count += 1
+        except Exception as e:
+            status += "REMOVE_DUPLICATE_SETTINGS_FAILED: " + str(e) + " "
+            success = False
+        clear_we_vote_setting_cache()
+        return {
+            'success':              success,
+            'status':               status,
+            'duplicate_name_count': duplicate_name_count,
+            'deleted_count':        deleted_count,
+        }
+
 # site_unique_id_prefix
 # we_vote_id_last_org_integer
 # we_vote_id_last_position_integer
 
 
-def fetch_batch_process_system_on():
-    we_vote_settings_manager = WeVoteSettingsManager()
-    results = we_vote_settings_manager.fetch_setting_results('batch_process_system_on', read_only=True)
-    if results['success']:
-        if results['we_vote_setting_found']:
-            return results['setting_value']
+BATCH_PROCESS_SYSTEM_SETTING_NAME_LIST = [
+    'batch_process_system_on',
+    'batch_process_system_activity_notices_on',
+    'batch_process_system_api_refresh_on',
+    'batch_process_system_ballot_items_on',
+    'batch_process_system_calculate_analytics_on',
+    'batch_process_system_search_twitter_on',
+    'batch_process_system_update_twitter_on',
+]
+# These flags are read by the batch process scheduler thousands of times a minute, but only change when someone
+#  flips them on the admin page. A change made in another process is picked up once the entry is this old.
+WE_VOTE_SETTING_CACHE_SECONDS = 60
+we_vote_setting_cache = {}
+we_vote_setting_cache_lock = threading.Lock()
+site_unique_id_prefix_cached = ''
+
+
+def clear_we_vote_setting_cache(setting_name=None):
+    global site_unique_id_prefix_cached
+    with we_vote_setting_cache_lock:
+        if setting_name is None:
+            we_vote_setting_cache.clear()
         else:
-            # Create the setting the first time
-            results = we_vote_settings_manager.save_setting(
-                setting_name='batch_process_system_on',
-                setting_value=True,
-                value_type=WeVoteSetting.BOOLEAN)
-            return results['success']
-    else:
-        return False
+            we_vote_setting_cache.pop(setting_name, None)
+    if setting_name is None or setting_name == 'site_unique_id_prefix':
+        site_unique_id_prefix_cached = ''
 
 
-def fetch_batch_process_system_activity_notices_on():
+def fetch_batch_process_system_setting(setting_name):
+    """
+    Boolean batch process flags are turned on the first time they are requested.
+    :param setting_name:
+    :return:
+    """
+    now = time.monotonic()
+    with we_vote_setting_cache_lock:
+        cache_entry = we_vote_setting_cache.get(setting_name)
+    if cache_entry is not None and now - cache_entry[1] < WE_VOTE_SETTING_CACHE_SECONDS:
+        return cache_entry[0]
+
+    if setting_name in BATCH_PROCESS_SYSTEM_SETTING_NAME_LIST:
+        # One query refreshes every batch process flag, instead of one query per flag
+        load_batch_process_system_setting_cache()
+        with we_vote_setting_cache_lock:
+            cache_entry = we_vote_setting_cache.get(setting_name)
+        if cache_entry is not None and now - cache_entry[1] < WE_VOTE_SETTING_CACHE_SECONDS:
+            return cache_entry[0]
+
     we_vote_settings_manager = WeVoteSettingsManager()
-    results = we_vote_settings_manager.fetch_setting_results('batch_process_system_activity_notices_on', read_only=True)
+    results = we_vote_settings_manager.fetch_setting_results(setting_name, read_only=True)
     if results['success']:
         if results['we_vote_setting_found']:
-            return results['setting_value']
+            setting_value = results['setting_value']
         else:
             # Create the setting the first time
             results = we_vote_settings_manager.save_setting(
-                setting_name='batch_process_system_activity_notices_on',
+                setting_name=setting_name,
                 setting_value=True,
                 value_type=WeVoteSetting.BOOLEAN)
-            return results['success']
+            setting_value = results['success']
     else:
+        # Don't cache a failed lookup
         return False
+    with we_vote_setting_cache_lock:
+        we_vote_setting_cache[setting_name] = (setting_value, now)
+    return setting_value
+
+
+def load_batch_process_system_setting_cache():
+    """
+    Read every batch process flag with one query, the first time one of them is needed and whenever they expire
+    :return:
+    """
+    try:
+        setting_list = WeVoteSetting.objects.using('readonly') \
+            .filter(name__in=BATCH_PROCESS_SYSTEM_SETTING_NAME_LIST, value_type=WeVoteSetting.BOOLEAN) \
+            .values_list('name', 'boolean_value')
+        now = time.monotonic()
+        with we_vote_setting_cache_lock:
+            for setting_name, boolean_value in setting_list:
+                we_vote_setting_cache[setting_name] = (boolean_value, now)
+    except Exception as e:
+        logger.error("load_batch_process_system_setting_cache failed: " + str(e))
+
+
+@receiver(post_save, sender=WeVoteSetting)
+@receiver(post_delete, sender=WeVoteSetting)
+def we_vote_setting_changed_signal(sender, instance, **kwargs):
+    # Covers WeVoteSettingsManager.save_setting as well as settings saved directly, like the admin on/off switches
+    clear_we_vote_setting_cache(instance.name)
+
+
+def fetch_batch_process_system_on():
+    return fetch_batch_process_system_setting('batch_process_system_on')
+
+
+def fetch_batch_process_system_activity_notices_on():
+    return fetch_batch_process_system_setting('batch_process_system_activity_notices_on')
 
 
 def fetch_batch_process_system_calculate_analytics_on():
-    we_vote_settings_manager = WeVoteSettingsManager()
-    results = \
-        we_vote_settings_manager.fetch_setting_results('batch_process_system_calculate_analytics_on', read_only=True)
-    if results['success']:
-        if results['we_vote_setting_found']:
-            return results['setting_value']
-        else:
-            # Create the setting the first time
-            results = we_vote_settings_manager.save_setting(
-                setting_name='batch_process_system_calculate_analytics_on',
-                setting_value=True,
-                value_type=WeVoteSetting.BOOLEAN)
-            return results['success']
-    else:
-        return False
+    return fetch_batch_process_system_setting('batch_process_system_calculate_analytics_on')
 
 
 def fetch_batch_process_system_api_refresh_on():
-    we_vote_settings_manager = WeVoteSettingsManager()
-    results = we_vote_settings_manager.fetch_setting_results('batch_process_system_api_refresh_on', read_only=True)
-    if results['success']:
-        if results['we_vote_setting_found']:
-            return results['setting_value']
-        else:
-            # Create the setting the first time
-            results = we_vote_settings_manager.save_setting(
-                setting_name='batch_process_system_api_refresh_on',
-                setting_value=True,
-                value_type=WeVoteSetting.BOOLEAN)
-            return results['success']
-    else:
-        return False
+    return fetch_batch_process_system_setting('batch_process_system_api_refresh_on')
 
 
 def fetch_batch_process_system_ballot_items_on():
-    we_vote_settings_manager = WeVoteSettingsManager()
-    results = we_vote_settings_manager.fetch_setting_results('batch_process_system_ballot_items_on', read_only=True)
-    if results['success']:
-        if results['we_vote_setting_found']:
-            return results['setting_value']
-        else:
-            # Create the setting the first time
-            results = we_vote_settings_manager.save_setting(
-                setting_name='batch_process_system_ballot_items_on',
-                setting_value=True,
-                value_type=WeVoteSetting.BOOLEAN)
-            return results['success']
-    else:
-        return False
+    return fetch_batch_process_system_setting('batch_process_system_ballot_items_on')
 
 
 def fetch_batch_process_system_search_twitter_on():
-    we_vote_settings_manager = WeVoteSettingsManager()
-    results = we_vote_settings_manager.fetch_setting_results('batch_process_system_search_twitter_on', read_only=True)
-    if results['success']:
-        if results['we_vote_setting_found']:
-            return results['setting_value']
-        else:
-            # Create the setting the first time
-            results = we_vote_settings_manager.save_setting(
-                setting_name='batch_process_system_search_twitter_on',
-                setting_value=True,
-                value_type=WeVoteSetting.BOOLEAN)
-            return results['success']
-    else:
-        return False
+    return fetch_batch_process_system_setting('batch_process_system_search_twitter_on')
 
 
 def fetch_batch_process_system_update_twitter_on():
-    we_vote_settings_manager = WeVoteSettingsManager()
-    results = we_vote_settings_manager.fetch_setting_results('batch_process_system_update_twitter_on', read_only=True)
-    if results['success']:
-        if results['we_vote_setting_found']:
-            return results['setting_value']
-        else:
-            # Create the setting the first time
-            results = we_vote_settings_manager.save_setting(
-                setting_name='batch_process_system_update_twitter_on',
-                setting_value=True,
-                value_type=WeVoteSetting.BOOLEAN)
-            return results['success']
-    else:
-        return False
+    return fetch_batch_process_system_setting('batch_process_system_update_twitter_on')
 
 
 def fetch_site_unique_id_prefix():
+    global site_unique_id_prefix_cached
+    # The prefix never changes once it has been created, so we only look it up once per process
+    if positive_value_exists(site_unique_id_prefix_cached):
+        return site_unique_id_prefix_cached
     we_vote_settings_manager = WeVoteSettingsManager()
     site_unique_id_prefix = we_vote_settings_manager.fetch_setting('site_unique_id_prefix')
 
@@ -361,19 +421,296 @@ def fetch_site_unique_id_prefix():
             safety_valve += 1
             site_unique_id_prefix = generate_random_string(2, characters_in_random_string)
             # Break out when we have a unique site_unique_id_prefix
-        we_vote_settings_manager.save_setting('site_unique_id_prefix', site_unique_id_prefix)
+        save_results = we_vote_settings_manager.save_setting('site_unique_id_prefix', site_unique_id_prefix)
         # TODO Each We Vote site needs to keep a local copy of site_unique_id_prefix's that are in use, AND
         # TODO Each We Vote site also needs to publish site_unique_id_prefix's in use by that organization
+        if not save_results['success']:
+            return site_unique_id_prefix
+    site_unique_id_prefix_cached = site_unique_id_prefix
     return site_unique_id_prefix
 
 
+def fetch_cache_version(cache_version_setting_name):
+    """
+    Version stamps let every worker notice that data it has cached in memory was changed by another process.
+    :param cache_version_setting_name:
+    :return:
+    """
+    try:
+        cache_version = WeVoteSetting.objects.filter(name=cache_version_setting_name) \
+            .values_list('integer_value', flat=True).first()
+        return convert_to_int(cache_version) if cache_version else 0
+    except Exception as e:
+        logger.error("fetch_cache_version " + str(cache_version_setting_name) + " failed: " + str(e))
+        return 0
+
+
+def increment_cache_version(cache_version_setting_name):
+    pending_name_set = getattr(cache_version_increment_state, 'pending_name_set', None)
+    if pending_name_set is not None:
+        # Inside cache_version_increments_deferred
+        pending_name_set.add(cache_version_setting_name)
+        return
+    try:
+        rows_updated = WeVoteSetting.objects.filter(name=cache_version_setting_name) \
+            .update(integer_value=Coalesce(F('integer_value'), 0) + 1)
+        if not rows_updated:
+            try:
+                with transaction.atomic():
+                    WeVoteSetting.objects.create(
+                        name=cache_version_setting_name,
+                        value_type=WeVoteSetting.INTEGER,
+                        integer_value=1,
+                    )
+            except IntegrityError:
+                # Another process created the setting after our update, so the update will find it now
+                WeVoteSetting.objects.filter(name=cache_version_setting_name) \
+                    .update(integer_value=Coalesce(F('integer_value'), 0) + 1)
+    except Exception as e:
+        handle_record_not_saved_exception(e, logger=logger)
+
+
+cache_version_increment_state = threading.local()
+
+
+@contextmanager
+def cache_version_increments_deferred():
+    """
+    Within this block increment_cache_version only notes which versions to bump, and each one is bumped once when
+    the block ends, so an import that saves thousands of rows for one election writes that election's version once.
+    Blocks can be nested; the outermost one does the bumping. Can also be used as a function decorator.
+    :return:
+    """
+    if getattr(cache_version_increment_state, 'pending_name_set', None) is not None:
+        yield
+        return
+    cache_version_increment_state.pending_name_set = set()
+    try:
+        yield
+    finally:
+        pending_name_set = cache_version_increment_state.pending_name_set
+        cache_version_increment_state.pending_name_set = None
+        for cache_version_setting_name in sorted(pending_name_set):
+            increment_cache_version(cache_version_setting_name)
+
+
+class WeVoteIdAllocator(object):
+    """
+    Hands out we_vote_id integers from blocks reserved in the database, so most new we_vote_ids don't need a query.
+    On PostgreSQL each kind of we_vote_id has its own sequence (we_vote_id_seq_position, ...) which advances by a
+    whole block on every nextval, so two processes can never be given the same block. The sequence is created the
+    first time it is needed, starting after the integer stored in the matching "we_vote_id_last_..._integer"
+    WeVoteSetting, and that setting is moved forward to the end of each block reserved. Other databases reserve
+    blocks by locking the WeVoteSetting row.
+    """
+
+    def __init__(self, block_size=WE_VOTE_ID_BLOCK_SIZE):
+        self.block_size = block_size
+        self.block_dict = {}
+        self.lock = threading.Lock()
+        self.process_id = os.getpid()
+        self.sequence_increment_dict = {}
+
+    def fetch_next_integer_list(self, we_vote_id_last_setting_name, count=1):
+        integer_list = []
+        with self.lock:
+            if self.process_id != os.getpid():
+                # A forked worker must not keep using the blocks its parent reserved
+                self.block_dict = {}
+                self.process_id = os.getpid()
+            while len(integer_list) < count:
+                block = self.block_dict.get(we_vote_id_last_setting_name)
+                if block is None or block['next_integer'] > block['last_integer']:
+                    first_integer, last_integer = self.reserve_block(
+                        we_vote_id_last_setting_name, max(self.block_size, count - len(integer_list)))
+                    block = {'next_integer': first_integer, 'last_integer': last_integer}
+                    self.block_dict[we_vote_id_last_setting_name] = block
+                take_count = min(count - len(integer_list), block['last_integer'] - block['next_integer'] + 1)
+                integer_list.extend(range(block['next_integer'], block['next_integer'] + take_count))
+                block['next_integer'] += take_count
+        return integer_list
+
+    def reserve_block(self, we_vote_id_last_setting_name, minimum_block_size):
+        if connections['default'].vendor == 'postgresql':
+            first_integer, last_integer = self.reserve_block_from_sequence(we_vote_id_last_setting_name)
+            while last_integer - first_integer + 1 < minimum_block_size:
+                # A request bigger than one block takes several; they are only usable if they are contiguous
+                next_first_integer, next_last_integer = self.reserve_block_from_sequence(we_vote_id_last_setting_name)
+                if next_first_integer != last_integer + 1:
+                    first_integer = next_first_integer
+                last_integer = next_last_integer
+            WeVoteSetting.objects.filter(name=we_vote_id_last_setting_name) \
+                .update(integer_value=Greatest(Coalesce(F('integer_value'), 0), last_integer))
+            return first_integer, last_integer
+        return self.reserve_block_from_setting(we_vote_id_last_setting_name, minimum_block_size)
+
+    def reserve_block_from_sequence(self, we_vote_id_last_setting_name):
+        sequence_name = we_vote_id_sequence_name(we_vote_id_last_setting_name)
+        sequence_increment = self.sequence_increment_dict.get(sequence_name)
+        with connections['default'].cursor() as cursor:
+            if sequence_increment is None:
+                cursor.execute("SELECT increment_by FROM pg_sequences WHERE sequencename = %s", [sequence_name])
+                row = cursor.fetchone()
+                if row is None:
+                    we_vote_id_last_integer = WeVoteSetting.objects.filter(name=we_vote_id_last_setting_name) \
+                        .values_list('integer_value', flat=True).first()
+                    # Identifiers can't be passed as query parameters; sequence_name is built from our own constants
+                    cursor.execute(
+                        "CREATE SEQUENCE IF NOT EXISTS " + sequence_name +
+                        " INCREMENT BY %s MINVALUE 1 START WITH %s",
+                        [self.block_size, convert_to_int(we_vote_id_last_integer) + 1])
+                    cursor.execute("SELECT increment_by FROM pg_sequences WHERE sequencename = %s", [sequence_name])
+                    row = cursor.fetchone()
+                sequence_increment = row[0]
+                if not connections['default'].in_atomic_block:
+                    # A sequence created inside a transaction disappears if that transaction is rolled back
+                    self.sequence_increment_dict[sequence_name] = sequence_increment
+            cursor.execute("SELECT nextval(%s)", [sequence_name])
+            first_integer = cursor.fetchone()[0]
+        return first_integer, first_integer + sequence_increment - 1
+
+    def reserve_block_from_setting(self, we_vote_id_last_setting_name, block_size):
+        with transaction.atomic(using='default'):
+            we_vote_setting = WeVoteSetting.objects.select_for_update() \
+                .filter(name=we_vote_id_last_setting_name).first()
+            if we_vote_setting is None:
+                we_vote_setting = WeVoteSetting(
+                    name=we_vote_id_last_setting_name,
+                    value_type=WeVoteSetting.INTEGER,
+                    integer_value=0,
+                )
+            first_integer = convert_to_int(we_vote_setting.integer_value) + 1
+            we_vote_setting.integer_value = first_integer + block_size - 1
+            we_vote_setting.save()
+        return first_integer, first_integer + block_size - 1
+
+    def clear(self):
+        with self.lock:
+            self.block_dict = {}
+            self.sequence_increment_dict = {}
+
+
+we_vote_id_allocator = WeVoteIdAllocator()
+
+
+def we_vote_id_sequence_name(we_vote_id_last_setting_name):
+    # ex/ we_vote_id_last_position_integer -> we_vote_id_seq_position
+    kind_of_we_vote_id = we_vote_id_last_setting_name.replace('we_vote_id_last_', '', 1)
+    if kind_of_we_vote_id.endswith('_integer'):
+        kind_of_we_vote_id = kind_of_we_vote_id[:-len('_integer')]
+    return 'we_vote_id_seq_' + ''.join(
+        character for character in kind_of_we_vote_id if character in string.ascii_lowercase + string.digits + '_')
+
+
 def fetch_next_we_vote_id_integer(we_vote_id_last_setting_name):
-    we_vote_settings_manager = WeVoteSettingsManager()
-    we_vote_id_last_integer = we_vote_settings_manager.fetch_setting(we_vote_id_last_setting_name)
-    we_vote_id_next_integer = convert_to_int(we_vote_id_last_integer)
-    we_vote_id_next_integer += 1
-    we_vote_settings_manager.save_setting(we_vote_id_last_setting_name, we_vote_id_next_integer)
-    return we_vote_id_next_integer
+    return we_vote_id_allocator.fetch_next_integer_list(we_vote_id_last_setting_name)[0]
+
+
+def fetch_next_we_vote_id_integer_list(we_vote_id_last_setting_name, count):
+    """
+    Reserve integers for many new rows at once, so they can be given we_vote_ids before a bulk_create
+    :param we_vote_id_last_setting_name: ex/ 'we_vote_id_last_position_integer'
+    :param count:
+    :return:
+    """
+    if not positive_value_exists(count):
+        return []
+    return we_vote_id_allocator.fetch_next_integer_list(we_vote_id_last_setting_name, convert_to_int(count))
+
+
+def generate_we_vote_id_list(we_vote_id_code, we_vote_id_last_setting_name, count):
+    """
+    Build we_vote_ids in the same "wv" + site_unique_id_prefix + code + integer format used by each model's
+    generate_new_we_vote_id, for rows that will be saved with bulk_create.
+    :param we_vote_id_code: ex/ 'pos'
+    :param we_vote_id_last_setting_name: ex/ 'we_vote_id_last_position_integer'
+    :param count:
+    :return:
+    """
+    site_unique_id_prefix = fetch_site_unique_id_prefix()
+    return ["wv{site_unique_id_prefix}{we_vote_id_code}{next_integer}".format(
+        site_unique_id_prefix=site_unique_id_prefix,
+        we_vote_id_code=we_vote_id_code,
+        next_integer=next_integer,
+    ) for next_integer in fetch_next_we_vote_id_integer_list(we_vote_id_last_setting_name, count)]
+
+
+class SharedRateLimiter(object):
+    """
+    A token bucket shared by every worker process, kept in one WeVoteSetting row so all processes draw from the same
+    allowance for a remote API. The row holds one integer: the time (in milliseconds) at which the bucket will be
+    full again. Taking a token moves that time forward by one refill interval, and a token is available whenever
+    the time is no more than a full bucket ahead of now. The row is locked while it is read and moved forward.
+    """
+
+    def __init__(self, setting_name, request_limit, period_seconds):
+        """
+        :param setting_name: ex/ 'rate_limit_twitter_users_lookup'
+        :param request_limit: Bucket size, ex/ 300 requests...
+        :param period_seconds: ...refilled evenly over 900 seconds
+        :return:
+        """
+        self.setting_name = setting_name
+        self.request_limit = request_limit
+        self.period_seconds = period_seconds
+        self.refill_interval_milliseconds = int(period_seconds * 1000 / request_limit)
+        self.bucket_milliseconds = self.refill_interval_milliseconds * request_limit
+
+    def try_acquire(self, cost=1):
+        """
+        :param cost: Number of tokens needed
+        :return: 0 if the tokens were taken, otherwise the number of seconds to wait before they will be available
+        """
+        now_milliseconds = int(time.time() * 1000)
+        with transaction.atomic(using='default'):
+            we_vote_setting = WeVoteSetting.objects.select_for_update().filter(name=self.setting_name).first()
+            if we_vote_setting is None:
+                we_vote_setting = WeVoteSetting(
+                    name=self.setting_name,
+                    value_type=WeVoteSetting.INTEGER,
+                    integer_value=0,
+                )
+            full_at_milliseconds = max(convert_to_int(we_vote_setting.integer_value), now_milliseconds)
+            new_full_at_milliseconds = full_at_milliseconds + self.refill_interval_milliseconds * cost
+            available_at_milliseconds = new_full_at_milliseconds - self.bucket_milliseconds
+            if available_at_milliseconds > now_milliseconds:
+                return (available_at_milliseconds - now_milliseconds) / 1000
+            we_vote_setting.integer_value = new_full_at_milliseconds
+            we_vote_setting.save()
+        return 0
+
+    def acquire(self, cost=1, max_wait_seconds=0):
+        """
+        Take tokens, sleeping for them if they will be available within max_wait_seconds
+        :param cost:
+        :param max_wait_seconds:
+        :return: True if the tokens were taken
+        """
+        deadline = time.monotonic() + max_wait_seconds
+        while True:
+            wait_seconds = self.try_acquire(cost)
+            if not wait_seconds:
+                return True
+            if time.monotonic() + wait_seconds > deadline:
+                return False
+            time.sleep(wait_seconds)
+
+    def empty_until(self, seconds_from_now):
+        """
+        The remote API told us we are out of requests (ex/ HTTP 429), so no process takes a token for this long
+        :param seconds_from_now:
+        :return:
+        """
+        full_at_milliseconds = int((time.time() + seconds_from_now) * 1000) + self.bucket_milliseconds
+        with transaction.atomic(using='default'):
+            updated_count = WeVoteSetting.objects.filter(name=self.setting_name) \
+                .update(integer_value=Greatest(Coalesce(F('integer_value'), 0), full_at_milliseconds))
+            if not updated_count:
+                WeVoteSetting.objects.create(
+                    name=self.setting_name,
+                    value_type=WeVoteSetting.INTEGER,
+                    integer_value=full_at_milliseconds,
+                )
 
 
 def fetch_next_we_vote_id_activity_comment_integer():
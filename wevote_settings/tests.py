@@ -0,0 +1,110 @@
+import multiprocessing
+from unittest import mock
+
+from django.db import connections
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+
+from wevote_settings.models import cache_version_increments_deferred, clear_we_vote_setting_cache, \
+    fetch_batch_process_system_on, fetch_cache_version, fetch_next_we_vote_id_integer_list, \
+    increment_cache_version, WeVoteIdAllocator, WeVoteSetting, we_vote_id_allocator, we_vote_id_sequence_name
+
+
+def allocate_in_child_process(result_queue, count):
+    # The child must open its own connection instead of sharing the parent's socket
+    connections.close_all()
+    allocator = WeVoteIdAllocator(block_size=10)
+    integer_list = []
+    for number in range(count):
+        integer_list.extend(allocator.fetch_next_integer_list('we_vote_id_last_test_integer'))
+    connections.close_all()
+    result_queue.put(integer_list)
+
+
+class WeVoteIdSequenceNameTestCase(SimpleTestCase):
+    def test_sequence_name(self):
+        self.assertEqual(we_vote_id_sequence_name('we_vote_id_last_position_integer'), 'we_vote_id_seq_position')
+        self.assertEqual(we_vote_id_sequence_name('we_vote_id_last_campaignx_news_item_integer'),
+                         'we_vote_id_seq_campaignx_news_item')
+
+
+class WeVoteSettingCacheTestCase(SimpleTestCase):
+    def setUp(self):
+        clear_we_vote_setting_cache()
+
+    def tearDown(self):
+        clear_we_vote_setting_cache()
+
+    def test_flag_read_once_until_cleared(self):
+        with mock.patch('wevote_settings.models.WeVoteSettingsManager') as mock_manager_class, \
+                mock.patch('wevote_settings.models.load_batch_process_system_setting_cache') as mock_load:
+            mock_manager = mock_manager_class.return_value
+            mock_manager.fetch_setting_results.return_value = {
+                'success': True, 'we_vote_setting_found': True, 'setting_value': False}
+            self.assertFalse(fetch_batch_process_system_on())
+            self.assertFalse(fetch_batch_process_system_on())
+            self.assertEqual(mock_manager.fetch_setting_results.call_count, 1)
+            self.assertEqual(mock_load.call_count, 1)
+
+            clear_we_vote_setting_cache('batch_process_system_on')
+            mock_manager.fetch_setting_results.return_value['setting_value'] = True
+            self.assertTrue(fetch_batch_process_system_on())
+            self.assertEqual(mock_manager.fetch_setting_results.call_count, 2)
+
+
+class WeVoteIdAllocatorTestCase(TransactionTestCase):
+    databases = ["default", "readonly"]
+
+    def setUp(self):
+        we_vote_id_allocator.clear()
+        with connections['default'].cursor() as cursor:
+            cursor.execute("DROP SEQUENCE IF EXISTS we_vote_id_seq_test")
+
+    def tearDown(self):
+        we_vote_id_allocator.clear()
+        with connections['default'].cursor() as cursor:
+            cursor.execute("DROP SEQUENCE IF EXISTS we_vote_id_seq_test")
+
+    def test_continues_after_existing_setting(self):
+        WeVoteSetting.objects.create(
+            name='we_vote_id_last_test_integer', value_type=WeVoteSetting.INTEGER, integer_value=41)
+        integer_list = fetch_next_we_vote_id_integer_list('we_vote_id_last_test_integer', 1500)
+        self.assertEqual(integer_list, list(range(42, 1542)))
+        self.assertGreaterEqual(
+            WeVoteSetting.objects.get(name='we_vote_id_last_test_integer').integer_value, 1541)
+
+    def test_unique_across_processes(self):
+        WeVoteSetting.objects.create(
+            name='we_vote_id_last_test_integer', value_type=WeVoteSetting.INTEGER, integer_value=0)
+        context = multiprocessing.get_context('fork')
+        result_queue = context.Queue()
+        process_list = [context.Process(target=allocate_in_child_process, args=(result_queue, 250))
+                        for number in range(4)]
+        for process in process_list:
+            process.start()
+        all_integer_list = []
+        for process in process_list:
+            all_integer_list.extend(result_queue.get(timeout=60))
+        for process in process_list:
+            process.join()
+        self.assertEqual(len(all_integer_list), 1000)
+        self.assertEqual(len(set(all_integer_list)), 1000)
+
+
+class CacheVersionTestCase(TestCase):
+    databases = ["default", "readonly"]
+
+    def test_increment_creates_the_setting_once(self):
+        increment_cache_version('test_cache_version')
+        increment_cache_version('test_cache_version')
+        self.assertEqual(fetch_cache_version('test_cache_version'), 2)
+        self.assertEqual(WeVoteSetting.objects.filter(name='test_cache_version').count(), 1)
+
+    def test_deferred_increments_are_written_once(self):
+        with cache_version_increments_deferred():
+            for number in range(100):
+                increment_cache_version('test_cache_version')
+                with cache_version_increments_deferred():
+                    increment_cache_version('test_other_cache_version')
+            self.assertEqual(fetch_cache_version('test_cache_version'), 0)
+        self.assertEqual(fetch_cache_version('test_cache_version'), 1)
+        self.assertEqual(fetch_cache_version('test_other_cache_version'), 1)